@@ -1,50 +1,35 @@
 import sys
 from PyQt5.QtWidgets import QApplication, QLabel, QMainWindow, QTabWidget
 from PyQt5.QtWidgets import *
-import sqlite3
+from PyQt5.QtCore import QTimer
 from objects import Person, Student, Instructor, Course
-import json
-import csv
-
-conn = sqlite3.connect('university.db')
-conn.execute("PRAGMA foreign_keys = ON")
-cursor = conn.cursor()
-
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Students (
-        ID TEXT PRIMARY KEY,
-        Name TEXT NOT NULL,
-        Age INTEGER,
-        Email TEXT
-    )
-''')
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Instructors (
-        ID TEXT PRIMARY KEY,
-        Name TEXT NOT NULL,
-        Age INTEGER,
-        Email TEXT
-    )
-''')
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Courses (
-        ID TEXT PRIMARY KEY,
-        Name TEXT NOT NULL,
-        InstructorID TEXT,
-        FOREIGN KEY (InstructorID) REFERENCES Instructors(ID) on delete cascade on update cascade
-    )
-''')
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Registrations (
-        StudentID TEXT,
-        CourseID TEXT,
-        FOREIGN KEY (StudentID) REFERENCES Students(ID) on delete cascade on update cascade,
-        FOREIGN KEY (CourseID) REFERENCES Courses(ID) on delete cascade on update cascade,
-        PRIMARY KEY (StudentID, CourseID)
-    )
-''')
-
-conn.commit()
+from database import connect, use_wal, is_busy, set_busy_timeout, BUSY_TIMEOUT
+from instrumentation import metrics, timed, InstrumentedConnection
+from compression import COMPRESSION_SUFFIXES, DEFAULT_LEVEL
+from jsonstream import JSON_FORMATS
+from changelog import export_changes, apply_changes
+from queries import Queries, QUERIES
+from storage import SqliteStorage, record_key
+from pagination import PAGE_SIZE
+from reports import REPORTS, report, export_report, refresh_summaries
+from backup import BackupJob, SnapshotJob, BACKUP_DIRECTORY, PAGES_PER_STEP, database_file, timestamped, prune_backups
+from parallel_export import ParallelExportJob, export_tables, CSV_FILE
+from csv_import import import_merged_csv
+from transfer import NESTED, export_nested
+from prerequisites import complete_courses, parse_ids, set_prerequisites
+from timetable import CSV_HEADER as CLASH_HEADER, clash_rows, parse_slots, set_slots, validate_term
+from jobs import open_job, resume_job, list_jobs, unfinished_jobs, import_summary
+import time
+import itertools
+
+conn = connect(factory=InstrumentedConnection)
+# backups and consistent exports read the database while the app keeps writing to it
+use_wal(conn)
+# cached lookups of schedules, rosters and teaching assignments
+queries = Queries(conn)
+# the students, instructors, courses and registrations are added, changed and listed through the storage interface
+# shared with main.py (see storage.py)
+storage = SqliteStorage(conn)
 
 
 def main():
@@ -72,21 +57,29 @@ window.setCentralWidget(tabs)
 def show_error_popup():
     """
     Displays an error message in a pop-up window.
+    When called while handling a "database is locked" error, which another program writing to university.db
+    for longer than the busy timeout causes, the message says so instead of blaming the input.
 
     :return: nothing
     :rtype: None
     """
+    metrics.record_error()
     # Create a message box for the error
     error_message = QMessageBox()
     error_message.setIcon(QMessageBox.Critical)
     error_message.setWindowTitle("Error")
-    error_message.setText("An error occurred!")
-    error_message.setInformativeText("Please check your input and try again.")
+    if is_busy(sys.exc_info()[1]):
+        error_message.setText("The database is busy!")
+        error_message.setInformativeText("Another program is writing to the database. Please try again in a moment.")
+    else:
+        error_message.setText("An error occurred!")
+        error_message.setInformativeText("Please check your input and try again.")
     error_message.setStandardButtons(QMessageBox.Ok)
     
     # Show the popup
     error_message.exec_()
 
+@timed('addStudent')
 def addStudent():
     """
     Adds a new student to the database.
@@ -109,9 +102,7 @@ def addStudent():
         return
     try:
         student = Student(name, age, email, student_id)
-        cursor.execute("INSERT INTO Students (ID, Name, Age, Email) VALUES (?, ?, ?, ?)", 
-                        (student_id, name, age, email))
-        conn.commit()
+        storage.add('students', {'id': student_id, 'name': name, 'age': int(age), 'email': email})
     except Exception as e:
         print(e)
         show_error_popup()
@@ -119,6 +110,7 @@ def addStudent():
 
 
 
+@timed('deleteStudent')
 def deleteStudent():
     """
     Deletes a student from the database.
@@ -132,14 +124,14 @@ def deleteStudent():
     :rtype: None
     """
     try:
-        cursor.execute("delete from Students where ID =  ?", (student_id_entry.text(),))
-        conn.commit()
+        storage.delete('students', student_id_entry.text())
     except Exception as e:
         print(e)
         show_error_popup()
     default_populate_tables()
 
 
+@timed('editStudent')
 def editStudent():
     """
     Edit the student whose ID is retrieved from the input field
@@ -157,22 +149,18 @@ def editStudent():
     email = student_email_entry.text()
     student_id = student_id_entry.text()
     try:
-        if (any(field != "" for field in [name, age, email])):
-            if name!="":
-                cursor.execute("Update Students set Name = ? where ID = ?", (name, student_id))
-                conn.commit()
-            if age!="":
-                cursor.execute("Update Students set Age = ? where ID = ?", (age, student_id))
-                conn.commit()
-            if email!="":
-                cursor.execute("Update Students set Email = ? where ID = ?", (email, student_id))
-                conn.commit()
+        changes = {field: value for field, value in [('name', name), ('age', age), ('email', email)] if value != ""}
+        if changes:
+            if 'age' in changes:
+                changes['age'] = int(age)
+            storage.update('students', student_id, changes)
     except Exception as e:
         show_error_popup()
         print(e)
     default_populate_tables()
 
 
+@timed('addInstructor')
 def addInstructor():
     """
     Adds a new instructor to the database.
@@ -196,9 +184,7 @@ def addInstructor():
     
     try:
         instructor = Instructor(name, age, email, instructor_id)
-        cursor.execute("INSERT INTO Instructors (ID, Name, Age, Email) VALUES (?, ?, ?, ?)", 
-                    (instructor_id, name, age, email))
-        conn.commit()
+        storage.add('instructors', {'id': instructor_id, 'name': name, 'age': int(age), 'email': email})
     except Exception as e:
         show_error_popup()
         print(e)
@@ -206,6 +192,7 @@ def addInstructor():
 
 
 
+@timed('deleteInstructor')
 def deleteInstructor():
     """
     Deletes a instructor from the database.
@@ -220,8 +207,7 @@ def deleteInstructor():
     :rtype: None
     """
     try:
-        cursor.execute("delete from Instructors where ID =  ?", (instructor_id_entry.text(),))
-        conn.commit()
+        storage.delete('instructors', instructor_id_entry.text())
     except Exception as e:
         show_error_popup()
         print(e)
@@ -229,6 +215,7 @@ def deleteInstructor():
 
     
 
+@timed('editInstructor')
 def editInstructor():
     """
     Edit the instructor whose ID is retrieved from the input field
@@ -246,30 +233,27 @@ def editInstructor():
     email = instructor_email_entry.text()
     instructor_id = instructor_id_entry.text()
     try:
-        if (any(field != "" for field in [name, age, email])):
-            if name!="":
-                cursor.execute("Update Instructors set Name = ? where ID = ?", (name, instructor_id))
-                conn.commit()
-            if age!="":
-                cursor.execute("Update Instructors set Age = ? where ID = ?", (age, instructor_id))
-                conn.commit()
-            if email!="":
-                cursor.execute("Update Instructors set Email = ? where ID = ?", (email, instructor_id))
-                conn.commit()
+        changes = {field: value for field, value in [('name', name), ('age', age), ('email', email)] if value != ""}
+        if changes:
+            if 'age' in changes:
+                changes['age'] = int(age)
+            storage.update('instructors', instructor_id, changes)
     except Exception as e:
         show_error_popup()
         print(e)
     default_populate_tables()
 
 
+@timed('addCourse')
 def addCourse():
     """
     Adds a new course to the database.
 
     Retrieves course information from input fields and inserts a new record 
-    into the Courses table in the database.
+    into the Courses table in the database, along with its meeting times if any (see timetable.py),
+    e.g. Mon 09:00-10:15, Wed 09:00-10:15, and the IDs of the courses it requires if any (see prerequisites.py)
     updates the info in the tables by calling default_populate_tables
-    displays an error popup in case of errors
+    displays an error popup in case of errors, or if the course meets at the same time as another course of the instructor
 
 
     :return: Nothing.
@@ -284,9 +268,17 @@ def addCourse():
     try:
         course = Course(course_id, course_name)
         course.instructor_id = instructor_id
-        cursor.execute("INSERT INTO Courses (ID, Name, InstructorID) VALUES (?, ?, ?)", 
-                    (course_id, course_name, instructor_id))
-        conn.commit()
+        slots = parse_slots(course_slots_entry.text())
+        required = parse_ids(course_prerequisites_entry.text())
+
+        def add(conn):
+            storage.add('courses', {'id': course_id, 'name': course_name, 'instructor_id': instructor_id})
+            if slots:
+                set_slots(conn, course_id, slots)
+            if required:
+                set_prerequisites(conn, course_id, required)
+        # the course is only added if its meeting times don't clash with the other courses of its instructor
+        storage.write(add)
     except Exception as e:
         show_error_popup()
         print(e)
@@ -294,6 +286,7 @@ def addCourse():
 
 
 
+@timed('deleteCourse')
 def deleteCourse():
     """
     Deletes a course from the database.
@@ -308,21 +301,23 @@ def deleteCourse():
     :rtype: None
     """
     try:
-        cursor.execute("delete from Courses where ID =  ?", (course_id_entry.text(),))
-        conn.commit()
+        storage.delete('courses', course_id_entry.text())
     except Exception as e:
         show_error_popup()
         print(e)
     default_populate_tables()
 
 
+@timed('editCourse')
 def editCourse():
     """
     Edit the course whose ID is retrieved from the input field
     by replacing one or more of its attributes in the database with the corresponding values in the nonempty input field.
     if an input field is left empty, the corresponding value is unchanged
+    the meeting times replace all the meeting times of the course, and the prerequisites all its prerequisites
     updates the info in the tables by calling default_populate_tables
-    displays an error popup in case of errors
+    displays an error popup in case of errors, or if the course would meet at the same time as another course
+    of its instructor or of one of its students, in which case the course is left unchanged
 
 
     :return: Nothing.
@@ -331,25 +326,35 @@ def editCourse():
     name = course_name_entry.text()
     course_id = course_id_entry.text()
     instructor_id = course_instructor_entry.text()
+    slots_text = course_slots_entry.text()
+    prerequisites_text = course_prerequisites_entry.text()
     try:
-        if (any(field != "" for field in [name, instructor_id])):
-            if name!="":
-                cursor.execute("Update Courses set Name = ? where ID = ?", (name, course_id))
-                conn.commit()
-            if instructor_id!="":
-                cursor.execute("Update Courses set InstructorID = ? where ID = ?", (instructor_id, course_id))
-                conn.commit()
+        changes = {field: value for field, value in [('name', name), ('instructor_id', instructor_id)] if value != ""}
+        slots = parse_slots(slots_text) if slots_text != "" else None
+
+        def edit(conn):
+            # the new instructor is checked against the new meeting times
+            if slots is not None:
+                set_slots(conn, course_id, slots)
+            if changes:
+                storage.update('courses', course_id, changes)
+            if prerequisites_text != "":
+                set_prerequisites(conn, course_id, parse_ids(prerequisites_text))
+        # none of the changes is made if one of them fails, e.g. meeting times clashing with another course
+        storage.write(edit)
     except Exception as e:
         show_error_popup()
         print(e)
     default_populate_tables()
 
 
+@timed('registerStudent')
 def registerStudent():
     """
     Obtains a studentID and a courseID from input fields and inserts a record in the Registrations table,
     indicating that this student has registered in this course
-    displays an error popup in case of errors
+    displays an error popup in case of errors, if the course meets at the same time as another course of the student,
+    or if the student hasn't completed the courses it requires
 
 
     :return: Nothing.
@@ -358,12 +363,31 @@ def registerStudent():
     student_id = registering_student_id_entry.text()
     course_id = registered_course.currentText()
     try:
-        cursor.execute("Insert into Registrations (StudentID, CourseID) values (?, ?)", (student_id, course_id))
-        conn.commit()
+        storage.register(student_id, course_id)
     except Exception as e:
         show_error_popup()
         print(e)
         
+@timed('completeCourse')
+def completeCourse():
+    """
+    Obtains a studentID and a courseID from input fields and records that this student has completed this course,
+    so they can register in the courses that require it (see prerequisites.py)
+    shows an error popup in case of errors
+
+
+    :return: Nothing.
+    :rtype: None
+    """
+    student_id = registering_student_id_entry.text()
+    course_id = registered_course.currentText()
+    try:
+        complete_courses(conn, student_id, [course_id])
+    except Exception as e:
+        show_error_popup()
+        print(e)
+
+@timed('dropStudent')
 def dropStudent():
     """
     Obtains a studentID and a courseID from input fields and deletes the row in Registrations table which corresponds to both values.
@@ -376,17 +400,17 @@ def dropStudent():
     student_id = registering_student_id_entry.text()
     course_id = registered_course.currentText()
     try:
-        cursor.execute("delete from Registrations where StudentID=? and CourseID=?", (student_id, course_id))
-        conn.commit()
+        storage.drop(student_id, course_id)
     except Exception as e:
         show_error_popup()
         print(e)
 
+@timed('assignInstructor')
 def assignInstructor():
     """
     Obtains a course ID and InstructorID from input fields, and sets the value of the instructorID for this course to the
     obtained instructor id.
-    displays an error popup in case of errors
+    displays an error popup in case of errors, or if the course meets at the same time as another course of the instructor
 
     :return: Nothing.
     :rtype: None
@@ -394,12 +418,12 @@ def assignInstructor():
     course_id = assigned_course.currentText()
     instructor_id = assigned_instructor_id_entry.text()
     try:
-        cursor.execute("update Courses set InstructorID = ? where ID = ? ", (instructor_id, course_id))
-        conn.commit()
+        storage.assign(course_id, instructor_id)
     except Exception as e:
         show_error_popup()
         print(e)
 
+@timed('changeInstructor')
 def changeInstructor():
     """
     Obtains a course ID and InstructorID from input fields, and sets the value of the instructorID for this course to the
@@ -412,12 +436,30 @@ def changeInstructor():
     instructor_id = assigned_instructor_id_entry.text()
     course_id = assigned_course.currentText()
     try:
-        cursor.execute("Update Courses set InstructorID = ? where ID= ?", (instructor_id, course_id))
-        conn.commit()
+        storage.assign(course_id, instructor_id)
     except Exception as e:
         show_error_popup()
         print(e)
 
+@timed('validateTerm')
+def validateTerm():
+    """
+    finds the clashes in the timetables of all students and instructors (see timetable.validate_term), and shows
+    their number and the first ones in the Register Students tab
+
+    :return: the clashes found, see timetable.validate_term
+    :rtype: dict
+    """
+    result = validate_term(conn)
+    rows = list(itertools.islice(clash_rows(result), PAGE_SIZE))
+    clash_status.setText("%d clashes of students, %d of instructors (%.2fs)" % (
+        len(result['students']), len(result['instructors']), result['seconds']))
+    clash_table.setRowCount(len(rows))
+    for i, row in enumerate(rows):
+        for j, value in enumerate(row):
+            clash_table.setItem(i, j, QTableWidgetItem(value))
+    return result
+
 
 # Create tabs
 student_tab = QWidget()
@@ -426,7 +468,10 @@ course_tab = QWidget()
 register_tab = QWidget()
 assign_tab = QWidget()
 display_tab = QWidget()
+reports_tab = QWidget()
 export_tab = QWidget()
+backup_tab = QWidget()
+diagnostics_tab = QWidget()
 
 tabs.addTab(student_tab, 'Students')
 tabs.addTab(instructor_tab, 'Instructors')
@@ -434,7 +479,10 @@ tabs.addTab(course_tab, 'Courses')
 tabs.addTab(register_tab, "Register Students")
 tabs.addTab(assign_tab, "Assign Instructors")
 tabs.addTab(display_tab, "Display Data")
+tabs.addTab(reports_tab, "Reports")
 tabs.addTab(export_tab, "Export Data")
+tabs.addTab(backup_tab, "Backup")
+tabs.addTab(diagnostics_tab, "Diagnostics")
 
 ### student tab
 
@@ -444,11 +492,11 @@ student_age_entry = QLineEdit()
 student_email_entry = QLineEdit()
 
 add_student = QPushButton('Add Student')
-add_student.clicked.connect(addStudent)
+add_student.clicked.connect(lambda: addStudent())
 delete_student = QPushButton('Delete Student with this ID')
-delete_student.clicked.connect(deleteStudent)
+delete_student.clicked.connect(lambda: deleteStudent())
 edit_student = QPushButton('Edit Student with this ID')
-edit_student.clicked.connect(editStudent)
+edit_student.clicked.connect(lambda: editStudent())
 
 student_form_layout = QFormLayout()
 student_form_layout.addRow('ID:', student_id_entry)
@@ -469,11 +517,11 @@ instructor_age_entry = QLineEdit()
 instructor_email_entry = QLineEdit()
 
 add_instructor = QPushButton('Add instructor')
-add_instructor.clicked.connect(addInstructor)
+add_instructor.clicked.connect(lambda: addInstructor())
 delete_instructor = QPushButton('Delete instructor with this ID')
-delete_instructor.clicked.connect(deleteInstructor)
+delete_instructor.clicked.connect(lambda: deleteInstructor())
 edit_instructor = QPushButton('Edit instructor with this ID')
-edit_instructor.clicked.connect(editInstructor)
+edit_instructor.clicked.connect(lambda: editInstructor())
 
 instructor_form_layout = QFormLayout()
 instructor_form_layout.addRow('ID:', instructor_id_entry)
@@ -490,18 +538,24 @@ instructor_tab.setLayout(instructor_form_layout)
 course_id_entry = QLineEdit()  
 course_name_entry = QLineEdit()
 course_instructor_entry = QLineEdit()
+course_slots_entry = QLineEdit()
+course_slots_entry.setPlaceholderText('e.g. Mon 09:00-10:15, Wed 09:00-10:15')
+course_prerequisites_entry = QLineEdit()
+course_prerequisites_entry.setPlaceholderText('IDs of the courses it requires, e.g. C1, C2')
 
 add_course = QPushButton('Add course')
-add_course.clicked.connect(addCourse)
+add_course.clicked.connect(lambda: addCourse())
 delete_course = QPushButton('Delete course with this ID')
-delete_course.clicked.connect(deleteCourse)
+delete_course.clicked.connect(lambda: deleteCourse())
 edit_course = QPushButton('Edit course with this ID')
-edit_course.clicked.connect(editCourse)
+edit_course.clicked.connect(lambda: editCourse())
 
 course_form_layout = QFormLayout()
 course_form_layout.addRow('ID:', course_id_entry)
 course_form_layout.addRow('Name:', course_name_entry)
 course_form_layout.addRow('Instructor ID:', course_instructor_entry)
+course_form_layout.addRow('Meeting times:', course_slots_entry)
+course_form_layout.addRow('Prerequisites:', course_prerequisites_entry)
 course_form_layout.addRow(add_course)
 course_form_layout.addRow(delete_course)
 course_form_layout.addRow(edit_course)
@@ -511,31 +565,44 @@ course_tab.setLayout(course_form_layout)
 
 registering_student_id_entry = QLineEdit()  
 registered_course = QComboBox()
-registered_course.addItems([t[0] for t in cursor.execute("select ID from Courses").fetchall()])
+registered_course.addItems([course['id'] for course in storage.iterate('courses')])
 
 register = QPushButton('register student')
-register.clicked.connect(registerStudent)
+register.clicked.connect(lambda: registerStudent())
 drop_student = QPushButton('Drop student from course')
-drop_student.clicked.connect(dropStudent)
+drop_student.clicked.connect(lambda: dropStudent())
+complete_course = QPushButton('Mark course as completed by student')
+complete_course.clicked.connect(lambda: completeCourse())
 
 registration_form_layout = QFormLayout()
 registration_form_layout.addRow('Student ID:', registering_student_id_entry)
 registration_form_layout.addRow('Course ID:', registered_course)
 registration_form_layout.addRow(register)
 registration_form_layout.addRow(drop_student)
+registration_form_layout.addRow(complete_course)
+
+validate_term_button = QPushButton('Find Timetable Clashes')
+validate_term_button.clicked.connect(lambda: validateTerm())
+clash_status = QLabel()
+clash_table = QTableWidget()
+clash_table.setColumnCount(len(CLASH_HEADER))
+clash_table.setHorizontalHeaderLabels(CLASH_HEADER)
+registration_form_layout.addRow(validate_term_button)
+registration_form_layout.addRow(clash_status)
+registration_form_layout.addRow(clash_table)
 register_tab.setLayout(registration_form_layout)
 
 #### Assign instructor tab
 
 assigned_instructor_id_entry = QLineEdit()  
 assigned_course = QComboBox()
-assigned_course.addItems([t[0] for t in cursor.execute("select ID from Courses").fetchall()])
+assigned_course.addItems([course['id'] for course in storage.iterate('courses')])
 
 
 assign = QPushButton('assign instructor')
-assign.clicked.connect(assignInstructor)
+assign.clicked.connect(lambda: assignInstructor())
 change_instructor = QPushButton('Change Instructor')
-change_instructor.clicked.connect(changeInstructor)
+change_instructor.clicked.connect(lambda: changeInstructor())
 
 assign_form_layout = QFormLayout()
 assign_form_layout.addRow('Instructor ID:', assigned_instructor_id_entry)
@@ -546,18 +613,90 @@ assign_tab.setLayout(assign_form_layout)
 
 #### View tables tab
 
+# the tables of the View Tables tab show a page of rows at a time, read with keyset pagination (see pagination.py):
+# for each table, the key of the last row before each page up to the one shown (None for the first page),
+# and the key of the last row of the page shown if there is a next page
+display_pages = {'students': [None], 'instructors': [None], 'courses': [None]}
+display_next = {}
+display_filters = {}
+
+@timed('default_populate_tables')
 def default_populate_tables():
     """
-    populates the tables in the View Tables tab with all available entries (no filters)
+    populates the tables in the View Tables tab with all available entries (no filters).
+    The tables stay on the page they show, unless they were filtered
+
+    :return: Nothing.
+    :rtype: None
+
+    """
+    if display_filters:
+        display_filters.clear()
+        reset_pages()
+    for kind in display_pages:
+        populate_page(kind)
+
+def reset_pages():
+    """
+    moves the tables in the View Tables tab back to their first page
+
+    :return: Nothing.
+    :rtype: None
+    """
+    for kind in display_pages:
+        display_pages[kind] = [None]
+
+def populate_page(kind):
+    """
+    shows the page of a table of the View Tables tab that starts after the key in display_pages,
+    reading only the rows of that page from the storage, with the filters of display_filters
+
+    :param kind: students, instructors or courses
+    :type kind: str
 
     :return: Nothing.
     :rtype: None
+    """
+    limit = page_size.value()
+    # one more row tells whether there is a next page
+    records = storage.page(kind, display_pages[kind][-1], limit + 1, **display_filters)
+    populate_table(DISPLAY_TABLES[kind], [tuple(record.values()) for record in records[:limit]])
+    display_next[kind] = record_key(kind, records[limit - 1]) if len(records) > limit else None
+    next_buttons[kind].setEnabled(display_next[kind] is not None)
+    previous_buttons[kind].setEnabled(len(display_pages[kind]) > 1)
+    page_labels[kind].setText("Page %d" % len(display_pages[kind]))
+
+@timed('next_page')
+def next_page(kind):
+    """
+    shows the next page of a table of the View Tables tab. Rows added or deleted meanwhile don't shift the pages
+
+    :param kind: students, instructors or courses
+    :type kind: str
+
+    :return: Nothing.
+    :rtype: None
+    """
+    if display_next.get(kind) is not None:
+        display_pages[kind].append(display_next[kind])
+        populate_page(kind)
+
+@timed('previous_page')
+def previous_page(kind):
+    """
+    shows the previous page of a table of the View Tables tab
+
+    :param kind: students, instructors or courses
+    :type kind: str
 
+    :return: Nothing.
+    :rtype: None
     """
-    populate_table(student_table, cursor.execute("select * from Students").fetchall())
-    populate_table(course_table, cursor.execute("select * from Courses").fetchall())
-    populate_table(instructor_table, cursor.execute("select * from Instructors").fetchall())
+    if len(display_pages[kind]) > 1:
+        display_pages[kind].pop()
+        populate_page(kind)
 
+@timed('populate_table')
 def populate_table(table, data):
     """
     populates the given table in the View Tables tab with the given data, after clearing it from existing data
@@ -586,6 +725,7 @@ def populate_table(table, data):
 
 #### Filter
 
+@timed('filter_results')
 def filter_results():
     """
     Obtains filter values from the input fields, and obtains data from the database according to these filters.
@@ -599,21 +739,15 @@ def filter_results():
     course_table.setRowCount(0)
     name = filter_name_entry.text()
     id = filter_id_entry.text()
-    student_query = "select * from Students where true "
-    instructor_query = "select * from Instructors where true "
-    course_query = "select * from Courses where true "
+    display_filters.clear()
     if name!="":
-        student_query += " and Name = '" + name +"'"
-        instructor_query+= " and Name = '" + name +"'"
-        course_query+= " and Name = '" + name +"'"
+        display_filters['name'] = name
     if id != "":
-        student_query += " and ID = '"+ id +"'"
-        instructor_query+= " and ID = '"+ id +"'"
-        course_query+= " and ID = '"+ id +"'"
-        
-    populate_table(student_table, cursor.execute(student_query).fetchall() )
-    populate_table(instructor_table, cursor.execute(instructor_query).fetchall())
-    populate_table(course_table, cursor.execute(course_query).fetchall() )
+        display_filters['id'] = id
+
+    reset_pages()
+    for kind in display_pages:
+        populate_page(kind)
 
 main_layout = QVBoxLayout()
 
@@ -622,7 +756,7 @@ filter_name_entry = QLineEdit()
 filter_id_entry = QLineEdit() 
 filter_layout = QFormLayout()
 filter = QPushButton('Filter')
-filter.clicked.connect(filter_results)
+filter.clicked.connect(lambda: filter_results())
 filter_layout.addRow('Filter by Name:', filter_name_entry)
 filter_layout.addRow('Filter by ID:', filter_id_entry)
 filter_layout.addRow(filter)
@@ -643,90 +777,442 @@ course_table = QTableWidget()
 course_table.setColumnCount(3)
 course_table.setHorizontalHeaderLabels(['ID', 'Name', 'Instructor ID'])
 
+DISPLAY_TABLES = {'students': student_table, 'instructors': instructor_table, 'courses': course_table}
+
+page_size = QSpinBox()
+page_size.setRange(1, 100000)
+page_size.setValue(PAGE_SIZE)
+page_size.valueChanged.connect(lambda: filter_results())
+filter_layout.addRow('Rows per page:', page_size)
+
+previous_buttons = {}
+next_buttons = {}
+page_labels = {}
+for kind, table in DISPLAY_TABLES.items():
+    previous_buttons[kind] = QPushButton('Previous')
+    previous_buttons[kind].clicked.connect(lambda checked, kind=kind: previous_page(kind))
+    next_buttons[kind] = QPushButton('Next')
+    next_buttons[kind].clicked.connect(lambda checked, kind=kind: next_page(kind))
+    page_labels[kind] = QLabel()
+    page_layout = QHBoxLayout()
+    page_layout.addWidget(previous_buttons[kind])
+    page_layout.addWidget(page_labels[kind])
+    page_layout.addWidget(next_buttons[kind])
+    main_layout.addWidget(table)
+    main_layout.addLayout(page_layout)
+
 default_populate_tables()
 
-main_layout.addWidget(student_table)
-main_layout.addWidget(instructor_table)
-main_layout.addWidget(course_table)
+#### Lookups
+
+# lookup -> query of queries.py
+LOOKUPS = {
+    'Schedule of student': 'student_schedule',
+    'Roster of course': 'course_roster',
+    'Courses of instructor': 'instructor_courses',
+}
+
+@timed('lookup')
+def lookup(name=None, key=None):
+    """
+    shows the schedule of a student, the roster of a course or the courses of an instructor in the Display Data tab.
+    The results come from the query cache unless the tables they are read from have been written to since
+
+    :param name: student_schedule, course_roster or instructor_courses, defaults to the lookup selected in the Display Data tab
+    :type name: str or None
+
+    :param key: the ID of the student, course or instructor, defaults to the ID entered in the Display Data tab
+    :type key: str or None
+
+    :return: Nothing.
+    :rtype: None
+    """
+    name = name or LOOKUPS[lookup_choice.currentText()]
+    key = lookup_id_entry.text() if key is None else key
+    tables, header, query = QUERIES[name]
+    rows = queries.run(name, key)
+    lookup_table.setRowCount(0)
+    lookup_table.setColumnCount(len(header))
+    lookup_table.setHorizontalHeaderLabels(header)
+    lookup_table.setRowCount(len(rows))
+    for i, row in enumerate(rows):
+        for j, value in enumerate(row):
+            lookup_table.setItem(i, j, QTableWidgetItem('' if value is None else str(value)))
+
+lookup_choice = QComboBox()
+lookup_choice.addItems(list(LOOKUPS))
+lookup_id_entry = QLineEdit()
+lookup_button = QPushButton('Look up')
+lookup_button.clicked.connect(lambda: lookup())
+lookup_table = QTableWidget()
+
+lookup_layout = QFormLayout()
+lookup_layout.addRow('Look up:', lookup_choice)
+lookup_layout.addRow('ID:', lookup_id_entry)
+lookup_layout.addRow(lookup_button)
+main_layout.addLayout(lookup_layout)
+main_layout.addWidget(lookup_table)
 
 display_tab.setLayout(main_layout)
 
+#### Reports tab
+
+def selected_report():
+    """
+    returns the name of the report selected in the Reports tab, e.g. enrollment
+
+    :return: the name of the report
+    :rtype: str
+    """
+    return list(REPORTS)[report_choice.currentIndex()]
+
+@timed('showReport')
+def showReport(name=None):
+    """
+    fills the table in the Reports tab with a report, read from the summary tables
+
+    :param name: enrollment, load or ages, defaults to the report selected in the Reports tab
+    :type name: str or None
+
+    :return: Nothing.
+    :rtype: None
+    """
+    start = time.perf_counter()
+    header, rows = report(conn, name or selected_report())
+    report_table.setRowCount(0)
+    report_table.setColumnCount(len(header))
+    report_table.setHorizontalHeaderLabels(header)
+    report_table.setRowCount(len(rows))
+    for i, row in enumerate(rows):
+        for j, value in enumerate(row):
+            report_table.setItem(i, j, QTableWidgetItem('' if value is None else str(value)))
+    report_status.setText("%d rows in %.1f ms" % (len(rows), (time.perf_counter() - start) * 1000))
+
+@timed('exportReport')
+def exportReport(name=None, filename=None, level=None):
+    """
+    writes a report into a csv file named after it, e.g. enrollment.csv, overwriting it if it exists.
+    The file is compressed with the compression selected in the Export Data tab
+
+    :param name: enrollment, load or ages, defaults to the report selected in the Reports tab
+    :type name: str or None
+
+    :param filename: the file to write, defaults to <name>.csv with the selected compression extension
+    :type filename: str or None
+
+    :param level: the compression level, defaults to the level selected in the Export Data tab
+    :type level: int or None
+
+    :return: Nothing.
+    :rtype: None
+    """
+    name = name or selected_report()
+    filename = filename or export_filename(name + '.csv')
+    level = compression_level.value() if level is None else level
+    try:
+        count = export_report(conn, name, filename, level)
+        report_status.setText("%d rows written to %s" % (count, filename))
+    except Exception as e:
+        show_error_popup()
+        print(e)
+
+@timed('refreshReports')
+def refreshReports():
+    """
+    rebuilds the summary tables from the Registrations, Students and Courses tables, then shows the selected report again
+
+    :return: Nothing.
+    :rtype: None
+    """
+    refresh_summaries(conn)
+    showReport()
+
+report_choice = QComboBox()
+report_choice.addItems([title for title, header, query in REPORTS.values()])
+report_choice.currentIndexChanged.connect(lambda: showReport())
+
+report_table = QTableWidget()
+report_status = QLabel()
+
+show_report_button = QPushButton('Refresh')
+show_report_button.clicked.connect(lambda: showReport())
+export_report_button = QPushButton('Export report to CSV')
+export_report_button.clicked.connect(lambda: exportReport())
+refresh_reports_button = QPushButton('Rebuild summary tables')
+refresh_reports_button.clicked.connect(lambda: refreshReports())
+
+# the reports are read again whenever their tab is opened
+tabs.currentChanged.connect(lambda index: showReport() if tabs.widget(index) is reports_tab else None)
+
+reports_layout = QFormLayout()
+reports_layout.addRow('Report:', report_choice)
+reports_layout.addRow(show_report_button)
+reports_layout.addRow(export_report_button)
+reports_layout.addRow(refresh_reports_button)
+reports_layout.addRow(report_status)
+reports_layout.addRow(report_table)
+reports_tab.setLayout(reports_layout)
+
 #### Export/Import data tab
 
-def exportStudents():
+def export_filename(filename):
+    """
+    applies the json format and compression format selected in the Export Data tab to the given file name,
+    e.g. students.json becomes students.jsonl when JSON Lines is selected, and students.json.gz when gzip is selected
+
+    :param filename: the uncompressed file name
+    :type filename: str
+
+    :return: the file name to read or write
+    :rtype: str
+    """
+    if filename.endswith('.json'):
+        filename = filename[:-len('.json')] + JSON_FORMATS[json_format.currentText()]
+    return filename + COMPRESSION_SUFFIXES[compression_format.currentText()]
+
+# the export and import jobs started from this window, by job ID
+running_jobs = {}
+
+def run_job(kind, table, filename, background=False, **options):
+    """
+    runs the export or import of a table as a job of jobs.py, going on from the last checkpoint of the unfinished job
+    of the same file if there is one. In the background, the job runs on a thread of its own and its progress is shown
+    in the jobs table of the Export Data tab, otherwise this waits for it to finish
+
+    :param kind: export or import
+    :type kind: str
+
+    :param table: students, instructors, courses or registrations
+    :type table: str
+
+    :param filename: the file to write or read
+    :type filename: str
+
+    :param background: don't wait for the job to finish
+    :type background: bool
+
+    :param options: the options of the job, e.g. level for the compression level of an export
+    :type options: dict
+
+    :return: the job, or the same job already running
+    :rtype: jobs.ExportJob or jobs.ImportJob
+    """
+    job = open_job(conn, database_file(conn), kind, table, filename, **options)
+    if job.job_id in running_jobs and running_jobs[job.job_id].running():
+        return running_jobs[job.job_id]
+    running_jobs[job.job_id] = job.start()
+    if background:
+        jobs_timer.start(200)
+        show_jobs()
+    else:
+        job.thread.join()
+        finish_job(job)
+    return job
+
+def finish_job(job):
+    """
+    reports the end of a job: displays a file not found error or an error popup if it failed, or if an import rejected
+    records, and shows the records of an import in the Display Data tab and its counts under the jobs table
+
+    :param job: a job that has finished
+    :type job: jobs.ExportJob or jobs.ImportJob
+
+    :return: Nothing.
+    :rtype: None
+    """
+    running_jobs.pop(job.job_id, None)
+    if job.error is not None:
+        if isinstance(job.error, FileNotFoundError):
+            file_not_found_popup()
+        else:
+            show_error_popup()
+        print(job.error)
+        return
+    if job.job['kind'] == 'import':
+        default_populate_tables()
+        checkpoint = job.job['checkpoint']
+        jobs_status.setText("%s: %s" % (job.job['table'], import_summary(checkpoint)))
+        if checkpoint['rejected']:
+            show_error_popup()
+            print("%d records rejected" % checkpoint['rejected'])
+            for error in checkpoint['errors']:
+                print(error)
+
+def show_jobs():
+    """
+    shows the latest jobs and their progress in the jobs table of the Export Data tab, and reports the jobs
+    that have finished since it was last called
+
+    :return: Nothing.
+    :rtype: None
+    """
+    for job in list(running_jobs.values()):
+        if not job.running():
+            finish_job(job)
+    if not running_jobs:
+        jobs_timer.stop()
+    rows = []
+    for job in list_jobs(conn):
+        progress = "%d / %d" % (job['done'], job['total']) if job['total'] is not None else str(job['done'])
+        rows.append((job['id'], job['kind'], job['table'], job['filename'], job['status'], progress))
+    jobs_table.setRowCount(len(rows))
+    for i, row in enumerate(rows):
+        for j, value in enumerate(row):
+            jobs_table.setItem(i, j, QTableWidgetItem(str(value)))
+
+@timed('resumeJobs')
+def resumeJobs():
+    """
+    resumes, in the background, the jobs that didn't finish, because they failed or the application was closed
+    while they ran, from their last checkpoint
+
+    :return: the jobs resumed
+    :rtype: list
+    """
+    resumed = []
+    for job_id in unfinished_jobs(conn):
+        if job_id in running_jobs and running_jobs[job_id].running():
+            continue
+        running_jobs[job_id] = resume_job(conn, database_file(conn), job_id).start()
+        resumed.append(running_jobs[job_id])
+    if resumed:
+        jobs_timer.start(200)
+    show_jobs()
+    return resumed
+
+@timed('exportStudents')
+def exportStudents(filename=None, level=None, background=False):
     """
     exports all database entries in the students table into a json file named students.json.
     Creates this file if it doesn't exist
-    Overwrites it if it exists
+    Overwrites it once the new file is complete
+    Runs as a job of jobs.py, which goes on from its last checkpoint if an export of the same file was interrupted
+    The records are written one per line if its name ends with .jsonl
+    The file is compressed if its name ends with .gz, .bz2 or .xz
+
+    :param filename: the file to write, defaults to students.json or students.jsonl with the selected format and compression extension
+    :type filename: str or None
+
+    :param level: the compression level, defaults to the level selected in the Export Data tab
+    :type level: int or None
+
+    :param background: run the export on a background thread, showing its progress in the Export Data tab
+    :type background: bool
 
     :return: Nothing.
     :rtype: None
     """
-    all_students = cursor.execute("select * from Students").fetchall()
-    with open("students.json", 'w') as file:
-        # Write an empty JSON object (or any initial content)
-        json.dump([], file)
-    for t in all_students:
-        student = Student(t[1], t[2], t[3], t[0])
-        student.save_to_json()
+    filename = filename or export_filename("students.json")
+    level = compression_level.value() if level is None else level
+    run_job('export', 'students', filename, background, level=level)
 
-def exportInstructors():
+@timed('exportInstructors')
+def exportInstructors(filename=None, level=None, background=False):
     """
     exports all database entries in the instructors table into a json file named instructors.json.
     Creates this file if it doesn't exist
-    Overwrites it if it exists
+    Overwrites it once the new file is complete
+    Runs as a job of jobs.py, which goes on from its last checkpoint if an export of the same file was interrupted
+    The records are written one per line if its name ends with .jsonl
+    The file is compressed if its name ends with .gz, .bz2 or .xz
+
+    :param filename: the file to write, defaults to instructors.json or instructors.jsonl with the selected format and compression extension
+    :type filename: str or None
+
+    :param level: the compression level, defaults to the level selected in the Export Data tab
+    :type level: int or None
+
+    :param background: run the export on a background thread, showing its progress in the Export Data tab
+    :type background: bool
 
     :return: Nothing.
     :rtype: None
     """
-    all_instructors = cursor.execute("select * from Instructors").fetchall()
-    with open("instructors.json", 'w') as file:
-        # Write an empty JSON object (or any initial content)
-        json.dump([], file)
-    for t in all_instructors:
-        instructor = Instructor(t[1], t[2], t[3], t[0])
-        instructor.save_to_json()
+    filename = filename or export_filename("instructors.json")
+    level = compression_level.value() if level is None else level
+    run_job('export', 'instructors', filename, background, level=level)
 
-def exportCourses():
+@timed('exportCourses')
+def exportCourses(filename=None, level=None, background=False):
     """
     exports all database entries in the courses table into a json file named courses.json.
     Creates this file if it doesn't exist
-    Overwrites it if it exists
+    Overwrites it once the new file is complete
+    Runs as a job of jobs.py, which goes on from its last checkpoint if an export of the same file was interrupted
+    The records are written one per line if its name ends with .jsonl
+    The file is compressed if its name ends with .gz, .bz2 or .xz
+
+    :param filename: the file to write, defaults to courses.json or courses.jsonl with the selected format and compression extension
+    :type filename: str or None
+
+    :param level: the compression level, defaults to the level selected in the Export Data tab
+    :type level: int or None
+
+    :param background: run the export on a background thread, showing its progress in the Export Data tab
+    :type background: bool
 
     :return: Nothing.
     :rtype: None
     """
-    all_courses = cursor.execute("select * from Courses").fetchall()
-    with open("courses.json", 'w') as file:
-        # Write an empty JSON object (or any initial content)
-        json.dump([], file)
-    for t in all_courses:
-        course = Course(t[0],t[1])
-        course.instructor_id = t[2]
-        course.save_to_json()
+    filename = filename or export_filename("courses.json")
+    level = compression_level.value() if level is None else level
+    run_job('export', 'courses', filename, background, level=level)
 
-def exportRegistrations():
+@timed('exportRegistrations')
+def exportRegistrations(filename=None, level=None, background=False):
     """
     exports all database entries in the regsitrations table into a json file named regsitrations.json.
     Creates this file if it doesn't exist
-    Overwrites it if it exists
+    Overwrites it once the new file is complete
+    Runs as a job of jobs.py, which goes on from its last checkpoint if an export of the same file was interrupted
+    The records are written one per line if its name ends with .jsonl
+    The file is compressed if its name ends with .gz, .bz2 or .xz
+
+    :param filename: the file to write, defaults to registrations.json or registrations.jsonl with the selected format and compression extension
+    :type filename: str or None
+
+    :param level: the compression level, defaults to the level selected in the Export Data tab
+    :type level: int or None
+
+    :param background: run the export on a background thread, showing its progress in the Export Data tab
+    :type background: bool
+
+    :return: Nothing.
+    :rtype: None
+    """
+    filename = filename or export_filename("registrations.json")
+    level = compression_level.value() if level is None else level
+    run_job('export', 'registrations', filename, background, level=level)
+
+@timed('exportNested')
+def exportNested(kinds=None, level=None):
+    """
+    exports one document per student, with the courses they are registered in, into students_nested.json, and one
+    document per instructor, with the courses they teach, into instructors_nested.json (see transfer.nested_records),
+    overwriting them if they exist, and shows the files written in the Export Data tab
+    The documents are written one per line if the selected format is JSON Lines
+    The files are compressed with the compression selected in the Export Data tab
+
+    :param kinds: students and/or instructors, defaults to both
+    :type kinds: list of str or None
+
+    :param level: the compression level, defaults to the level selected in the Export Data tab
+    :type level: int or None
 
     :return: Nothing.
     :rtype: None
     """
-    all_registrations = cursor.execute("select * from Registrations").fetchall()
-    with open("registrations.json", 'w') as file:
-        # Write an empty JSON object (or any initial content)
-        json.dump([], file)
-    data = []
-    with open("registrations.json", 'w') as file:
-        for t in all_registrations:
-            record = {
-                "StudentID" : t[0],
-                "CourseID" : t[1] 
-            }
-            data.extend([record])
-        json.dump(data, file, indent=4)
+    level = compression_level.value() if level is None else level
+    filenames = []
+    try:
+        for kind in kinds or list(NESTED):
+            filename = export_filename(NESTED[kind][2])
+            export_nested(conn, kind, filename, level)
+            filenames.append(filename)
+        nested_status.setText("written to " + ", ".join(filenames))
+    except Exception as e:
+        show_error_popup()
+        print(e)
 
 def file_not_found_popup():
     """
@@ -735,6 +1221,7 @@ def file_not_found_popup():
     :return: nothing
     :rtype: None
     """
+    metrics.record_error()
     # Create a message box for the error
     error_message = QMessageBox()
     error_message.setIcon(QMessageBox.Critical)
@@ -745,189 +1232,639 @@ def file_not_found_popup():
     # Show the popup
     error_message.exec_()
 
-def loadStudents():
+def import_options(sync=None, delete_missing=None):
+    """
+    returns the options of an import job, defaulting to the Sync and Delete boxes of the Export Data tab
+
+    :param sync: update the rows that differ in the file instead of rejecting them
+    :type sync: bool or None
+
+    :param delete_missing: delete the rows missing from the file
+    :type delete_missing: bool or None
+
+    :rtype: dict
+    """
+    return {'sync': sync_import.isChecked() if sync is None else sync,
+            'delete_missing': delete_missing_rows.isChecked() if delete_missing is None else delete_missing}
+
+@timed('loadStudents')
+def loadStudents(filename=None, background=False, sync=None, delete_missing=None):
     """
     inserts all entries in the students.json file into the Students table in the database
     displays a file not found error in case this file doesn't exist
-    display an error popup in case of errors in inserting data into the database
+    display an error popup if records could not be inserted into the database
+    Records already in the table are rejected, or updated if they differ when syncing (see upsert.py), and the import
+    runs as a job of jobs.py, which goes on from its last checkpoint if an import of the same file was interrupted
+    The file is read as json lines if its name ends with .jsonl (or .jsonl.gz, ...), and as a json array otherwise
+    The file is decompressed on the fly if its name ends with .gz, .bz2 or .xz, and read one record at a time
+
+    :param filename: the file to read, defaults to students.json or students.jsonl with the format and compression extension selected in the Export Data tab
+    :type filename: str or None
+
+    :param background: run the import on a background thread, showing its progress in the Export Data tab
+    :type background: bool
+
+    :param sync: update the rows that differ in the file instead of rejecting them, defaults to the Sync box
+    :type sync: bool or None
+
+    :param delete_missing: delete the rows missing from the file, defaults to the Delete box
+    :type delete_missing: bool or None
 
     :return: Nothing.
     :rtype: None
     """
-    try:
-        with open("students.json", 'r') as file:
-            data = json.load(file)
-            for t in data:
-                try:
-                    cursor.execute("insert into Students values (?,?,?,?)", (t["student_id"],t["name"],t["age"],t["email"]))
-                    conn.commit()
-                except Exception as e:
-                    show_error_popup()
-                    print(e)
-    except:
-        file_not_found_popup()
-        
-def loadInstructors():
+    filename = filename or export_filename("students.json")
+    run_job('import', 'students', filename, background, **import_options(sync, delete_missing))
+
+@timed('loadInstructors')
+def loadInstructors(filename=None, background=False, sync=None, delete_missing=None):
     """
     inserts all entries in the instructors.json file into the Instructors table in the database
     displays a file not found error in case this file doesn't exist
-    display an error popup in case of errors in inserting data into the database
+    display an error popup if records could not be inserted into the database
+    Records already in the table are rejected, or updated if they differ when syncing (see upsert.py), and the import
+    runs as a job of jobs.py, which goes on from its last checkpoint if an import of the same file was interrupted
+    The file is read as json lines if its name ends with .jsonl (or .jsonl.gz, ...), and as a json array otherwise
+    The file is decompressed on the fly if its name ends with .gz, .bz2 or .xz, and read one record at a time
+
+    :param filename: the file to read, defaults to instructors.json or instructors.jsonl with the format and compression extension selected in the Export Data tab
+    :type filename: str or None
+
+    :param background: run the import on a background thread, showing its progress in the Export Data tab
+    :type background: bool
+
+    :param sync: update the rows that differ in the file instead of rejecting them, defaults to the Sync box
+    :type sync: bool or None
+
+    :param delete_missing: delete the rows missing from the file, defaults to the Delete box
+    :type delete_missing: bool or None
 
     :return: Nothing.
     :rtype: None
     """
-    try:
-        with open("instructors.json", 'r') as file:
-            data = json.load(file)
-            for t in data:
-                try:
-                    cursor.execute("insert into Instructors values (?,?,?,?)", (t["instructor_id"],t["name"],t["age"],t["email"]))
-                    conn.commit()
-                except:
-                    show_error_popup()
-                    pass   
-    except:
-        file_not_found_popup()
-        
+    filename = filename or export_filename("instructors.json")
+    run_job('import', 'instructors', filename, background, **import_options(sync, delete_missing))
 
-def loadCourses():
+@timed('loadCourses')
+def loadCourses(filename=None, background=False, sync=None, delete_missing=None):
     """
     inserts all entries in the courses.json file into the Courses table in the database
     displays a file not found error in case this file doesn't exist
-    display an error popup in case of errors in inserting data into the database
+    display an error popup if records could not be inserted into the database
+    Records already in the table are rejected, or updated if they differ when syncing (see upsert.py), and the import
+    runs as a job of jobs.py, which goes on from its last checkpoint if an import of the same file was interrupted
+    The file is read as json lines if its name ends with .jsonl (or .jsonl.gz, ...), and as a json array otherwise
+    The file is decompressed on the fly if its name ends with .gz, .bz2 or .xz, and read one record at a time
+
+    :param filename: the file to read, defaults to courses.json or courses.jsonl with the format and compression extension selected in the Export Data tab
+    :type filename: str or None
+
+    :param background: run the import on a background thread, showing its progress in the Export Data tab
+    :type background: bool
+
+    :param sync: update the rows that differ in the file instead of rejecting them, defaults to the Sync box
+    :type sync: bool or None
+
+    :param delete_missing: delete the rows missing from the file, defaults to the Delete box
+    :type delete_missing: bool or None
 
     :return: Nothing.
     :rtype: None
     """
-    try:
-        with open("courses.json", 'r') as file:
-            data = json.load(file)
-            for t in data:
-                try:
-                    cursor.execute("insert into Courses values (?,?,?)", (t["course_id"],t["course_name"],t["instructor_id"]))
-                    conn.commit()
-                except:
-                    show_error_popup()
-                    pass  
-    except:
-        file_not_found_popup()
-            
+    filename = filename or export_filename("courses.json")
+    run_job('import', 'courses', filename, background, **import_options(sync, delete_missing))
 
-def loadRegistrations():
+@timed('loadRegistrations')
+def loadRegistrations(filename=None, background=False, sync=None, delete_missing=None):
     """
     inserts all entries in the registrations.json file into the Registrations table in the database
     displays a file not found error in case this file doesn't exist
-    display an error popup in case of errors in inserting data into the database
+    display an error popup if records could not be inserted into the database
+    Records already in the table are rejected, or updated if they differ when syncing (see upsert.py), and the import
+    runs as a job of jobs.py, which goes on from its last checkpoint if an import of the same file was interrupted
+    The file is read as json lines if its name ends with .jsonl (or .jsonl.gz, ...), and as a json array otherwise
+    The file is decompressed on the fly if its name ends with .gz, .bz2 or .xz, and read one record at a time
+
+    :param filename: the file to read, defaults to registrations.json or registrations.jsonl with the format and compression extension selected in the Export Data tab
+    :type filename: str or None
+
+    :param background: run the import on a background thread, showing its progress in the Export Data tab
+    :type background: bool
+
+    :param sync: update the rows that differ in the file instead of rejecting them, defaults to the Sync box
+    :type sync: bool or None
+
+    :param delete_missing: delete the rows missing from the file, defaults to the Delete box
+    :type delete_missing: bool or None
 
     :return: Nothing.
     :rtype: None
     """
-    try:
-        with open("registrations.json", 'r') as file:
-            data = json.load(file)
-            for t in data:
-                try:
-                    cursor.execute("insert into Registrations values (?,?)", (t["StudentID"],t["CourseID"]))
-                    conn.commit()
-                except Exception as e:
-                    show_error_popup()
-                    print(e)
-    except:
-        file_not_found_popup()
-        
+    filename = filename or export_filename("registrations.json")
+    run_job('import', 'registrations', filename, background, **import_options(sync, delete_missing))
 
-def generate_csv():
+@timed('generate_csv')
+def generate_csv(filename=None, level=None):
     """
-    generates a csv file containing all records in the tables in the database
-    by exporting them to json first, then using these json files to populate the csv file.
+    exports all tables to json, and generates a csv file containing all records in the tables in the database.
+    The tables, and the ranges of IDs of large tables, are exported at the same time by several processes
+    (see parallel_export.py), which stream the rows from the database, so the tables are never loaded into memory at once.
+    The files are compressed if their names end with .gz, .bz2 or .xz
+
+    :param filename: the file to write, defaults to merged_data.csv with the selected compression extension
+    :type filename: str or None
+
+    :param level: the compression level, defaults to the level selected in the Export Data tab
+    :type level: int or None
 
     :return: Nothing.
     :rtype: None
     """
-    student_file = 'students.json'
-    instructor_file = 'instructors.json'
-    course_file = 'courses.json'
-    registrations_file = 'registrations.json'
+    csv_file = filename or export_filename(CSV_FILE)
+    level = compression_level.value() if level is None else level
 
-    exportStudents()
-    exportInstructors()
-    exportCourses()
-    exportRegistrations()
+    export_tables(database_file(conn), '.', extension=JSON_FORMATS[json_format.currentText()],
+                  suffix=COMPRESSION_SUFFIXES[compression_format.currentText()], level=level, csv_file=csv_file)
 
-    # Load JSON data from each file
-    with open(student_file, 'r') as f:
-        students = json.load(f)
+@timed('loadCSV')
+def loadCSV(filename=None):
+    """
+    inserts the students, instructors, courses and registrations of a merged_data.csv file, as written by Export
+    to CSV, into the database, reading it a chunk of rows at a time (see csv_import.py), and shows how many of
+    each were inserted in the Export Data tab
+    displays a file not found error in case this file doesn't exist
+    display an error popup if records could not be inserted into the database
+    The file is decompressed on the fly if its name ends with .gz, .bz2 or .xz
 
-    with open(instructor_file, 'r') as f:
-        instructors = json.load(f)
+    :param filename: the file to read, defaults to merged_data.csv with the selected compression extension
+    :type filename: str or None
 
-    with open(course_file, 'r') as f:
-        courses = json.load(f)
+    :return: Nothing.
+    :rtype: None
+    """
+    filename = filename or export_filename(CSV_FILE)
+    try:
+        result = import_merged_csv(conn, filename)
+    except FileNotFoundError as e:
+        file_not_found_popup()
+        print(e)
+        return
+    except Exception as e:
+        show_error_popup()
+        print(e)
+        return
+    default_populate_tables()
+    csv_status.setText(", ".join("%s: %d of %d inserted" % (table, counts['inserted'], counts['records'])
+                                 for table, counts in result['tables'].items()))
+    if result['unknown'] or any(counts['invalid'] or counts['failed'] for counts in result['tables'].values()):
+        show_error_popup()
+        for counts in result['tables'].values():
+            for error in counts['errors']:
+                print(error)
 
-    with open(registrations_file, 'r') as f:
-        registrations = json.load(f)
+export_job = None
 
-    csv_file = 'merged_data.csv'
+@timed('startParallelExport')
+def startParallelExport(directory='.'):
+    """
+    starts exporting all tables to json and csv on a background thread, like generate_csv, and shows its progress
+    and the throughput of each table in the Export Data tab, unless such an export is already running
 
+    :param directory: the directory to write to
+    :type directory: str
 
-    with open(csv_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        
+    :return: the export job, None if another one is running
+    :rtype: parallel_export.ParallelExportJob or None
+    """
+    global export_job
+    if export_job is not None and export_job.running():
+        return None
+    export_job = ParallelExportJob(database_file(conn), directory, extension=JSON_FORMATS[json_format.currentText()],
+                                   suffix=COMPRESSION_SUFFIXES[compression_format.currentText()],
+                                   level=compression_level.value(), csv_file=export_filename(CSV_FILE)).start()
+    export_progress_timer.start(200)
+    return export_job
+
+def show_export_progress():
+    """
+    shows the progress of the running parallel export in the Export Data tab, then the records per second of each table
+    once it has finished, recording its duration in the metrics, and displays an error popup if it failed
 
-        writer.writerow(['ID / Student ID', 'Name / Course ID', 'Type', 'Age/Instructor ID', 'Email'])
-        
-        # Write student data to the CSV
-        for student in students:
-            writer.writerow([student['student_id'], student['name'], 'Student', student['age'], student['email']])
+    :return: Nothing.
+    :rtype: None
+    """
+    progress = export_job.progress()
+    export_status.setText("%d / %d parts in %.2fs" % (progress['done'], progress['total'], progress['seconds']))
+    if progress['running']:
+        return
+    export_progress_timer.stop()
+    metrics.record('parallel export', progress['seconds'], progress['error'] is not None)
+    if progress['error'] is not None:
+        export_status.setText("failed: " + progress['error'])
+        show_error_popup()
+        print(progress['error'])
+        return
+    export_status.setText(export_status.text() + "\n" + "\n".join(
+        "%s: %d records in %.2fs (%.0f records/s)" % (table, result['records'], result['seconds'], result['records_per_second'])
+        for table, result in export_job.report['tables'].items()))
 
-        # Write instructor data to the CSV
-        for instructor in instructors:
-            writer.writerow([instructor['instructor_id'], instructor['name'], 'Instructor', instructor['age'], instructor['email']])
+@timed('exportChanges')
+def exportChanges(filename=None, since=None, level=None):
+    """
+    exports the changes made to the database since the last export of changes, or since the given sequence number,
+    into a file named changes.json or changes.jsonl, and shows the range of changes written in the Export Data tab
+    The file is compressed if its name ends with .gz, .bz2 or .xz
 
-        # Write course data to the CSV
-        for course in courses:
-            writer.writerow([course['course_id'], course['course_name'], 'Course', course['instructor_id'], 'N/A'])  # 'N/A' for email
+    :param filename: the file to write, defaults to changes.json or changes.jsonl with the selected format and compression extension
+    :type filename: str or None
 
-        for r in registrations:
-            writer.writerow([r['StudentID'], r['CourseID'], 'Registration', "N/A", 'N/A'])  # 'N/A' for email
+    :param since: the sequence number to start after, defaults to the last sequence number exported
+    :type since: int or None
 
+    :param level: the compression level, defaults to the level selected in the Export Data tab
+    :type level: int or None
+
+    :return: Nothing.
+    :rtype: None
+    """
+    filename = filename or export_filename("changes.json")
+    level = compression_level.value() if level is None else level
+    try:
+        since, until, count = export_changes(conn, filename, since, level=level)
+        if count:
+            changes_status.setText("%d changes exported (%d to %d)" % (count, since + 1, until))
+        else:
+            changes_status.setText("no changes since %d" % since)
+    except Exception as e:
+        show_error_popup()
+        print(e)
+
+@timed('applyChanges')
+def applyChanges(filename=None):
+    """
+    applies the changes in the changes.json or changes.jsonl file exported from another database, in one transaction
+    displays a file not found error in case this file doesn't exist
+    display an error popup if the file is malformed, starts after the last change applied, or a change cannot be applied,
+    in which case none of them is
+
+    :param filename: the file to read, defaults to changes.json or changes.jsonl with the selected format and compression extension
+    :type filename: str or None
+
+    :return: Nothing.
+    :rtype: None
+    """
+    filename = filename or export_filename("changes.json")
+    try:
+        applied, last = apply_changes(conn, filename)
+        changes_status.setText("%d changes applied (up to %d)" % (applied, last))
+    except FileNotFoundError as e:
+        file_not_found_popup()
+        print(e)
+    except Exception as e:
+        show_error_popup()
+        print(e)
 
 
 export_import_layout = QFormLayout()
+json_format = QComboBox()
+json_format.addItems(list(JSON_FORMATS))
+compression_format = QComboBox()
+compression_format.addItems(list(COMPRESSION_SUFFIXES))
+compression_level = QSpinBox()
+compression_level.setRange(0, 9)
+compression_level.setValue(DEFAULT_LEVEL)
+
 export_students = QPushButton('Export Students to JSON')
-export_students.clicked.connect(exportStudents)
+export_students.clicked.connect(lambda: exportStudents(background=True))
 export_instructors = QPushButton('Export Instructors to JSON')
-export_instructors.clicked.connect(exportInstructors)
+export_instructors.clicked.connect(lambda: exportInstructors(background=True))
 export_courses = QPushButton('Export Courses to JSON')
-export_courses.clicked.connect(exportCourses)
+export_courses.clicked.connect(lambda: exportCourses(background=True))
 export_registrations = QPushButton('Export Registrations to JSON')
-export_registrations.clicked.connect(exportRegistrations)
+export_registrations.clicked.connect(lambda: exportRegistrations(background=True))
 
 load_students = QPushButton('load Students from JSON')
-load_students.clicked.connect(loadStudents)
+load_students.clicked.connect(lambda: loadStudents(background=True))
 load_instructors = QPushButton('load Instructors from JSON')
-load_instructors.clicked.connect(loadInstructors)
+load_instructors.clicked.connect(lambda: loadInstructors(background=True))
 load_courses = QPushButton('load Courses from JSON')
-load_courses.clicked.connect(loadCourses)
+load_courses.clicked.connect(lambda: loadCourses(background=True))
 load_registrations = QPushButton('load Registrations from JSON')
-load_registrations.clicked.connect(loadRegistrations)
+load_registrations.clicked.connect(lambda: loadRegistrations(background=True))
+
+sync_import = QCheckBox('Sync: update the rows that differ in the file')
+delete_missing_rows = QCheckBox('Delete the rows missing from the file')
+
+export_nested_button = QPushButton('Export Students and Instructors with their Courses')
+export_nested_button.clicked.connect(lambda: exportNested())
+nested_status = QLabel()
 
 export_csv = QPushButton('Export to CSV')
-export_csv.clicked.connect(generate_csv)
+export_csv.clicked.connect(lambda: generate_csv())
+load_csv = QPushButton('load all tables from CSV')
+load_csv.clicked.connect(lambda: loadCSV())
+csv_status = QLabel()
+parallel_export_button = QPushButton('Export All Tables in the Background')
+parallel_export_button.clicked.connect(lambda: startParallelExport())
+export_status = QLabel()
+export_progress_timer = QTimer()
+export_progress_timer.timeout.connect(lambda: show_export_progress())
+
+export_import_layout.addRow('Format:', json_format)
+export_import_layout.addRow('Compression:', compression_format)
+export_import_layout.addRow('Compression level:', compression_level)
 
 export_import_layout.addRow(export_students)
 export_import_layout.addRow(export_instructors)
 export_import_layout.addRow(export_courses)
 export_import_layout.addRow(export_registrations)
+export_import_layout.addRow(export_nested_button)
+export_import_layout.addRow(nested_status)
 
 export_import_layout.addRow(load_students)
 export_import_layout.addRow(load_instructors)
 export_import_layout.addRow(load_courses)
 export_import_layout.addRow(load_registrations)
+export_import_layout.addRow(sync_import)
+export_import_layout.addRow(delete_missing_rows)
 export_import_layout.addRow(export_csv)
+export_import_layout.addRow(load_csv)
+export_import_layout.addRow(csv_status)
+export_import_layout.addRow(parallel_export_button)
+export_import_layout.addRow(export_status)
+
+resume_jobs_button = QPushButton('Resume Unfinished Jobs')
+resume_jobs_button.clicked.connect(lambda: resumeJobs())
+jobs_table = QTableWidget()
+jobs_table.setColumnCount(6)
+jobs_table.setHorizontalHeaderLabels(['ID', 'Job', 'Table', 'File', 'Status', 'Progress'])
+jobs_timer = QTimer()
+jobs_timer.timeout.connect(lambda: show_jobs())
+export_import_layout.addRow(resume_jobs_button)
+jobs_status = QLabel()
+export_import_layout.addRow(jobs_table)
+export_import_layout.addRow(jobs_status)
+show_jobs()
+
+export_changes_button = QPushButton('Export Changes since last export')
+export_changes_button.clicked.connect(lambda: exportChanges())
+apply_changes_button = QPushButton('Apply Changes')
+apply_changes_button.clicked.connect(lambda: applyChanges())
+changes_status = QLabel()
+export_import_layout.addRow(export_changes_button)
+export_import_layout.addRow(apply_changes_button)
+export_import_layout.addRow(changes_status)
 
 export_tab.setLayout(export_import_layout)
 
+#### Backup tab
+
+# the backup or consistent export running in the background, if any
+backup_job = None
+
+@timed('startBackup')
+def startBackup(target=None, pages=None):
+    """
+    starts copying the database into the backup folder on a background thread, a bounded number of pages at a time,
+    unless a backup or consistent export is already running. Its progress is shown in the Backup tab
+
+    :param target: the backup file, defaults to university-<date>-<time>.db in the backup folder
+    :type target: str or None
+
+    :param pages: the number of pages copied per step, defaults to the number selected in the Backup tab
+    :type pages: int or None
+
+    :return: the backup job, None if another job is running
+    :rtype: backup.BackupJob or None
+    """
+    global backup_job
+    if backup_job is not None and backup_job.running():
+        return None
+    target = target or timestamped(backup_directory.text(), 'university', '.db')
+    backup_job = BackupJob(database_file(conn), target, pages or backup_pages.value()).start()
+    backup_progress_timer.start(200)
+    return backup_job
+
+@timed('startSnapshot')
+def startSnapshot(directory=None):
+    """
+    starts exporting all tables from a single read transaction on a background thread, so the exports hold the
+    same point in time, unless a backup or consistent export is already running.
+    The exports use the format and compression selected in the Export Data tab
+
+    :param directory: the directory to write to, defaults to snapshot-<date>-<time> in the backup folder
+    :type directory: str or None
+
+    :return: the export job, None if another job is running
+    :rtype: backup.SnapshotJob or None
+    """
+    global backup_job
+    if backup_job is not None and backup_job.running():
+        return None
+    directory = directory or timestamped(backup_directory.text(), 'snapshot')
+    backup_job = SnapshotJob(database_file(conn), directory, JSON_FORMATS[json_format.currentText()],
+                             COMPRESSION_SUFFIXES[compression_format.currentText()], compression_level.value()).start()
+    backup_progress_timer.start(200)
+    return backup_job
+
+def show_backup_progress():
+    """
+    shows the progress and throughput of the running backup or consistent export in the Backup tab.
+    Once it has finished, records its duration in the metrics, deletes the oldest backups beyond the number to keep,
+    and displays an error popup if it failed
+
+    :return: Nothing.
+    :rtype: None
+    """
+    progress = backup_job.progress()
+    unit = 'pages' if isinstance(backup_job, BackupJob) else 'tables'
+    backup_progress.setValue(int(progress['fraction'] * 100))
+    backup_status.setText("%d / %d %s, %.1f MB in %.2fs (%.1f MB/s)" % (
+        progress['done'], progress['total'], unit, progress['bytes'] / 1e6, progress['seconds'],
+        progress['bytes_per_second'] / 1e6))
+    if progress['running']:
+        return
+    backup_progress_timer.stop()
+    metrics.record('backup' if unit == 'pages' else 'snapshot', progress['seconds'], progress['error'] is not None)
+    if progress['error'] is not None:
+        backup_status.setText("failed: " + progress['error'])
+        show_error_popup()
+        print(progress['error'])
+        return
+    if unit == 'pages' and backup_keep.value():
+        prune_backups(backup_directory.text(), backup_keep.value())
+    target = backup_job.target if unit == 'pages' else backup_job.directory
+    backup_status.setText(backup_status.text() + " - written to " + target)
+
+backup_directory = QLineEdit(BACKUP_DIRECTORY)
+backup_pages = QSpinBox()
+backup_pages.setRange(1, 1000000)
+backup_pages.setValue(PAGES_PER_STEP)
+backup_keep = QSpinBox()
+backup_keep.setRange(0, 1000)
+backup_keep.setSpecialValueText('all')
+backup_interval = QSpinBox()
+backup_interval.setRange(1, 24 * 60)
+backup_interval.setValue(60)
+
+backup_button = QPushButton('Back up now')
+backup_button.clicked.connect(lambda: startBackup())
+snapshot_button = QPushButton('Consistent export of all tables')
+snapshot_button.clicked.connect(lambda: startSnapshot())
+backup_progress = QProgressBar()
+backup_status = QLabel()
+
+backup_progress_timer = QTimer()
+backup_progress_timer.timeout.connect(lambda: show_backup_progress())
+
+# backs up every backup_interval minutes while the box is checked
+backup_timer = QTimer()
+backup_timer.timeout.connect(lambda: startBackup())
+auto_backup = QCheckBox('Back up automatically')
+auto_backup.toggled.connect(lambda checked: backup_timer.start(backup_interval.value() * 60000) if checked else backup_timer.stop())
+backup_interval.valueChanged.connect(lambda minutes: backup_timer.setInterval(minutes * 60000))
+
+backup_layout = QFormLayout()
+backup_layout.addRow('Backup folder:', backup_directory)
+backup_layout.addRow('Pages per step:', backup_pages)
+backup_layout.addRow('Backups to keep:', backup_keep)
+backup_layout.addRow(backup_button)
+backup_layout.addRow(snapshot_button)
+backup_layout.addRow(backup_progress)
+backup_layout.addRow(backup_status)
+backup_layout.addRow('Every (minutes):', backup_interval)
+backup_layout.addRow(auto_backup)
+backup_tab.setLayout(backup_layout)
+
+#### Diagnostics tab
+
+METRICS_FILE = 'metrics.json'
+
+def refresh_diagnostics():
+    """
+    fills the tables in the Diagnostics tab with the count, error count and latency percentiles of every
+    operation and database statement, and with the slow-query log, and shows the hit rate of the query cache
+
+    :return: Nothing.
+    :rtype: None
+    """
+    snapshot = metrics.snapshot()
+    operations_table.setRowCount(0)
+    for i, (name, summary) in enumerate(snapshot['operations'].items()):
+        operations_table.insertRow(i)
+        operations_table.setItem(i, 0, QTableWidgetItem(name))
+        operations_table.setItem(i, 1, QTableWidgetItem(str(summary['count'])))
+        operations_table.setItem(i, 2, QTableWidgetItem(str(summary['errors'])))
+        for column, key in enumerate(['p50', 'p95', 'p99', 'max'], 3):
+            operations_table.setItem(i, column, QTableWidgetItem("%.3f" % (summary[key] * 1000)))
+    slow_query_table.setRowCount(0)
+    for i, entry in enumerate(reversed(snapshot['slow_queries'])):
+        slow_query_table.insertRow(i)
+        slow_query_table.setItem(i, 0, QTableWidgetItem(time.strftime('%H:%M:%S', time.localtime(entry['time']))))
+        slow_query_table.setItem(i, 1, QTableWidgetItem("%.3f" % (entry['duration'] * 1000)))
+        slow_query_table.setItem(i, 2, QTableWidgetItem(entry['statement']))
+    stats = queries.cache.stats()
+    cache_status.setText("%d / %d results, %d hits, %d misses (%d stale), %d evictions, hit rate %.1f%%" % (
+        stats['size'], stats['maxsize'], stats['hits'], stats['misses'], stats['stale'], stats['evictions'],
+        stats['hit_rate'] * 100))
+
+def set_slow_query_threshold(milliseconds):
+    """
+    sets the duration above which statements are added to the slow-query log
+
+    :param milliseconds: the threshold
+    :type milliseconds: int
+
+    :return: Nothing.
+    :rtype: None
+    """
+    metrics.slow_query_threshold = milliseconds / 1000
+
+def change_busy_timeout(milliseconds):
+    """
+    sets the time the app waits for another program writing to the database before its own writes are retried
+
+    :param milliseconds: the busy timeout
+    :type milliseconds: int
+
+    :return: Nothing.
+    :rtype: None
+    """
+    set_busy_timeout(conn, milliseconds)
+
+def dump_metrics(filename=METRICS_FILE):
+    """
+    writes all the metrics to a json file (metrics.json by default) for the monitoring agent
+
+    :param filename: the file to write
+    :type filename: str
+
+    :return: Nothing.
+    :rtype: None
+    """
+    try:
+        metrics.dump(filename)
+    except Exception as e:
+        show_error_popup()
+        print(e)
+
+def reset_metrics():
+    """
+    clears all the metrics, the slow-query log and the query cache
+
+    :return: Nothing.
+    :rtype: None
+    """
+    metrics.reset()
+    queries.cache.clear()
+    refresh_diagnostics()
+
+operations_table = QTableWidget()
+operations_table.setColumnCount(7)
+operations_table.setHorizontalHeaderLabels(['Operation', 'Count', 'Errors', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'Max (ms)'])
+
+slow_query_table = QTableWidget()
+slow_query_table.setColumnCount(3)
+slow_query_table.setHorizontalHeaderLabels(['Time', 'Duration (ms)', 'Statement'])
+
+cache_status = QLabel()
+
+slow_query_threshold = QSpinBox()
+slow_query_threshold.setRange(1, 60000)
+slow_query_threshold.setValue(int(metrics.slow_query_threshold * 1000))
+slow_query_threshold.valueChanged.connect(set_slow_query_threshold)
+busy_timeout = QSpinBox()
+busy_timeout.setRange(0, 600000)
+busy_timeout.setValue(BUSY_TIMEOUT)
+busy_timeout.valueChanged.connect(change_busy_timeout)
+
+refresh_metrics = QPushButton('Refresh')
+refresh_metrics.clicked.connect(lambda: refresh_diagnostics())
+dump_metrics_button = QPushButton('Write metrics to ' + METRICS_FILE)
+dump_metrics_button.clicked.connect(lambda: dump_metrics())
+reset_metrics_button = QPushButton('Reset metrics')
+reset_metrics_button.clicked.connect(lambda: reset_metrics())
+
+# writes the metrics file every minute while the box is checked
+metrics_timer = QTimer()
+metrics_timer.timeout.connect(lambda: dump_metrics())
+auto_dump_metrics = QCheckBox('Write ' + METRICS_FILE + ' every minute')
+auto_dump_metrics.toggled.connect(lambda checked: metrics_timer.start(60000) if checked else metrics_timer.stop())
+
+diagnostics_layout = QFormLayout()
+diagnostics_layout.addRow('Slow query threshold (ms):', slow_query_threshold)
+diagnostics_layout.addRow('Busy timeout (ms):', busy_timeout)
+diagnostics_layout.addRow(refresh_metrics)
+diagnostics_layout.addRow(operations_table)
+diagnostics_layout.addRow(QLabel('Slow queries'))
+diagnostics_layout.addRow(slow_query_table)
+diagnostics_layout.addRow('Query cache:', cache_status)
+diagnostics_layout.addRow(dump_metrics_button)
+diagnostics_layout.addRow(auto_dump_metrics)
+diagnostics_layout.addRow(reset_metrics_button)
+diagnostics_tab.setLayout(diagnostics_layout)
+tabs.currentChanged.connect(lambda index: refresh_diagnostics() if tabs.widget(index) is diagnostics_tab else None)
+
 
 
 if __name__ == '__main__':
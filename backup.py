@@ -0,0 +1,307 @@
+"""
+Online backups and consistent exports of the database, run on a background thread so that the
+application keeps working while they run.
+
+A backup copies the database file with sqlite3.Connection.backup, a bounded number of pages at a
+time, into a temporary file that replaces the target once it is complete. The database is switched to
+WAL mode, so that the backup and the exports read a snapshot while the application keeps writing. A consistent export writes
+the json exports of the four tables from a single read transaction, so they hold the same point in
+time, along with the change log sequence number of that point (see changelog.py).
+
+Both run as a BackgroundJob, whose progress can be polled from the GUI thread::
+
+    job = BackupJob('university.db', 'backups/university-20240101-120000.db')
+    job.start()
+    ...
+    job.progress()
+
+Usage::
+
+    python backup.py --db university.db --to backups --every 3600 --keep 24
+"""
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from changelog import current_sequence
+from database import DB_FILE, use_wal
+from transfer import EXPORTS, export_json
+
+PAGES_PER_STEP = 256
+BACKUP_DIRECTORY = 'backups'
+
+
+def database_file(conn):
+    """
+    returns the file of the main database of a connection
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :return: the file name
+    :rtype: str
+    """
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+def timestamped(directory, name, extension=''):
+    """
+    returns a file name in the directory made of a name, the current time and an extension,
+    e.g. backups/university-20240101-120000.db
+
+    :return: the file name
+    :rtype: str
+    """
+    return os.path.join(directory, "%s-%s%s" % (name, time.strftime('%Y%m%d-%H%M%S'), extension))
+
+
+def prune_backups(directory, keep, pattern='university-*.db'):
+    """
+    deletes the oldest backups in a directory, keeping the given number of the most recent ones
+
+    :param directory: the backup directory
+    :type directory: str
+
+    :param keep: the number of backups to keep
+    :type keep: int
+
+    :param pattern: the names of the backups
+    :type pattern: str
+
+    :return: the deleted files
+    :rtype: list of str
+    """
+    backups = sorted(glob.glob(os.path.join(directory, pattern)))
+    deleted = backups[:-keep] if keep > 0 else backups
+    for filename in deleted:
+        os.remove(filename)
+    return deleted
+
+
+class BackgroundJob(ABC):
+    """
+    Work run on a thread of its own, whose progress can be read from other threads.
+
+    Attributes
+    ----------
+    done : int
+        The units of work done so far.
+    total : int
+        The units of work in total, 0 while unknown.
+    bytes : int
+        The bytes copied or written so far.
+    started : float
+        The time.perf_counter() at which the job started.
+    finished : float or None
+        The time.perf_counter() at which the job finished, None while it runs.
+    error : Exception or None
+        The exception that stopped the job, if any.
+
+    Methods
+    -------
+    start()
+        Runs the job on a new thread.
+    join(timeout=None)
+        Waits for the job to finish, then raises its error if it failed.
+    running()
+        Tells whether the job is still running.
+    progress()
+        Returns the progress of the job as a dictionary.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.done = 0
+        self.total = 0
+        self.bytes = 0
+        self.started = None
+        self.finished = None
+        self.error = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.run()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = time.perf_counter()
+
+    @abstractmethod
+    def run(self):
+        pass
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+        if self.error is not None:
+            raise self.error
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def update(self, done=None, total=None, size=None):
+        with self.lock:
+            if done is not None:
+                self.done = done
+            if total is not None:
+                self.total = total
+            if size is not None:
+                self.bytes = size
+
+    def progress(self):
+        with self.lock:
+            elapsed = (self.finished or time.perf_counter()) - self.started if self.started else 0.0
+            return {
+                'done': self.done,
+                'total': self.total,
+                'fraction': self.done / self.total if self.total else 0.0,
+                'bytes': self.bytes,
+                'seconds': elapsed,
+                'bytes_per_second': self.bytes / elapsed if elapsed else 0.0,
+                'running': self.running(),
+                'error': None if self.error is None else str(self.error),
+            }
+
+
+class BackupJob(BackgroundJob):
+    """
+    Copies a database into another file with sqlite3.Connection.backup, a bounded number of pages per
+    step, sleeping between steps so that writers can get in. Progress is counted in pages.
+
+    Attributes
+    ----------
+    source : str
+        The database file to back up.
+    target : str
+        The backup file, replaced once the copy is complete.
+    pages : int
+        The number of pages copied per step.
+    sleep : float
+        The seconds to wait between steps.
+    """
+
+    def __init__(self, source, target, pages=PAGES_PER_STEP, sleep=0.0):
+        super().__init__()
+        self.source = source
+        self.target = target
+        self.pages = pages
+        self.sleep = sleep
+
+    def run(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.target)), exist_ok=True)
+        temporary = self.target + '.tmp'
+        # the connections are opened on the backup thread, as sqlite connections stay on their thread
+        source = sqlite3.connect(self.source)
+        target = sqlite3.connect(temporary)
+        try:
+            page_size = source.execute("PRAGMA page_size").fetchone()[0]
+
+            def progress(status, remaining, total):
+                self.update(total - remaining, total, (total - remaining) * page_size)
+
+            # a backup restarts whenever another connection writes to the database, so it would never end
+            # while the application keeps writing. In WAL mode a read transaction held by the source
+            # connection pins a snapshot the backup copies from, without blocking the writers.
+            if source.execute("PRAGMA journal_mode").fetchone()[0] != 'wal':
+                use_wal(source)
+            source.execute("BEGIN")
+            source.execute("select count(*) from sqlite_master").fetchone()
+            source.backup(target, pages=self.pages, progress=progress, sleep=self.sleep)
+            source.rollback()
+        finally:
+            target.close()
+            source.close()
+        os.replace(temporary, self.target)
+
+
+class SnapshotJob(BackgroundJob):
+    """
+    Exports the four tables of a database from one read transaction, so that the exports hold the same
+    point in time, and writes snapshot.json with the change log sequence number of that point and the
+    number of records of each table. Progress is counted in tables.
+
+    Attributes
+    ----------
+    source : str
+        The database file to export.
+    directory : str
+        The directory the exports are written to.
+    extension : str
+        .json or .jsonl
+    suffix : str
+        The compression extension of the exports, e.g. .gz
+    level : int or None
+        The compression level.
+    sequence : int or None
+        The change log sequence number of the snapshot, once the job has started.
+    """
+
+    def __init__(self, source, directory, extension='.json', suffix='', level=None):
+        super().__init__()
+        self.source = source
+        self.directory = directory
+        self.extension = extension
+        self.suffix = suffix
+        self.level = level
+        self.sequence = None
+
+    def run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(self.source)
+        try:
+            # readers don't block the application's writes in WAL mode, even for a long export
+            if conn.execute("PRAGMA journal_mode").fetchone()[0] != 'wal':
+                use_wal(conn)
+            self.update(total=len(EXPORTS))
+            counts = {}
+            conn.execute("BEGIN")
+            self.sequence = current_sequence(conn)
+            for i, table in enumerate(EXPORTS):
+                filename = os.path.join(self.directory, table + self.extension + self.suffix)
+                counts[table] = conn.execute("select count(*) from " + table).fetchone()[0]
+                export_json(conn, table, filename, self.level)
+                self.update(i + 1, size=self.bytes + os.path.getsize(filename))
+            conn.rollback()
+        finally:
+            conn.close()
+        with open(os.path.join(self.directory, 'snapshot.json'), 'w') as file:
+            json.dump({'sequence': self.sequence, 'time': time.time(), 'counts': counts}, file, indent=4)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="online backup of the database")
+    parser.add_argument('--db', default=DB_FILE)
+    parser.add_argument('--to', default=BACKUP_DIRECTORY, help='backup directory')
+    parser.add_argument('--pages', type=int, default=PAGES_PER_STEP, help='pages copied per step')
+    parser.add_argument('--sleep', type=float, default=0.0, help='seconds between steps')
+    parser.add_argument('--every', type=float, help='seconds between backups (default: back up once)')
+    parser.add_argument('--keep', type=int, default=0, help='number of backups to keep (default: all)')
+    args = parser.parse_args(argv)
+
+    while True:
+        job = BackupJob(args.db, timestamped(args.to, 'university', '.db'), args.pages, args.sleep).start()
+        job.join()
+        progress = job.progress()
+        print("%s: %d pages, %.1f MB in %.2fs (%.1f MB/s)" % (
+            job.target, progress['total'], progress['bytes'] / 1e6, progress['seconds'],
+            progress['bytes_per_second'] / 1e6), flush=True)
+        if args.keep:
+            prune_backups(args.to, args.keep)
+        if args.every is None:
+            break
+        time.sleep(max(args.every - progress['seconds'], 0))
+
+
+if __name__ == '__main__':
+    main()
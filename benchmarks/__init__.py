@@ -0,0 +1,12 @@
+"""
+Benchmark suite for the School Management System.
+
+Builds databases and JSON files at 1k, 100k and 1M records, times the public operations of
+app_PyQt5.py, main.py and objects.py, records their peak (Python) memory with tracemalloc and
+writes the results to a JSON file that can be compared across commits.
+
+Run it with::
+
+    python -m benchmarks --size 1k --size 100k
+    python -m benchmarks.compare old.json new.json
+"""
@@ -0,0 +1,65 @@
+"""
+Command line entry point: python -m benchmarks [--size 1k] [--filter app.] [--output results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.fixtures import SIZES, Fixture
+from benchmarks.runner import BENCHMARKS, run_benchmark, metadata
+import benchmarks.bench_app
+import benchmarks.bench_main
+import benchmarks.bench_objects
+import benchmarks.bench_session
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__)
+    parser.add_argument('--size', action='append', choices=list(SIZES),
+                        help='fixture size to run, can be given several times (default: all)')
+    parser.add_argument('--filter', default='',
+                        help='only run the benchmarks whose name contains this text')
+    parser.add_argument('--repeat', type=int, default=5, help='timed iterations per benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated data')
+    parser.add_argument('--workdir', help='directory for the fixtures (default: a temporary directory)')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<commit>.json)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = args.size or list(SIZES)
+    selected = [bench for bench in BENCHMARKS if args.filter in bench.name]
+    meta = metadata(sizes, args.repeat, args.seed)
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.workdir) as root:
+        for size in sizes:
+            directory = os.path.join(root, size)
+            os.makedirs(directory)
+            print("building %s fixture..." % size, flush=True)
+            fixture = Fixture(directory, SIZES[size], args.seed).build()
+            for bench in selected:
+                result = run_benchmark(bench, fixture, root, args.repeat)
+                results.append(result)
+                if result['status'] == 'ok':
+                    print("%-45s %6s  median %10.6fs  peak %10d B" % (
+                        bench.name, size, result['median'], result['peak_memory']), flush=True)
+                else:
+                    print("%-45s %6s  %s: %s" % (bench.name, size, result['status'], result['reason']), flush=True)
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', (meta['commit'][:12] or 'results') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump({'meta': meta, 'results': results}, file, indent=4)
+    print("results written to " + output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""
+Benchmarks of the operations in app_PyQt5.py, run with Qt's offscreen platform.
+
+The operations read their input from the widgets, so every setup fills the widgets first.
+The error popups are modal, they are replaced by a function raising an exception so that a
+failing operation is reported as an error instead of blocking the run.
+"""
+import os
+
+from benchmarks.generator import student_id, instructor_id, course_id
+from benchmarks.runner import benchmark, SkipBenchmark
+from compression import DEFAULT_LEVEL
+from database import connect
+from instrumentation import InstrumentedConnection
+from queries import Queries
+from storage import SqliteStorage
+
+_app = None
+_app_db = None
+
+
+class PopupShown(Exception):
+    pass
+
+
+def popup():
+    raise PopupShown("the operation displayed an error popup")
+
+
+def get_app(ctx):
+    """
+    imports app_PyQt5 with the offscreen platform and points it to the database of the benchmark
+
+    :return: the app_PyQt5 module
+    :rtype: module
+    """
+    global _app, _app_db
+    if _app is None:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        try:
+            import app_PyQt5
+        except ImportError as e:
+            raise SkipBenchmark("PyQt5 is not available: %s" % e)
+        app_PyQt5.show_error_popup = popup
+        app_PyQt5.file_not_found_popup = popup
+        _app = app_PyQt5
+    if _app_db != ctx.db_path:
+        _app.conn.close()
+        _app.conn = connect(ctx.db_path, InstrumentedConnection)
+        _app.queries = Queries(_app.conn)
+        _app.storage = SqliteStorage(_app.conn)
+        _app_db = ctx.db_path
+    return _app
+
+
+def fill(*pairs):
+    """
+    sets the text of the given (widget, text) pairs
+    """
+    for widget, text in pairs:
+        widget.setText(text)
+
+
+def select(combo, text):
+    """
+    makes text the only (and current) item of a combo box
+    """
+    combo.clear()
+    combo.addItem(text)
+
+
+def registered_course(app, i):
+    """
+    returns a course the i-th student is registered in
+    """
+    return app.conn.execute("select CourseID from Registrations where StudentID = ?",
+                            (student_id(i),)).fetchone()[0]
+
+
+def other_course(app, i):
+    """
+    returns a course the i-th student is not registered in
+    """
+    return app.conn.execute("select ID from Courses where ID not in "
+                            "(select CourseID from Registrations where StudentID = ?)",
+                            (student_id(i),)).fetchone()[0]
+
+
+#### Students
+
+@benchmark('app.addStudent', needs=('db',))
+def add_student(ctx, i):
+    app = get_app(ctx)
+    fill((app.student_id_entry, 'B%d' % i), (app.student_name_entry, 'Bench Student'),
+         (app.student_age_entry, '20'), (app.student_email_entry, 'bench%d@example.com' % i))
+    return app.addStudent
+
+
+@benchmark('app.editStudent', needs=('db',))
+def edit_student(ctx, i):
+    app = get_app(ctx)
+    fill((app.student_id_entry, student_id(i)), (app.student_name_entry, 'Edited Student'),
+         (app.student_age_entry, '30'), (app.student_email_entry, 'edited%d@example.com' % i))
+    return app.editStudent
+
+
+@benchmark('app.deleteStudent', needs=('db',))
+def delete_student(ctx, i):
+    app = get_app(ctx)
+    fill((app.student_id_entry, student_id(i)),)
+    return app.deleteStudent
+
+
+#### Instructors
+
+@benchmark('app.addInstructor', needs=('db',))
+def add_instructor(ctx, i):
+    app = get_app(ctx)
+    fill((app.instructor_id_entry, 'B%d' % i), (app.instructor_name_entry, 'Bench Instructor'),
+         (app.instructor_age_entry, '40'), (app.instructor_email_entry, 'bench%d@example.com' % i))
+    return app.addInstructor
+
+
+@benchmark('app.editInstructor', needs=('db',))
+def edit_instructor(ctx, i):
+    app = get_app(ctx)
+    fill((app.instructor_id_entry, instructor_id(i % ctx.fixture.counts['instructors'])),
+         (app.instructor_name_entry, 'Edited Instructor'), (app.instructor_age_entry, '50'),
+         (app.instructor_email_entry, 'edited%d@example.com' % i))
+    return app.editInstructor
+
+
+@benchmark('app.deleteInstructor', needs=('db',))
+def delete_instructor(ctx, i):
+    app = get_app(ctx)
+    fill((app.instructor_id_entry, instructor_id(i)),)
+    return app.deleteInstructor
+
+
+#### Courses
+
+@benchmark('app.addCourse', needs=('db',))
+def add_course(ctx, i):
+    app = get_app(ctx)
+    fill((app.course_id_entry, 'B%d' % i), (app.course_name_entry, 'Bench Course'),
+         (app.course_instructor_entry, instructor_id(0)))
+    return app.addCourse
+
+
+@benchmark('app.editCourse', needs=('db',))
+def edit_course(ctx, i):
+    app = get_app(ctx)
+    fill((app.course_id_entry, course_id(i % ctx.fixture.counts['courses'])),
+         (app.course_name_entry, 'Edited Course'), (app.course_instructor_entry, instructor_id(0)))
+    return app.editCourse
+
+
+@benchmark('app.deleteCourse', needs=('db',))
+def delete_course(ctx, i):
+    app = get_app(ctx)
+    fill((app.course_id_entry, course_id(i % ctx.fixture.counts['courses'])),)
+    return app.deleteCourse
+
+
+#### Registrations and assignments
+
+@benchmark('app.registerStudent', needs=('db',))
+def register_student(ctx, i):
+    app = get_app(ctx)
+    fill((app.registering_student_id_entry, student_id(i)),)
+    select(app.registered_course, other_course(app, i))
+    return app.registerStudent
+
+
+@benchmark('app.dropStudent', needs=('db',))
+def drop_student(ctx, i):
+    app = get_app(ctx)
+    fill((app.registering_student_id_entry, student_id(i)),)
+    select(app.registered_course, registered_course(app, i))
+    return app.dropStudent
+
+
+@benchmark('app.assignInstructor', needs=('db',))
+def assign_instructor(ctx, i):
+    app = get_app(ctx)
+    fill((app.assigned_instructor_id_entry, instructor_id(i % ctx.fixture.counts['instructors'])),)
+    select(app.assigned_course, course_id(i % ctx.fixture.counts['courses']))
+    return app.assignInstructor
+
+
+@benchmark('app.changeInstructor', needs=('db',))
+def change_instructor(ctx, i):
+    app = get_app(ctx)
+    fill((app.assigned_instructor_id_entry, instructor_id(i % ctx.fixture.counts['instructors'])),)
+    select(app.assigned_course, course_id(i % ctx.fixture.counts['courses']))
+    return app.changeInstructor
+
+
+#### Display Data tab
+
+@benchmark('app.default_populate_tables', needs=('db',))
+def default_populate_tables(ctx, i):
+    app = get_app(ctx)
+    return app.default_populate_tables
+
+
+@benchmark('app.populate_table', needs=('db',))
+def populate_table(ctx, i):
+    app = get_app(ctx)
+    rows = app.conn.execute("select * from Students").fetchall()
+    return lambda: app.populate_table(app.student_table, rows)
+
+
+@benchmark('app.filter_results[name]', needs=('db',))
+def filter_by_name(ctx, i):
+    app = get_app(ctx)
+    name = app.conn.execute("select Name from Students where ID = ?", (student_id(i),)).fetchone()[0]
+    fill((app.filter_name_entry, name), (app.filter_id_entry, ''))
+    return app.filter_results
+
+
+@benchmark('app.filter_results[id]', needs=('db',))
+def filter_by_id(ctx, i):
+    app = get_app(ctx)
+    fill((app.filter_name_entry, ''), (app.filter_id_entry, student_id(i)))
+    return app.filter_results
+
+
+#### Export Data tab
+
+def export_benchmark(name, function, filename):
+    @benchmark('app.' + name, needs=('db',))
+    def export(ctx, i):
+        app = get_app(ctx)
+        return lambda: getattr(app, function)(ctx.path(filename), DEFAULT_LEVEL)
+
+
+for suffix in ['', '.gz']:
+    export_benchmark('exportStudents' + suffix, 'exportStudents', 'students.json' + suffix)
+    export_benchmark('exportInstructors' + suffix, 'exportInstructors', 'instructors.json' + suffix)
+    export_benchmark('exportCourses' + suffix, 'exportCourses', 'courses.json' + suffix)
+    export_benchmark('exportRegistrations' + suffix, 'exportRegistrations', 'registrations.json' + suffix)
+    export_benchmark('generate_csv' + suffix, 'generate_csv', 'merged_data.csv' + suffix)
+
+
+@benchmark('app.exportNested', needs=('db',))
+def export_nested(ctx, i):
+    app = get_app(ctx)
+    return lambda: app.exportNested(level=DEFAULT_LEVEL)
+
+
+def load_benchmark(function, table, filename):
+    @benchmark('app.' + function, needs=('db', 'json'))
+    def load(ctx, i):
+        app = get_app(ctx)
+        app.conn.execute("delete from " + table)
+        app.conn.commit()
+        return lambda: getattr(app, function)(ctx.path(filename))
+
+
+load_benchmark('loadStudents', 'Students', 'students.json')
+load_benchmark('loadInstructors', 'Instructors', 'instructors.json')
+load_benchmark('loadCourses', 'Courses', 'courses.json')
+load_benchmark('loadRegistrations', 'Registrations', 'registrations.json')
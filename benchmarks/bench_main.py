@@ -0,0 +1,159 @@
+"""
+Benchmarks of the operations in main.py (the Tkinter app).
+
+main.py builds its window when it is imported, so these benchmarks need a display and are
+skipped when Tk cannot be started. The operations work on the json store (see storage.py) in
+the working directory of the benchmark.
+"""
+import os
+
+from benchmarks.generator import student_id, instructor_id, course_name
+from benchmarks.runner import benchmark, SkipBenchmark
+
+_main = None
+_main_error = None
+
+
+def get_main(ctx=None):
+    """
+    imports main.py, or skips the benchmark if Tk cannot be started.
+    With a context, the store of main.py is opened on the json files of its working directory
+
+    :return: the main module
+    :rtype: module
+    """
+    global _main, _main_error
+    if _main is None and _main_error is None:
+        try:
+            import tkinter
+            try:
+                import main
+            except tkinter.TclError as e:
+                _main_error = "Tk cannot be started: %s" % e
+            else:
+                _main = main
+        except ImportError as e:
+            _main_error = "tkinter is not available: %s" % e
+    if _main is None:
+        raise SkipBenchmark(_main_error)
+    if ctx is not None and getattr(_main.storage, 'directory', None) != os.path.abspath(ctx.workdir):
+        if _main.storage is not None:
+            _main.storage.close()
+        _main.storage = _main.open_storage('json', ctx.workdir, write_behind=True)
+    return _main
+
+
+def fill(*pairs):
+    """
+    replaces the text of the given (entry, text) pairs
+    """
+    for entry, text in pairs:
+        entry.delete(0, 'end')
+        entry.insert(0, text)
+
+
+def some_course(ctx, i):
+    return course_name(i % ctx.fixture.counts['courses'])
+
+
+def unregistered_course(ctx, main, i):
+    """
+    returns the name of a course the student i is not registered in yet
+    """
+    registered = {r['course_id'] for r in main.storage.iterate('registrations', student_id=student_id(i))}
+    j = i + 1
+    while main.find_course(some_course(ctx, j)) in registered:
+        j += 1
+    return some_course(ctx, j)
+
+
+@benchmark('main.SchoolManagementSystem.save_data', needs=('tk',))
+def save_data(ctx, i):
+    main = get_main(ctx)
+    student = main.Student('Bench Student', 20, 'bench%d@example.com' % i, 'B%d' % i)
+    return lambda: main.SchoolManagementSystem.save_data('students.json', [student])
+
+
+@benchmark('main.SchoolManagementSystem.save_data_dump', needs=('tk',))
+def save_data_dump(ctx, i):
+    main = get_main(ctx)
+    students = main.load_json('students.json')
+    return lambda: main.SchoolManagementSystem.save_data_dump('students.json', students)
+
+
+@benchmark('main.load_json', needs=('tk',))
+def load_json(ctx, i):
+    main = get_main(ctx)
+    return lambda: main.load_json('students.json')
+
+
+@benchmark('main.Student', repeat=1)
+def make_students(ctx, i):
+    main = get_main()
+    rows = list(ctx.fixture.students())
+    return lambda: [main.Student(t[1], t[2], t[3], t[0]) for t in rows]
+
+
+@benchmark('main.add_student', needs=('tk',))
+def add_student(ctx, i):
+    main = get_main(ctx)
+    fill((main.student_name_entry, 'Bench Student'), (main.student_age_entry, '20'),
+         (main.student_email_entry, 'bench%d@example.com' % i), (main.student_id_entry, 'B%d' % i))
+    return main.add_student
+
+
+@benchmark('main.add_instructor', needs=('tk',))
+def add_instructor(ctx, i):
+    main = get_main(ctx)
+    fill((main.instructor_name_entry, 'Bench Instructor'), (main.instructor_age_entry, '40'),
+         (main.instructor_email_entry, 'bench%d@example.com' % i), (main.instructor_id_entry, 'B%d' % i))
+    return main.add_instructor
+
+
+@benchmark('main.add_course', needs=('tk',))
+def add_course(ctx, i):
+    main = get_main(ctx)
+    fill((main.course_id_entry, 'B%d' % i), (main.course_name_entry, 'Bench Course %d' % i))
+    return main.add_course
+
+
+@benchmark('main.refreshCourses', needs=('tk',))
+def refresh_courses(ctx, i):
+    main = get_main(ctx)
+    return main.refreshCourses
+
+
+@benchmark('main.addCourseToStudent', needs=('tk',))
+def add_course_to_student(ctx, i):
+    main = get_main(ctx)
+    regcc = main.RegCourse(student_id(i), unregistered_course(ctx, main, i))
+    return lambda: main.addCourseToStudent(regcc)
+
+
+@benchmark('main.addCourseToInstructor', needs=('tk',))
+def add_course_to_instructor(ctx, i):
+    main = get_main(ctx)
+    ass_course = main.AssCourse(instructor_id(i % ctx.fixture.counts['instructors']), some_course(ctx, i))
+    return lambda: main.addCourseToInstructor(ass_course)
+
+
+@benchmark('main.register_course', needs=('tk',))
+def register_course(ctx, i):
+    main = get_main(ctx)
+    fill((main.student_id_entry1, student_id(i)),)
+    main.selected_course_var.set(unregistered_course(ctx, main, i))
+    return main.register_course
+
+
+@benchmark('main.assign_course', needs=('tk',))
+def assign_course(ctx, i):
+    main = get_main(ctx)
+    fill((main.instructor_id_entry1, instructor_id(i % ctx.fixture.counts['instructors'])),)
+    main.selected_course_var1.set(some_course(ctx, i))
+    return main.assign_course
+
+
+@benchmark('main.display_data', needs=('tk',))
+def display_data(ctx, i):
+    main = get_main(ctx)
+    return main.display_data
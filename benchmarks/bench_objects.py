@@ -0,0 +1,133 @@
+"""
+Benchmarks of the classes in objects.py.
+
+The *.save_to_json and *.load_from_json methods work on the json files in the current
+directory, which is the working directory of the benchmark.
+"""
+from benchmarks.runner import benchmark
+from objects import can_be_int, Student, Instructor, Course
+
+
+@benchmark('objects.can_be_int', repeat=3)
+def check_ints(ctx, i):
+    ages = [str(t[2]) for t in ctx.fixture.students()]
+    return lambda: [can_be_int(age) for age in ages]
+
+
+@benchmark('objects.Student', repeat=3)
+def make_students(ctx, i):
+    rows = list(ctx.fixture.students())
+    return lambda: [Student(t[1], t[2], t[3], t[0]) for t in rows]
+
+
+@benchmark('objects.Instructor', repeat=3)
+def make_instructors(ctx, i):
+    rows = list(ctx.fixture.instructors())
+    return lambda: [Instructor(t[1], t[2], t[3], t[0]) for t in rows]
+
+
+@benchmark('objects.Course', repeat=3)
+def make_courses(ctx, i):
+    rows = list(ctx.fixture.courses())
+    return lambda: [Course(t[0], t[1]) for t in rows]
+
+
+@benchmark('objects.Student.from_rows', repeat=3)
+def students_from_rows(ctx, i):
+    rows = list(ctx.fixture.students())
+    return lambda: Student.from_rows(rows)
+
+
+@benchmark('objects.Instructor.from_rows', repeat=3)
+def instructors_from_rows(ctx, i):
+    rows = list(ctx.fixture.instructors())
+    return lambda: Instructor.from_rows(rows)
+
+
+@benchmark('objects.Course.from_rows', repeat=3)
+def courses_from_rows(ctx, i):
+    rows = list(ctx.fixture.courses())
+    return lambda: Course.from_rows(rows)
+
+
+@benchmark('objects.Student.to_dict', repeat=3)
+def students_to_dict(ctx, i):
+    students = [Student(t[1], t[2], t[3], t[0]) for t in ctx.fixture.students()]
+    return lambda: [student.to_dict() for student in students]
+
+
+@benchmark('objects.Instructor.to_dict', repeat=3)
+def instructors_to_dict(ctx, i):
+    instructors = [Instructor(t[1], t[2], t[3], t[0]) for t in ctx.fixture.instructors()]
+    return lambda: [instructor.to_dict() for instructor in instructors]
+
+
+@benchmark('objects.Course.to_dict', repeat=3)
+def courses_to_dict(ctx, i):
+    courses = [Course(t[0], t[1]) for t in ctx.fixture.courses()]
+    return lambda: [course.to_dict() for course in courses]
+
+
+@benchmark('objects.Student.to_dicts', repeat=3)
+def students_to_dicts(ctx, i):
+    students = Student.from_rows(ctx.fixture.students())
+    return lambda: Student.to_dicts(students)
+
+
+@benchmark('objects.Course.from_dict', repeat=3)
+def courses_from_dict(ctx, i):
+    data = [{'course_id': t[0], 'course_name': t[1], 'instructor_id': t[2]} for t in ctx.fixture.courses()]
+    return lambda: [Course.from_dict(d) for d in data]
+
+
+@benchmark('objects.Student.register_course', repeat=3)
+def register_courses(ctx, i):
+    students = [Student(t[1], t[2], t[3], t[0]) for t in ctx.fixture.students()]
+    course = Course('C', 'Course')
+    def register():
+        for student in students:
+            student.register_course(course)
+    return register
+
+
+@benchmark('objects.Instructor.assign_course', repeat=3)
+def assign_courses(ctx, i):
+    instructor = Instructor('Bench Instructor', 40, 'bench@example.com', 'I')
+    courses = [Course(t[0], t[1]) for t in ctx.fixture.courses()]
+    def assign():
+        for course in courses:
+            instructor.assign_course(course)
+    return assign
+
+
+@benchmark('objects.Student.save_to_json', needs=('json',))
+def save_student(ctx, i):
+    student = Student('Bench Student', 20, 'bench%d@example.com' % i, 'B%d' % i)
+    return student.save_to_json
+
+
+@benchmark('objects.Instructor.save_to_json', needs=('json',))
+def save_instructor(ctx, i):
+    instructor = Instructor('Bench Instructor', 40, 'bench%d@example.com' % i, 'B%d' % i)
+    return instructor.save_to_json
+
+
+@benchmark('objects.Course.save_to_json', needs=('json',))
+def save_course(ctx, i):
+    course = Course('B%d' % i, 'Bench Course')
+    return course.save_to_json
+
+
+@benchmark('objects.Student.load_from_json', needs=('json',))
+def load_students(ctx, i):
+    return Student.load_from_json
+
+
+@benchmark('objects.Instructor.load_from_json', needs=('json',))
+def load_instructors(ctx, i):
+    return Instructor.load_from_json
+
+
+@benchmark('objects.Course.load_from_json', needs=('json',))
+def load_courses(ctx, i):
+    return Course.load_from_json
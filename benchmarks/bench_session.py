@@ -0,0 +1,29 @@
+"""
+Benchmarks of session.py: walking from every student to their courses and the instructors of these courses,
+with the relationships loaded in batches, and one object at a time (the N+1 queries of a batch size of 1).
+"""
+from benchmarks.runner import benchmark
+from database import connect
+from objects import Student
+from session import BATCH_SIZE, Session
+
+
+def walk(db_path, batch_size):
+    def operation():
+        conn = connect(db_path)
+        session = Session(conn, batch_size)
+        for student in session.all(Student):
+            for course in student.registered_courses:
+                course.instructor
+        conn.close()
+    return operation
+
+
+@benchmark('session.walk', needs=('db',), repeat=3)
+def walk_batched(ctx, i):
+    return walk(ctx.db_path, BATCH_SIZE)
+
+
+@benchmark('session.walk.one_at_a_time', needs=('db',), repeat=3)
+def walk_one_at_a_time(ctx, i):
+    return walk(ctx.db_path, 1)
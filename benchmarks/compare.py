@@ -0,0 +1,65 @@
+"""
+Compares two benchmark result files: python -m benchmarks.compare old.json new.json
+
+Prints the ratio of the median times and peak memory of every benchmark found in both files,
+and exits with status 1 if a benchmark got slower than --threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def load_results(filename):
+    with open(filename) as file:
+        data = json.load(file)
+    return data['meta'], {(r['name'], r['size']): r for r in data['results']}
+
+
+def compare(old, new, threshold):
+    """
+    compares the results of two runs
+
+    :param old: the baseline results, by (name, size)
+    :type old: dict
+    :param new: the new results, by (name, size)
+    :type new: dict
+    :param threshold: the relative slowdown above which a benchmark is a regression, e.g. 0.1 for 10%
+    :type threshold: float
+
+    :return: the rows (name, size, old median, new median, time ratio, memory ratio, regression)
+    :rtype: list of tuple
+    """
+    rows = []
+    for key in sorted(old.keys() & new.keys(), key=lambda k: (k[1], k[0])):
+        a, b = old[key], new[key]
+        if a['status'] != 'ok' or b['status'] != 'ok':
+            continue
+        time_ratio = b['median'] / a['median'] if a['median'] else float('inf')
+        memory_ratio = b['peak_memory'] / a['peak_memory'] if a['peak_memory'] else float('inf')
+        rows.append((key[0], key[1], a['median'], b['median'], time_ratio, memory_ratio,
+                     time_ratio > 1 + threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.compare', description=__doc__)
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown reported as a regression (default: 0.1)')
+    args = parser.parse_args(argv)
+
+    old_meta, old = load_results(args.old)
+    new_meta, new = load_results(args.new)
+    print("old: %s  new: %s" % (old_meta['commit'][:12], new_meta['commit'][:12]))
+    print("%-45s %10s %12s %12s %8s %8s" % ('benchmark', 'size', 'old (s)', 'new (s)', 'time', 'memory'))
+    regressions = 0
+    for name, size, old_median, new_median, time_ratio, memory_ratio, regression in compare(old, new, args.threshold):
+        regressions += regression
+        print("%-45s %10s %12.6f %12.6f %7.2fx %7.2fx%s" % (
+            name, size, old_median, new_median, time_ratio, memory_ratio, '  <-- slower' if regression else ''))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Several processes registering students in the same database at once, as copies of app_PyQt5.py and
+server.py do: every registration reads the roster size of the course, then inserts the registration,
+in one transaction. Prints the registrations per second, and how many were retried or failed::
+
+    python -m benchmarks.contention --processes 1 2 4 8 --registrations 2000
+
+With --mode immediate (the default) the transactions go through database.write_transaction, which
+takes the write lock when the transaction begins and retries it while another process holds it.
+--mode deferred runs them as plain `with conn:` transactions, which take the lock only at the insert:
+a process that read while another was writing then fails with "database is locked" at once, whatever
+the busy timeout.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.generator import RosterGenerator
+from database import BUSY_TIMEOUT, RETRY_METRIC, connect, is_busy, set_busy_timeout, use_wal, write_transaction
+from instrumentation import metrics
+
+MODES = ['immediate', 'deferred']
+
+
+def register(conn, student_id, course_id):
+    conn.execute("select count(*) from Registrations where CourseID = ?", (course_id,)).fetchone()
+    conn.execute("insert into Registrations values (?,?)", (student_id, course_id))
+
+
+def worker(db, pairs, mode, busy_timeout):
+    """
+    registers the given (student, course) pairs, one transaction each
+
+    :return: the registrations that succeeded and failed, the retries and the seconds it took
+    :rtype: dict
+    """
+    conn = connect(db)
+    set_busy_timeout(conn, busy_timeout)
+    metrics.reset()
+    ok = failed = 0
+    start = time.perf_counter()
+    for student_id, course_id in pairs:
+        try:
+            if mode == 'immediate':
+                write_transaction(conn, lambda conn: register(conn, student_id, course_id))
+            else:
+                with conn:
+                    conn.execute("BEGIN")
+                    register(conn, student_id, course_id)
+            ok += 1
+        except Exception as e:
+            if not is_busy(e):
+                raise
+            failed += 1
+    seconds = time.perf_counter() - start
+    conn.close()
+    histogram = metrics.histograms.get(RETRY_METRIC)
+    retries = histogram.count - histogram.errors if histogram else 0
+    return {'ok': ok, 'failed': failed, 'retries': retries, 'seconds': seconds}
+
+
+def run(db, pairs, processes, mode, busy_timeout):
+    conn = connect(db)
+    with conn:
+        conn.execute("delete from Registrations")
+    conn.close()
+    shares = [pairs[i::processes] for i in range(processes)]
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(worker, [(db, share, mode, busy_timeout) for share in shares])
+    seconds = time.perf_counter() - start
+    ok = sum(t['ok'] for t in results)
+    return {'processes': processes, 'mode': mode, 'seconds': seconds, 'ok': ok,
+            'failed': sum(t['failed'] for t in results), 'retries': sum(t['retries'] for t in results),
+            'registrations_per_second': ok / seconds if seconds else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.contention', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--registrations', type=int, default=2000, help='registrations made by all the processes')
+    parser.add_argument('--mode', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--busy-timeout', type=int, default=BUSY_TIMEOUT, help='milliseconds (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='directory for the database (default: a temporary directory)')
+    parser.add_argument('--output', help='json file to write the results to')
+    args = parser.parse_args(argv)
+
+    # one course per student, so that no pair is registered twice
+    generator = RosterGenerator(args.registrations, courses=max(args.registrations // 50, 2),
+                                instructors=max(args.registrations // 100, 1), courses_per_student=1, seed=args.seed)
+    pairs = list(generator.registrations())
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.workdir) as directory:
+        db = os.path.join(directory, 'university.db')
+        generator.write_database(db)
+        conn = connect(db)
+        use_wal(conn)
+        conn.close()
+        print("%-10s%10s%12s%10s%10s%10s" % ('mode', 'processes', 'per second', 'ok', 'retries', 'failed'))
+        for mode in args.mode:
+            for processes in args.processes:
+                result = run(db, pairs, processes, mode, args.busy_timeout)
+                results.append(result)
+                print("%(mode)-10s%(processes)10d%(registrations_per_second)12.0f%(ok)10d%(retries)10d%(failed)10d"
+                      % result, flush=True)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'counts': generator.counts, 'busy_timeout': args.busy_timeout, 'results': results}, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Speedup of parallel_export.py over exporting the tables one after the other: generates a roster
+into a database, then exports its four tables to json and merged_data.csv, first with
+transfer.export_json and transfer.export_csv on one connection (what generate_csv used to do),
+and then with an increasing number of workers::
+
+    python -m benchmarks.export_speedup --students 1000000 --workers 1 2 4 8
+
+Prints the total time of each run, and the records per second of each table with the most workers.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.generator import RosterGenerator
+from database import connect
+from parallel_export import CSV_FILE, SHARD_ROWS, export_tables
+from transfer import EXPORTS, export_csv, export_json
+
+
+def export_serial(db, directory, extension, suffix):
+    start = time.perf_counter()
+    conn = connect(db)
+    for table in EXPORTS:
+        export_json(conn, table, os.path.join(directory, table + extension + suffix))
+    export_csv(conn, os.path.join(directory, CSV_FILE + suffix))
+    conn.close()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.export_speedup', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--shard-rows', type=int, default=SHARD_ROWS)
+    parser.add_argument('--format', choices=['.json', '.jsonl'], default='.json')
+    parser.add_argument('--compression', choices=['', '.gz', '.bz2', '.xz'], default='')
+    parser.add_argument('--threads', action='store_true', help='export on threads instead of processes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='directory for the database and the exports (default: a temporary directory)')
+    parser.add_argument('--output', help='json file to write the results to')
+    args = parser.parse_args(argv)
+
+    generator = RosterGenerator(args.students, seed=args.seed)
+    results = {}
+    with tempfile.TemporaryDirectory(dir=args.workdir) as directory:
+        db = os.path.join(directory, 'university.db')
+        print("generating %d students..." % args.students, flush=True)
+        generator.write_database(db)
+        records = sum(generator.counts.values())
+        print("%d records on %d cores" % (records, os.cpu_count()))
+        print("%-10s%10s%12s%10s" % ('workers', 'seconds', 'records/s', 'speedup'))
+        serial = export_serial(db, directory, args.format, args.compression)
+        results['serial'] = {'seconds': serial}
+        print("%-10s%10.2f%12.0f%9.2fx" % ('serial', serial, records / serial, 1.0), flush=True)
+        for workers in args.workers:
+            report = export_tables(db, directory, extension=args.format, suffix=args.compression,
+                                   csv_file=CSV_FILE + args.compression, workers=workers, shard_rows=args.shard_rows,
+                                   executor='thread' if args.threads else 'process')
+            results[workers] = report
+            print("%-10d%10.2f%12.0f%9.2fx" % (workers, report['seconds'], records / report['seconds'],
+                                               serial / report['seconds']), flush=True)
+        print()
+        for table, result in report['tables'].items():
+            print("%-14s%10d records in %3d parts, %6.2fs (%.0f records/s)" % (
+                table, result['records'], result['parts'], result['seconds'], result['records_per_second']))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'counts': generator.counts, 'results': results}, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
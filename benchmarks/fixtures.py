@@ -0,0 +1,87 @@
+"""
+Builds the databases and JSON files the benchmarks run against.
+
+Every fixture is generated from a seed, so two runs with the same size and seed work on
+exactly the same data.
+"""
+import os
+import shutil
+
+from benchmarks.generator import RosterGenerator
+
+SIZES = {
+    '1k': 1000,
+    '100k': 100000,
+    '1m': 1000000,
+}
+
+# files read by the load* functions of app_PyQt5.py and by objects.py
+JSON_FILES = ['students.json', 'instructors.json', 'courses.json', 'registrations.json']
+
+# files of the json store of main.py (see storage.py)
+TK_FILES = JSON_FILES
+
+
+class Fixture:
+    """
+    A database and the JSON files matching it, generated in a directory.
+
+    Attributes
+    ----------
+    size : int
+        The number of students.
+    counts : dict
+        The number of rows of each table.
+    db_path : str
+        The database in the schema used by app_PyQt5.py.
+    json_dir : str
+        The directory holding the files read by the load* functions and objects.py.
+    tk_dir : str
+        The directory holding the files read by main.py.
+    """
+
+    def __init__(self, directory, size, seed=0):
+        self.directory = directory
+        self.size = size
+        self.seed = seed
+        self.generator = RosterGenerator(size, courses=max(size // 50, 2), instructors=max(size // 100, 1),
+                                         courses_per_student=1, seed=seed)
+        self.counts = self.generator.counts
+        self.db_path = os.path.join(directory, 'university.db')
+        self.json_dir = os.path.join(directory, 'json')
+        self.tk_dir = os.path.join(directory, 'tk')
+
+    def build(self):
+        """
+        generates the database and the JSON files
+
+        :return: the fixture
+        :rtype: Fixture
+        """
+        self.generator.write_database(self.db_path)
+        self.generator.write_json(self.json_dir)
+        self.generator.write_tk_json(self.tk_dir)
+        return self
+
+    def students(self):
+        return self.generator.students()
+
+    def instructors(self):
+        return self.generator.instructors()
+
+    def courses(self):
+        return self.generator.courses()
+
+    def registrations(self):
+        return self.generator.registrations()
+
+    def copy_database(self, destination):
+        shutil.copyfile(self.db_path, destination)
+
+    def copy_json(self, destination):
+        for name in JSON_FILES:
+            shutil.copyfile(os.path.join(self.json_dir, name), os.path.join(destination, name))
+
+    def copy_tk_json(self, destination):
+        for name in TK_FILES:
+            shutil.copyfile(os.path.join(self.tk_dir, name), os.path.join(destination, name))
@@ -0,0 +1,295 @@
+"""
+Synthetic roster generator for load and scale testing.
+
+Generates students, instructors, courses and registrations from a seed, so the same arguments
+always produce the same data. Registrations follow a Zipf-like popularity curve: the course of
+popularity rank r is picked with a weight of 1 / r ** exponent. Every row is generated on the fly
+and written in batches, so memory use does not depend on the number of students (only on the
+number of courses).
+
+The data can be written to a database in the schema of app_PyQt5.py, to the json files read by
+its load* functions, and to the json files used by main.py::
+
+    python -m benchmarks.generator --students 1000000 --db university.db --json out --tk out/tk
+"""
+import argparse
+import bisect
+import itertools
+import json
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from compression import open_file
+from database import connect, bulk_load, write_transaction
+from jsonstream import is_json_lines, write_json_lines
+
+FIRST_NAMES = ['Ayman', 'Aya', 'Rami', 'Lina', 'Omar', 'Sara', 'Karim', 'Nour', 'Hadi', 'Maya',
+               'Jad', 'Rana', 'Ziad', 'Dana', 'Fadi', 'Hiba', 'Tarek', 'Layla', 'Samir', 'Yara']
+LAST_NAMES = ['Haddad', 'Khoury', 'Saleh', 'Nasser', 'Azar', 'Fares', 'Daher', 'Mansour',
+              'Khalil', 'Hamdan', 'Sabbagh', 'Jaber', 'Karam', 'Aoun', 'Najjar', 'Rizk']
+SUBJECTS = ['CMPS', 'MATH', 'PHYS', 'CHEM', 'BIOL', 'ECON', 'ENGL', 'HIST', 'PHIL', 'ARAB',
+            'EECE', 'MECH', 'CIVE', 'PSYC', 'SOAN', 'STAT']
+
+
+def student_id(i):
+    return 'S%07d' % i
+
+
+def instructor_id(i):
+    return 'I%05d' % i
+
+
+def course_id(i):
+    return 'C%05d' % i
+
+
+def course_name(i):
+    """
+    returns the (unique) name of the i-th course, e.g. CMPS 201
+    """
+    return "%s %d" % (SUBJECTS[i % len(SUBJECTS)], 200 + i // len(SUBJECTS))
+
+
+def batches(rows, size):
+    """
+    splits an iterable into lists of at most size rows
+    """
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def write_json(filename, records, level=None):
+    """
+    writes the records as a json array, one record per line, without holding them all in memory.
+    The records are written as json lines if the file name ends with .jsonl.
+    The file is compressed if its name ends with .gz, .bz2 or .xz
+    """
+    with open_file(filename, 'w', level) as file:
+        if is_json_lines(filename):
+            write_json_lines(file, records)
+            return
+        file.write('[')
+        for i, record in enumerate(records):
+            file.write('\n' if i == 0 else ',\n')
+            file.write(json.dumps(record))
+        file.write('\n]')
+
+
+class RosterGenerator:
+    """
+    A seeded, streaming generator of students, instructors, courses and registrations.
+
+    Attributes
+    ----------
+    counts : dict
+        The number of students, instructors, courses and registrations generated.
+    courses_per_student : int
+        The number of courses every student registers in.
+    exponent : float
+        The exponent of the popularity curve, 0 makes all courses equally popular.
+    seed : int
+        The seed of the data.
+    """
+
+    def __init__(self, students, courses=None, instructors=None, courses_per_student=4, exponent=1.0, seed=0):
+        """
+        :param students: The number of students.
+        :type students: int
+        :param courses: The number of courses, defaults to one per 500 students (at least 10).
+        :type courses: int or None
+        :param instructors: The number of instructors, defaults to one per 3 courses.
+        :type instructors: int or None
+        :param courses_per_student: The number of courses every student registers in.
+        :type courses_per_student: int
+        :param exponent: The exponent of the Zipf-like popularity curve.
+        :type exponent: float
+        :param seed: The seed of the data.
+        :type seed: int
+        """
+        courses = courses or max(students // 500, 10)
+        instructors = instructors or max(courses // 3, 1)
+        self.courses_per_student = min(courses_per_student, courses)
+        self.exponent = exponent
+        self.seed = seed
+        self.counts = {
+            'students': students,
+            'instructors': instructors,
+            'courses': courses,
+            'registrations': students * self.courses_per_student,
+        }
+
+    def rng(self, stream):
+        """
+        returns a random generator for one stream of data, independent of the other streams
+        """
+        return random.Random("%d-%s" % (self.seed, stream))
+
+    def people(self, n, make_id, stream, min_age, max_age):
+        rng = self.rng(stream)
+        for i in range(n):
+            first = rng.choice(FIRST_NAMES)
+            last = rng.choice(LAST_NAMES)
+            yield (make_id(i), first + " " + last, rng.randint(min_age, max_age),
+                   "%s.%s%d@example.com" % (first.lower(), last.lower(), i))
+
+    def students(self):
+        """
+        yields the (ID, Name, Age, Email) rows of the students
+        """
+        return self.people(self.counts['students'], student_id, 'students', 17, 30)
+
+    def instructors(self):
+        """
+        yields the (ID, Name, Age, Email) rows of the instructors
+        """
+        return self.people(self.counts['instructors'], instructor_id, 'instructors', 27, 70)
+
+    def course_instructors(self):
+        """
+        returns the index of the instructor of every course
+        """
+        rng = self.rng('courses')
+        return [rng.randrange(self.counts['instructors']) for i in range(self.counts['courses'])]
+
+    def courses(self):
+        """
+        yields the (ID, Name, InstructorID) rows of the courses
+        """
+        for i, instructor in enumerate(self.course_instructors()):
+            yield (course_id(i), course_name(i), instructor_id(instructor))
+
+    def student_courses(self):
+        """
+        yields the indexes of the courses every student registers in, in student order.
+        The course of popularity rank r is picked with a weight of 1 / r ** exponent.
+        """
+        rng = self.rng('registrations')
+        n_courses = self.counts['courses']
+        by_rank = list(range(n_courses))
+        rng.shuffle(by_rank)
+        cumulative = list(itertools.accumulate(1 / (rank + 1) ** self.exponent for rank in range(n_courses)))
+        total = cumulative[-1]
+        for i in range(self.counts['students']):
+            chosen = []
+            while len(chosen) < self.courses_per_student:
+                course = by_rank[min(bisect.bisect(cumulative, rng.random() * total), n_courses - 1)]
+                if course not in chosen:
+                    chosen.append(course)
+            yield chosen
+
+    def registrations(self):
+        """
+        yields the (StudentID, CourseID) rows of the registrations
+        """
+        for i, chosen in enumerate(self.student_courses()):
+            for course in chosen:
+                yield (student_id(i), course_id(course))
+
+    def write_database(self, filename, batch_size=10000):
+        """
+        inserts the generated rows into a database in the schema of app_PyQt5.py,
+        committing every batch_size rows
+
+        :param filename: The database file, created if it doesn't exist.
+        :type filename: str
+        :param batch_size: The number of rows inserted per transaction.
+        :type batch_size: int
+
+        :return: Nothing.
+        :rtype: None
+        """
+        conn = connect(filename)
+        with bulk_load(conn):
+            for statement, rows in [("insert into Students values (?,?,?,?)", self.students()),
+                                    ("insert into Instructors values (?,?,?,?)", self.instructors()),
+                                    ("insert into Courses values (?,?,?)", self.courses()),
+                                    ("insert into Registrations values (?,?)", self.registrations())]:
+                for batch in batches(rows, batch_size):
+                    write_transaction(conn, lambda conn: conn.executemany(statement, batch))
+        conn.close()
+
+    def write_json(self, directory, suffix='', level=None, extension='.json'):
+        """
+        writes students.json, instructors.json, courses.json and registrations.json in the formats
+        read by the load* functions of app_PyQt5.py
+
+        :param directory: The directory to write to, created if it doesn't exist.
+        :type directory: str
+        :param suffix: A compression extension appended to the file names, e.g. .gz
+        :type suffix: str
+        :param level: The compression level.
+        :type level: int or None
+        :param extension: .json for json arrays, .jsonl for json lines
+        :type extension: str
+
+        :return: Nothing.
+        :rtype: None
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = lambda name: os.path.join(directory, name[:-len('.json')] + extension + suffix)
+        write_json(path('students.json'),
+                   ({'name': t[1], 'age': t[2], 'email': t[3], 'student_id': t[0]} for t in self.students()), level)
+        write_json(path('instructors.json'),
+                   ({'name': t[1], 'age': t[2], 'email': t[3], 'instructor_id': t[0], 'assigned_courses': []}
+                    for t in self.instructors()), level)
+        write_json(path('courses.json'),
+                   ({'course_id': t[0], 'course_name': t[1], 'instructor_id': t[2]} for t in self.courses()), level)
+        write_json(path('registrations.json'),
+                   ({'StudentID': t[0], 'CourseID': t[1]} for t in self.registrations()), level)
+
+    def write_tk_json(self, directory):
+        """
+        writes the files of the json store used by main.py (see storage.py), which are the json exports
+        of app_PyQt5.py: students.json, instructors.json, courses.json and registrations.json
+
+        :param directory: The directory to write to, created if it doesn't exist.
+        :type directory: str
+
+        :return: Nothing.
+        :rtype: None
+        """
+        self.write_json(directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.generator', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, required=True, help='number of students')
+    parser.add_argument('--courses', type=int, help='number of courses (default: students / 500)')
+    parser.add_argument('--instructors', type=int, help='number of instructors (default: courses / 3)')
+    parser.add_argument('--courses-per-student', type=int, default=4)
+    parser.add_argument('--exponent', type=float, default=1.0, help='exponent of the popularity curve')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', help='database file to insert into')
+    parser.add_argument('--batch-size', type=int, default=10000, help='rows inserted per transaction')
+    parser.add_argument('--json', help='directory for the json files read by app_PyQt5.py')
+    parser.add_argument('--compress', default='', choices=['', '.gz', '.bz2', '.xz'],
+                        help='compression of the json files read by app_PyQt5.py')
+    parser.add_argument('--json-lines', action='store_true',
+                        help='write the files read by app_PyQt5.py as json lines (.jsonl)')
+    parser.add_argument('--tk', help='directory for the json files used by main.py')
+    args = parser.parse_args(argv)
+
+    generator = RosterGenerator(args.students, args.courses, args.instructors, args.courses_per_student,
+                                args.exponent, args.seed)
+    print("generating %(students)d students, %(instructors)d instructors, %(courses)d courses "
+          "and %(registrations)d registrations" % generator.counts)
+    if args.db:
+        generator.write_database(args.db, args.batch_size)
+    if args.json:
+        generator.write_json(args.json, args.compress, extension='.jsonl' if args.json_lines else '.json')
+    if args.tk:
+        generator.write_tk_json(args.tk)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Speedup of import_pipeline.py over a single process: generates the students and registrations of a
+roster as json exports, then imports them into fresh databases, first in one process (json.load,
+validation and batched inserts, one after the other) and then with an increasing number of workers::
+
+    python -m benchmarks.import_speedup --students 1000000 --workers 1 2 4 8
+
+The last row streams the same records from csv files with csv_import.py, in one process.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.generator import RosterGenerator
+from csv_import import HEADERS, import_csv
+from database import connect
+from import_pipeline import TABLES, BATCH_SIZE, import_file
+from jsonstream import is_json_lines
+from transfer import read_records
+
+ORDER = ['instructors', 'courses', 'students', 'registrations']
+
+
+def import_serial(table, filename, db, batch_size=BATCH_SIZE):
+    """
+    the single process baseline: parses the whole file, validates every record and inserts the rows in batches
+    """
+    start = time.perf_counter()
+    keys, validate, statement = TABLES[table]
+    with open(filename) as file:
+        data = [json.loads(line) for line in file] if is_json_lines(filename) else json.load(file)
+    rows = [validate(t) for t in data]
+    conn = connect(db)
+    for i in range(0, len(rows), batch_size):
+        with conn:
+            conn.executemany(statement, rows[i:i + batch_size])
+    conn.close()
+    return {'records': len(data), 'inserted': len(rows), 'seconds': time.perf_counter() - start}
+
+
+def write_csv(directory, extension):
+    """
+    writes the records of the json exports into csv files of the same name, with the keys of the records as headers
+    """
+    for table in ORDER:
+        header = list(HEADERS[table])
+        with open(os.path.join(directory, table + '.csv'), 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows([t[key] for key in header] for t in read_records(os.path.join(directory, table + extension)))
+
+
+def import_csv_file(table, filename, db):
+    conn = connect(db)
+    result = import_csv(conn, table, filename)
+    conn.close()
+    return result
+
+
+def run(directory, extension, tables, name, function):
+    db = os.path.join(directory, name + '.db')
+    seconds = records = 0
+    for table in ORDER:
+        result = function(table, os.path.join(directory, table + extension), db)
+        if table in tables:
+            assert result['inserted'] == result['records'], result
+            seconds += result['seconds']
+            records += result['records']
+    os.remove(db)
+    return records, seconds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.import_speedup', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json-lines', action='store_true', help='import json lines (.jsonl) files instead of arrays')
+    parser.add_argument('--workdir', help='directory for the generated files (default: a temporary directory)')
+    parser.add_argument('--output', help='json file to write the results to')
+    args = parser.parse_args(argv)
+
+    tables = ('students', 'registrations')
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.workdir) as directory:
+        generator = RosterGenerator(args.students, courses_per_student=1, seed=args.seed)
+        print("generating %(students)d students..." % generator.counts, flush=True)
+        extension = '.jsonl' if args.json_lines else '.json'
+        generator.write_json(directory, extension=extension)
+
+        records, baseline = run(directory, extension, tables, 'serial', import_serial)
+        results.append({'workers': 0, 'seconds': baseline, 'records_per_second': records / baseline, 'speedup': 1.0})
+        for workers in args.workers:
+            records, seconds = run(directory, extension, tables, 'workers-%d' % workers,
+                                   lambda table, filename, db: import_file(table, filename, db, workers))
+            results.append({'workers': workers, 'seconds': seconds, 'records_per_second': records / seconds,
+                            'speedup': baseline / seconds})
+        write_csv(directory, extension)
+        records, seconds = run(directory, '.csv', tables, 'csv', import_csv_file)
+        results.append({'workers': 'csv', 'seconds': seconds, 'records_per_second': records / seconds,
+                        'speedup': baseline / seconds})
+
+    print("%d %s records on %d cores" % (records, ' and '.join(tables), os.cpu_count() or 1))
+    print("%-10s %10s %12s %8s" % ('workers', 'seconds', 'records/s', 'speedup'))
+    for result in results:
+        print("%-10s %10.2f %12.0f %7.2fx" % (result['workers'] or 'serial', result['seconds'],
+                                             result['records_per_second'], result['speedup']))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'cores': os.cpu_count(), 'records': records, 'results': results}, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+Load test of server.py: starts the server on a generated database, then runs concurrent clients
+on keep-alive connections for a fixed duration and reports requests per second and latencies::
+
+    python -m benchmarks.load_test --students 100000 --clients 50 --duration 30
+
+Every client picks its requests from a mix of student lookups, filters, course rosters and
+registrations (writes), from a seeded random generator.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.generator import RosterGenerator, student_id, course_id
+from instrumentation import Histogram
+
+# request kind -> weight
+MIX = {
+    'get student': 60,
+    'filter students': 10,
+    'course roster': 10,
+    'register': 15,
+    'drop': 5,
+}
+
+
+class Client:
+    """
+    A minimal HTTP/1.1 client on one keep-alive connection.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        data = b'' if body is None else json.dumps(body).encode()
+        self.writer.write(("%s %s HTTP/1.1\r\nHost: %s\r\nContent-Length: %d\r\n\r\n" % (
+            method, path, self.host, len(data))).encode() + data)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode().partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if headers.get('transfer-encoding') == 'chunked':
+            body = b''
+            while True:
+                size = int(await self.reader.readline(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                body += chunk[:-2]
+        else:
+            body = await self.reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection') == 'close':
+            self.close()
+        return status, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def next_request(rng, counts):
+    kind = rng.choices(list(MIX), list(MIX.values()))[0]
+    student = student_id(rng.randrange(counts['students']))
+    course = course_id(rng.randrange(counts['courses']))
+    if kind == 'get student':
+        return kind, 'GET', '/students/' + student, None
+    if kind == 'filter students':
+        return kind, 'GET', '/students?id=' + student, None
+    if kind == 'course roster':
+        return kind, 'GET', '/registrations?course_id=' + course, None
+    if kind == 'register':
+        return kind, 'POST', '/registrations', {'student_id': student, 'course_id': course}
+    return kind, 'DELETE', '/registrations/%s/%s' % (student, course), None
+
+
+async def run_client(host, port, counts, seed, deadline, histograms, statuses):
+    rng = random.Random(seed)
+    client = Client(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            kind, method, path, body = next_request(rng, counts)
+            start = time.perf_counter()
+            status, _ = await client.request(method, path, body)
+            histograms[kind].record(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        client.close()
+
+
+async def load(host, port, counts, clients, duration, seed):
+    histograms = {kind: Histogram() for kind in MIX}
+    statuses = {}
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(host, port, counts, seed + i, deadline, histograms, statuses)
+                           for i in range(clients)))
+    return time.perf_counter() - start, histograms, statuses
+
+
+def start_server(db, readers):
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'server.py'), '--db', db, '--port', '0',
+                                '--readers', str(readers)], stdout=subprocess.PIPE, text=True)
+    address = process.stdout.readline().split('//')[-1].strip()
+    host, port = address.rsplit(':', 1)
+    return process, host, int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load_test', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--clients', type=int, default=50, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=30, help='seconds')
+    parser.add_argument('--readers', type=int, default=4, help='reader threads of the server')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='json file to write the results to')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = os.path.join(directory, 'university.db')
+        generator = RosterGenerator(args.students, seed=args.seed)
+        print("generating %(students)d students..." % generator.counts, flush=True)
+        generator.write_database(db)
+        process, host, port = start_server(db, args.readers)
+        try:
+            elapsed, histograms, statuses = asyncio.run(
+                load(host, port, generator.counts, args.clients, args.duration, args.seed))
+        finally:
+            process.terminate()
+            process.wait()
+
+    total = sum(h.count for h in histograms.values())
+    results = {
+        'clients': args.clients,
+        'duration': elapsed,
+        'requests': total,
+        'requests_per_second': total / elapsed,
+        'statuses': statuses,
+        'latency': {kind: h.summary() for kind, h in histograms.items()},
+    }
+    print("%d requests in %.1fs with %d clients: %.0f requests/s" % (
+        total, elapsed, args.clients, results['requests_per_second']))
+    print("%-16s %8s %10s %10s %10s" % ('request', 'count', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)'))
+    for kind, summary in results['latency'].items():
+        print("%-16s %8d %10.2f %10.2f %10.2f" % (kind, summary['count'], summary['p50'] * 1000,
+                                                  summary['p95'] * 1000, summary['p99'] * 1000))
+    print("statuses: %s" % statuses)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
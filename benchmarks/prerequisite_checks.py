@@ -0,0 +1,138 @@
+"""
+How long checking the prerequisites of registrations takes: generates a roster into a database, splits the
+courses into levels where every course requires --fanin courses of the level below, makes every student
+complete the courses required by a random course, then times
+
+- adding the prerequisites one at a time, along with the maintenance of their closure (prerequisites.py)
+- the check of single registrations, with the closure (prerequisites.missing_prerequisites) and by walking
+  the prerequisites of the course with a recursive query, as without the closure
+- a burst of registrations, each checked by the trigger of the Registrations table::
+
+    python -m benchmarks.prerequisite_checks --students 100000 --courses 2000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.generator import RosterGenerator, course_id, student_id
+from database import connect
+from prerequisites import add_prerequisite, missing_prerequisites, required_courses
+
+# the courses required by a course that a student hasn't completed, walking the prerequisites at every check
+WALK = '''
+    WITH RECURSIVE Required (ID) AS (
+        SELECT PrerequisiteID FROM Prerequisites WHERE CourseID = ?
+        UNION
+        SELECT e.PrerequisiteID FROM Required r JOIN Prerequisites e ON e.CourseID = r.ID
+    )
+    SELECT ID FROM Required
+    WHERE ID NOT IN (SELECT CourseID FROM CompletedCourses WHERE StudentID = ?)
+    ORDER BY ID
+    '''
+
+
+def add_prerequisites(conn, courses, levels, fanin, seed):
+    generator = random.Random(seed)
+    size = courses // levels
+    pairs = []
+    for i in range(size, size * levels):
+        below = range((i // size - 1) * size, i // size * size)
+        pairs.extend((course_id(i), course_id(j)) for j in generator.sample(below, min(fanin, size)))
+    start = time.perf_counter()
+    for pair in pairs:
+        add_prerequisite(conn, *pair)
+    return len(pairs), time.perf_counter() - start
+
+
+def complete_courses(conn, counts, seed):
+    generator = random.Random(seed)
+    rows = []
+    for i in range(counts['students']):
+        target = course_id(generator.randrange(counts['courses']))
+        rows.extend((student_id(i), course) for course in required_courses(conn, target) + [target])
+    with conn:
+        conn.executemany("insert or ignore into CompletedCourses values (?, ?)", rows)
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.prerequisite_checks', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--courses', type=int, default=2000)
+    parser.add_argument('--levels', type=int, default=6, help='levels of courses, each requiring the one below')
+    parser.add_argument('--fanin', type=int, default=2, help='courses of the level below required by a course')
+    parser.add_argument('--checks', type=int, default=10000, help='single registrations checked')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='directory for the database (default: a temporary directory)')
+    parser.add_argument('--output', help='json file to write the results to')
+    args = parser.parse_args(argv)
+
+    generator = RosterGenerator(args.students, courses=args.courses, seed=args.seed)
+    counts = generator.counts
+    with tempfile.TemporaryDirectory(dir=args.workdir) as directory:
+        db = os.path.join(directory, 'university.db')
+        print("generating %d students..." % args.students, flush=True)
+        generator.write_database(db)
+        conn = connect(db)
+        prerequisites, add_seconds = add_prerequisites(conn, counts['courses'], args.levels, args.fanin, args.seed)
+        closure = conn.execute("select count(*) from PrerequisiteClosure").fetchone()[0]
+        completed = complete_courses(conn, counts, args.seed)
+
+        pairs = random.Random(args.seed)
+        pairs = [(student_id(pairs.randrange(counts['students'])), course_id(pairs.randrange(counts['courses'])))
+                 for _ in range(args.checks)]
+        start = time.perf_counter()
+        missing = [missing_prerequisites(conn, student, course) for student, course in pairs]
+        closure_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        walked = [[row[0] for row in conn.execute(WALK, (course, student))] for student, course in pairs]
+        walk_seconds = time.perf_counter() - start
+        assert missing == walked
+
+        accepted = 0
+        start = time.perf_counter()
+        with conn:
+            for pair in pairs:
+                try:
+                    accepted += conn.execute("insert or ignore into Registrations values (?, ?)", pair).rowcount
+                except sqlite3.IntegrityError:
+                    pass
+        burst_seconds = time.perf_counter() - start
+        conn.close()
+
+    eligible = sum(1 for courses in missing if not courses)
+    results = {
+        'counts': counts,
+        'prerequisites': {'added': prerequisites, 'closure': closure,
+                          'microseconds': add_seconds / prerequisites * 1e6},
+        'completed': completed,
+        'check': {'checks': args.checks, 'eligible': eligible,
+                  'closure_microseconds': closure_seconds / args.checks * 1e6,
+                  'walk_microseconds': walk_seconds / args.checks * 1e6},
+        'burst': {'registrations': args.checks, 'accepted': accepted, 'per_second': args.checks / burst_seconds},
+    }
+    print("%d courses in %d levels, %d prerequisites, %d pairs in the closure, %d courses completed" % (
+        counts['courses'], args.levels, prerequisites, closure, completed))
+    print("adding a prerequisite: %.0f us, with its closure" % results['prerequisites']['microseconds'])
+    print("single registration: %.1f us per check with the closure, %.1f us walking the prerequisites (%.1fx), "
+          "%d of %d eligible" % (results['check']['closure_microseconds'], results['check']['walk_microseconds'],
+                                 walk_seconds / closure_seconds, eligible, args.checks))
+    print("burst: %.0f registrations/s checked by the trigger, %d accepted" % (
+        results['burst']['per_second'], accepted))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
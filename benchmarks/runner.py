@@ -0,0 +1,176 @@
+"""
+Registry of benchmarks and the code that times them.
+
+A benchmark is a setup function decorated with @benchmark. It is called as setup(ctx, i) before
+every timed iteration, prepares whatever the iteration needs (untimed) and returns the zero-argument
+callable that is timed.
+"""
+import gc
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+BENCHMARKS = []
+
+
+class SkipBenchmark(Exception):
+    """
+    Raised by a setup function when the benchmark cannot run in this environment.
+    """
+
+
+class Benchmark:
+    """
+    A named operation to time.
+
+    Attributes
+    ----------
+    name : str
+        The name of the benchmark, e.g. app.addStudent.
+    setup : function
+        Called as setup(ctx, i), returns the callable to time.
+    needs : tuple
+        The fixture files copied into the working directory before running:
+        'db' (university.db), 'json' (load*/objects.py files) or 'tk' (main.py files).
+    repeat : int or None
+        The number of timed iterations, None to use the runner's default.
+    """
+
+    def __init__(self, name, setup, needs=(), repeat=None):
+        self.name = name
+        self.setup = setup
+        self.needs = needs
+        self.repeat = repeat
+
+
+def benchmark(name, needs=(), repeat=None):
+    """
+    decorator registering a setup function as a benchmark
+
+    :param name: The name of the benchmark
+    :type name: str
+
+    :param needs: The fixture files the benchmark works on, see Benchmark
+    :type needs: tuple
+
+    :param repeat: The number of timed iterations, defaults to the runner's default
+    :type repeat: int or None
+    """
+    def decorator(setup):
+        BENCHMARKS.append(Benchmark(name, setup, needs, repeat))
+        return setup
+    return decorator
+
+
+class Context:
+    """
+    What a setup function gets to work with.
+
+    Attributes
+    ----------
+    fixture : benchmarks.fixtures.Fixture
+        The generated data.
+    workdir : str
+        The working directory of the benchmark, it is also the current directory.
+    db_path : str
+        The copy of the fixture database in workdir.
+    """
+
+    def __init__(self, fixture, workdir):
+        self.fixture = fixture
+        self.workdir = workdir
+        self.db_path = os.path.join(workdir, 'university.db')
+
+    def path(self, name):
+        return os.path.join(self.workdir, name)
+
+
+def prepare_workdir(bench, fixture, root):
+    workdir = os.path.join(root, 'work', bench.name)
+    shutil.rmtree(workdir, ignore_errors=True)
+    os.makedirs(workdir)
+    if 'db' in bench.needs:
+        fixture.copy_database(os.path.join(workdir, 'university.db'))
+    if 'json' in bench.needs:
+        fixture.copy_json(workdir)
+    if 'tk' in bench.needs:
+        fixture.copy_tk_json(workdir)
+    return workdir
+
+
+def run_benchmark(bench, fixture, root, repeat):
+    """
+    times a benchmark on a fixture, then runs it once more under tracemalloc to record its peak memory
+
+    :return: the result, with status 'ok', 'skipped' or 'error'
+    :rtype: dict
+    """
+    repeat = bench.repeat or repeat
+    result = {
+        'name': bench.name,
+        'size': fixture.size,
+        'repeat': repeat,
+    }
+    cwd = os.getcwd()
+    workdir = prepare_workdir(bench, fixture, root)
+    os.chdir(workdir)
+    ctx = Context(fixture, workdir)
+    try:
+        times = []
+        for i in range(repeat):
+            operation = bench.setup(ctx, i)
+            gc.collect()
+            start = time.perf_counter()
+            operation()
+            times.append(time.perf_counter() - start)
+
+        operation = bench.setup(ctx, repeat)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            operation()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    except SkipBenchmark as e:
+        result.update({'status': 'skipped', 'reason': str(e)})
+    except Exception as e:
+        result.update({'status': 'error', 'reason': "%s: %s" % (type(e).__name__, e)})
+    else:
+        result.update({
+            'status': 'ok',
+            'times': times,
+            'min': min(times),
+            'median': statistics.median(times),
+            'mean': statistics.mean(times),
+            'peak_memory': peak,
+        })
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except OSError:
+        return ''
+
+
+def metadata(sizes, repeat, seed):
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'sizes': sizes,
+        'repeat': repeat,
+        'seed': seed,
+    }
@@ -0,0 +1,103 @@
+"""
+The backends of storage.py under the same workload: a generated roster is added one record at a time,
+then looked up, changed, listed and partly deleted through the Storage interface, as main.py and
+app_PyQt5.py do. Prints the operations per second of each phase for each backend::
+
+    python -m benchmarks.storage_backends --students 1000 --backends json jsonl sqlite
+
+The json backend rewrites a whole file on every change, so its adds slow down as the roster grows.
+With --write-behind the json backends write their files in batches from a background thread
+(see storage.WriteBehind), and close is the time it takes to write what is still pending.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.generator import RosterGenerator
+from storage import STORAGES, open_storage
+
+PHASES = ['add', 'register', 'get', 'update', 'iterate', 'delete', 'close']
+
+
+def workload(generator, changes, seed=0):
+    """
+    yields (phase, operations) pairs, where operations is a list of functions taking the store,
+    the same for every backend
+    """
+    rng = random.Random(seed)
+    students = list(generator.students())
+    courses = list(generator.courses())
+    adds = [('instructors', {'id': t[0], 'name': t[1], 'age': t[2], 'email': t[3]}) for t in generator.instructors()]
+    adds += [('courses', {'id': t[0], 'name': t[1], 'instructor_id': t[2]}) for t in courses]
+    adds += [('students', {'id': t[0], 'name': t[1], 'age': t[2], 'email': t[3]}) for t in students]
+    yield 'add', [lambda store, kind=kind, record=record: store.add(kind, record) for kind, record in adds]
+    yield 'register', [lambda store, t=t: store.register(*t) for t in generator.registrations()]
+    picked = [rng.choice(students)[0] for i in range(changes)]
+    yield 'get', [lambda store, id=id: store.get('students', id) for id in picked]
+    yield 'update', [lambda store, i=i, id=id: store.update('students', id, {'email': 'changed%d@example.com' % i})
+                     for i, id in enumerate(picked)]
+    yield 'iterate', [lambda store, id=t[0]: list(store.iterate('registrations', course_id=id)) for t in courses]
+    deleted = rng.sample([t[0] for t in students], min(changes, len(students)))
+    yield 'delete', [lambda store, id=id: store.delete('students', id) for id in deleted]
+
+
+def run(backend, location, phases, write_behind=False):
+    store = open_storage(backend, location, write_behind)
+    results = {}
+    for phase, operations in itertools.chain(phases, [('close', [lambda store: store.close()])]):
+        start = time.perf_counter()
+        for operation in operations:
+            operation(store)
+        seconds = time.perf_counter() - start
+        results[phase] = {'operations': len(operations), 'seconds': seconds,
+                          'operations_per_second': len(operations) / seconds if seconds else 0.0}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.storage_backends', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--changes', type=int, default=200, help='students looked up, updated and deleted')
+    parser.add_argument('--backends', nargs='+', choices=list(STORAGES), default=list(STORAGES))
+    parser.add_argument('--write-behind', action='store_true', help='write the files of the json backends behind')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='directory for the stores (default: a temporary directory)')
+    parser.add_argument('--output', help='json file to write the results to')
+    args = parser.parse_args(argv)
+
+    generator = RosterGenerator(args.students, courses=max(args.students // 50, 2),
+                                instructors=max(args.students // 100, 1), courses_per_student=2, seed=args.seed)
+    results = {}
+    with tempfile.TemporaryDirectory(dir=args.workdir) as directory:
+        for backend in args.backends:
+            location = os.path.join(directory, backend)
+            if backend == 'sqlite':
+                os.makedirs(location)
+                location = os.path.join(location, 'university.db')
+            print("running %s..." % backend, flush=True)
+            results[backend] = run(backend, location, workload(generator, args.changes, args.seed), args.write_behind)
+
+    print("%(students)d students, %(instructors)d instructors, %(courses)d courses, "
+          "%(registrations)d registrations (operations per second)" % generator.counts)
+    print("%-10s" % 'phase' + "".join("%12s" % backend for backend in args.backends)
+          + ("  (json backends written behind)" if args.write_behind else ""))
+    for phase in PHASES:
+        print("%-10s" % phase + "".join("%12.0f" % results[backend][phase]['operations_per_second']
+                                        for backend in args.backends))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'counts': generator.counts, 'results': results}, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
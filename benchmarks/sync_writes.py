@@ -0,0 +1,122 @@
+"""
+What importing a nightly full dump costs: generates a roster into a database, exports its students and
+registrations, changes a fraction of the students in the database so that the dump differs from it, then
+brings the database back to the dump in two ways, each on a copy of the database::
+
+    python -m benchmarks.sync_writes --students 100000 --changed 0 0.01 0.1
+
+- sync: imports the dump with the sync and delete_missing options of jobs.ImportJob (see upsert.py),
+  which only writes the rows that differ.
+- reload: deletes the students (and with them their registrations), then imports the dump again.
+
+Prints the time of each, the rows logged in ChangeLog, and the bytes written by the process to the
+database and its WAL (from /proc/self/io, so only on Linux).
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.generator import RosterGenerator
+from database import connect, use_wal, write_transaction
+from jobs import get_job, open_job
+from transfer import export_json
+
+MODES = ['sync', 'reload']
+TABLES = ['students', 'registrations']
+
+
+def bytes_written():
+    try:
+        with open('/proc/self/io') as file:
+            return int(dict(line.split(': ') for line in file.read().splitlines())['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def bring_back(db, dumps, mode):
+    """
+    brings a database back to the dumps of its tables, returning the seconds, the changes logged,
+    the bytes written and the checkpoints of the imports
+    """
+    conn = connect(db)
+    use_wal(conn)
+    changes = conn.execute("select count(*) from ChangeLog").fetchone()[0]
+    written = bytes_written()
+    start = time.perf_counter()
+    if mode == 'reload':
+        write_transaction(conn, lambda conn: conn.execute("delete from Students"))
+    options = {'sync': True, 'delete_missing': True} if mode == 'sync' else {}
+    checkpoints = {}
+    for table in TABLES:
+        job = open_job(conn, db, 'import', table, dumps[table], **options)
+        job.start().join()
+        checkpoints[table] = get_job(conn, job.job_id)['checkpoint']
+    seconds = time.perf_counter() - start
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    after = bytes_written()
+    result = {
+        'seconds': seconds,
+        'changes': conn.execute("select count(*) from ChangeLog").fetchone()[0] - changes,
+        'bytes': None if written is None else after - written,
+        'imports': checkpoints,
+    }
+    conn.close()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.sync_writes', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--changed', type=float, nargs='+', default=[0, 0.01, 0.1],
+                        help='fractions of the students changed in the database')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='directory for the databases and the dumps (default: a temporary directory)')
+    parser.add_argument('--output', help='json file to write the results to')
+    args = parser.parse_args(argv)
+
+    generator = RosterGenerator(args.students, seed=args.seed)
+    results = {}
+    with tempfile.TemporaryDirectory(dir=args.workdir) as directory:
+        source = os.path.join(directory, 'source.db')
+        print("generating %d students..." % args.students, flush=True)
+        generator.write_database(source)
+        conn = connect(source)
+        dumps = {table: os.path.join(directory, table + '.jsonl') for table in TABLES}
+        for table in TABLES:
+            export_json(conn, table, dumps[table])
+        conn.close()
+        print("%-9s%-8s%10s%12s%14s" % ('changed', 'mode', 'seconds', 'changes', 'bytes written'))
+        for changed in args.changed:
+            for mode in MODES:
+                db = os.path.join(directory, 'copy.db')
+                shutil.copy(source, db)
+                conn = connect(db)
+                # every n-th student gets another name, which the dump brings back
+                step = round(1 / changed) if changed else 0
+                if step:
+                    write_transaction(conn, lambda conn: conn.execute(
+                        "update Students set Name = Name || ' changed' where rowid % ? = 0", (step,)))
+                conn.close()
+                result = bring_back(db, dumps, mode)
+                results.setdefault(changed, {})[mode] = result
+                print("%-9g%-8s%10.2f%12d%14s" % (changed, mode, result['seconds'], result['changes'],
+                                                  'n/a' if result['bytes'] is None else result['bytes']), flush=True)
+                for suffix in ['', '-wal', '-shm']:
+                    if os.path.exists(db + suffix):
+                        os.remove(db + suffix)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'counts': generator.counts, 'results': results}, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+How long finding the clashes of timetables takes: generates a roster into a database, gives every course the
+meeting times of a Mon/Wed/Fri or a Tue/Thu pattern starting at a random hour, then times the check of single
+registrations (timetable.clashes) and the validation of the whole term (timetable.validate_term)::
+
+    python -m benchmarks.timetable_clashes --students 250000
+
+With 4 courses per student, 250,000 students make a million registrations.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.generator import RosterGenerator, course_id, student_id
+from database import connect
+from timetable import clashes, validate_term
+
+# the days and the length in minutes of the meetings of a course
+PATTERNS = [((0, 2, 4), 50), ((1, 3), 75)]
+
+
+def add_slots(conn, courses, seed):
+    generator = random.Random(seed)
+    rows = []
+    for i in range(courses):
+        days, length = generator.choice(PATTERNS)
+        start = generator.randrange(8, 18) * 60
+        rows.extend((course_id(i), day, start, start + length) for day in days)
+    with conn:
+        conn.executemany("insert into CourseSlots values (?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.timetable_clashes', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=250000)
+    parser.add_argument('--checks', type=int, default=10000, help='single registrations checked')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='directory for the database (default: a temporary directory)')
+    parser.add_argument('--output', help='json file to write the results to')
+    args = parser.parse_args(argv)
+
+    generator = RosterGenerator(args.students, seed=args.seed)
+    counts = generator.counts
+    with tempfile.TemporaryDirectory(dir=args.workdir) as directory:
+        db = os.path.join(directory, 'university.db')
+        print("generating %d students..." % args.students, flush=True)
+        generator.write_database(db)
+        conn = connect(db)
+        slots = add_slots(conn, counts['courses'], args.seed)
+
+        pairs = random.Random(args.seed)
+        pairs = [(student_id(pairs.randrange(counts['students'])), course_id(pairs.randrange(counts['courses'])))
+                 for _ in range(args.checks)]
+        start = time.perf_counter()
+        refused = sum(1 for student, course in pairs if clashes(conn, 'students', student, course))
+        check_seconds = time.perf_counter() - start
+
+        result = validate_term(conn)
+        conn.close()
+
+    results = {
+        'counts': counts,
+        'slots': slots,
+        'check': {'checks': args.checks, 'clashing': refused, 'microseconds': check_seconds / args.checks * 1e6},
+        'term': {'students': len(result['students']), 'instructors': len(result['instructors']),
+                 'seconds': result['seconds']},
+    }
+    print("%d registrations, %d courses, %d slots" % (counts['registrations'], counts['courses'], slots))
+    print("single registration: %.0f us per check, %d of %d would clash" % (
+        results['check']['microseconds'], refused, args.checks))
+    print("whole term: %d clashes of students and %d of instructors in %.2fs (%.0f registrations/s)" % (
+        len(result['students']), len(result['instructors']), result['seconds'],
+        counts['registrations'] / result['seconds']))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+"""
+Incremental (delta) exports from the change log, and applying them to another database.
+
+The triggers created by database.py record every insert, update and delete in the ChangeLog table
+with a growing sequence number. A delta export writes the changes after a given sequence number,
+or after the last one exported to the same consumer (its watermark), as one record per change:
+
+    {"seq": 42, "since": 40, "table": "Registrations", "op": "insert",
+     "key": {"StudentID": "S0000001", "CourseID": "C00003"},
+     "row": {"StudentID": "S0000001", "CourseID": "C00003"}}
+
+where since is the sequence number the export starts after. Applying a delta replays the changes in order
+in a single transaction, and remembers the last sequence number applied from the source, so that applying
+the same file twice has no effect. A delta starting after a later sequence number than the last one applied
+is refused, as the changes in between would be lost: the deltas are applied in the order they were
+exported. A target starts from a full export of the source, taken together with its current sequence
+number, or from a backup (see backup.py), whose change log ends where the source's did; start_from records
+where it starts. The meeting times, prerequisites and completed courses are recorded and replayed as well.
+
+Usage::
+
+    python changelog.py export changes.jsonl --db university.db
+    python changelog.py start --db copy.db
+    python changelog.py apply changes.jsonl --db copy.db
+"""
+import argparse
+import json
+
+from compression import open_file
+from database import DB_FILE, LOGGED_COLUMNS, connect, replay, write_transaction
+from jsonstream import is_json_lines, write_json_array, write_json_lines
+from transfer import read_records
+
+DEFAULT_PEER = 'default'
+
+
+def current_sequence(conn):
+    """
+    returns the sequence number of the last change recorded, 0 if there is none
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :return: the sequence number
+    :rtype: int
+    """
+    row = conn.execute("select seq from sqlite_sequence where name = 'ChangeLog'").fetchone()
+    return row[0] if row else 0
+
+
+def get_watermark(conn, name):
+    """
+    returns the last sequence number exported to, or applied from, the given peer, 0 if there is none
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param name: the name of the watermark
+    :type name: str
+
+    :return: the sequence number
+    :rtype: int
+    """
+    row = conn.execute("select Seq from Watermarks where Name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def set_watermark(conn, name, seq):
+    """
+    stores the last sequence number exported to, or applied from, the given peer. Does not commit.
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param name: the name of the watermark
+    :type name: str
+
+    :param seq: the sequence number
+    :type seq: int
+
+    :return: Nothing.
+    :rtype: None
+    """
+    conn.execute("insert into Watermarks values (?, ?) on conflict (Name) do update set Seq = excluded.Seq",
+                 (name, seq))
+
+
+def changes(conn, since=0, until=None):
+    """
+    yields the changes recorded after the given sequence number, in order
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param since: the sequence number to start after
+    :type since: int
+
+    :param until: the last sequence number to include, None for all
+    :type until: int or None
+
+    :return: the changes, as {"seq", "table", "op", "key", "row"} records
+    :rtype: generator of dict
+    """
+    if until is None:
+        until = current_sequence(conn)
+    for t in conn.execute("select * from ChangeLog where Seq > ? and Seq <= ? order by Seq", (since, until)):
+        yield {"seq": t[0], "table": t[1], "op": t[2], "key": json.loads(t[3]),
+               "row": None if t[4] is None else json.loads(t[4])}
+
+
+def export_changes(conn, filename='changes.jsonl', since=None, consumer=DEFAULT_PEER, level=None):
+    """
+    writes the changes after a sequence number into a file, as json lines if its name ends with .jsonl
+    and as a json array otherwise, then moves the consumer's watermark to the last change written.
+    The file is compressed if its name ends with .gz, .bz2 or .xz
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param filename: the file to write
+    :type filename: str
+
+    :param since: the sequence number to start after, defaults to the consumer's watermark
+    :type since: int or None
+
+    :param consumer: the name of the watermark
+    :type consumer: str
+
+    :param level: the compression level
+    :type level: int or None
+
+    :return: the sequence numbers the export starts after and ends at, and the number of changes written
+    :rtype: tuple
+    """
+    if since is None:
+        since = get_watermark(conn, consumer)
+    until = current_sequence(conn)
+    count = 0
+
+    def counted(records):
+        nonlocal count
+        for record in records:
+            count += 1
+            record["since"] = since
+            yield record
+
+    write = write_json_lines if is_json_lines(filename) else write_json_array
+    with open_file(filename, 'w', level) as file:
+        write(file, counted(changes(conn, since, until)))
+    with conn:
+        set_watermark(conn, consumer, until)
+    return since, until, count
+
+
+def upsert_statement(table):
+    columns, key = LOGGED_COLUMNS[table]
+    others = [column for column in columns if column not in key]
+    return "insert into %s (%s) values (%s) on conflict (%s) do %s" % (
+        table, ", ".join(columns), ", ".join("?" * len(columns)), ", ".join(key),
+        "update set " + ", ".join("%s = excluded.%s" % (c, c) for c in others) if others else "nothing")
+
+
+def apply_change(conn, change):
+    """
+    replays a single change. Inserts and updates of rows that already, or no longer, exist are turned
+    into updates and inserts, and deletes of missing rows are ignored.
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param change: a record written by export_changes
+    :type change: dict
+
+    :return: Nothing.
+    :rtype: None
+    """
+    table = change["table"]
+    columns, key = LOGGED_COLUMNS[table]
+    where = " and ".join("%s = ?" % column for column in key)
+    key_values = [change["key"][column] for column in key]
+    if change["op"] == "delete":
+        conn.execute("delete from %s where %s" % (table, where), key_values)
+        return
+    values = [change["row"][column] for column in columns]
+    if change["op"] == "update":
+        cursor = conn.execute("update %s set %s where %s" % (
+            table, ", ".join("%s = ?" % column for column in columns), where), values + key_values)
+        if cursor.rowcount:
+            return
+    conn.execute(upsert_statement(table), values)
+
+
+def start_from(conn, seq=None, source=DEFAULT_PEER):
+    """
+    records that a database is a copy of the source as it was at a sequence number, so that the deltas of
+    the source are applied from there
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param seq: the sequence number of the source when it was copied, defaults to the last one of the
+        change log of the database, for a backup of the source
+    :type seq: int or None
+
+    :param source: the name of the source database, used for its watermark
+    :type source: str
+
+    :return: the sequence number
+    :rtype: int
+    """
+    if seq is None:
+        seq = current_sequence(conn)
+    with conn:
+        set_watermark(conn, 'applied:' + source, seq)
+    return seq
+
+
+def apply_changes(conn, filename='changes.jsonl', source=DEFAULT_PEER):
+    """
+    applies the changes in a file written by export_changes, in one transaction. Changes at or before the
+    last sequence number applied from the same source are skipped, and a file starting after it is refused,
+    without applying any of its changes. The registrations are not checked against the prerequisites again,
+    the source did (see database.replay).
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param filename: the file to read
+    :type filename: str
+
+    :param source: the name of the source database, used for its watermark
+    :type source: str
+
+    :return: the number of changes applied and the last sequence number applied from the source
+    :rtype: tuple
+    :raises ValueError: if the file starts after the last sequence number applied from the source
+    """
+    name = 'applied:' + source
+
+    def apply(conn):
+        # cascaded changes are logged before the change of the parent row that caused them,
+        # so the foreign keys only hold again at the end of the transaction
+        conn.execute("PRAGMA defer_foreign_keys = ON")
+        applied = 0
+        last = get_watermark(conn, name)
+        with replay(conn):
+            for change in read_records(filename):
+                if change["seq"] <= last:
+                    continue
+                # files written before the start of each export was recorded start right before their first change
+                since = change.get("since", change["seq"] - 1)
+                if since > last:
+                    raise ValueError("%s starts after change %d of %s, but only the changes up to %d were applied: "
+                                     "apply the deltas in the order they were exported"
+                                     % (filename, since, source, last))
+                apply_change(conn, change)
+                last = change["seq"]
+                applied += 1
+        set_watermark(conn, name, last)
+        return applied, last
+
+    return write_transaction(conn, apply)
+
+
+def prune_changes(conn, upto=None):
+    """
+    deletes the changes every consumer has exported already, or the changes up to the given sequence number
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param upto: the last sequence number to delete, defaults to the lowest export watermark
+    :type upto: int or None
+
+    :return: the number of changes deleted
+    :rtype: int
+    """
+    if upto is None:
+        upto = conn.execute("select min(Seq) from Watermarks where Name not like 'applied:%'").fetchone()[0] or 0
+    with conn:
+        return conn.execute("delete from ChangeLog where Seq <= ?", (upto,)).rowcount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="delta exports from the change log")
+    parser.add_argument('--db', default=DB_FILE)
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help='write the changes since a sequence number or the last export')
+    export.add_argument('filename', nargs='?', default='changes.jsonl')
+    export.add_argument('--since', type=int, help="sequence number (default: the consumer's watermark)")
+    export.add_argument('--consumer', default=DEFAULT_PEER)
+    apply = commands.add_parser('apply', help='apply a delta export')
+    apply.add_argument('filename', nargs='?', default='changes.jsonl')
+    apply.add_argument('--source', default=DEFAULT_PEER)
+    start = commands.add_parser('start', help='record the sequence number of the source this copy was taken at')
+    start.add_argument('seq', nargs='?', type=int, help='default: the last change of this database, for a backup')
+    start.add_argument('--source', default=DEFAULT_PEER)
+    prune = commands.add_parser('prune', help='delete the changes all consumers have exported')
+    prune.add_argument('--upto', type=int)
+    commands.add_parser('status', help='print the current sequence number and the watermarks')
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    if args.command == 'export':
+        print("changes after %d up to %d: %d written to %s" % (
+            *export_changes(conn, args.filename, args.since, args.consumer), args.filename))
+    elif args.command == 'apply':
+        print("%d changes applied, up to %d" % apply_changes(conn, args.filename, args.source))
+    elif args.command == 'start':
+        print("applying the changes of %s after %d" % (args.source, start_from(conn, args.seq, args.source)))
+    elif args.command == 'prune':
+        print("%d changes deleted" % prune_changes(conn, args.upto))
+    else:
+        print("sequence %d" % current_sequence(conn))
+        for name, seq in conn.execute("select * from Watermarks"):
+            print("%s: %d" % (name, seq))
+
+
+if __name__ == '__main__':
+    main()
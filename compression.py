@@ -0,0 +1,100 @@
+"""
+Helpers for reading and writing export files that may be compressed.
+
+The compression format is chosen from the file extension, so ``students.json`` is a plain file,
+``students.json.gz`` is written with gzip, ``students.json.bz2`` with bzip2 and ``students.json.xz``
+with lzma. All of them are stream based: data is compressed or decompressed as it is written or read,
+so the whole payload never has to sit in memory.
+"""
+import bz2
+import gzip
+import lzma
+import os
+
+COMPRESSORS = {
+    '.gz': gzip,
+    '.bz2': bz2,
+    '.xz': lzma,
+    '.lzma': lzma,
+}
+
+# suffixes offered in the export tab, in display order
+COMPRESSION_SUFFIXES = {
+    'None': '',
+    'gzip (.gz)': '.gz',
+    'bzip2 (.bz2)': '.bz2',
+    'xz (.xz)': '.xz',
+}
+
+DEFAULT_LEVEL = 6
+
+
+def compressor_for(filename):
+    """
+    Returns the stdlib module used to (de)compress the given file, based on its extension
+
+    :param filename: The name of the file
+    :type filename: str
+
+    :return: gzip, bz2 or lzma, or None if the file is not compressed
+    :rtype: module or None
+    """
+    return COMPRESSORS.get(os.path.splitext(filename)[1].lower())
+
+
+def strip_compression_suffix(filename):
+    """
+    Removes the compression extension from a file name, e.g. students.json.gz -> students.json
+
+    :param filename: The name of the file
+    :type filename: str
+
+    :return: the file name without its compression extension
+    :rtype: str
+    """
+    if compressor_for(filename) is not None:
+        return os.path.splitext(filename)[0]
+    return filename
+
+
+def open_file(filename, mode='r', level=None, newline=None):
+    """
+    Opens a file like the builtin open(), compressing or decompressing it on the fly if its extension
+    is .gz, .bz2, .xz or .lzma. Text mode is used unless 'b' is in mode.
+
+    :param filename: The name of the file to open
+    :type filename: str
+
+    :param mode: The mode to open the file in ('r', 'w', 'a', 'rb', ...)
+    :type mode: str
+
+    :param level: Compression level from 0 (fastest) to 9 (smallest), only used when writing a compressed file.
+        Defaults to DEFAULT_LEVEL.
+    :type level: int or None
+
+    :param newline: Passed to the text wrapper, use '' for csv files
+    :type newline: str or None
+
+    :return: a file object
+    :rtype: file object
+    """
+    module = compressor_for(filename)
+    if module is None:
+        return open(filename, mode, newline=newline)
+
+    binary = 'b' in mode
+    if not binary and 't' not in mode:
+        mode += 't'
+
+    kwargs = {}
+    if not binary:
+        kwargs['newline'] = newline
+    if any(m in mode for m in 'wax'):
+        if level is None:
+            level = DEFAULT_LEVEL
+        if module is lzma:
+            kwargs['preset'] = level
+        else:
+            # bz2 does not accept level 0
+            kwargs['compresslevel'] = max(level, 1) if module is bz2 else level
+    return module.open(filename, mode, **kwargs)
@@ -0,0 +1,254 @@
+"""
+Streaming import of csv files into the database, the reverse of the Export to CSV button.
+
+Two kinds of files are read:
+
+- the csv file of one table, whose first row names its columns. The columns are found by their header, in
+  any order, ignoring case, spaces and underscores, and other columns are ignored: e.g. ID (or Student ID),
+  Name, Age and Email for students (see HEADERS).
+- merged_data.csv, as written by the Export Data tab (see transfer.CSV_HEADER), where each row is a student,
+  an instructor, a course or a registration according to its Type column.
+
+The file is read with csv.reader, decompressed on the fly if its name ends with .gz, .bz2 or .xz, BATCH_SIZE
+rows at a time. The rows of a chunk are turned into the records of the json exports and validated with the
+classes of objects.py like import_pipeline.py does, and the valid ones are inserted with one executemany in
+one transaction, retried row by row if it fails (see import_pipeline.write_batch). Only one chunk is ever in
+memory, whatever the size of the file. Registrations are loaded with database.bulk_load, which rebuilds the
+summary tables once at the end instead of updating them row by row. Invalid records and rows rejected by the
+database are counted and reported instead of stopping the import.
+
+Usage::
+
+    python csv_import.py students students.csv --db university.db
+    python csv_import.py merged merged_data.csv.gz
+"""
+import argparse
+import csv
+import itertools
+import re
+import time
+from contextlib import nullcontext
+
+from compression import open_file
+from database import DB_FILE, bulk_load, connect
+from import_pipeline import BATCH_SIZE, MAX_ERRORS, TABLES, write_batch
+from transfer import CSV_HEADER
+
+# table -> key of the records of its json export -> the headers of the csv column holding it
+HEADERS = {
+    'students': {'student_id': ('student_id', 'id'), 'name': ('name',), 'age': ('age',), 'email': ('email',)},
+    'instructors': {'instructor_id': ('instructor_id', 'id'), 'name': ('name',), 'age': ('age',), 'email': ('email',)},
+    'courses': {'course_id': ('course_id', 'id'), 'course_name': ('course_name', 'name'),
+                'instructor_id': ('instructor_id',)},
+    'registrations': {'StudentID': ('student_id',), 'CourseID': ('course_id',)},
+}
+
+# Type of a row of merged_data.csv -> its table, and the key of its records -> the header of the column holding it
+MERGED = {
+    'Student': ('students', {'student_id': (CSV_HEADER[0],), 'name': (CSV_HEADER[1],), 'age': (CSV_HEADER[3],),
+                             'email': (CSV_HEADER[4],)}),
+    'Instructor': ('instructors', {'instructor_id': (CSV_HEADER[0],), 'name': (CSV_HEADER[1],),
+                                   'age': (CSV_HEADER[3],), 'email': (CSV_HEADER[4],)}),
+    'Course': ('courses', {'course_id': (CSV_HEADER[0],), 'course_name': (CSV_HEADER[1],),
+                           'instructor_id': (CSV_HEADER[3],)}),
+    'Registration': ('registrations', {'StudentID': (CSV_HEADER[0],), 'CourseID': (CSV_HEADER[1],)}),
+}
+
+# the tables in the order the rows of a chunk are inserted, each after the tables its rows refer to
+ORDER = ['instructors', 'students', 'courses', 'registrations']
+
+# keys whose empty cell is null: a course without an instructor
+OPTIONAL = {'instructor_id'}
+
+
+def normalize(header):
+    """
+    returns a header without case, spaces nor punctuation, e.g. studentid for "Student ID" and student_id
+    """
+    return re.sub(r'[^a-z0-9]', '', header.lower())
+
+
+def column_indexes(header, columns, filename):
+    """
+    finds the columns of the records in the header row of a csv file
+
+    :param header: the first row of the file
+    :type header: list of str
+
+    :param columns: key of the records -> the headers of the column holding it
+    :type columns: dict
+
+    :param filename: the file, for the error message
+    :type filename: str
+
+    :return: key of the records -> index of its column
+    :rtype: dict
+    :raises ValueError: if the file has no column for one of the keys
+    """
+    positions = {}
+    for index, name in enumerate(header):
+        positions.setdefault(normalize(name), index)
+    indexes = {}
+    for key, names in columns.items():
+        found = [positions[normalize(name)] for name in names if normalize(name) in positions]
+        if not found:
+            raise ValueError("%s has no %s column" % (filename, " or ".join(names)))
+        indexes[key] = found[0]
+    return indexes
+
+
+def to_record(row, indexes):
+    """
+    turns a row of a csv file into a record of the json exports, with the columns found by column_indexes
+    """
+    record = {}
+    for key, index in indexes.items():
+        value = row[index] if index < len(row) else ''
+        record[key] = None if value == '' and key in OPTIONAL else value
+    return record
+
+
+def read_csv(filename, batch_size=BATCH_SIZE):
+    """
+    yields the header row of a csv file, then its other rows in lists of up to batch_size rows, skipping empty lines.
+    The file is decompressed on the fly if its name ends with .gz, .bz2 or .xz
+
+    :rtype: generator of list
+    """
+    with open_file(filename, 'r', newline='') as file:
+        reader = csv.reader(file)
+        yield next(reader, [])
+        while True:
+            chunk = list(itertools.islice(reader, batch_size))
+            if not chunk:
+                return
+            yield [row for row in chunk if row]
+
+
+def new_counts():
+    return {'records': 0, 'inserted': 0, 'invalid': 0, 'failed': 0, 'errors': []}
+
+
+def insert_records(conn, table, records, counts):
+    """
+    validates records of a table and inserts the valid ones in one transaction, adding to counts the records
+    read, inserted, invalid and rejected by the database, and the first error messages
+    """
+    keys, validate, statement = TABLES[table]
+    rows = []
+    for record in records:
+        try:
+            rows.append(validate(record))
+        except Exception as e:
+            counts['invalid'] += 1
+            if len(counts['errors']) < MAX_ERRORS:
+                counts['errors'].append("%s: %s in %r" % (type(e).__name__, e, record))
+    counts['records'] += len(records)
+    inserted, failed = write_batch(conn, statement, rows, counts['errors'])
+    counts['inserted'] += inserted
+    counts['failed'] += failed
+
+
+def import_csv(conn, table, filename, batch_size=BATCH_SIZE):
+    """
+    imports the csv file of a table, a chunk of rows at a time
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param table: students, instructors, courses or registrations
+    :type table: str
+
+    :param filename: the csv file, whose first row names its columns. It may be compressed.
+    :type filename: str
+
+    :param batch_size: the number of rows read and inserted at a time
+    :type batch_size: int
+
+    :return: the number of records read, inserted, invalid and rejected by the database,
+        the first error messages, and the time taken
+    :rtype: dict
+    :raises ValueError: if the file lacks a column of the table
+    """
+    start = time.perf_counter()
+    counts = new_counts()
+    chunks = read_csv(filename, batch_size)
+    indexes = column_indexes(next(chunks), HEADERS[table], filename)
+    with bulk_load(conn) if table == 'registrations' else nullcontext():
+        for chunk in chunks:
+            insert_records(conn, table, [to_record(row, indexes) for row in chunk], counts)
+    counts['seconds'] = time.perf_counter() - start
+    return counts
+
+
+def import_merged_csv(conn, filename, batch_size=BATCH_SIZE):
+    """
+    imports the students, instructors, courses and registrations of a merged_data.csv file, a chunk of rows at
+    a time. The rows of every chunk are inserted table by table, instructors and students before the courses,
+    and courses before the registrations, so that a row is inserted after the rows it refers to in its chunk
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param filename: the csv file, in the format of the Export to CSV button. It may be compressed.
+    :type filename: str
+
+    :param batch_size: the number of rows read and inserted at a time
+    :type batch_size: int
+
+    :return: the counts of every table as returned by import_csv, the number of rows of an unknown type,
+        and the time taken
+    :rtype: dict
+    :raises ValueError: if the file lacks a column of merged_data.csv
+    """
+    start = time.perf_counter()
+    tables = {table: new_counts() for table in ORDER}
+    unknown = 0
+    chunks = read_csv(filename, batch_size)
+    header = next(chunks)
+    type_index = column_indexes(header, {'type': (CSV_HEADER[2],)}, filename)['type']
+    kinds = {kind: (table, column_indexes(header, columns, filename)) for kind, (table, columns) in MERGED.items()}
+    with bulk_load(conn):
+        for chunk in chunks:
+            records = {table: [] for table in ORDER}
+            for row in chunk:
+                kind = row[type_index] if type_index < len(row) else None
+                if kind not in kinds:
+                    unknown += 1
+                    continue
+                table, indexes = kinds[kind]
+                records[table].append(to_record(row, indexes))
+            for table in ORDER:
+                if records[table]:
+                    insert_records(conn, table, records[table], tables[table])
+    return {'tables': tables, 'unknown': unknown, 'seconds': time.perf_counter() - start}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="streaming import of the csv file of a table, or of merged_data.csv")
+    parser.add_argument('table', choices=list(TABLES) + ['merged'])
+    parser.add_argument('filename')
+    parser.add_argument('--db', default=DB_FILE)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    if args.table == 'merged':
+        result = import_merged_csv(conn, args.filename, args.batch_size)
+        results = result['tables']
+        if result['unknown']:
+            print("%d rows of an unknown type" % result['unknown'])
+    else:
+        result = import_csv(conn, args.table, args.filename, args.batch_size)
+        results = {args.table: result}
+    for table, counts in results.items():
+        print("%s: %d records, %d inserted, %d invalid, %d rejected by the database" % (
+            table, counts['records'], counts['inserted'], counts['invalid'], counts['failed']))
+        for error in counts['errors']:
+            print("  " + error)
+    print("%.2fs" % result['seconds'])
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,776 @@
+"""
+Database connection and schema of the School Management System.
+
+Several processes (copies of app_PyQt5.py, server.py, ...) can write to the same database: it is
+kept in WAL mode, every connection waits up to a busy timeout for the lock of another writer, and
+write_transaction takes the write lock as soon as it begins (BEGIN IMMEDIATE), retrying with an
+exponential backoff while another writer holds it.
+"""
+import os
+import random
+import sqlite3
+import time
+from contextlib import contextmanager, nullcontext
+
+from instrumentation import metrics
+
+DB_FILE = 'university.db'
+
+# milliseconds a connection waits for the lock held by another connection before failing with "database is locked"
+BUSY_TIMEOUT = 5000
+# times write_transaction starts over when the database is still locked, waiting RETRY_DELAY seconds,
+# then twice as long every time
+WRITE_RETRIES = 5
+RETRY_DELAY = 0.05
+# every wait before a retry is recorded in instrumentation.metrics under this name
+RETRY_METRIC = 'db: busy retry'
+
+TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS Students (
+        ID TEXT PRIMARY KEY,
+        Name TEXT NOT NULL,
+        Age INTEGER,
+        Email TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS Instructors (
+        ID TEXT PRIMARY KEY,
+        Name TEXT NOT NULL,
+        Age INTEGER,
+        Email TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS Courses (
+        ID TEXT PRIMARY KEY,
+        Name TEXT NOT NULL,
+        InstructorID TEXT,
+        FOREIGN KEY (InstructorID) REFERENCES Instructors(ID) on delete cascade on update cascade
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS Registrations (
+        StudentID TEXT,
+        CourseID TEXT,
+        FOREIGN KEY (StudentID) REFERENCES Students(ID) on delete cascade on update cascade,
+        FOREIGN KEY (CourseID) REFERENCES Courses(ID) on delete cascade on update cascade,
+        PRIMARY KEY (StudentID, CourseID)
+    )
+    ''',
+]
+
+# table -> (columns, primary key columns)
+COLUMNS = {
+    'Students': (('ID', 'Name', 'Age', 'Email'), ('ID',)),
+    'Instructors': (('ID', 'Name', 'Age', 'Email'), ('ID',)),
+    'Courses': (('ID', 'Name', 'InstructorID'), ('ID',)),
+    'Registrations': (('StudentID', 'CourseID'), ('StudentID', 'CourseID')),
+}
+
+# the roster of a course and the courses of an instructor are looked up by these columns (see queries.py)
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS Registrations_CourseID ON Registrations (CourseID)",
+    "CREATE INDEX IF NOT EXISTS Courses_InstructorID ON Courses (InstructorID)",
+]
+
+# every insert, update and delete on the tables above, and on those of LOGGED_COLUMNS below, is recorded in
+# ChangeLog by triggers, with a sequence number that only grows. RowKey is the primary key of the row before
+# the change, as a json object, and RowData the whole row after it (null for deletes). Watermarks holds the
+# last sequence number exported to, or applied from, each named peer.
+CHANGE_LOG = [
+    '''
+    CREATE TABLE IF NOT EXISTS ChangeLog (
+        Seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        TableName TEXT NOT NULL,
+        Operation TEXT NOT NULL,
+        RowKey TEXT NOT NULL,
+        RowData TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS Watermarks (
+        Name TEXT PRIMARY KEY,
+        Seq INTEGER NOT NULL
+    )
+    ''',
+]
+
+# long imports and exports run as jobs (see jobs.py) that record in Jobs how far they got, so they can be
+# resumed after a crash. Checkpoint is a json object whose content depends on the kind of job.
+JOBS = [
+    '''
+    CREATE TABLE IF NOT EXISTS Jobs (
+        ID INTEGER PRIMARY KEY,
+        Kind TEXT NOT NULL,
+        TableName TEXT NOT NULL,
+        Filename TEXT NOT NULL,
+        Options TEXT NOT NULL DEFAULT '{}',
+        Status TEXT NOT NULL DEFAULT 'pending',
+        Checkpoint TEXT,
+        Done INTEGER NOT NULL DEFAULT 0,
+        Total INTEGER,
+        Updated REAL,
+        Error TEXT
+    )
+    ''',
+]
+
+# the meeting times of the courses (see timetable.py): a course meets in any number of slots, each on a Day
+# from 0 (Monday) to 6, from StartTime up to EndTime, in minutes since midnight
+SLOTS = [
+    '''
+    CREATE TABLE IF NOT EXISTS CourseSlots (
+        CourseID TEXT NOT NULL,
+        Day INTEGER NOT NULL CHECK (Day BETWEEN 0 AND 6),
+        StartTime INTEGER NOT NULL,
+        EndTime INTEGER NOT NULL,
+        CHECK (0 <= StartTime AND StartTime < EndTime AND EndTime <= 1440),
+        FOREIGN KEY (CourseID) REFERENCES Courses(ID) on delete cascade on update cascade,
+        PRIMARY KEY (CourseID, Day, StartTime)
+    )
+    ''',
+]
+
+# the prerequisites of the courses and the courses each student has completed (see prerequisites.py).
+# PrerequisiteClosure holds every course required by a course, directly or through its prerequisites, with the
+# number of paths of prerequisites leading to it, and is kept up to date by the triggers of prerequisite_triggers.
+PREREQUISITES = [
+    '''
+    CREATE TABLE IF NOT EXISTS Prerequisites (
+        CourseID TEXT NOT NULL,
+        PrerequisiteID TEXT NOT NULL,
+        FOREIGN KEY (CourseID) REFERENCES Courses(ID) on delete cascade on update cascade,
+        FOREIGN KEY (PrerequisiteID) REFERENCES Courses(ID) on delete cascade on update cascade,
+        PRIMARY KEY (CourseID, PrerequisiteID)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS PrerequisiteClosure (
+        CourseID TEXT NOT NULL,
+        RequiredID TEXT NOT NULL,
+        Paths INTEGER NOT NULL,
+        PRIMARY KEY (CourseID, RequiredID)
+    ) WITHOUT ROWID
+    ''',
+    "CREATE INDEX IF NOT EXISTS PrerequisiteClosure_RequiredID ON PrerequisiteClosure (RequiredID, CourseID)",
+    '''
+    CREATE TABLE IF NOT EXISTS CompletedCourses (
+        StudentID TEXT NOT NULL,
+        CourseID TEXT NOT NULL,
+        FOREIGN KEY (StudentID) REFERENCES Students(ID) on delete cascade on update cascade,
+        FOREIGN KEY (CourseID) REFERENCES Courses(ID) on delete cascade on update cascade,
+        PRIMARY KEY (StudentID, CourseID)
+    )
+    ''',
+]
+
+# A prerequisite from course C to course P adds a path from every course requiring C (and C itself) to every
+# course required by P (and P itself): the number of paths of a pair grows by the product of the paths of its
+# two halves, and shrinks by it when the prerequisite is removed, the pairs left without a path leaving the
+# closure. Only the rows of the courses above C and below P are read, in one statement each, as triggers can't
+# run recursive queries. A prerequisite making a cycle would have P require C already, and is refused.
+ADD_PATHS = '''
+        INSERT INTO PrerequisiteClosure (CourseID, RequiredID, Paths)
+        SELECT a.CourseID, d.RequiredID, a.Paths * d.Paths
+        FROM (SELECT %(row)s.CourseID AS CourseID, 1 AS Paths
+              UNION ALL SELECT CourseID, Paths FROM PrerequisiteClosure WHERE RequiredID = %(row)s.CourseID) a,
+             (SELECT %(row)s.PrerequisiteID AS RequiredID, 1 AS Paths
+              UNION ALL SELECT RequiredID, Paths FROM PrerequisiteClosure WHERE CourseID = %(row)s.PrerequisiteID) d
+        WHERE true
+        ON CONFLICT (CourseID, RequiredID) DO UPDATE SET Paths = Paths + excluded.Paths;
+'''
+
+REMOVE_PATHS = '''
+        UPDATE PrerequisiteClosure SET Paths = Paths
+            - CASE WHEN CourseID = %(row)s.CourseID THEN 1 ELSE (
+                SELECT a.Paths FROM PrerequisiteClosure a
+                WHERE a.CourseID = PrerequisiteClosure.CourseID AND a.RequiredID = %(row)s.CourseID) END
+            * CASE WHEN RequiredID = %(row)s.PrerequisiteID THEN 1 ELSE (
+                SELECT d.Paths FROM PrerequisiteClosure d
+                WHERE d.CourseID = %(row)s.PrerequisiteID AND d.RequiredID = PrerequisiteClosure.RequiredID) END
+        WHERE (CourseID = %(row)s.CourseID OR CourseID IN (
+                SELECT CourseID FROM PrerequisiteClosure WHERE RequiredID = %(row)s.CourseID))
+          AND (RequiredID = %(row)s.PrerequisiteID OR RequiredID IN (
+                SELECT RequiredID FROM PrerequisiteClosure WHERE CourseID = %(row)s.PrerequisiteID));
+        DELETE FROM PrerequisiteClosure WHERE Paths = 0 AND (CourseID = %(row)s.CourseID OR CourseID IN (
+            SELECT CourseID FROM PrerequisiteClosure WHERE RequiredID = %(row)s.CourseID));
+'''
+
+REFUSE_CYCLE = '''
+    CREATE TRIGGER IF NOT EXISTS Prerequisites_%(operation)s_cycle BEFORE %(upper)s ON Prerequisites
+    WHEN new.CourseID = new.PrerequisiteID OR EXISTS (
+        SELECT 1 FROM PrerequisiteClosure WHERE CourseID = new.PrerequisiteID AND RequiredID = new.CourseID)
+    BEGIN
+        SELECT RAISE(ABORT, 'a course can''t require itself, directly or through its prerequisites');
+    END
+'''
+
+# a registration is refused unless the student has completed every course in the closure of the course,
+# each looked up by its primary key. A registration that already exists is left to the conflict handling of
+# the insert, e.g. skipped by INSERT OR IGNORE, and the registrations replayed from another database by
+# changelog.py were checked there already (see replay).
+REQUIRE_PREREQUISITES = '''
+    CREATE TRIGGER IF NOT EXISTS Registrations_insert_prerequisites BEFORE INSERT ON Registrations
+    WHEN NOT EXISTS (SELECT 1 FROM TransactionFlags WHERE Name = 'replay') AND EXISTS (
+        SELECT 1 FROM PrerequisiteClosure c
+        WHERE c.CourseID = new.CourseID AND NOT EXISTS (
+            SELECT 1 FROM CompletedCourses d WHERE d.StudentID = new.StudentID AND d.CourseID = c.RequiredID))
+      AND NOT EXISTS (SELECT 1 FROM Registrations WHERE StudentID = new.StudentID AND CourseID = new.CourseID)
+    BEGIN
+        SELECT RAISE(ABORT, 'the student has not completed the prerequisites of the course');
+    END
+'''
+
+# the tables whose changes are recorded in ChangeLog, so that the copies kept in sync by changelog.py get the
+# meeting times, the prerequisites and the completed courses along with the tables of COLUMNS
+LOGGED_COLUMNS = dict(COLUMNS, **{
+    'CourseSlots': (('CourseID', 'Day', 'StartTime', 'EndTime'), ('CourseID', 'Day', 'StartTime')),
+    'Prerequisites': (('CourseID', 'PrerequisiteID'), ('CourseID', 'PrerequisiteID')),
+    'CompletedCourses': (('StudentID', 'CourseID'), ('StudentID', 'CourseID')),
+})
+
+# the generation of a table is bumped by triggers on every row written to it, by any connection,
+# so that cached query results can tell whether the tables they were read from have changed
+GENERATIONS = [
+    '''
+    CREATE TABLE IF NOT EXISTS Generations (
+        TableName TEXT PRIMARY KEY,
+        Generation INTEGER NOT NULL
+    )
+    ''',
+] + ["INSERT OR IGNORE INTO Generations VALUES ('%s', 0)" % table for table in COLUMNS]
+
+# summary tables for the reports (see reports.py), kept up to date by the triggers below:
+# the number of students registered in each course, the number of students of each age in each course,
+# and the number of courses and registered students of each instructor. Courses and instructors without
+# any registration may have no row.
+SUMMARY_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS CourseEnrollment (
+        CourseID TEXT PRIMARY KEY,
+        Students INTEGER NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS CourseAges (
+        CourseID TEXT,
+        Age INTEGER,
+        Students INTEGER NOT NULL,
+        PRIMARY KEY (CourseID, Age)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS InstructorLoad (
+        InstructorID TEXT PRIMARY KEY,
+        Courses INTEGER NOT NULL,
+        Students INTEGER NOT NULL
+    )
+    ''',
+]
+
+# The triggers below and the generation triggers do nothing for the rows written by the transactions of a bulk
+# load, which set the 'bulk load' flag of TransactionFlags until they commit (see bulk_load).
+# A cascaded delete removes the parent row before the triggers of its children run, so the contributions
+# that depend on the parent (the age of a student, the instructor of a course) are taken away before it
+# is deleted. Likewise, a cascaded update of a primary key only moves the rows of the summary that are
+# keyed by it.
+SUMMARY_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS Registrations_insert_summary AFTER INSERT ON Registrations
+    WHEN NOT EXISTS (SELECT 1 FROM TransactionFlags WHERE Name = 'bulk load')
+    BEGIN
+        INSERT INTO CourseEnrollment VALUES (new.CourseID, 1)
+        ON CONFLICT (CourseID) DO UPDATE SET Students = Students + 1;
+        INSERT INTO CourseAges SELECT new.CourseID, Age, 1 FROM Students WHERE ID = new.StudentID AND Age IS NOT NULL
+        ON CONFLICT (CourseID, Age) DO UPDATE SET Students = Students + 1;
+        INSERT INTO InstructorLoad SELECT InstructorID, 0, 1 FROM Courses WHERE ID = new.CourseID AND InstructorID IS NOT NULL
+        ON CONFLICT (InstructorID) DO UPDATE SET Students = Students + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS Registrations_delete_summary AFTER DELETE ON Registrations
+    WHEN NOT EXISTS (SELECT 1 FROM TransactionFlags WHERE Name = 'bulk load')
+    BEGIN
+        UPDATE CourseEnrollment SET Students = Students - 1 WHERE CourseID = old.CourseID;
+        UPDATE CourseAges SET Students = Students - 1
+        WHERE CourseID = old.CourseID AND Age = (SELECT Age FROM Students WHERE ID = old.StudentID);
+        DELETE FROM CourseAges WHERE CourseID = old.CourseID AND Students = 0;
+        UPDATE InstructorLoad SET Students = Students - 1
+        WHERE InstructorID = (SELECT InstructorID FROM Courses WHERE ID = old.CourseID);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS Registrations_update_course_summary AFTER UPDATE OF CourseID ON Registrations
+    WHEN old.CourseID IS NOT new.CourseID
+      AND NOT EXISTS (SELECT 1 FROM TransactionFlags WHERE Name = 'bulk load')
+    BEGIN
+        UPDATE CourseEnrollment SET Students = Students - 1 WHERE CourseID = old.CourseID;
+        INSERT INTO CourseEnrollment VALUES (new.CourseID, 1)
+        ON CONFLICT (CourseID) DO UPDATE SET Students = Students + 1;
+        UPDATE InstructorLoad SET Students = Students - 1
+        WHERE InstructorID = (SELECT InstructorID FROM Courses WHERE ID = old.CourseID);
+        INSERT INTO InstructorLoad SELECT InstructorID, 0, 1 FROM Courses
+        WHERE ID = new.CourseID AND InstructorID IS NOT NULL AND EXISTS (SELECT 1 FROM Courses WHERE ID = old.CourseID)
+        ON CONFLICT (InstructorID) DO UPDATE SET Students = Students + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS Registrations_update_ages_summary AFTER UPDATE ON Registrations
+    WHEN (old.CourseID IS NOT new.CourseID OR old.StudentID IS NOT new.StudentID)
+        AND EXISTS (SELECT 1 FROM Students WHERE ID = old.StudentID)
+        AND NOT EXISTS (SELECT 1 FROM TransactionFlags WHERE Name = 'bulk load')
+    BEGIN
+        UPDATE CourseAges SET Students = Students - 1
+        WHERE CourseID = old.CourseID AND Age = (SELECT Age FROM Students WHERE ID = old.StudentID);
+        DELETE FROM CourseAges WHERE CourseID = old.CourseID AND Students = 0;
+        INSERT INTO CourseAges SELECT new.CourseID, Age, 1 FROM Students WHERE ID = new.StudentID AND Age IS NOT NULL
+        ON CONFLICT (CourseID, Age) DO UPDATE SET Students = Students + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS Students_update_age_summary AFTER UPDATE OF Age ON Students
+    WHEN old.Age IS NOT new.Age
+      AND NOT EXISTS (SELECT 1 FROM TransactionFlags WHERE Name = 'bulk load')
+    BEGIN
+        UPDATE CourseAges SET Students = Students - 1
+        WHERE Age = old.Age AND CourseID IN (SELECT CourseID FROM Registrations WHERE StudentID = new.ID);
+        DELETE FROM CourseAges
+        WHERE Age = old.Age AND Students = 0 AND CourseID IN (SELECT CourseID FROM Registrations WHERE StudentID = new.ID);
+        INSERT INTO CourseAges SELECT CourseID, new.Age, 1 FROM Registrations WHERE StudentID = new.ID AND new.Age IS NOT NULL
+        ON CONFLICT (CourseID, Age) DO UPDATE SET Students = Students + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS Students_delete_summary BEFORE DELETE ON Students
+    WHEN NOT EXISTS (SELECT 1 FROM TransactionFlags WHERE Name = 'bulk load')
+    BEGIN
+        UPDATE CourseAges SET Students = Students - 1
+        WHERE Age = old.Age AND CourseID IN (SELECT CourseID FROM Registrations WHERE StudentID = old.ID);
+        DELETE FROM CourseAges
+        WHERE Age = old.Age AND Students = 0 AND CourseID IN (SELECT CourseID FROM Registrations WHERE StudentID = old.ID);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS Courses_insert_summary AFTER INSERT ON Courses
+    WHEN new.InstructorID IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM TransactionFlags WHERE Name = 'bulk load')
+    BEGIN
+        INSERT INTO InstructorLoad VALUES (new.InstructorID, 1, 0)
+        ON CONFLICT (InstructorID) DO UPDATE SET Courses = Courses + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS Courses_update_instructor_summary AFTER UPDATE OF InstructorID ON Courses
+    WHEN old.InstructorID IS NOT new.InstructorID
+      AND NOT EXISTS (SELECT 1 FROM TransactionFlags WHERE Name = 'bulk load')
+    BEGIN
+        UPDATE InstructorLoad SET Courses = Courses - 1,
+            Students = Students - ifnull((SELECT Students FROM CourseEnrollment WHERE CourseID = new.ID), 0)
+        WHERE InstructorID = old.InstructorID;
+        INSERT INTO InstructorLoad SELECT new.InstructorID, 1, ifnull((SELECT Students FROM CourseEnrollment WHERE CourseID = new.ID), 0)
+        WHERE new.InstructorID IS NOT NULL
+        ON CONFLICT (InstructorID) DO UPDATE SET Courses = Courses + 1, Students = Students + excluded.Students;
+        DELETE FROM InstructorLoad WHERE InstructorID = old.InstructorID AND Courses = 0;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS Courses_update_id_summary AFTER UPDATE OF ID ON Courses
+    WHEN old.ID IS NOT new.ID
+      AND NOT EXISTS (SELECT 1 FROM TransactionFlags WHERE Name = 'bulk load')
+    BEGIN
+        DELETE FROM CourseEnrollment WHERE CourseID = old.ID;
+        DELETE FROM CourseAges WHERE CourseID = old.ID;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS Courses_delete_summary BEFORE DELETE ON Courses
+    WHEN NOT EXISTS (SELECT 1 FROM TransactionFlags WHERE Name = 'bulk load')
+    BEGIN
+        UPDATE InstructorLoad SET Courses = Courses - 1,
+            Students = Students - ifnull((SELECT Students FROM CourseEnrollment WHERE CourseID = old.ID), 0)
+        WHERE InstructorID = old.InstructorID;
+        DELETE FROM InstructorLoad WHERE InstructorID = old.InstructorID AND Courses = 0;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS Courses_deleted_summary AFTER DELETE ON Courses
+    WHEN NOT EXISTS (SELECT 1 FROM TransactionFlags WHERE Name = 'bulk load')
+    BEGIN
+        DELETE FROM CourseEnrollment WHERE CourseID = old.ID;
+        DELETE FROM CourseAges WHERE CourseID = old.ID;
+    END
+    ''',
+]
+
+# rebuilds the summary tables from scratch, e.g. after a bulk load, whose rows skip the triggers
+REFRESH_SUMMARIES = [
+    "DELETE FROM CourseEnrollment",
+    "INSERT INTO CourseEnrollment SELECT CourseID, count(*) FROM Registrations GROUP BY CourseID",
+    "DELETE FROM CourseAges",
+    '''
+    INSERT INTO CourseAges SELECT r.CourseID, s.Age, count(*) FROM Registrations r JOIN Students s ON s.ID = r.StudentID
+    WHERE s.Age IS NOT NULL GROUP BY r.CourseID, s.Age
+    ''',
+    "DELETE FROM InstructorLoad",
+    '''
+    INSERT INTO InstructorLoad SELECT c.InstructorID, count(*), ifnull(sum(e.Students), 0)
+    FROM Courses c LEFT JOIN CourseEnrollment e ON e.CourseID = c.ID
+    WHERE c.InstructorID IS NOT NULL GROUP BY c.InstructorID
+    ''',
+]
+
+
+def json_row(prefix, columns):
+    return "json_object(%s)" % ", ".join("'%s', %s.%s" % (column, prefix, column) for column in columns)
+
+
+def change_log_triggers():
+    """
+    returns the statements creating the triggers that record the changes of every table in ChangeLog
+
+    :return: the create trigger statements
+    :rtype: list of str
+    """
+    statements = []
+    for table, (columns, key) in LOGGED_COLUMNS.items():
+        for operation, key_row, data in (('insert', 'new', json_row('new', columns)),
+                                         ('update', 'old', json_row('new', columns)),
+                                         ('delete', 'old', 'null')):
+            statements.append('''
+    CREATE TRIGGER IF NOT EXISTS %(table)s_%(operation)s_log AFTER %(upper)s ON %(table)s
+    BEGIN
+        INSERT INTO ChangeLog (TableName, Operation, RowKey, RowData)
+        VALUES ('%(table)s', '%(operation)s', %(key)s, %(data)s);
+    END
+    ''' % {'table': table, 'operation': operation, 'upper': operation.upper(),
+           'key': json_row(key_row, key), 'data': data})
+    return statements
+
+
+def generation_triggers():
+    """
+    returns the statements creating the triggers that bump the generation of every table in Generations
+
+    :return: the create trigger statements
+    :rtype: list of str
+    """
+    return ['''
+    CREATE TRIGGER IF NOT EXISTS %(table)s_%(operation)s_generation AFTER %(upper)s ON %(table)s
+    WHEN NOT EXISTS (SELECT 1 FROM TransactionFlags WHERE Name = 'bulk load')
+    BEGIN
+        UPDATE Generations SET Generation = Generation + 1 WHERE TableName = '%(table)s';
+    END
+    ''' % {'table': table, 'operation': operation, 'upper': operation.upper()}
+            for table in COLUMNS for operation in ('insert', 'update', 'delete')]
+
+
+def prerequisite_triggers():
+    """
+    returns the statements creating the triggers that refuse cycles of prerequisites, keep PrerequisiteClosure
+    up to date and refuse the registrations of students who haven't completed the prerequisites of the course
+
+    :return: the create trigger statements
+    :rtype: list of str
+    """
+    cycles = [REFUSE_CYCLE % {'operation': operation, 'upper': operation.upper()} for operation in ('insert', 'update')]
+    return cycles + [
+        '''
+    CREATE TRIGGER IF NOT EXISTS Prerequisites_%s_closure AFTER %s ON Prerequisites
+    BEGIN%s
+    END
+    ''' % (operation, operation.upper(), body) for operation, body in (
+            ('insert', ADD_PATHS % {'row': 'new'}),
+            ('update', REMOVE_PATHS % {'row': 'old'} + ADD_PATHS % {'row': 'new'}),
+            ('delete', REMOVE_PATHS % {'row': 'old'}))] + [REQUIRE_PREREQUISITES]
+
+
+# the bulk loads in progress (see bulk_load), so that the summaries and generations are rebuilt when a process
+# dies before finishing its load
+BULK_LOADS = [
+    '''
+    CREATE TABLE IF NOT EXISTS BulkLoads (
+        ID INTEGER PRIMARY KEY,
+        Pid INTEGER NOT NULL,
+        Started REAL NOT NULL
+    )
+    ''',
+]
+
+# the flags of the transaction being written, e.g. 'bulk load' (see transaction_flag), which the triggers check
+# instead of a function defined by connect, so that any connection can write to the database. A flag is
+# set after the transaction begins and cleared before it commits, so no other connection ever sees it.
+TRANSACTION_FLAGS = [
+    "CREATE TABLE IF NOT EXISTS TransactionFlags (Name TEXT PRIMARY KEY) WITHOUT ROWID",
+]
+
+# the names of the triggers maintaining the summary tables and the generations
+MAINTAINING = ("SELECT name FROM sqlite_master WHERE type = 'trigger' "
+               "AND (name LIKE '%\\_summary' ESCAPE '\\' OR name LIKE '%\\_generation' ESCAPE '\\')")
+
+# the ids of the connections of this process running bulk_load
+loading = set()
+
+
+def create_tables(cursor):
+    """
+    creates the Students, Instructors, Courses and Registrations tables if they don't exist,
+    along with their indexes, the change log, the jobs table, the meeting times of the courses, the prerequisites
+    of the courses and the courses completed by the students, the table generations, the summary tables and their
+    triggers.
+    The summary tables are filled from the other tables when they are created in an existing database, or when
+    their triggers or the generation triggers had to be created again, e.g. by an older bulk load that dropped them.
+
+    :param cursor: the cursor to execute the statements with
+    :type cursor: sqlite3.Cursor
+
+    :return: Nothing.
+    :rtype: None
+    """
+    summaries = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'CourseEnrollment'").fetchone()
+    # the triggers written before they checked TransactionFlags are created again, checking it
+    for name, in cursor.execute(MAINTAINING + " AND sql NOT LIKE '%TransactionFlags%'").fetchall():
+        cursor.execute("DROP TRIGGER " + name)
+    # and so is the prerequisites trigger
+    if cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'Registrations_insert_prerequisites' "
+                      "AND sql NOT LIKE '%TransactionFlags%'").fetchone():
+        cursor.execute("DROP TRIGGER Registrations_insert_prerequisites")
+    maintaining = len(cursor.execute(MAINTAINING).fetchall())
+    for statement in (TRANSACTION_FLAGS + TABLES + INDEXES + CHANGE_LOG + JOBS + SLOTS + PREREQUISITES
+                      + change_log_triggers() + prerequisite_triggers() + GENERATIONS + generation_triggers()
+                      + SUMMARY_TABLES + SUMMARY_TRIGGERS + BULK_LOADS):
+        cursor.execute(statement)
+    # the flags are never committed, unless written by hand
+    cursor.execute("DELETE FROM TransactionFlags")
+    if summaries is None or len(cursor.execute(MAINTAINING).fetchall()) > maintaining:
+        rebuild_summaries(cursor)
+
+
+def rebuild_summaries(cursor):
+    """
+    fills the summary tables again from the other tables and bumps every generation, so that cached results are
+    read again
+
+    :return: Nothing.
+    :rtype: None
+    """
+    for statement in REFRESH_SUMMARIES:
+        cursor.execute(statement)
+    cursor.execute("UPDATE Generations SET Generation = Generation + 1")
+
+
+def process_alive(pid):
+    """
+    tells whether a process of this machine is still running
+    """
+    if os.name == 'nt':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        # SYNCHRONIZE access, then WAIT_TIMEOUT while the process runs
+        handle = kernel32.OpenProcess(0x00100000, False, pid)
+        if not handle:
+            return False
+        try:
+            return kernel32.WaitForSingleObject(handle, 0) == 0x102
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def finish_bulk_loads(conn):
+    """
+    rebuilds the summary tables and bumps the generations if a process died during a bulk load, whose rows
+    were written without maintaining them (see bulk_load). Does not commit.
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :return: the number of bulk loads finished
+    :rtype: int
+    """
+    dead = [id for id, pid in conn.execute("SELECT ID, Pid FROM BulkLoads").fetchall() if not process_alive(pid)]
+    if dead:
+        rebuild_summaries(conn.cursor())
+        conn.executemany("DELETE FROM BulkLoads WHERE ID = ?", [(id,) for id in dead])
+    return len(dead)
+
+
+@contextmanager
+def transaction_flag(conn, name):
+    """
+    sets a flag of TransactionFlags, checked by the triggers, for the statements of the block. It has to run in
+    a transaction of conn, which the flag is cleared from before it is committed.
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param name: the flag, 'bulk load' or 'replay'
+    :type name: str
+    """
+    conn.execute("INSERT INTO TransactionFlags (Name) VALUES (?)", (name,))
+    try:
+        yield conn
+    finally:
+        conn.execute("DELETE FROM TransactionFlags WHERE Name = ?", (name,))
+
+
+@contextmanager
+def bulk_load(conn):
+    """
+    skips the triggers that maintain the summary tables and the table generations for the rows this connection
+    writes with write_transaction while the block runs, then rebuilds the summary tables and bumps every
+    generation once. For bulk loads, where maintaining them row by row costs more than rebuilding them. The
+    writes of other connections still maintain them, and the change log is still recorded. The load is recorded
+    in BulkLoads until it ends, so that connect rebuilds the summaries if the process dies before.
+
+    :param conn: a connection opened with connect
+    :type conn: sqlite3.Connection
+    """
+    with conn:
+        load = conn.execute("INSERT INTO BulkLoads (Pid, Started) VALUES (?, ?)", (os.getpid(), time.time())).lastrowid
+    loading.add(id(conn))
+    try:
+        yield conn
+    finally:
+        loading.discard(id(conn))
+        with conn:
+            rebuild_summaries(conn.cursor())
+            conn.execute("DELETE FROM BulkLoads WHERE ID = ?", (load,))
+
+
+def replay(conn):
+    """
+    skips the prerequisites of the registrations inserted while the block runs, in the transaction of conn, for
+    the changes replayed from another database (see changelog.apply_changes): that database checked them
+    already, and the completed courses they depend on may predate the copy.
+
+    :param conn: the database connection, in a transaction
+    :type conn: sqlite3.Connection
+    """
+    return transaction_flag(conn, 'replay')
+
+
+def connect(filename=DB_FILE, factory=sqlite3.Connection, busy_timeout=BUSY_TIMEOUT):
+    """
+    opens the given database file with foreign keys enabled, and creates the tables if they don't exist.
+    Finishes the bulk loads of the processes that died during one (see finish_bulk_loads)
+
+    :param filename: the database file, defaults to university.db
+    :type filename: str
+
+    :param factory: the connection class, e.g. instrumentation.InstrumentedConnection
+    :type factory: type
+
+    :param busy_timeout: the milliseconds to wait for the lock of another connection
+    :type busy_timeout: int
+
+    :return: the connection
+    :rtype: sqlite3.Connection
+    """
+    conn = sqlite3.connect(filename, factory=factory, timeout=busy_timeout / 1000)
+    conn.execute("PRAGMA foreign_keys = ON")
+    # another process may be writing while this one starts
+    write_transaction(conn, lambda conn: (create_tables(conn.cursor()), finish_bulk_loads(conn)))
+    return conn
+
+
+def use_wal(conn):
+    """
+    switches the database to write-ahead logging, so that readers don't block the writer and the writer
+    doesn't block readers. The setting is stored in the database file.
+
+    :param conn: the connection
+    :type conn: sqlite3.Connection
+
+    :return: Nothing.
+    :rtype: None
+    """
+    conn.execute("PRAGMA journal_mode = WAL")
+
+
+def set_busy_timeout(conn, milliseconds):
+    """
+    changes the time a connection waits for the lock of another connection
+
+    :param conn: the connection
+    :type conn: sqlite3.Connection
+
+    :param milliseconds: the busy timeout
+    :type milliseconds: int
+
+    :return: Nothing.
+    :rtype: None
+    """
+    conn.execute("PRAGMA busy_timeout = %d" % milliseconds)
+
+
+def is_busy(error):
+    """
+    tells whether an exception is sqlite's "database is locked" (SQLITE_BUSY or SQLITE_LOCKED)
+
+    :param error: the exception
+    :type error: Exception
+
+    :rtype: bool
+    """
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return 'locked' in str(error)
+
+
+def write_transaction(conn, work, retries=WRITE_RETRIES, delay=RETRY_DELAY):
+    """
+    runs work(conn) in a write transaction and commits it. The transaction takes the write lock when it
+    begins (BEGIN IMMEDIATE), so it can't fail half way because another connection started writing after it
+    read. While another connection holds the lock for longer than the busy timeout, the transaction is
+    rolled back and started over, up to retries times, waiting a random time around delay seconds,
+    then twice as long every time. Every wait is recorded in instrumentation.metrics.
+
+    :param conn: the connection. If it is already in a transaction, work joins it and is neither
+        committed nor retried. In a bulk load, the transaction sets its flag (see bulk_load)
+    :type conn: sqlite3.Connection
+
+    :param work: runs the statements of the transaction, and returns its result
+    :type work: function
+
+    :param retries: the number of times the transaction is started over
+    :type retries: int
+
+    :param delay: the seconds to wait before the first retry
+    :type delay: float
+
+    :return: the result of work
+    :raises sqlite3.OperationalError: if the database is still locked after the last retry
+    """
+    if conn.in_transaction:
+        return work(conn)
+    for attempt in range(retries + 1):
+        began = False
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            began = True
+            with transaction_flag(conn, 'bulk load') if id(conn) in loading else nullcontext():
+                result = work(conn)
+            conn.commit()
+            return result
+        except Exception as e:
+            if began and conn.in_transaction:
+                conn.rollback()
+            if not is_busy(e):
+                raise
+            if attempt == retries:
+                metrics.record(RETRY_METRIC, 0.0, failed=True)
+                raise
+        wait = delay * 2 ** attempt * random.uniform(0.5, 1.5)
+        metrics.record(RETRY_METRIC, wait)
+        time.sleep(wait)
@@ -0,0 +1,343 @@
+"""
+Multi-process import of large json exports into the database.
+
+The input file is split into shards at byte offsets. Worker processes parse their shards and validate
+every record by building the objects.py Student/Instructor/Course, the same rules the GUI enforces,
+then send compact tuples of the valid records to a single writer process that inserts them in batches.
+Parsing and validation, which dominate the cost of an import, therefore scale with the number of cores,
+while sqlite only ever sees one writer.
+
+A shard holds the records whose preceding '[' or ',' is inside its byte range. A worker finds the
+first record of its range and the first record of the next one, by looking for an object after such
+a separator that has the keys of the table's records, and decodes the text between them with a
+single json.loads. Records over MAX_RECORD_SIZE bytes are not recognized. Json lines files (.jsonl)
+are split at the start of the line after each offset instead. Compressed files cannot be split, so they are
+streamed by the parent process, which sends the records to the workers in batches instead.
+
+Usage::
+
+    python import_pipeline.py students students.json --db university.db --workers 4
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+
+from compression import compressor_for
+from database import DB_FILE, connect, bulk_load, write_transaction
+from jsonstream import is_json_lines, read_json_lines_range
+from objects import Student, Instructor, Course
+from transfer import read_records
+
+SHARD_SIZE = 8 * 1024 * 1024
+BATCH_SIZE = 10000
+READ_SIZE = 1024 * 1024
+MAX_RECORD_SIZE = 1024 * 1024
+MAX_ERRORS = 20
+
+RECORD_START = re.compile(rb'[\[,]\s*\{')
+
+
+def validate_student(t):
+    student = Student(t["name"], t["age"], t["email"], t["student_id"])
+    return (student.student_id, student.name, student.age, student.get_email())
+
+
+def validate_instructor(t):
+    instructor = Instructor(t["name"], t["age"], t["email"], t["instructor_id"])
+    return (instructor.instructor_id, instructor.name, instructor.age, instructor.get_email())
+
+
+def validate_course(t):
+    course = Course(t["course_id"], t["course_name"])
+    return (course.course_id, course.course_name, t["instructor_id"])
+
+
+def validate_registration(t):
+    assert t["StudentID"] != "" and t["CourseID"] != "", "empty ID"
+    return (t["StudentID"], t["CourseID"])
+
+
+# table -> (keys every record has, validation returning the row to insert, insert statement)
+TABLES = {
+    'students': (('student_id', 'name', 'age', 'email'), validate_student,
+                 "insert into Students values (?,?,?,?)"),
+    'instructors': (('instructor_id', 'name', 'age', 'email'), validate_instructor,
+                    "insert into Instructors values (?,?,?,?)"),
+    'courses': (('course_id', 'course_name', 'instructor_id'), validate_course,
+                "insert into Courses values (?,?,?)"),
+    'registrations': (('StudentID', 'CourseID'), validate_registration,
+                      "insert into Registrations values (?,?)"),
+}
+
+
+def shards(filename, shard_size=SHARD_SIZE):
+    """
+    splits a file into (start, end) byte ranges of about shard_size bytes
+    """
+    size = os.path.getsize(filename)
+    return [(start, min(start + shard_size, size)) for start in range(0, size, shard_size)] or [(0, 0)]
+
+
+def record_start(file, offset, keys):
+    """
+    finds the first record whose preceding '[' or ',' is at or after the given offset: the first object
+    after such a separator that has all the given keys
+
+    :param file: the json array file, opened in binary mode
+    :type file: file object
+    :param offset: the byte offset to start looking from
+    :type offset: int
+    :param keys: the keys of the records
+    :type keys: tuple
+
+    :return: the byte offset of the separator, None if there is no record after the offset
+    :rtype: int or None
+    """
+    decoder = json.JSONDecoder()
+    file.seek(offset)
+    block = file.read(READ_SIZE)
+    search_from = 0
+    while True:
+        match = RECORD_START.search(block, search_from)
+        if match is None:
+            more = file.read(READ_SIZE)
+            if not more:
+                return None
+            # the separator may be the last byte read, with its object still to come
+            search_from = max(len(block.rstrip()) - 1, 0)
+            block += more
+            continue
+        candidate = match.end() - 1
+        obj = None
+        while True:
+            try:
+                obj = decoder.raw_decode(block[candidate:candidate + MAX_RECORD_SIZE].decode('utf-8', 'ignore'))[0]
+                break
+            except ValueError:
+                if len(block) >= candidate + MAX_RECORD_SIZE:
+                    break
+                more = file.read(READ_SIZE)
+                if not more:
+                    break
+                block += more
+        if isinstance(obj, dict) and all(key in obj for key in keys):
+            return offset + match.start()
+        search_from = match.start() + 1
+
+
+def read_shard(filename, start, end, keys):
+    """
+    reads the records of a json array file whose preceding separator is in the byte range [start, end)
+
+    :param filename: the json array file
+    :type filename: str
+    :param start: the start of the range
+    :type start: int
+    :param end: the end of the range
+    :type end: int
+    :param keys: the keys of the records
+    :type keys: tuple
+
+    :return: the records
+    :rtype: list of dict
+    """
+    with open(filename, 'rb') as file:
+        first = record_start(file, start, keys)
+        if first is None or first >= end:
+            return []
+        last = record_start(file, end, keys)
+        file.seek(first + 1)
+        if last is None:
+            # the rest of the file, up to and including the closing bracket of the array
+            return json.loads('[' + file.read().decode('utf-8'))
+        return json.loads('[' + file.read(last - first - 1).decode('utf-8') + ']')
+
+
+#### worker processes
+
+_queue = None
+
+
+def init_worker(queue):
+    global _queue
+    _queue = queue
+
+
+def validate_records(table, records, batch_size):
+    """
+    validates records and sends the rows of the valid ones to the writer in batches
+
+    :return: the number of valid and invalid records, and the first error messages
+    :rtype: tuple
+    """
+    keys, validate, statement = TABLES[table]
+    batch = []
+    valid = invalid = 0
+    errors = []
+    for t in records:
+        try:
+            batch.append(validate(t))
+            valid += 1
+        except Exception as e:
+            invalid += 1
+            if len(errors) < MAX_ERRORS:
+                errors.append("%s: %s in %s" % (type(e).__name__, e, json.dumps(t)[:200]))
+        if len(batch) >= batch_size:
+            _queue.put(batch)
+            batch = []
+    if batch:
+        _queue.put(batch)
+    return valid, invalid, errors
+
+
+def import_shard(table, filename, start, end, batch_size):
+    if is_json_lines(filename):
+        records = read_json_lines_range(filename, start, end)
+    else:
+        records = read_shard(filename, start, end, TABLES[table][0])
+    return validate_records(table, records, batch_size)
+
+
+def import_batch(table, records, batch_size):
+    return validate_records(table, records, batch_size)
+
+
+#### writer process
+
+def write_batch(conn, statement, batch, errors):
+    """
+    inserts a batch of rows in one transaction. A batch that fails is retried row by row, so that only the
+    failing rows are rejected, and the first MAX_ERRORS reasons are added to errors.
+    Returns the number of rows inserted and rejected.
+    """
+    try:
+        write_transaction(conn, lambda conn: conn.executemany(statement, batch))
+        return len(batch), 0
+    except sqlite3.Error:
+        inserted = failed = 0
+        for row in batch:
+            try:
+                write_transaction(conn, lambda conn: conn.execute(statement, row))
+                inserted += 1
+            except sqlite3.Error as e:
+                failed += 1
+                if len(errors) < MAX_ERRORS:
+                    errors.append("%s: %s in %r" % (type(e).__name__, e, row))
+        return inserted, failed
+
+
+def write_rows(db, statement, queue, results, bulk=False):
+    """
+    inserts the batches received on the queue until it receives None, one transaction per batch (see write_batch).
+    With bulk, the summary tables and table generations are updated once at the end instead of row by row.
+    """
+    conn = connect(db)
+    inserted = failed = 0
+    errors = []
+    with bulk_load(conn) if bulk else nullcontext():
+        while True:
+            batch = queue.get()
+            if batch is None:
+                break
+            counts = write_batch(conn, statement, batch, errors)
+            inserted += counts[0]
+            failed += counts[1]
+    conn.close()
+    results.put((inserted, failed, errors))
+
+
+def import_file(table, filename, db=DB_FILE, workers=None, batch_size=BATCH_SIZE, shard_size=SHARD_SIZE):
+    """
+    imports a json export into a table using worker processes for parsing and validation
+    and a single writer process
+
+    :param table: students, instructors, courses or registrations
+    :type table: str
+    :param filename: the json or json lines file, in the format of the Export Data tab. It may be compressed.
+    :type filename: str
+    :param db: the database file
+    :type db: str
+    :param workers: the number of worker processes, defaults to the number of cores
+    :type workers: int or None
+    :param batch_size: the number of rows per insert transaction
+    :type batch_size: int
+    :param shard_size: the number of bytes per shard
+    :type shard_size: int
+
+    :return: the number of records read, inserted, rejected by validation and rejected by the database,
+        the first error messages, and the time taken
+    :rtype: dict
+    """
+    start_time = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    statement = TABLES[table][2]
+    queue = multiprocessing.Queue(maxsize=4 * workers)
+    results = multiprocessing.Queue()
+    writer = multiprocessing.Process(target=write_rows, args=(db, statement, queue, results, table == 'registrations'),
+                                     daemon=True)
+    writer.start()
+
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(queue,)) as pool:
+        if compressor_for(filename) is None:
+            tasks = [pool.apply_async(import_shard, (table, filename, start, end, batch_size))
+                     for start, end in shards(filename, shard_size)]
+        else:
+            # at most two batches per worker wait in the pool, so memory stays bounded by the batch size
+            pending = threading.BoundedSemaphore(2 * workers)
+            release = lambda result: pending.release()
+            tasks = []
+            records = read_records(filename)
+            while True:
+                batch = list(itertools.islice(records, batch_size))
+                if not batch:
+                    break
+                pending.acquire()
+                tasks.append(pool.apply_async(import_batch, (table, batch, batch_size),
+                                              callback=release, error_callback=release))
+        counts = [task.get() for task in tasks]
+        # let the workers flush their queues before they exit, the pool would otherwise terminate them
+        pool.close()
+        pool.join()
+
+    queue.put(None)
+    inserted, failed, write_errors = results.get()
+    writer.join()
+
+    valid = sum(c[0] for c in counts)
+    invalid = sum(c[1] for c in counts)
+    errors = [e for c in counts for e in c[2]][:MAX_ERRORS] + write_errors
+    return {
+        'records': valid + invalid,
+        'inserted': inserted,
+        'invalid': invalid,
+        'failed': failed,
+        'errors': errors,
+        'seconds': time.perf_counter() - start_time,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="parallel import of a json or json lines export into the database")
+    parser.add_argument('table', choices=list(TABLES))
+    parser.add_argument('filename')
+    parser.add_argument('--db', default=DB_FILE)
+    parser.add_argument('--workers', type=int, help='worker processes (default: number of cores)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    result = import_file(args.table, args.filename, args.db, args.workers, args.batch_size)
+    print("%(records)d records, %(inserted)d inserted, %(invalid)d invalid, %(failed)d rejected by the database "
+          "in %(seconds).2fs" % result)
+    for error in result['errors']:
+        print(error)
+
+
+if __name__ == '__main__':
+    main()
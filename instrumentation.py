@@ -0,0 +1,276 @@
+"""
+Latency instrumentation of database statements and high-level operations.
+
+Every operation decorated with @timed and every statement executed on an InstrumentedConnection
+is counted and its latency is recorded in a histogram, from which p50/p95/p99 are computed.
+Statements slower than a threshold are kept in a slow-query log. Everything is recorded in the
+module-level ``metrics`` registry, which can be dumped to a json file for a monitoring agent.
+"""
+import functools
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# width of the histogram buckets: every bucket is 5% wider than the previous one,
+# so the percentiles are accurate to 5%
+GROWTH = 1.05
+SMALLEST = 1e-6
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_QUERY_LOG_SIZE = 200
+
+
+class Histogram:
+    """
+    A latency histogram with logarithmic buckets, using constant memory however many
+    values are recorded.
+
+    Attributes
+    ----------
+    count : int
+        The number of recorded values.
+    errors : int
+        The number of recorded operations that failed.
+    total : float
+        The sum of the recorded values, in seconds.
+    min, max : float
+        The smallest and largest recorded values, in seconds.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, seconds):
+        bucket = int(math.log(seconds / SMALLEST, GROWTH)) if seconds > SMALLEST else 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        """
+        returns the value below which p percent of the recorded values fall
+
+        :param p: the percentile, between 0 and 100
+        :type p: float
+
+        :return: the value in seconds (the upper bound of its bucket), 0 if nothing was recorded
+        :rtype: float
+        """
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(SMALLEST * GROWTH ** (bucket + 1), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+        }
+
+
+class Metrics:
+    """
+    A thread-safe registry of latency histograms and slow queries.
+
+    Attributes
+    ----------
+    slow_query_threshold : float
+        Statements taking longer than this many seconds are added to the slow-query log.
+    slow_queries : collections.deque
+        The most recent slow statements, as dicts with time, duration, statement and parameters.
+    """
+
+    def __init__(self, slow_query_threshold=SLOW_QUERY_THRESHOLD):
+        self.slow_query_threshold = slow_query_threshold
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+            self.started = time.time()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def record(self, name, seconds, failed=False):
+        """
+        records the latency of one call of an operation or statement
+
+        :param name: the operation (e.g. addStudent) or statement (e.g. db: insert into Students ...)
+        :type name: str
+        :param seconds: how long it took
+        :type seconds: float
+        :param failed: whether it raised an exception
+        :type failed: bool
+        """
+        with self.lock:
+            histogram = self.histogram(name)
+            histogram.record(seconds)
+            if failed:
+                histogram.errors += 1
+
+    def record_statement(self, sql, parameters, seconds, failed=False):
+        self.record('db: ' + normalize(sql), seconds, failed)
+        if seconds >= self.slow_query_threshold:
+            entry = {
+                'time': time.time(),
+                'duration': seconds,
+                'statement': normalize(sql),
+                'parameters': repr(parameters)[:200],
+            }
+            with self.lock:
+                self.slow_queries.append(entry)
+            logger.warning("slow query (%.3fs): %s", seconds, entry['statement'])
+
+    def record_error(self):
+        """
+        counts an error of the operation currently running in this thread, used by operations
+        that catch their own exceptions
+        """
+        operations = getattr(self.local, 'operations', None)
+        if operations:
+            with self.lock:
+                self.histogram(operations[-1]).errors += 1
+
+    def snapshot(self):
+        """
+        returns all the metrics as a json-serializable dict
+
+        :rtype: dict
+        """
+        with self.lock:
+            return {
+                'started': self.started,
+                'timestamp': time.time(),
+                'slow_query_threshold': self.slow_query_threshold,
+                'operations': {name: h.summary() for name, h in sorted(self.histograms.items())},
+                'slow_queries': list(self.slow_queries),
+            }
+
+    def dump(self, filename):
+        """
+        writes the metrics to a json file, replacing it atomically
+        """
+        temporary = filename + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(self.snapshot(), file, indent=4)
+        os.replace(temporary, filename)
+
+
+def normalize(sql):
+    """
+    collapses the whitespace of a statement so that the same statement always gets the same name
+    """
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+metrics = Metrics()
+
+
+def timed(name):
+    """
+    decorator recording the latency of every call of the decorated function under the given name
+
+    :param name: the name of the operation
+    :type name: str
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            operations = metrics.local.__dict__.setdefault('operations', [])
+            operations.append(name)
+            failed = False
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                metrics.record(name, time.perf_counter() - start, failed)
+                operations.pop()
+        return wrapper
+    return decorator
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    A cursor recording the latency of every statement it executes in ``metrics``.
+    Only the execution is timed, rows fetched afterwards are not.
+    """
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = super().execute(sql, parameters)
+            failed = False
+            return result
+        finally:
+            metrics.record_statement(sql, parameters, time.perf_counter() - start, failed)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = super().executemany(sql, seq_of_parameters)
+            failed = False
+            return result
+        finally:
+            metrics.record_statement(sql, '<many>', time.perf_counter() - start, failed)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    A connection whose cursors are InstrumentedCursors, pass it as the factory of sqlite3.connect()
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        start = time.perf_counter()
+        failed = True
+        try:
+            super().commit()
+            failed = False
+        finally:
+            metrics.record_statement('COMMIT', (), time.perf_counter() - start, failed)
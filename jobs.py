@@ -0,0 +1,480 @@
+"""
+Exports and imports that can be resumed after a crash.
+
+Every job has a row in the Jobs table of the database (see database.JOBS), where it records a
+checkpoint after every batch of rows:
+
+- an export (ExportJob) writes its file under another name, e.g. students.partial.json.gz, a page of
+  rows at a time (see pagination.py). After every page the file is synced to the disk and the key of
+  the last row written and the size of the file are checkpointed. A resumed export cuts the file back
+  to that size and goes on after that key, and the file replaces the export once complete, so a
+  half-written export never takes the place of a complete one. Compressed files are written as one
+  compressed stream per page, which gzip, bzip2 and xz readers read as a single file.
+- an import (ImportJob) inserts a batch of records and checkpoints the number of records read, and
+  the byte offset reached in an uncompressed json lines file, in the same transaction, so the
+  checkpoint is exactly what has been committed. A resumed import seeks to that offset, or skips
+  that many records, and goes on. Records are validated like import_pipeline.py does, and the ones
+  whose key is already in the table are rejected with the reason, like any record the database refuses.
+  A sync import updates instead the rows that differ in the file, and can delete the rows missing
+  from it (see upsert.py), so that a full dump can be imported again and again.
+
+Running the same export or import again resumes its unfinished job instead of starting another one.
+Jobs run on a thread of their own, with their own connection, and their progress can be read like
+the progress of a backup::
+
+    job = open_job(conn, 'university.db', 'import', 'registrations', 'registrations.jsonl').start()
+    ...
+    job.progress()
+
+Usage::
+
+    python jobs.py export students students.json.gz --db university.db
+    python jobs.py import registrations registrations.jsonl --db university.db
+    python jobs.py import students students.jsonl --sync --delete-missing
+    python jobs.py list
+    python jobs.py resume
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+from abc import abstractmethod
+
+from backup import BackgroundJob
+from compression import compressor_for, open_file
+from database import COLUMNS, DB_FILE, connect, write_transaction
+from import_pipeline import TABLES as IMPORTS
+from jsonstream import format_element, is_json_lines
+from pagination import iter_pages, page_key
+from transfer import EXPORTS, read_records, rows_to_dicts
+from upsert import create_seen_keys, delete_missing, existing_rows, remember_keys, upsert_row
+
+BATCH_ROWS = 5000
+# errors kept in the checkpoint of an import, for the records it rejected
+MAX_ERRORS = 20
+FIELDS = ['id', 'kind', 'table', 'filename', 'options', 'status', 'checkpoint', 'done', 'total', 'updated', 'error']
+
+
+def create_job(conn, kind, table, filename, **options):
+    """
+    records a new job in the Jobs table
+
+    :param kind: export or import
+    :type kind: str
+
+    :param table: students, instructors, courses or registrations
+    :type table: str
+
+    :param filename: the file to write or read
+    :type filename: str
+
+    :param options: the options of the job, e.g. level for the compression level of an export
+    :type options: dict
+
+    :return: the ID of the job
+    :rtype: int
+    """
+    return write_transaction(conn, lambda conn: conn.execute(
+        "insert into Jobs (Kind, TableName, Filename, Options, Updated) values (?,?,?,?,?)",
+        (kind, table, os.path.abspath(filename), json.dumps(options), time.time())).lastrowid)
+
+
+def get_job(conn, job_id):
+    """
+    returns the row of a job in the Jobs table as a dictionary with the keys in FIELDS, the options and the
+    checkpoint decoded, or None if there is no such job
+    """
+    row = conn.execute("select ID, Kind, TableName, Filename, Options, Status, Checkpoint, Done, Total, Updated, Error "
+                       "from Jobs where ID = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(zip(FIELDS, row))
+    job['options'] = json.loads(job['options'])
+    job['checkpoint'] = json.loads(job['checkpoint']) if job['checkpoint'] else None
+    return job
+
+
+def list_jobs(conn, limit=20):
+    """
+    returns the most recent jobs, the latest first, as returned by get_job
+
+    :rtype: list of dict
+    """
+    return [get_job(conn, job_id) for job_id, in conn.execute("select ID from Jobs order by ID desc limit ?", (limit,))]
+
+
+def unfinished_jobs(conn):
+    """
+    returns the IDs of the jobs that didn't finish, because they failed or the program running them stopped
+
+    :rtype: list of int
+    """
+    return [job_id for job_id, in conn.execute("select ID from Jobs where Status != 'done' order by ID")]
+
+
+def partial_filename(filename):
+    """
+    returns the file an export is written to until it is complete, e.g. students.partial.json.gz for students.json.gz
+    """
+    directory, name = os.path.split(filename)
+    stem, dot, extensions = name.partition('.')
+    return os.path.join(directory, stem + '.partial' + dot + extensions)
+
+
+def sync(filename):
+    with open(filename, 'ab') as file:
+        os.fsync(file.fileno())
+
+
+class CheckpointedJob(BackgroundJob):
+    """
+    A job of the Jobs table, run on a thread of its own with a connection of its own. It starts from the
+    checkpoint recorded by its last run, if any. Progress is counted in records.
+
+    Attributes
+    ----------
+    source : str
+        The database file.
+    job_id : int
+        The ID of the job in the Jobs table.
+    batch_rows : int
+        The records written or read between two checkpoints.
+    job : dict or None
+        The row of the job in the Jobs table (see get_job), once it has started.
+    """
+
+    def __init__(self, source, job_id, batch_rows=BATCH_ROWS):
+        super().__init__()
+        self.source = source
+        self.job_id = job_id
+        self.batch_rows = batch_rows
+        self.job = None
+
+    def run(self):
+        conn = connect(self.source)
+        try:
+            self.job = get_job(conn, self.job_id)
+            self.update(self.job['done'], self.job['total'] or 0)
+            self.set_status(conn, 'running')
+            try:
+                self.resume(conn, self.job['checkpoint'])
+            except Exception as e:
+                self.set_status(conn, 'failed', str(e))
+                raise
+            self.set_status(conn, 'done')
+        finally:
+            conn.close()
+
+    @abstractmethod
+    def resume(self, conn, checkpoint):
+        pass
+
+    def set_status(self, conn, status, error=None):
+        write_transaction(conn, lambda conn: conn.execute(
+            "update Jobs set Status = ?, Error = ?, Updated = ? where ID = ?", (status, error, time.time(), self.job_id)))
+
+    def save_checkpoint(self, conn, checkpoint, done, total=None):
+        """
+        records the checkpoint of the job, in the transaction of conn if one is open
+        """
+        write_transaction(conn, lambda conn: conn.execute(
+            "update Jobs set Checkpoint = ?, Done = ?, Total = coalesce(?, Total), Updated = ? where ID = ?",
+            (json.dumps(checkpoint), done, total, time.time(), self.job_id)))
+        self.update(done, total)
+
+
+class ExportJob(CheckpointedJob):
+    """
+    Exports a table into a json array or json lines file, possibly compressed, checkpointing the key of the
+    last row written and the size of the file after every page. The checkpoint is
+    {"after": key, "offset": bytes, "records": n}.
+    """
+
+    def resume(self, conn, checkpoint):
+        table, filename, level = self.job['table'], self.job['filename'], self.job['options'].get('level')
+        name = EXPORTS[table][0]
+        partial = partial_filename(filename)
+        lines = is_json_lines(filename)
+        if checkpoint is None or not os.path.exists(partial):
+            checkpoint = {'after': None, 'offset': 0, 'records': 0}
+        # what was written after the last checkpoint is written again
+        with open(partial, 'ab') as file:
+            file.truncate(checkpoint['offset'])
+        total = conn.execute("select count(*) from " + name).fetchone()[0]
+        records = checkpoint['records']
+        after = tuple(checkpoint['after']) if checkpoint['after'] is not None else None
+        self.update(records, total)
+        for rows in iter_pages(conn, name, page_size=self.batch_rows, after=after):
+            if lines:
+                text = "".join(json.dumps(record) + '\n' for record in rows_to_dicts(table, rows))
+            else:
+                text = (',\n' if records else '[\n') + ",\n".join(
+                    format_element(record) for record in rows_to_dicts(table, rows))
+            with open_file(partial, 'a', level) as file:
+                file.write(text)
+            sync(partial)
+            records += len(rows)
+            after = page_key(name, rows[-1])
+            self.save_checkpoint(conn, {'after': list(after), 'offset': os.path.getsize(partial), 'records': records},
+                                 records, total)
+            self.update(size=os.path.getsize(partial))
+        if not lines:
+            with open_file(partial, 'a', level) as file:
+                file.write('\n]' if records else '[]')
+            sync(partial)
+        os.replace(partial, filename)
+
+
+class ImportJob(CheckpointedJob):
+    """
+    Inserts the records of a json array or json lines file, possibly compressed, into a table, a batch at a time,
+    checkpointing in the transaction of every batch {"records": n, "offset": bytes or None, "inserted": n,
+    "updated": n, "unchanged": n, "deleted": n or None, "rejected": n, "errors": [...]}: the records read, the
+    offset of the next record in an uncompressed json lines file, the records inserted, and the invalid ones or
+    the ones the database refused, e.g. those already in the table, with the first MAX_ERRORS reasons. The
+    number of records to import is not known in advance, so the progress of an import has no total, only the bytes
+    read of a json lines file.
+
+    With the sync option, the records already in the table are updated if they differ instead of being rejected,
+    and counted as updated or unchanged (see upsert.py). With the delete_missing option, the rows whose key isn't
+    in the file are deleted once it has been read, unless some records were rejected, and counted as deleted.
+    """
+
+    def resume(self, conn, checkpoint):
+        table, filename, options = self.job['table'], self.job['filename'], self.job['options']
+        sync, missing = options.get('sync', False), options.get('delete_missing', False)
+        validate = IMPORTS[table][1]
+        name = EXPORTS[table][0]
+        insert = "insert into %s values (%s)" % (name, ", ".join("?" * len(COLUMNS[name][0])))
+        if checkpoint is None:
+            checkpoint = {'records': 0, 'offset': None, 'rejected': 0, 'errors': []}
+        for count in ('inserted', 'updated', 'unchanged'):
+            checkpoint.setdefault(count, 0)
+        checkpoint.setdefault('deleted', None)
+        seekable = is_json_lines(filename) and compressor_for(filename) is None
+        if seekable and checkpoint['offset'] is None:
+            checkpoint['offset'] = 0
+        self.update(checkpoint['records'])
+        batch = []
+
+        def reject(index, error):
+            checkpoint['rejected'] += 1
+            if len(checkpoint['errors']) < MAX_ERRORS:
+                checkpoint['errors'].append("record %d: %s" % (index, error))
+
+        def valid_rows(records, first):
+            rows = []
+            for index, record in enumerate(records, first):
+                try:
+                    rows.append((index, validate(record)))
+                except (AssertionError, KeyError, TypeError, ValueError) as e:
+                    reject(index, e)
+            return rows
+
+        def insert_batch(conn):
+            rows = valid_rows(batch, checkpoint['records'])
+            existing = existing_rows(conn, name, [page_key(name, row) for index, row in rows]) if sync else None
+            for index, row in rows:
+                try:
+                    if sync:
+                        upsert_row(conn, name, row, existing, checkpoint)
+                    else:
+                        conn.execute(insert, row)
+                        checkpoint['inserted'] += 1
+                except sqlite3.IntegrityError as e:
+                    reject(index, e)
+            if missing:
+                remember_keys(conn, name, [row for index, row in rows])
+            checkpoint['records'] += len(batch)
+            self.save_checkpoint(conn, checkpoint, checkpoint['records'])
+
+        def flush(offset):
+            saved = json.loads(json.dumps(checkpoint))
+            try:
+                if seekable:
+                    checkpoint['offset'] = offset
+                write_transaction(conn, insert_batch)
+            except BaseException:
+                # the batch was rolled back, and so was its checkpoint
+                checkpoint.clear()
+                checkpoint.update(saved)
+                raise
+            if seekable:
+                self.update(size=offset)
+            batch.clear()
+
+        if missing:
+            # the keys of the records imported before the checkpoint are read again, the temporary table is gone
+            create_seen_keys(conn, name)
+        if seekable and not missing:
+            records, skip = read_lines(filename, checkpoint['offset']), 0
+        else:
+            records = read_lines(filename, 0) if seekable else ((record, None) for record in read_records(filename))
+            skip = checkpoint['records']
+        offset = checkpoint['offset']
+        replayed = []
+        for index, (record, offset) in enumerate(records):
+            if index < skip:
+                if not missing:
+                    continue
+                try:
+                    replayed.append(validate(record))
+                except (AssertionError, KeyError, TypeError, ValueError):
+                    pass  # counted as rejected before the checkpoint
+                if len(replayed) >= self.batch_rows or index == skip - 1:
+                    remember_keys(conn, name, replayed)
+                    conn.commit()
+                    replayed.clear()
+                continue
+            batch.append(record)
+            if len(batch) >= self.batch_rows:
+                flush(offset)
+        flush(offset)
+        if missing and checkpoint['deleted'] is None:
+            if checkpoint['rejected']:
+                checkpoint['errors'].append("rows missing from the file not deleted, %d records were rejected"
+                                            % checkpoint['rejected'])
+                checkpoint['deleted'] = 0
+                self.save_checkpoint(conn, checkpoint, checkpoint['records'])
+            else:
+                def delete(conn):
+                    checkpoint['deleted'] = delete_missing(conn, name)
+                    self.save_checkpoint(conn, checkpoint, checkpoint['records'])
+                write_transaction(conn, delete)
+        self.job['checkpoint'] = checkpoint
+
+
+def read_lines(filename, offset):
+    """
+    yields the records of an uncompressed json lines file from a byte offset, with the offset of the next line
+    """
+    with open(filename, 'rb') as file:
+        file.seek(offset)
+        for line in file:
+            offset += len(line)
+            if line.strip():
+                yield json.loads(line), offset
+
+
+def import_summary(checkpoint):
+    """
+    returns the counts of the checkpoint of an import as text, e.g. "3 inserted, 2 updated, 995 unchanged, 0 rejected"
+
+    :rtype: str
+    """
+    counts = [(checkpoint['inserted'], 'inserted'), (checkpoint['updated'], 'updated'),
+              (checkpoint['unchanged'], 'unchanged'), (checkpoint['deleted'], 'deleted'),
+              (checkpoint['rejected'], 'rejected')]
+    return ", ".join("%d %s" % (count, label) for count, label in counts
+                     if count or label in ('inserted', 'rejected') or (label == 'deleted' and count is not None))
+
+
+JOB_CLASSES = {'export': ExportJob, 'import': ImportJob}
+
+
+def resume_job(conn, source, job_id, batch_rows=BATCH_ROWS):
+    """
+    returns the job with the given ID of the Jobs table, not started, which goes on from its last checkpoint
+
+    :param conn: a connection to the database
+    :type conn: sqlite3.Connection
+
+    :param source: the database file
+    :type source: str
+
+    :param job_id: the ID of the job
+    :type job_id: int
+
+    :rtype: ExportJob or ImportJob
+    """
+    return JOB_CLASSES[get_job(conn, job_id)['kind']](source, job_id, batch_rows)
+
+
+def open_job(conn, source, kind, table, filename, batch_rows=BATCH_ROWS, **options):
+    """
+    returns a job, not started, exporting a table to a file or importing it from a file: the unfinished job doing
+    the same if there is one, so that it goes on from where it stopped with the given options, or a new one
+
+    :param conn: a connection to the database
+    :type conn: sqlite3.Connection
+
+    :param source: the database file
+    :type source: str
+
+    :param kind: export or import
+    :type kind: str
+
+    :param table: students, instructors, courses or registrations
+    :type table: str
+
+    :param filename: the file to write or read
+    :type filename: str
+
+    :param batch_rows: the records written or read between two checkpoints
+    :type batch_rows: int
+
+    :param options: the options of the job, level for the compression level of an export, sync and delete_missing
+        for an import (see ImportJob)
+    :type options: dict
+
+    :rtype: ExportJob or ImportJob
+    """
+    row = conn.execute("select ID from Jobs where Kind = ? and TableName = ? and Filename = ? and Status != 'done' "
+                       "order by ID desc", (kind, table, os.path.abspath(filename))).fetchone()
+    if row is None:
+        job_id = create_job(conn, kind, table, filename, **options)
+    else:
+        # a checkpoint doesn't depend on the options, which are those of the last run
+        job_id = row[0]
+        write_transaction(conn, lambda conn: conn.execute(
+            "update Jobs set Options = ? where ID = ?", (json.dumps(options), job_id)))
+    return JOB_CLASSES[kind](source, job_id, batch_rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="exports and imports that can be resumed after a crash")
+    parser.add_argument('--db', default=DB_FILE)
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS, help='rows between checkpoints')
+    commands = parser.add_subparsers(dest='command', required=True)
+    for kind in JOB_CLASSES:
+        command = commands.add_parser(kind, help='%s a table, or resume the unfinished %s of the same file' % (kind, kind))
+        command.add_argument('table', choices=list(EXPORTS))
+        command.add_argument('filename')
+        if kind == 'export':
+            command.add_argument('--level', type=int, help='compression level')
+        else:
+            command.add_argument('--sync', action='store_true', help='update the rows that differ in the file')
+            command.add_argument('--delete-missing', action='store_true', help='delete the rows missing from the file')
+    commands.add_parser('list', help='list the recent jobs')
+    resume = commands.add_parser('resume', help='resume unfinished jobs')
+    resume.add_argument('ids', type=int, nargs='*', help='the jobs to resume (default: all unfinished jobs)')
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    if args.command == 'list':
+        for job in list_jobs(conn):
+            print("%(id)5d  %(kind)-7s %(table)-14s %(status)-8s %(done)10d / %(total)s  %(filename)s" % job)
+        return
+    if args.command == 'resume':
+        jobs = [resume_job(conn, args.db, job_id, args.batch_rows) for job_id in args.ids or unfinished_jobs(conn)]
+    else:
+        if args.command == 'export':
+            options = {'level': args.level}
+        else:
+            options = {'sync': args.sync, 'delete_missing': args.delete_missing}
+        jobs = [open_job(conn, args.db, args.command, args.table, args.filename, args.batch_rows, **options)]
+    for job in jobs:
+        job.start().join()
+        progress = job.progress()
+        print("job %d: %s %s %s, %d records in %.2fs" % (job.job_id, job.job['kind'], job.job['table'],
+                                                        job.job['filename'], progress['done'], progress['seconds']))
+        checkpoint = get_job(conn, job.job_id)['checkpoint']
+        if job.job['kind'] == 'import':
+            print("  " + import_summary(checkpoint))
+            for error in checkpoint['errors']:
+                print("  " + error)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+"""
+Reading and writing json arrays and json lines files one element at a time, so that files larger
+than memory can be imported and exported. Only the element being decoded or encoded is held in
+memory, along with a buffer of the file.
+
+A json lines file (.jsonl) holds one json record per line. Unlike an array it can be appended to
+without rewriting it, and split at any byte offset by moving to the start of the next line.
+"""
+import json
+import os
+import re
+import textwrap
+
+from compression import strip_compression_suffix
+
+CHUNK_SIZE = 64 * 1024
+
+JSON_LINES_SUFFIX = '.jsonl'
+
+# formats offered in the export tab, in display order
+JSON_FORMATS = {
+    'JSON array (.json)': '.json',
+    'JSON Lines (.jsonl)': JSON_LINES_SUFFIX,
+}
+
+WHITESPACE = re.compile(r'\s*')
+DELIMITER = re.compile(r'\s*[,\]]')
+
+# what iter_json_array expects next
+OPEN, FIRST, VALUE, SEPARATOR, END = range(5)
+
+
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    """
+    yields the elements of the json array in an open text file, one at a time, decoding them with
+    json.JSONDecoder.raw_decode from a buffer that is refilled chunk by chunk
+
+    :param file: the file to read, opened in text mode
+    :type file: file object
+
+    :param chunk_size: the number of characters read at a time
+    :type chunk_size: int
+
+    :return: the elements of the array
+    :rtype: generator
+
+    :raises json.JSONDecodeError: if the file does not hold a json array, or holds more than whitespace after it
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    state = OPEN
+    eof = False
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+        if position < len(buffer):
+            char = buffer[position]
+            if state == OPEN:
+                if char != '[':
+                    raise json.JSONDecodeError("Expecting '['", buffer, position)
+                position += 1
+                state = FIRST
+                continue
+            if state == END:
+                raise json.JSONDecodeError("Extra data", buffer, position)
+            if state == SEPARATOR:
+                if char == ']':
+                    position += 1
+                    state = END
+                    continue
+                if char != ',':
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buffer, position)
+                position += 1
+                state = VALUE
+                continue
+            if state == FIRST and char == ']':
+                position += 1
+                state = END
+                continue
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # a number at the end of the buffer may go on in the next chunk, so the value is only
+                # complete once the separator after it has been read
+                if eof or DELIMITER.match(buffer, end):
+                    yield value
+                    position = end
+                    state = SEPARATOR
+                    continue
+        elif eof:
+            if state == END:
+                return
+            raise json.JSONDecodeError("Unterminated array", buffer, position)
+
+        # the buffer holds part of an element at most: keep it and read more, twice as much for large elements
+        chunk = file.read(max(chunk_size, len(buffer) - position))
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def load_json_array(filename):
+    """
+    yields the elements of the json array in a file, one at a time
+
+    :param filename: the file to read
+    :type filename: str
+
+    :return: the elements of the array
+    :rtype: generator
+    """
+    with open(filename, 'r') as file:
+        yield from iter_json_array(file)
+
+
+def write_json_array(file, records):
+    """
+    writes the given records to an open file as an indented json array, one record at a time,
+    so the whole array is never built in memory
+
+    :param file: the file to write to
+    :type file: file object
+
+    :param records: the records to write
+    :type records: iterable of dict
+
+    :return: Nothing.
+    :rtype: None
+    """
+    file.write('[')
+    first = True
+    for record in records:
+        file.write('\n' if first else ',\n')
+        file.write(format_element(record))
+        first = False
+    file.write(']' if first else '\n]')
+
+
+def format_element(record):
+    """
+    returns a record as it is written in a json array by write_json_array, indented
+    """
+    return textwrap.indent(json.dumps(record, indent=4), '    ')
+
+
+def rewrite_json_array(filename, update):
+    """
+    rewrites a json array file element by element: every element is passed to update, which returns
+    the element to write in its place. The new file replaces the old one once it is complete.
+
+    :param filename: the file to rewrite
+    :type filename: str
+
+    :param update: called with each element, returns the element to write
+    :type update: function
+
+    :return: Nothing.
+    :rtype: None
+    """
+    temporary = filename + '.tmp'
+    with open(filename, 'r') as source, open(temporary, 'w') as target:
+        write_json_array(target, (update(element) for element in iter_json_array(source)))
+    os.replace(temporary, filename)
+
+
+def is_json_lines(filename):
+    """
+    tells whether a file holds json lines rather than a json array, from its extension
+
+    :param filename: the file name, e.g. students.jsonl or students.jsonl.gz
+    :type filename: str
+
+    :return: True for .jsonl files, compressed or not
+    :rtype: bool
+    """
+    return strip_compression_suffix(filename).endswith(JSON_LINES_SUFFIX)
+
+
+def iter_json_lines(file):
+    """
+    yields the records of an open json lines file, one per line, skipping blank lines
+
+    :param file: the file to read
+    :type file: file object
+
+    :return: the records
+    :rtype: generator
+    """
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_records(file, filename):
+    """
+    yields the records of an open json array or json lines file, depending on the extension of its name
+
+    :param file: the file to read, opened in text mode
+    :type file: file object
+
+    :param filename: the name of the file
+    :type filename: str
+
+    :return: the records
+    :rtype: generator
+    """
+    return iter_json_lines(file) if is_json_lines(filename) else iter_json_array(file)
+
+
+def write_json_lines(file, records):
+    """
+    writes the given records to an open file, one compact json record per line
+
+    :param file: the file to write to
+    :type file: file object
+
+    :param records: the records to write
+    :type records: iterable of dict
+
+    :return: Nothing.
+    :rtype: None
+    """
+    for record in records:
+        file.write(json.dumps(record))
+        file.write('\n')
+
+
+def append_json_lines(filename, records):
+    """
+    appends records at the end of a json lines file, creating it if it doesn't exist.
+    The existing records are neither read nor rewritten.
+
+    :param filename: the file to append to
+    :type filename: str
+
+    :param records: the records to append
+    :type records: iterable of dict
+
+    :return: Nothing.
+    :rtype: None
+    """
+    with open(filename, 'a') as file:
+        write_json_lines(file, records)
+
+
+def read_json_lines_range(filename, start, end):
+    """
+    yields the records of a json lines file whose line starts in the byte range [start, end).
+    Reading consecutive ranges yields every record exactly once, so a file can be split at arbitrary
+    byte offsets and its parts loaded in parallel.
+
+    :param filename: the json lines file
+    :type filename: str
+
+    :param start: the start of the range
+    :type start: int
+
+    :param end: the end of the range
+    :type end: int
+
+    :return: the records
+    :rtype: generator
+    """
+    with open(filename, 'rb') as file:
+        if start > 0:
+            # the line holding the byte before the range belongs to the previous range
+            file.seek(start - 1)
+            file.readline()
+        first = file.tell()
+        if first >= end:
+            return
+        # the lines starting in the range, the last one read to its end
+        data = file.read(end - first)
+        if not data.endswith(b'\n'):
+            data += file.readline()
+    # decoded at once as an array, which is much faster than line by line
+    yield from json.loads(b'[' + b','.join(line for line in data.split(b'\n') if line.strip()) + b']')
@@ -1,7 +1,11 @@
+import argparse
+import os
 import re
 import json
 import tkinter as tk
 from tkinter import ttk
+from jsonstream import load_json_array
+from storage import STORAGES, StorageError, open_storage
 
 
 class SchoolManagementSystem:
@@ -306,12 +310,49 @@ class Instructor(Person):
 
 
 
+# The students, instructors, courses and registrations are kept in a store shared with app_PyQt5.py (see storage.py):
+# by default the json files of the current directory, in the format of the Export Data tab of app_PyQt5.py.
+# SCHOOL_STORAGE=sqlite and SCHOOL_DATA=university.db run the app on the database instead.
+# The json files are written behind: a click changes the records in memory and appends the change to a
+# journal, and a background thread writes the files in batches (see storage.WriteBehind).
+# The store is opened when the app starts, so that importing this module doesn't create a journal.
+storage = None
+
+
+def find_course(course_name):
+    """
+    Returns the ID of the course with the given name.
+
+    :param course_name: The name of the course.
+    :type course_name: str
+    :return: The ID of the course.
+    :rtype: str
+    :raises StorageError: If there is no course with this name.
+    """
+    for course in storage.iterate('courses', name=course_name):
+        return course['id']
+    raise StorageError("no course named %s" % course_name)
+
+
 # Create the main window
 root = tk.Tk()
 root.title("School Management System")
 root.geometry("400x400")
 
 
+def close_window():
+    """
+    Writes the changes that are not in the files yet, then closes the window.
+
+    :return: None
+    """
+    storage.close()
+    root.destroy()
+
+
+root.protocol("WM_DELETE_WINDOW", close_window)
+
+
 main_frame = tk.Frame(root)
 main_frame.pack(fill=tk.BOTH, expand=1)
 
@@ -337,7 +378,7 @@ title_label.pack(pady=10)
 def add_student():
     """
     Retrieves the student information from the entry fields,
-    creates a `Student` object, and saves it to a JSON file.
+    creates a `Student` object, and adds it to the store.
 
     :return: None
     """
@@ -347,7 +388,7 @@ def add_student():
     student_id = student_id_entry.get()
 
     stdnt = Student(name, age, email, student_id)
-    SchoolManagementSystem.save_data("students.json", [stdnt])
+    storage.add('students', {'id': stdnt.student_id, 'name': stdnt.name, 'age': stdnt.age, 'email': stdnt._email})
 
 
 # Labels and Entry fields for Student Form
@@ -379,21 +420,20 @@ add_student_button.pack(pady=10)
 
 def load_json(filename):
     """
-    Loads and returns data from the given JSON file.
+    Yields the elements of the JSON array in the given file, one at a time.
 
     :param filename: The name of the file to load data from.
     :type filename: str
-    :return: The loaded data.
-    :rtype: dict or list
+    :return: The elements of the array.
+    :rtype: generator
     """
-    with open(filename, 'r') as file:
-        return json.load(file)
+    return load_json_array(filename)
 
 
 def add_instructor():
     """
     Retrieves the instructor information from the entry fields,
-    creates an `Instructor` object, and saves it to a JSON file.
+    creates an `Instructor` object, and adds it to the store.
 
     :return: None
     """
@@ -403,7 +443,7 @@ def add_instructor():
     instructor_id = instructor_id_entry.get()
 
     inst = Instructor(name, age, email, instructor_id)
-    SchoolManagementSystem.save_data("instructors.json", [inst])
+    storage.add('instructors', {'id': inst.instructor_id, 'name': inst.name, 'age': inst.age, 'email': inst._email})
 
 
 instructor_label = tk.Label(second_frame, text="Add Instructor")
@@ -437,7 +477,7 @@ add_instructor_button.pack(pady=10)
 def add_course():
     """
     Retrieves the course information from the entry fields,
-    creates a `Course` object, and saves it to a JSON file.
+    creates a `Course` object, and adds it to the store.
 
     :return: None
     """
@@ -445,7 +485,7 @@ def add_course():
     course_name = course_name_entry.get()
 
     crs = Course(course_id, course_name)
-    SchoolManagementSystem.save_data("Courses.json", [crs])
+    storage.add('courses', {'id': crs.course_id, 'name': crs.course_name, 'instructor_id': None})
     refreshCourses()
 
 
@@ -494,59 +534,43 @@ def update_option_menu():
 
 def refreshCourses():
     """
-    Loads the courses from a JSON file, updates the available courses list, and refreshes the dropdown menu.
+    Loads the courses from the store, updates the available courses list, and refreshes the dropdown menu.
 
     :return: None
     """
-    with open("Courses.json", "r") as file:
-        courses = json.load(file)
-
-        global available_courses
-        available_courses = []
-
-        for obj in courses:
-            available_courses.append(obj["course_name"])
+    global available_courses
+    available_courses = [course['name'] for course in storage.iterate('courses')]
 
     update_option_menu()
 
 
 def addCourseToStudent(regcc):
     """
-    Adds a registered course to a student's registered courses list.
+    Registers a student in a course in the store.
 
     :param regcc: The registered course object.
     :type regcc: RegCourse
     :return: None
+    :raises StorageError: If the student or the course doesn't exist, or the student is already registered in it.
     """
-    students = load_json("students.json")
-
-    for obj in students:
-        if obj["student_id"] == regcc.student_id:
-            obj["registered_courses"].append(regcc.course_name)
-
-    SchoolManagementSystem.save_data_dump("students.json", students)
+    storage.register(regcc.student_id, find_course(regcc.course_name))
 
 def addCourseToInstructor(ass_course):
     """
-    Adds an assigned course to an instructor's assigned courses list.
+    Assigns an instructor to a course in the store, in place of its previous instructor.
 
     :param ass_course: The assigned course object.
     :type ass_course: AssCourse
     :return: None
+    :raises StorageError: If the instructor or the course doesn't exist.
     """
-    instructors = load_json("instructors.json")
-
-    for obj in instructors:
-        if obj["instructor_id"] == ass_course.instructor_id:
-            obj["assigned_courses"].append(ass_course.course_name)
-
-    SchoolManagementSystem.save_data_dump("instructors.json", instructors)
+    storage.assign(find_course(ass_course.course_name), ass_course.instructor_id)
 
 
 
 def register_course():
     """
-    Registers a course for a student and updates the student's data in the JSON file.
+    Registers a course for a student in the store.
 
     :return: None
     """
@@ -556,8 +580,6 @@ def register_course():
     regcc = RegCourse(student_id, selected_course)
     addCourseToStudent(regcc)
 
-    SchoolManagementSystem.save_data("RegCourses.json", [regcc])
-
 
 title_label = tk.Label(second_frame, text="Course Registration", font=("Arial", 14))
 title_label.pack(pady=10)
@@ -582,7 +604,7 @@ register_button.pack(pady=10)
 
 def assign_course():
     """
-    Assigns a course to an instructor and updates the instructor's data in the JSON file.
+    Assigns a course to an instructor in the store.
 
     :return: None
     """
@@ -592,8 +614,6 @@ def assign_course():
     ass_course = AssCourse(instructor_id, selected_course)
     addCourseToInstructor(ass_course)
 
-    SchoolManagementSystem.save_data("AssignedCourses.json", [ass_course])
-
 
 def display_data():
     """
@@ -604,14 +624,16 @@ def display_data():
     for item in treeview.get_children():
         treeview.delete(item)
 
-    students = load_json("students.json")
-    instructors = load_json("instructors.json")
+    course_names = {course['id']: course['name'] for course in storage.iterate('courses')}
 
-    for obj in students:
-        treeview.insert("", 'end', values=(obj["name"], "Student", obj["registered_courses"]))
+    for obj in storage.iterate('students'):
+        registered_courses = [course_names[registration['course_id']]
+                              for registration in storage.iterate('registrations', student_id=obj['id'])]
+        treeview.insert("", 'end', values=(obj["name"], "Student", registered_courses))
 
-    for obj in instructors:
-        treeview.insert("", 'end', values=(obj["name"], "Instructor", obj["assigned_courses"]))
+    for obj in storage.iterate('instructors'):
+        assigned_courses = [course['name'] for course in storage.iterate('courses', instructor_id=obj['id'])]
+        treeview.insert("", 'end', values=(obj["name"], "Instructor", assigned_courses))
 
 
 
@@ -647,5 +669,14 @@ display_button.pack(side="bottom")
 
 
 
-root.mainloop()
-
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="School Management System")
+    parser.add_argument('--storage', choices=list(STORAGES), help='the store of the records (default: json)')
+    parser.add_argument('--data', help='the directory of a json store, or the database file')
+    parser.add_argument('--write-through', action='store_true',
+                        help='write the json files at every change instead of in the background')
+    args = parser.parse_args()
+    storage = open_storage(args.storage or os.environ.get('SCHOOL_STORAGE', 'json'),
+                           args.data or os.environ.get('SCHOOL_DATA'), write_behind=not args.write_through)
+    refreshCourses()
+    root.mainloop()
@@ -2,6 +2,7 @@
 from abc import ABC, abstractmethod
 import re
 import json
+from jsonstream import is_json_lines, iter_records, append_json_lines
 
 def can_be_int(s):
     try:
@@ -9,6 +10,26 @@ def can_be_int(s):
         return True
     except ValueError:
         return False
+
+# a relationship between the objects, e.g. Student.registered_courses. The constructors set it, but a
+# session.Session leaves it unset on the objects it reads from the database, and the session loads it on
+# first access, for a batch of objects at once. Without a session it starts empty (see default)
+class Related:
+    def __init__(self, default=list):
+        self.default = default
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        session = obj.__dict__.get('_session')
+        if session is None:
+            obj.__dict__[self.name] = self.default()
+        else:
+            session.load(obj, self.name)
+        return obj.__dict__[self.name]
     
 class Person(ABC):
     def __init__(self, name, age, email):
@@ -19,6 +40,21 @@ class Person(ABC):
         self.age = age
         self.__email = email
 
+    # from_row, from_rows and to_dicts are for rows read back from our own database, which were validated
+    # when they were written: they build the objects without checking the age, email and name again
+    @classmethod
+    def trusted(cls, name, age, email):
+        person = cls.__new__(cls)
+        person.name = name
+        person.age = age
+        person.__email = email
+        return person
+
+    @classmethod
+    def from_rows(cls, rows):
+        from_row = cls.from_row
+        return [from_row(row) for row in rows]
+
     @abstractmethod
     def introduce(self):
         pass
@@ -34,10 +70,27 @@ class Person(ABC):
         }
     
 class Student(Person):
+    registered_courses = Related()
+
     def __init__(self, name, age, email, student_id):
         super().__init__(name, age, email)
         self.student_id = student_id
         self.registered_courses = []
+
+    @classmethod
+    def from_row(cls, row):
+        # a row (ID, Name, Age, Email) of the Students table
+        student = cls.trusted(row[1], row[2], row[3])
+        student.student_id = row[0]
+        student.registered_courses = []
+        return student
+
+    @staticmethod
+    def to_dicts(students):
+        # the to_dict() of every student, without a call per student
+        return [{'name': student.name, 'age': student.age, 'email': student.get_email(),
+                 'student_id': student.student_id} for student in students]
+
     def introduce(self):
         return f"I am a student, my name is {self.name}, I am {self.age} years old. These are the courses that I am taking: \n {self.registered_courses}"
     def register_course(self, course):
@@ -51,10 +104,14 @@ class Student(Person):
         })
         return data
 
-    def save_to_json(self):
+    def save_to_json(self, filename='students.json'):
+        if is_json_lines(filename):
+            append_json_lines(filename, [self.to_dict()])
+            return
+
         # read existing data from the file
         try:
-            with open('students.json', 'r') as file:
+            with open(filename, 'r') as file:
                 existing_data = json.load(file)
         except Exception as e:
             existing_data = []
@@ -62,25 +119,43 @@ class Student(Person):
         # append new student data to the existing data
         existing_data.extend([self.to_dict()])
 
-        with open('students.json', 'w') as file:
+        with open(filename, 'w') as file:
             json.dump(existing_data, file, indent=4)
 
     @staticmethod
-    def load_from_json():
-        with open('students.json', 'r') as file:
-            students_data = json.load(file)
+    def load_from_json(filename='students.json'):
+        with open(filename, 'r') as file:
+            students_data = iter_records(file, filename)
             students = []
             for data in students_data:
                 student = Student(data['name'], data['age'], data['email'], data['student_id'])
-                student.registered_courses = [Course.from_dict(course) for course in data['registered_courses']]
+                # to_dict doesn't write the courses of a student, so students.json only has them if written by hand
+                student.registered_courses = [Course.from_dict(course) for course in data.get('registered_courses', [])]
                 students.append(student)
             return students
 
 class Instructor(Person):
+    assigned_courses = Related()
+
     def __init__(self, name, age, email, instructor_id):
         super().__init__(name, age, email)
         self.instructor_id = instructor_id
         self.assigned_courses = []
+
+    @classmethod
+    def from_row(cls, row):
+        # a row (ID, Name, Age, Email) of the Instructors table
+        instructor = cls.trusted(row[1], row[2], row[3])
+        instructor.instructor_id = row[0]
+        instructor.assigned_courses = []
+        return instructor
+
+    @staticmethod
+    def to_dicts(instructors):
+        # the to_dict() of every instructor, without a call per instructor
+        return [{'name': instructor.name, 'age': instructor.age, 'email': instructor.get_email(),
+                 'instructor_id': instructor.instructor_id,
+                 'assigned_courses': Course.to_dicts(instructor.assigned_courses)} for instructor in instructors]
     
     def introduce(self):
         return f"I am an instructor, my name is {self.name}, I am {self.age} years old. These are the courses that I am teaching: \n {self.assigned_courses}"
@@ -97,36 +172,65 @@ class Instructor(Person):
         })
         return data
     
-    def save_to_json(self):
+    def save_to_json(self, filename='instructors.json'):
+        if is_json_lines(filename):
+            append_json_lines(filename, [self.to_dict()])
+            return
+
         try:
-            with open('instructors.json', 'r') as file:
+            with open(filename, 'r') as file:
                 existing_data = json.load(file)
         except Exception as e:
             existing_data = []
 
         existing_data.extend([self.to_dict()])
 
-        with open('instructors.json', 'w') as file:
+        with open(filename, 'w') as file:
             json.dump(existing_data, file, indent=4)
 
     @staticmethod
-    def load_from_json():
-            with open('instructors.json', 'r') as file:
-                instructors_data = json.load(file)
+    def load_from_json(filename='instructors.json'):
+            with open(filename, 'r') as file:
+                instructors_data = iter_records(file, filename)
                 instructors = []
                 for data in instructors_data:
                     instructor = Instructor(data['name'], data['age'], data['email'], data['instructor_id'])
-                    instructor.assigned_courses = [Course(**course) for course in data['assigned_courses']]
+                    instructor.assigned_courses = [Course.from_dict(course) for course in data.get('assigned_courses', [])]
                     instructors.append(instructor)
                 return instructors
 
 class Course:
+    enrolled_students = Related()
+    instructor = Related(lambda: None)
+
     def __init__(self, course_id, course_name):
         assert course_name != ""
         self.course_id = course_id
         self.course_name = course_name
         self.enrolled_students = []
         self.instructor_id = None
+
+    # from_row, from_rows and to_dicts are for rows read back from our own database, see Person
+    @classmethod
+    def from_row(cls, row):
+        # a row (ID, Name, InstructorID) of the Courses table
+        course = cls.__new__(cls)
+        course.course_id = row[0]
+        course.course_name = row[1]
+        course.enrolled_students = []
+        course.instructor_id = row[2]
+        return course
+
+    @classmethod
+    def from_rows(cls, rows):
+        from_row = cls.from_row
+        return [from_row(row) for row in rows]
+
+    @staticmethod
+    def to_dicts(courses):
+        # the to_dict() of every course, without a call per course
+        return [{'course_id': course.course_id, 'course_name': course.course_name,
+                 'instructor_id': course.instructor_id} for course in courses]
     
     def add_student(self, student):
         self.enrolled_students.append(student)
@@ -145,22 +249,26 @@ class Course:
 
         return course
 
-    def save_to_json(self):
+    def save_to_json(self, filename='courses.json'):
+        if is_json_lines(filename):
+            append_json_lines(filename, [self.to_dict()])
+            return
+
         try:
-            with open('courses.json', 'r') as file:
+            with open(filename, 'r') as file:
                 existing_data = json.load(file)
         except Exception as e:
             existing_data = []
 
         existing_data.extend([self.to_dict()])
 
-        with open('courses.json', 'w') as file:
+        with open(filename, 'w') as file:
             json.dump(existing_data, file, indent=4)
 
     @staticmethod
-    def load_from_json():
-            with open('courses.json', 'r') as file:
-                courses_data = json.load(file)
+    def load_from_json(filename='courses.json'):
+            with open(filename, 'r') as file:
+                courses_data = iter_records(file, filename)
                 courses = []
                 for data in courses_data:
                     course = Course(data['course_id'], data['course_name'])
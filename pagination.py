@@ -0,0 +1,172 @@
+"""
+Keyset (seek) pagination over the Students, Instructors, Courses and Registrations tables.
+
+A page is read from where the previous one ended instead of skipping the rows before it::
+
+    SELECT ... FROM Students WHERE ID > ? ORDER BY ID LIMIT ?
+
+so every page is a range of the primary key index, and the 1000th page is read as fast as the
+first. A page is read by a statement of its own and only the key of its last row is kept between
+pages, so reading a whole table holds one page in memory, and no read transaction stays open
+between pages. The key is also what a cursor holds: rows inserted or deleted elsewhere in the
+table don't shift the rows after it, so a row is never skipped nor read twice by moving to the
+next page (a row inserted before the cursor is simply not seen).
+
+Cursors are handed to clients (the list endpoints of server.py) as opaque strings::
+
+    rows = fetch_page(conn, 'Students', after=decode_cursor(token))
+    token = encode_cursor(page_key('Students', rows[-1]))
+"""
+import base64
+import json
+
+from database import COLUMNS
+
+PAGE_SIZE = 500
+
+
+def key_columns(table):
+    """
+    returns the primary key columns of a table, which pages are ordered by
+
+    :param table: Students, Instructors, Courses or Registrations
+    :type table: str
+
+    :rtype: tuple of str
+    """
+    return COLUMNS[table][1]
+
+
+def page_key(table, row, columns=None):
+    """
+    returns the key of a row, to fetch the page after it
+
+    :param table: the table of the row
+    :type table: str
+
+    :param row: the row, with the columns given or all the columns of the table, in their order
+    :type row: tuple
+
+    :param columns: the columns of the row, defaults to all the columns of the table
+    :type columns: list of str or None
+
+    :rtype: tuple
+    """
+    columns = list(columns or COLUMNS[table][0])
+    return tuple(row[columns.index(column)] for column in key_columns(table))
+
+
+def fetch_page(conn, table, filters=(), after=None, limit=PAGE_SIZE, columns=None, upto=None, before=None):
+    """
+    returns up to limit rows of a table in key order, whose key is greater than after. With before,
+    returns the last limit rows whose key is smaller than it instead (the previous page), still in key order
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param table: Students, Instructors, Courses or Registrations
+    :type table: str
+
+    :param filters: (column, value) pairs the rows must match
+    :type filters: iterable of tuple
+
+    :param after: the key of the last row of the previous page, or None for the first page
+    :type after: tuple or None
+
+    :param limit: the maximum number of rows
+    :type limit: int
+
+    :param columns: the columns to read, defaults to all the columns of the table
+    :type columns: list of str or None
+
+    :param upto: the key of the last row to read, or None to read to the end of the table
+    :type upto: tuple or None
+
+    :param before: the key of the first row of the next page, to read the page before it
+    :type before: tuple or None
+
+    :return: the rows
+    :rtype: list of tuple
+    """
+    keys = key_columns(table)
+    key = "(%s)" % ", ".join(keys)
+    where = ["%s = ?" % column for column, value in filters]
+    params = [value for column, value in filters]
+    for bound, operator in [(after, '>'), (upto, '<='), (before, '<')]:
+        if bound is not None:
+            where.append("%s %s (%s)" % (key, operator, ", ".join("?" * len(bound))))
+            params.extend(bound)
+    order = ", ".join(column + (" desc" if before is not None else "") for column in keys)
+    sql = "select %s from %s where %s order by %s limit ?" % (
+        ", ".join(columns or COLUMNS[table][0]), table, " and ".join(where) or "true", order)
+    rows = conn.execute(sql, params + [limit]).fetchall()
+    if before is not None:
+        rows.reverse()
+    return rows
+
+
+def iter_pages(conn, table, filters=(), page_size=PAGE_SIZE, columns=None, after=None, upto=None):
+    """
+    yields the rows of a table a page at a time, in key order, each page starting after the last row of the previous one
+
+    :param after: the key after which to start, None to start at the beginning of the table
+    :type after: tuple or None
+
+    :param upto: the key of the last row to read, None to read to the end of the table
+    :type upto: tuple or None
+
+    :return: the pages
+    :rtype: generator of list of tuple
+    """
+    while True:
+        rows = fetch_page(conn, table, filters, after, page_size, columns, upto)
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        after = page_key(table, rows[-1], columns)
+
+
+def iter_rows(conn, table, filters=(), page_size=PAGE_SIZE, columns=None, after=None, upto=None):
+    """
+    yields the rows of a table one at a time, in key order, reading them a page at a time (see iter_pages)
+
+    :rtype: generator of tuple
+    """
+    for rows in iter_pages(conn, table, filters, page_size, columns, after, upto):
+        yield from rows
+
+
+def encode_cursor(key):
+    """
+    turns the key of a row into an opaque cursor string, safe in a url
+
+    :param key: the key, or None
+    :type key: tuple or None
+
+    :rtype: str or None
+    """
+    if key is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    turns a cursor string of encode_cursor back into a key
+
+    :param cursor: the cursor, or None or '' for the first page
+    :type cursor: str or None
+
+    :rtype: tuple or None
+    :raises ValueError: if the cursor is not one of encode_cursor
+    """
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("invalid cursor: %s" % cursor) from e
+    if not isinstance(key, list) or not key:
+        raise ValueError("invalid cursor: %s" % cursor)
+    return tuple(key)
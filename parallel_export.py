@@ -0,0 +1,373 @@
+"""
+Exports of several tables at once. Every table is split into parts, ranges of keys of at most
+shard_rows rows, which are exported at the same time by a pool of processes (or threads), each
+reading the database through a read-only connection of its own, a page at a time (see pagination.py). The parts of a table are then
+joined into its file, so a full export takes about as long as its largest part rather than the sum
+of the tables:
+
+- <table>.json (or .jsonl) in the format of transfer.export_json, the parts of json arrays being
+  written without their brackets
+- merged_data.csv in the format of transfer.export_csv, if asked for, written from the same rows
+
+Compressed parts are joined as they are, since gzip, bzip2 and xz files can hold several streams one
+after the other. With merge=False the parts are kept as complete files instead.
+
+Either way export.json lists the files of each table with the records, bytes and seconds of each
+table. Unlike backup.SnapshotJob the parts are read in separate transactions, so they don't hold
+a single point in time if the database is written to meanwhile.
+
+Usage::
+
+    python parallel_export.py --db university.db --to exports --format .jsonl --compression .gz --csv
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from urllib.request import pathname2url
+
+from backup import BackgroundJob
+from compression import open_file
+from database import DB_FILE
+from jsonstream import format_element, is_json_lines
+from pagination import iter_pages, key_columns
+from transfer import CSV_HEADER, CSV_ROWS, EXPORTS, rows_to_dicts
+
+# tables with more rows are split into parts of this many rows
+SHARD_ROWS = 100000
+CSV_FILE = 'merged_data.csv'
+MANIFEST_FILE = 'export.json'
+EXECUTORS = {'process': ProcessPoolExecutor, 'thread': ThreadPoolExecutor}
+
+
+def read_only(source):
+    """
+    opens a database file for reading only
+
+    :param source: the database file
+    :type source: str
+
+    :return: the connection
+    :rtype: sqlite3.Connection
+    """
+    return sqlite3.connect('file:%s?mode=ro' % pathname2url(os.path.abspath(source)), uri=True)
+
+
+def plan(conn, tables, shard_rows=SHARD_ROWS):
+    """
+    splits tables into ranges of keys of shard_rows rows, the last one possibly smaller, reading the keys
+    from the primary key index
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param tables: the names of the tables, e.g. students
+    :type tables: list of str
+
+    :param shard_rows: the rows of a part
+    :type shard_rows: int
+
+    :return: the parts, as dictionaries with the table, the index of the part in the table, the number of the
+        part among all parts, the key of the last row of the previous part (None for the first part), the key
+        of its own last row (None for the last part) and its number of rows
+    :rtype: list of dict
+    """
+    parts = []
+    for name in tables:
+        table = EXPORTS[name][0]
+        columns = ", ".join(key_columns(table))
+        ends = []
+        rows = 0
+        for rows, key in enumerate(conn.execute("select %s from %s order by %s" % (columns, table, columns)), 1):
+            if rows % shard_rows == 0:
+                ends.append(key)
+        if ends and rows % shard_rows == 0:
+            # the last part reads up to the end of the table, whatever was inserted since
+            ends.pop()
+        bounds = [None] + ends + [None]
+        for index in range(len(ends) + 1):
+            parts.append({'table': name, 'index': index, 'number': len(parts), 'after': bounds[index],
+                          'upto': bounds[index + 1], 'rows': shard_rows if index < len(ends) else rows - shard_rows * len(ends)})
+    return parts
+
+
+def part_filename(filename, index, kind='part'):
+    """
+    returns the file of a part of an export, e.g. students.part002.json.gz for part 2 of students.json.gz,
+    keeping its extensions so the part is written in the same format
+    """
+    directory, name = os.path.split(filename)
+    stem, dot, extensions = name.partition('.')
+    return os.path.join(directory, "%s.%s%03d%s%s" % (stem, kind, index, dot, extensions))
+
+
+def export_part(source, part, json_file, csv_file, level=None, merge=True):
+    """
+    writes the records of a part to its json file and its csv file, if any, from a read-only connection
+    of its own. Runs in the worker processes or threads.
+
+    :param source: the database file
+    :type source: str
+
+    :param part: the part, as returned by plan
+    :type part: dict
+
+    :param json_file: the json file of the part, None for none
+    :type json_file: str or None
+
+    :param csv_file: the csv file of the part, None for none
+    :type csv_file: str or None
+
+    :param level: the compression level
+    :type level: int or None
+
+    :param merge: whether the part is joined with others afterwards. If it isn't, it's a complete file.
+    :type merge: bool
+
+    :return: the part, with the number of records and bytes written and when it started and finished
+    :rtype: dict
+    """
+    started = time.time()
+    conn = read_only(source)
+    to_row = CSV_ROWS[part['table']]
+    lines = json_file is not None and is_json_lines(json_file)
+    # a complete array has its brackets, and a newline before its first record
+    array = json_file is not None and not lines and not merge
+    json_out = csv_out = None
+    records = 0
+    try:
+        if json_file:
+            json_out = open_file(json_file, 'w', level)
+        if csv_file:
+            csv_out = open_file(csv_file, 'w', level, newline='')
+            writer = csv.writer(csv_out)
+            if not merge:
+                writer.writerow(CSV_HEADER)
+        if array:
+            json_out.write('[')
+        for rows in iter_pages(conn, EXPORTS[part['table']][0], after=part['after'], upto=part['upto']):
+            if json_out is not None:
+                dicts = rows_to_dicts(part['table'], rows)
+                if lines:
+                    json_out.write("".join(json.dumps(record) + '\n' for record in dicts))
+                else:
+                    if records or array:
+                        json_out.write(',\n' if records else '\n')
+                    json_out.write(",\n".join(format_element(record) for record in dicts))
+            if csv_out is not None:
+                writer.writerows(to_row(t) for t in rows)
+            records += len(rows)
+        if array:
+            json_out.write('\n]' if records else ']')
+    finally:
+        for file in (json_out, csv_out):
+            if file is not None:
+                file.close()
+        conn.close()
+    size = sum(os.path.getsize(f) for f in (json_file, csv_file) if f)
+    return dict(part, records=records, bytes=size, started=started, finished=time.time())
+
+
+def write_text(filename, text, level=None):
+    with open_file(filename, 'w', level, newline='') as file:
+        file.write(text)
+    return filename
+
+
+def join_files(filename, pieces):
+    """
+    concatenates files into one, replacing it once complete, and deletes them
+    """
+    temporary = filename + '.tmp'
+    with open(temporary, 'wb') as out:
+        for piece in pieces:
+            with open(piece, 'rb') as file:
+                shutil.copyfileobj(file, out)
+    os.replace(temporary, filename)
+    for piece in pieces:
+        os.remove(piece)
+
+
+def merge_json(filename, parts, level=None):
+    """
+    joins the json parts of a table, given with the number of records they hold, into its export
+    """
+    if is_json_lines(filename):
+        return join_files(filename, [part_filename(filename, part['index']) for part in parts])
+    # the brackets and the separators between the parts are small compressed files of their own
+    pieces = []
+    for part in parts:
+        piece = part_filename(filename, part['index'])
+        if part['records']:
+            before = write_text(part_filename(filename, part['index'], 'before'), ',\n' if pieces else '[\n', level)
+            pieces += [before, piece]
+        else:
+            os.remove(piece)
+    end = write_text(part_filename(filename, 0, 'end'), '\n]' if pieces else '[]', level)
+    join_files(filename, pieces + [end])
+
+
+def export_tables(source, directory='.', tables=tuple(EXPORTS), extension='.json', suffix='', level=None,
+                  csv_file=None, workers=None, shard_rows=SHARD_ROWS, executor='process', merge=True, progress=None):
+    """
+    exports tables of a database into json files, and optionally merged_data.csv, exporting the parts
+    of all tables at the same time on a pool of workers, then joining them, and writes export.json
+
+    :param source: the database file
+    :type source: str
+
+    :param directory: the directory of the exports
+    :type directory: str
+
+    :param tables: the names of the tables to export
+    :type tables: iterable of str
+
+    :param extension: .json or .jsonl
+    :type extension: str
+
+    :param suffix: the compression extension, e.g. .gz, or ''
+    :type suffix: str
+
+    :param level: the compression level
+    :type level: int or None
+
+    :param csv_file: the name of the csv file (e.g. merged_data.csv) in the directory, None for none
+    :type csv_file: str or None
+
+    :param workers: the number of workers, defaults to the number of processors
+    :type workers: int or None
+
+    :param shard_rows: the rows of a part
+    :type shard_rows: int
+
+    :param executor: process or thread
+    :type executor: str
+
+    :param merge: whether the parts are joined into one file per table, or kept and listed in export.json
+    :type merge: bool
+
+    :param progress: called with the number of parts done and the number of parts after every part
+    :type progress: function or None
+
+    :return: the records, bytes, seconds and records per second of each table, and the total seconds
+    :rtype: dict
+    """
+    start = time.time()
+    os.makedirs(directory, exist_ok=True)
+    tables = [table for table in EXPORTS if table in tables]
+    conn = read_only(source)
+    try:
+        parts = plan(conn, tables, shard_rows)
+    finally:
+        conn.close()
+    json_files = {table: os.path.join(directory, table + extension + suffix) for table in tables}
+    csv_path = os.path.join(directory, csv_file) if csv_file else None
+
+    def files(part):
+        # the parts of the csv file are numbered across the tables
+        return (part_filename(json_files[part['table']], part['index']),
+                part_filename(csv_path, part['number']) if csv_path else None)
+
+    done = []
+    with EXECUTORS[executor](max_workers=workers or os.cpu_count()) as pool:
+        # the largest parts first, so that the small ones fill the gaps at the end
+        futures = [pool.submit(export_part, source, part, *files(part), level=level, merge=merge)
+                   for part in sorted(parts, key=lambda part: -part['rows'])]
+        for future in as_completed(futures):
+            done.append(future.result())
+            if progress is not None:
+                progress(len(done), len(parts))
+    done.sort(key=lambda part: (tables.index(part['table']), part['index']))
+
+    report = {'tables': {}, 'files': {}}
+    for table in tables:
+        table_parts = [part for part in done if part['table'] == table]
+        records = sum(part['records'] for part in table_parts)
+        seconds = max(part['finished'] for part in table_parts) - min(part['started'] for part in table_parts)
+        report['tables'][table] = {
+            'parts': len(table_parts), 'records': records, 'bytes': sum(part['bytes'] for part in table_parts),
+            'seconds': seconds, 'records_per_second': records / seconds if seconds else 0.0}
+        if merge:
+            merge_json(json_files[table], table_parts, level)
+            report['files'][table] = [json_files[table]]
+        else:
+            report['files'][table] = [files(part)[0] for part in table_parts]
+    if csv_path:
+        csv_parts = [files(part)[1] for part in done]
+        if merge:
+            header = io.StringIO()
+            csv.writer(header).writerow(CSV_HEADER)
+            join_files(csv_path, [write_text(part_filename(csv_path, 0, 'header'), header.getvalue(), level)] + csv_parts)
+            report['files']['csv'] = [csv_path]
+        else:
+            report['files']['csv'] = csv_parts
+    report['seconds'] = time.time() - start
+    with open(os.path.join(directory, MANIFEST_FILE), 'w') as file:
+        json.dump(report, file, indent=4)
+    return report
+
+
+class ParallelExportJob(BackgroundJob):
+    """
+    Runs export_tables on a background thread, so the application keeps working while the workers
+    export. Progress is counted in parts.
+
+    Attributes
+    ----------
+    source : str
+        The database file to export.
+    directory : str
+        The directory the exports are written to.
+    options : dict
+        The other arguments of export_tables.
+    report : dict or None
+        What export_tables returned, once the job has finished.
+    """
+
+    def __init__(self, source, directory, **options):
+        super().__init__()
+        self.source = source
+        self.directory = directory
+        self.options = options
+        self.report = None
+
+    def run(self):
+        self.report = export_tables(self.source, self.directory, progress=self.progress_of, **self.options)
+        self.update(size=sum(table['bytes'] for table in self.report['tables'].values()))
+
+    def progress_of(self, done, total):
+        self.update(done, total)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="exports the tables of the database in parallel")
+    parser.add_argument('--db', default=DB_FILE)
+    parser.add_argument('--to', default='.', help='directory of the exports')
+    parser.add_argument('--tables', nargs='+', choices=list(EXPORTS), default=list(EXPORTS))
+    parser.add_argument('--format', choices=['.json', '.jsonl'], default='.json')
+    parser.add_argument('--compression', choices=['', '.gz', '.bz2', '.xz'], default='')
+    parser.add_argument('--level', type=int)
+    parser.add_argument('--csv', action='store_true', help='also write ' + CSV_FILE)
+    parser.add_argument('--workers', type=int, help='default: the number of processors')
+    parser.add_argument('--shard-rows', type=int, default=SHARD_ROWS, help='rows per part (default: %(default)s)')
+    parser.add_argument('--threads', action='store_true', help='export on threads instead of processes')
+    parser.add_argument('--no-merge', action='store_true', help='keep the parts instead of joining them')
+    args = parser.parse_args(argv)
+
+    report = export_tables(args.db, args.to, args.tables, args.format, args.compression, args.level,
+                           CSV_FILE + args.compression if args.csv else None, args.workers, args.shard_rows,
+                           'thread' if args.threads else 'process', not args.no_merge)
+    for table, result in report['tables'].items():
+        print("%-14s%10d records in %3d parts, %8.1f MB in %6.2fs (%.0f records/s)" % (
+            table, result['records'], result['parts'], result['bytes'] / 1e6, result['seconds'],
+            result['records_per_second']))
+    print("total: %.2fs" % report['seconds'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""
+Prerequisites of the courses, and the courses the students have completed.
+
+A course may require other courses, kept in the Prerequisites table (see database.py), which may require
+courses in turn. A student can only be registered in a course once they have completed every course it
+requires, directly or through its prerequisites. Rather than walking the prerequisites of the course at every
+registration, the PrerequisiteClosure table holds every course each course requires, and is kept up to date
+by triggers as prerequisites are added and removed, and as courses are renamed or deleted: adding or removing
+a prerequisite only touches the rows of the courses above and below it. A registration then looks up each
+required course in the CompletedCourses of the student by its primary key, in constant time per prerequisite.
+
+The check runs in a trigger of the Registrations table, so every path registering students is covered: the
+app, storage.py, server.py, the imports and the jobs. The changes applied from another database by changelog.py
+are not checked again, the prerequisites and completed courses being replayed along with the registrations.
+check_eligibility runs it beforehand to name the courses missing. A prerequisite that would make a course require itself is refused. Usage::
+
+    python prerequisites.py add C3 C1 C2 --db university.db
+    python prerequisites.py show C3
+    python prerequisites.py complete S1 C1 C2
+    python prerequisites.py check S1 C3
+"""
+import argparse
+import re
+import sqlite3
+
+from database import DB_FILE, connect, write_transaction
+
+# every (course, required course) pair reachable through the prerequisites, with the number of paths between them
+CLOSURE = '''
+    WITH RECURSIVE Paths (CourseID, RequiredID) AS (
+        SELECT CourseID, PrerequisiteID FROM Prerequisites
+        UNION ALL
+        SELECT p.CourseID, e.PrerequisiteID FROM Paths p JOIN Prerequisites e ON e.CourseID = p.RequiredID
+    )
+    SELECT CourseID, RequiredID, count(*) FROM Paths GROUP BY CourseID, RequiredID
+    '''
+
+
+class PrerequisiteError(sqlite3.IntegrityError):
+    """
+    Raised when a student hasn't completed the prerequisites of a course they are registered in, or when a
+    prerequisite would make a course require itself. It is an IntegrityError, so it is reported like the
+    constraints of the database: as a StorageError by storage.py, and with a 409 status by server.py.
+    """
+
+
+def parse_ids(text):
+    """
+    reads course IDs separated by commas or semicolons, e.g. "C1, C2"
+
+    :rtype: list of str
+    """
+    return [part.strip() for part in re.split(r'[,;]', text) if part.strip()]
+
+
+def prerequisites(conn, course_id):
+    """
+    returns the courses a course requires directly
+
+    :rtype: list of str
+    """
+    return [row[0] for row in conn.execute(
+        "select PrerequisiteID from Prerequisites where CourseID = ? order by PrerequisiteID", (course_id,))]
+
+
+def required_courses(conn, course_id):
+    """
+    returns the courses a course requires, directly or through its prerequisites
+
+    :rtype: list of str
+    """
+    return [row[0] for row in conn.execute(
+        "select RequiredID from PrerequisiteClosure where CourseID = ? order by RequiredID", (course_id,))]
+
+
+def check_prerequisite(conn, course_id, prerequisite_id):
+    """
+    raises a PrerequisiteError if a course requiring another would make it require itself
+
+    :return: Nothing.
+    :rtype: None
+    :raises PrerequisiteError: if the course is the prerequisite, or the prerequisite requires the course already
+    """
+    if course_id == prerequisite_id or conn.execute(
+            "select 1 from PrerequisiteClosure where CourseID = ? and RequiredID = ?",
+            (prerequisite_id, course_id)).fetchone():
+        raise PrerequisiteError("%s can't require %s: it would require itself" % (course_id, prerequisite_id))
+
+
+def add_prerequisite(conn, course_id, prerequisite_id):
+    """
+    makes a course require another
+
+    :return: Nothing.
+    :rtype: None
+    :raises PrerequisiteError: if it would make the course require itself
+    :raises sqlite3.IntegrityError: if one of the courses doesn't exist, or the course requires the other already
+    """
+    def add(conn):
+        check_prerequisite(conn, course_id, prerequisite_id)
+        conn.execute("insert into Prerequisites (CourseID, PrerequisiteID) values (?, ?)", (course_id, prerequisite_id))
+    write_transaction(conn, add)
+
+
+def remove_prerequisite(conn, course_id, prerequisite_id):
+    """
+    makes a course no longer require another
+
+    :return: whether the course required it
+    :rtype: bool
+    """
+    return write_transaction(conn, lambda conn: conn.execute(
+        "delete from Prerequisites where CourseID = ? and PrerequisiteID = ?",
+        (course_id, prerequisite_id)).rowcount > 0)
+
+
+def set_prerequisites(conn, course_id, prerequisite_ids):
+    """
+    replaces the prerequisites of a course, in one transaction
+
+    :param course_id: the ID of the course
+    :type course_id: str
+
+    :param prerequisite_ids: the IDs of the courses it requires
+    :type prerequisite_ids: list of str
+
+    :return: Nothing.
+    :rtype: None
+    :raises PrerequisiteError: if it would make the course require itself
+    :raises sqlite3.IntegrityError: if one of the courses doesn't exist
+    """
+    wanted = list(dict.fromkeys(prerequisite_ids))
+
+    def replace(conn):
+        current = set(prerequisites(conn, course_id))
+        conn.executemany("delete from Prerequisites where CourseID = ? and PrerequisiteID = ?",
+                         [(course_id, prerequisite_id) for prerequisite_id in current - set(wanted)])
+        for prerequisite_id in wanted:
+            if prerequisite_id not in current:
+                check_prerequisite(conn, course_id, prerequisite_id)
+                conn.execute("insert into Prerequisites (CourseID, PrerequisiteID) values (?, ?)",
+                             (course_id, prerequisite_id))
+    write_transaction(conn, replace)
+
+
+def completed_courses(conn, student_id):
+    """
+    returns the courses a student has completed
+
+    :rtype: list of str
+    """
+    return [row[0] for row in conn.execute(
+        "select CourseID from CompletedCourses where StudentID = ? order by CourseID", (student_id,))]
+
+
+def complete_courses(conn, student_id, course_ids):
+    """
+    records that a student has completed courses, those recorded already being skipped
+
+    :return: the number of courses recorded
+    :rtype: int
+    :raises sqlite3.IntegrityError: if the student or one of the courses doesn't exist
+    """
+    return write_transaction(conn, lambda conn: conn.executemany(
+        "insert or ignore into CompletedCourses (StudentID, CourseID) values (?, ?)",
+        [(student_id, course_id) for course_id in course_ids]).rowcount)
+
+
+def missing_prerequisites(conn, student_id, course_id):
+    """
+    returns the courses required by a course that a student hasn't completed, each looked up in the completed
+    courses of the student by its primary key
+
+    :rtype: list of str
+    """
+    return [row[0] for row in conn.execute('''
+        select c.RequiredID from PrerequisiteClosure c
+        where c.CourseID = ? and not exists (
+            select 1 from CompletedCourses d where d.StudentID = ? and d.CourseID = c.RequiredID)
+        order by c.RequiredID
+        ''', (course_id, student_id))]
+
+
+def check_eligibility(conn, student_id, course_id):
+    """
+    raises a PrerequisiteError if a student hasn't completed the prerequisites of a course
+
+    :return: Nothing.
+    :rtype: None
+    :raises PrerequisiteError: naming the courses missing
+    """
+    missing = missing_prerequisites(conn, student_id, course_id)
+    if missing:
+        raise PrerequisiteError("student %s has to complete %s before %s" % (
+            student_id, ", ".join(missing), course_id))
+
+
+def rebuild_closure(conn):
+    """
+    computes PrerequisiteClosure again from the Prerequisites table, e.g. after it was edited with the
+    triggers dropped
+
+    :return: the number of (course, required course) pairs
+    :rtype: int
+    """
+    def rebuild(conn):
+        conn.execute("delete from PrerequisiteClosure")
+        return conn.execute("insert into PrerequisiteClosure (CourseID, RequiredID, Paths) " + CLOSURE).rowcount
+    return write_transaction(conn, rebuild)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="prerequisites of the courses, and the courses completed")
+    parser.add_argument('command', choices=['add', 'remove', 'show', 'complete', 'check', 'rebuild'])
+    parser.add_argument('id', nargs='?', help='the course (add, remove, show) or the student (complete, check)')
+    parser.add_argument('courses', nargs='*', help='the prerequisites to add or remove, the courses completed, '
+                                                   'or the course to check')
+    parser.add_argument('--db', default=DB_FILE)
+    args = parser.parse_args(argv)
+    if args.command != 'rebuild' and not args.id:
+        parser.error("%s needs an ID" % args.command)
+    if args.command == 'check' and len(args.courses) != 1:
+        parser.error("check needs a student and a course")
+
+    conn = connect(args.db)
+    if args.command == 'add':
+        set_prerequisites(conn, args.id, prerequisites(conn, args.id) + args.courses)
+    elif args.command == 'remove':
+        for course_id in args.courses:
+            remove_prerequisite(conn, args.id, course_id)
+    elif args.command == 'complete':
+        complete_courses(conn, args.id, args.courses)
+    elif args.command == 'rebuild':
+        print("%d required courses" % rebuild_closure(conn))
+    if args.command in ('add', 'remove', 'show'):
+        print("%s requires %s" % (args.id, ", ".join(prerequisites(conn, args.id)) or "nothing"))
+        print("and through them %s" % (", ".join(required_courses(conn, args.id)) or "nothing"))
+    elif args.command == 'complete':
+        print("%s has completed %s" % (args.id, ", ".join(completed_courses(conn, args.id)) or "nothing"))
+    elif args.command == 'check':
+        missing = missing_prerequisites(conn, args.id, args.courses[0])
+        print("%s can register in %s" % (args.id, args.courses[0]) if not missing else
+              "%s has to complete %s first" % (args.id, ", ".join(missing)))
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+Lookups of the records read most often while advising: the schedule of a student, the roster of a
+course and the courses of an instructor, behind a least recently used cache of their results.
+
+Every cached result is stored with the generations of the tables it was read from. database.py
+bumps the generation of a table on every row written to it, from any connection or process, so a
+result is served from the cache only as long as none of its tables has been written to since, and a
+write to Students, say, leaves the cached schedules alone. The generations themselves are only read
+again from the database once the connection has written something or another connection has
+committed, so a cache hit doesn't run any query::
+
+    queries = Queries(conn)
+    queries.student_schedule('S0000001')
+    queries.cache.stats()
+
+A QueryCache can be shared by the Queries of several connections, e.g. one per reader thread.
+"""
+import threading
+from collections import OrderedDict
+
+CACHE_SIZE = 4096
+
+# name -> (tables the result is read from, column headers, query)
+QUERIES = {
+    'student_schedule': (
+        ('Registrations', 'Courses', 'Instructors'),
+        ['Course ID', 'Course', 'Instructor ID', 'Instructor'],
+        '''
+        SELECT c.ID, c.Name, c.InstructorID, i.Name
+        FROM Registrations r
+        JOIN Courses c ON c.ID = r.CourseID
+        LEFT JOIN Instructors i ON i.ID = c.InstructorID
+        WHERE r.StudentID = ?
+        ORDER BY c.ID
+        ''',
+    ),
+    'course_roster': (
+        ('Registrations', 'Students'),
+        ['Student ID', 'Name', 'Age', 'Email'],
+        '''
+        SELECT s.ID, s.Name, s.Age, s.Email
+        FROM Registrations r
+        JOIN Students s ON s.ID = r.StudentID
+        WHERE r.CourseID = ?
+        ORDER BY s.ID
+        ''',
+    ),
+    'instructor_courses': (
+        ('Courses', 'Registrations'),
+        ['Course ID', 'Course', 'Students'],
+        '''
+        SELECT c.ID, c.Name, ifnull(e.Students, 0)
+        FROM Courses c
+        LEFT JOIN CourseEnrollment e ON e.CourseID = c.ID
+        WHERE c.InstructorID = ?
+        ORDER BY c.ID
+        ''',
+    ),
+}
+
+
+class QueryCache:
+    """
+    A bounded least recently used cache of query results, safe to share between threads.
+
+    Attributes
+    ----------
+    maxsize : int
+        The number of results kept at most.
+    hits : int
+        The lookups answered from the cache.
+    misses : int
+        The lookups that were not in the cache, or whose tables had changed since.
+    stale : int
+        The misses whose result was in the cache but whose tables had changed since.
+    evictions : int
+        The results dropped to keep the cache within maxsize.
+
+    Methods
+    -------
+    get(key, generations)
+        Returns the cached result of key if it was read at the given generations, else None.
+    put(key, generations, result)
+        Stores a result read at the given generations.
+    stats()
+        Returns the size and hit rate of the cache as a dictionary.
+    clear()
+        Drops every result and resets the statistics.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.stale = self.evictions = 0
+
+    def get(self, key, generations):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == generations:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            if entry is not None:
+                self.stale += 1
+            return None
+
+    def put(self, key, generations, result):
+        with self.lock:
+            self.entries[key] = (generations, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.stale = self.evictions = 0
+
+
+class Queries:
+    """
+    The cached lookups, run on one connection.
+
+    Attributes
+    ----------
+    conn : sqlite3.Connection
+        The connection the queries run on, from a single thread.
+    cache : QueryCache
+        The cache of results, possibly shared with the Queries of other connections.
+
+    Methods
+    -------
+    student_schedule(student_id)
+        Returns the courses of a student, with their instructors.
+    course_roster(course_id)
+        Returns the students registered in a course.
+    instructor_courses(instructor_id)
+        Returns the courses of an instructor, with their number of students.
+    generations()
+        Returns the current generation of every table.
+    """
+
+    def __init__(self, conn, cache=None):
+        self.conn = conn
+        self.cache = QueryCache() if cache is None else cache
+        self.state = None
+        self.current = None
+
+    def generations(self):
+        # data_version changes when another connection commits, total_changes when this one writes,
+        # and in_transaction when it commits or rolls back: otherwise the generations can't have changed
+        state = (self.conn.execute("PRAGMA data_version").fetchone()[0], self.conn.total_changes,
+                 self.conn.in_transaction)
+        if state != self.state:
+            self.current = dict(self.conn.execute("SELECT TableName, Generation FROM Generations"))
+            self.state = state
+        return self.current
+
+    def run(self, name, *args):
+        """
+        returns the rows of a query, from the cache if none of its tables has been written to since they were read.
+        Results read inside a transaction may be rolled back, so they are not cached.
+        """
+        tables, header, query = QUERIES[name]
+        current = self.generations()
+        generations = tuple(current[table] for table in tables)
+        key = (name,) + args
+        rows = self.cache.get(key, generations)
+        if rows is None:
+            rows = tuple(self.conn.execute(query, args))
+            if not self.conn.in_transaction:
+                self.cache.put(key, generations, rows)
+        return rows
+
+    def student_schedule(self, student_id):
+        """
+        returns the courses a student is registered in, with their instructors
+
+        :param student_id: the ID of the student
+        :type student_id: str
+
+        :return: (course ID, course name, instructor ID, instructor name) rows, in course order
+        :rtype: tuple of tuple
+        """
+        return self.run('student_schedule', student_id)
+
+    def course_roster(self, course_id):
+        """
+        returns the students registered in a course
+
+        :param course_id: the ID of the course
+        :type course_id: str
+
+        :return: (ID, name, age, email) rows, in student order
+        :rtype: tuple of tuple
+        """
+        return self.run('course_roster', course_id)
+
+    def instructor_courses(self, instructor_id):
+        """
+        returns the courses taught by an instructor, with their number of students
+
+        :param instructor_id: the ID of the instructor
+        :type instructor_id: str
+
+        :return: (course ID, course name, number of students) rows, in course order
+        :rtype: tuple of tuple
+        """
+        return self.run('instructor_courses', instructor_id)
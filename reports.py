@@ -0,0 +1,141 @@
+"""
+Enrollment and teaching load reports, read from the summary tables that database.py keeps up to date
+with triggers. A report only reads one row per course or per instructor, so it takes the same time
+however many registrations there are.
+
+Bulk loads can skip the triggers for the rows they write and rebuild the summary tables once at the end
+instead (see database.bulk_load), which is faster than updating them for every row.
+
+Usage::
+
+    python reports.py enrollment --db university.db
+    python reports.py load --csv teaching_load.csv
+    python reports.py refresh
+"""
+import argparse
+import csv
+
+from compression import open_file
+from database import DB_FILE, REFRESH_SUMMARIES, connect, write_transaction
+
+# name -> (title, column headers, query)
+REPORTS = {
+    'enrollment': (
+        'Students per course',
+        ['Course ID', 'Course', 'Instructor', 'Students', 'Average age'],
+        '''
+        SELECT c.ID, c.Name, i.Name, ifnull(e.Students, 0),
+            (SELECT round(sum(a.Age * a.Students) * 1.0 / sum(a.Students), 1) FROM CourseAges a WHERE a.CourseID = c.ID)
+        FROM Courses c
+        LEFT JOIN CourseEnrollment e ON e.CourseID = c.ID
+        LEFT JOIN Instructors i ON i.ID = c.InstructorID
+        ORDER BY 4 DESC, c.ID
+        ''',
+    ),
+    'load': (
+        'Teaching load per instructor',
+        ['Instructor ID', 'Instructor', 'Courses', 'Students'],
+        '''
+        SELECT i.ID, i.Name, ifnull(l.Courses, 0), ifnull(l.Students, 0)
+        FROM Instructors i
+        LEFT JOIN InstructorLoad l ON l.InstructorID = i.ID
+        ORDER BY 4 DESC, i.ID
+        ''',
+    ),
+    'ages': (
+        'Age distribution per course',
+        ['Course ID', 'Course', 'Age', 'Students'],
+        '''
+        SELECT a.CourseID, c.Name, a.Age, a.Students
+        FROM CourseAges a
+        JOIN Courses c ON c.ID = a.CourseID
+        ORDER BY a.CourseID, a.Age
+        ''',
+    ),
+}
+
+
+def report(conn, name):
+    """
+    returns the column headers and the rows of a report
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param name: enrollment, load or ages
+    :type name: str
+
+    :return: the headers and the rows
+    :rtype: tuple
+    """
+    title, header, query = REPORTS[name]
+    return header, conn.execute(query).fetchall()
+
+
+def export_report(conn, name, filename=None, level=None):
+    """
+    writes a report into a csv file, overwriting it if it exists.
+    The file is compressed if its name ends with .gz, .bz2 or .xz
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param name: enrollment, load or ages
+    :type name: str
+
+    :param filename: the file to write, defaults to <name>.csv
+    :type filename: str or None
+
+    :param level: the compression level
+    :type level: int or None
+
+    :return: the number of rows written
+    :rtype: int
+    """
+    header, rows = report(conn, name)
+    with open_file(filename or name + '.csv', 'w', level, newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return len(rows)
+
+
+def refresh_summaries(conn):
+    """
+    rebuilds the summary tables from the Registrations, Students and Courses tables, in one transaction
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :return: Nothing.
+    :rtype: None
+    """
+    def refresh(conn):
+        for statement in REFRESH_SUMMARIES:
+            conn.execute(statement)
+
+    write_transaction(conn, refresh)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="enrollment and teaching load reports")
+    parser.add_argument('report', choices=list(REPORTS) + ['refresh'],
+                        help='the report to print, or refresh to rebuild the summary tables')
+    parser.add_argument('--db', default=DB_FILE)
+    parser.add_argument('--csv', help='csv file to write the report to instead of printing it')
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    if args.report == 'refresh':
+        refresh_summaries(conn)
+    elif args.csv:
+        print("%d rows written to %s" % (export_report(conn, args.report, args.csv), args.csv))
+    else:
+        header, rows = report(conn, args.report)
+        print("\t".join(header))
+        for row in rows:
+            print("\t".join('' if value is None else str(value) for value in row))
+
+
+if __name__ == '__main__':
+    main()
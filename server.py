@@ -0,0 +1,594 @@
+"""
+Local JSON/HTTP API over the school database, built on asyncio and the standard library only.
+
+Run it with::
+
+    python server.py --db university.db --port 8080
+
+Endpoints (request and response bodies are json)::
+
+    GET    /students?name=&id=          list students, optionally filtered like the Display Data tab
+    GET    /students?limit=&after=      one page of students: {"rows": [...], "next": cursor of the next page or null}
+    POST   /students                    {"id", "name", "age", "email"}
+    GET    /students/<id>
+    PATCH  /students/<id>               any of {"name", "age", "email"}
+    DELETE /students/<id>
+    (the same for /instructors, and for /courses with {"id", "name", "instructor_id"})
+    GET    /registrations?student_id=&course_id=
+    (every list takes limit and after, the cursor of the previous page)
+    POST   /registrations               {"student_id", "course_id"}
+    DELETE /registrations/<student_id>/<course_id>
+    PUT    /courses/<id>/instructor     {"instructor_id"}
+    GET    /students/<id>/schedule      the courses of a student, with their instructors
+    GET    /courses/<id>/roster         the students registered in a course
+    GET    /instructors/<id>/courses    the courses of an instructor, with their number of students
+    GET    /export/<table>              students, instructors, courses or registrations, in the json export format
+    GET    /export/csv                  the merged csv export
+    GET    /metrics                     request and statement latencies
+    GET    /cache                       hit rate of the cache of schedules, rosters and courses
+
+A registration, or an instructor assigned to a course, that would give the student or the instructor two
+courses at the same time is refused with a 409, like a row breaking a constraint (see timetable.py), and
+so is the registration of a student who hasn't completed the prerequisites of the course (see prerequisites.py).
+
+The sqlite work runs on a bounded executor: one writer thread with its own connection, and a pool of
+reader threads each with their own read-only connection, on a database in WAL mode so that readers
+and the writer don't block each other. Lists and exports are streamed with chunked transfer encoding,
+a page of rows at a time, so large result sets are never held in memory. Pages are read with keyset
+pagination (see pagination.py), so a deep page costs as much as the first one.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qsl, unquote
+
+from database import DB_FILE, connect, use_wal, write_transaction
+from instrumentation import metrics, InstrumentedConnection
+from objects import Student, Instructor, Course
+from pagination import decode_cursor, encode_cursor, fetch_page as fetch_table_page, page_key
+from queries import Queries, QueryCache
+from prerequisites import check_eligibility
+from timetable import check_assignment, check_registration
+from transfer import EXPORTS, CSV_HEADER, CSV_ROWS
+
+PAGE_SIZE = 1000
+MAX_BODY = 1024 * 1024
+
+REASONS = {200: 'OK', 201: 'Created', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+def make_person(cls):
+    return lambda f: cls(f['name'], f['age'], f['email'], f['id'])
+
+
+def make_course(f):
+    course = Course(f['id'], f['name'])
+    course.instructor_id = f.get('instructor_id')
+    return course
+
+
+# resource name -> table, its columns and the json fields they map to, its key, and how to validate a record
+RESOURCES = {
+    'students': {
+        'table': 'Students',
+        'columns': ['ID', 'Name', 'Age', 'Email'],
+        'fields': ['id', 'name', 'age', 'email'],
+        'key': ['ID'],
+        'required': ['id', 'name', 'age', 'email'],
+        'validate': make_person(Student),
+    },
+    'instructors': {
+        'table': 'Instructors',
+        'columns': ['ID', 'Name', 'Age', 'Email'],
+        'fields': ['id', 'name', 'age', 'email'],
+        'key': ['ID'],
+        'required': ['id', 'name', 'age', 'email'],
+        'validate': make_person(Instructor),
+    },
+    'courses': {
+        'table': 'Courses',
+        'columns': ['ID', 'Name', 'InstructorID'],
+        'fields': ['id', 'name', 'instructor_id'],
+        'key': ['ID'],
+        'required': ['id', 'name'],
+        'validate': make_course,
+    },
+    'registrations': {
+        'table': 'Registrations',
+        'columns': ['StudentID', 'CourseID'],
+        'fields': ['student_id', 'course_id'],
+        'key': ['StudentID', 'CourseID'],
+        'required': ['student_id', 'course_id'],
+        'validate': None,
+    },
+}
+
+# lookup of queries.py -> the json fields of its columns
+LOOKUP_FIELDS = {
+    'student_schedule': ['course_id', 'course_name', 'instructor_id', 'instructor_name'],
+    'course_roster': ['id', 'name', 'age', 'email'],
+    'instructor_courses': ['course_id', 'course_name', 'students'],
+}
+
+# query parameters accepted by the list endpoints, and the columns they filter on
+FILTERS = {
+    'students': {'name': 'Name', 'id': 'ID'},
+    'instructors': {'name': 'Name', 'id': 'ID'},
+    'courses': {'name': 'Name', 'id': 'ID', 'instructor_id': 'InstructorID'},
+    'registrations': {'student_id': 'StudentID', 'course_id': 'CourseID'},
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+#### Database work, run on the executor threads
+
+def fetch_page(conn, resource, filters, after, limit):
+    """
+    returns up to limit rows of a resource whose key is greater than after, in key order
+
+    :param filters: (column, value) pairs the rows must match
+    :type filters: list of tuple
+    :param after: the key of the last row of the previous page, or None for the first page
+    :type after: tuple or None
+    """
+    spec = RESOURCES[resource]
+    return fetch_table_page(conn, spec['table'], filters, after, limit, spec['columns'])
+
+
+def fetch_one(conn, resource, key):
+    spec = RESOURCES[resource]
+    return conn.execute("select %s from %s where %s" % (
+        ", ".join(spec['columns']), spec['table'], " and ".join("%s = ?" % c for c in spec['key'])), key).fetchone()
+
+
+def insert(conn, resource, values):
+    spec = RESOURCES[resource]
+    if resource == 'registrations':
+        check_eligibility(conn, *values)
+        check_registration(conn, *values)
+    instructor_id = dict(zip(spec['columns'], values)).get('InstructorID')
+    if resource == 'courses' and instructor_id is not None:
+        check_assignment(conn, instructor_id, values[0])
+    conn.execute("insert into %s (%s) values (%s)" % (
+        spec['table'], ", ".join(spec['columns']), ", ".join("?" * len(values))), values)
+
+
+def update(conn, resource, key, changes):
+    """
+    updates the given columns of a row, returns the number of updated rows
+    """
+    spec = RESOURCES[resource]
+    if resource == 'courses' and changes.get('InstructorID') is not None:
+        check_assignment(conn, changes['InstructorID'], key[0])
+    return conn.execute("update %s set %s where %s" % (
+        spec['table'], ", ".join("%s = ?" % column for column in changes),
+        " and ".join("%s = ?" % c for c in spec['key'])), list(changes.values()) + list(key)).rowcount
+
+
+def delete(conn, resource, key):
+    spec = RESOURCES[resource]
+    return conn.execute("delete from %s where %s" % (
+        spec['table'], " and ".join("%s = ?" % c for c in spec['key'])), key).rowcount
+
+
+class DatabaseExecutor:
+    """
+    Runs blocking sqlite work off the event loop: writes on a single writer thread, reads on a pool
+    of reader threads. Every thread has its own connection. At most max_pending jobs are queued at a
+    time, further requests wait for a slot. The reader threads share one cache of lookup results.
+    """
+
+    def __init__(self, filename=DB_FILE, readers=4, max_pending=256):
+        self.filename = filename
+        self.local = threading.local()
+        conn = connect(filename)
+        use_wal(conn)
+        conn.close()
+        self.writer = ThreadPoolExecutor(1, 'db-writer', initializer=self.open, initargs=(False,))
+        self.readers = ThreadPoolExecutor(readers, 'db-reader', initializer=self.open, initargs=(True,))
+        self.max_pending = max_pending
+        self.pending = None
+        self.cache = QueryCache()
+
+    def open(self, read_only):
+        conn = connect(self.filename, InstrumentedConnection)
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        self.local.conn = conn
+        self.local.queries = Queries(conn, self.cache)
+
+    def call_read(self, function, args):
+        return function(self.local.conn, *args)
+
+    def call_lookup(self, name, args):
+        return self.local.queries.run(name, *args)
+
+    def call_write(self, function, args):
+        # other processes, e.g. app_PyQt5.py, may be writing to the database as well
+        return write_transaction(self.local.conn, lambda conn: function(conn, *args))
+
+    async def run(self, pool, call, function, args):
+        if self.pending is None:
+            self.pending = asyncio.Semaphore(self.max_pending)
+        async with self.pending:
+            return await asyncio.get_running_loop().run_in_executor(pool, call, function, args)
+
+    async def read(self, function, *args):
+        """
+        runs function(conn, *args) on a reader thread
+        """
+        return await self.run(self.readers, self.call_read, function, args)
+
+    async def lookup(self, name, *args):
+        """
+        runs a query of queries.py on a reader thread, through the shared cache
+        """
+        return await self.run(self.readers, self.call_lookup, name, args)
+
+    async def write(self, function, *args):
+        """
+        runs function(conn, *args) on the writer thread and commits, or rolls back if it raises
+        """
+        return await self.run(self.writer, self.call_write, function, args)
+
+    def shutdown(self):
+        self.writer.shutdown()
+        self.readers.shutdown()
+
+
+#### HTTP
+
+class Request:
+    def __init__(self, method, target, version, headers, body):
+        self.method = method
+        url = urlsplit(target)
+        self.path = url.path
+        self.query = dict(parse_qsl(url.query))
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        try:
+            data = json.loads(self.body or b'{}')
+        except ValueError:
+            raise HTTPError(400, "the body is not valid json")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "the body must be a json object")
+        return data
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+
+class Response:
+    def __init__(self, status, data=None):
+        self.status = status
+        self.data = data
+
+
+class StreamResponse:
+    """
+    A response whose body is produced by an async iterator of bytes, sent with chunked encoding
+    """
+
+    def __init__(self, chunks, content_type='application/json'):
+        self.status = 200
+        self.chunks = chunks
+        self.content_type = content_type
+
+
+async def read_request(reader):
+    """
+    reads one request from the connection, returns None if the client closed it
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY:
+        raise HTTPError(413, "the body is too large")
+    body = await reader.readexactly(length) if length else b''
+    return Request(method, target, version, headers, body)
+
+
+def head(status, headers):
+    lines = ["HTTP/1.1 %d %s" % (status, REASONS.get(status, ''))]
+    lines.extend("%s: %s" % header for header in headers)
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+
+async def send(writer, response, keep_alive):
+    connection = ('Connection', 'keep-alive' if keep_alive else 'close')
+    if isinstance(response, StreamResponse):
+        writer.write(head(response.status, [('Content-Type', response.content_type),
+                                            ('Transfer-Encoding', 'chunked'), connection]))
+        async for chunk in response.chunks:
+            if chunk:
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                await writer.drain()
+        writer.write(b"0\r\n\r\n")
+    else:
+        body = b'' if response.data is None else json.dumps(response.data).encode()
+        writer.write(head(response.status, [('Content-Type', 'application/json'),
+                                            ('Content-Length', len(body)), connection]) + body)
+    await writer.drain()
+
+
+class SchoolServer:
+    """
+    The API server. Routes are matched in order against "METHOD path".
+    """
+
+    def __init__(self, filename=DB_FILE, readers=4, page_size=PAGE_SIZE):
+        self.db = DatabaseExecutor(filename, readers)
+        self.page_size = page_size
+        resources = "(students|instructors|courses)"
+        self.routes = [
+            ('GET', r'/metrics', self.get_metrics),
+            ('GET', r'/cache', self.get_cache),
+            ('GET', r'/(students)/([^/]+)/schedule', self.lookup),
+            ('GET', r'/(courses)/([^/]+)/roster', self.lookup),
+            ('GET', r'/(instructors)/([^/]+)/courses', self.lookup),
+            ('GET', r'/export/csv', self.export_csv),
+            ('GET', r'/export/(students|instructors|courses|registrations)', self.export),
+            ('PUT', r'/courses/([^/]+)/instructor', self.assign_instructor),
+            ('GET', r'/(registrations)', self.list),
+            ('POST', r'/(registrations)', self.create),
+            ('DELETE', r'/(registrations)/([^/]+)/([^/]+)', self.delete),
+            ('GET', r'/%s' % resources, self.list),
+            ('POST', r'/%s' % resources, self.create),
+            ('GET', r'/%s/([^/]+)' % resources, self.get),
+            ('PATCH', r'/%s/([^/]+)' % resources, self.update),
+            ('DELETE', r'/%s/([^/]+)' % resources, self.delete),
+        ]
+        self.routes = [(method, re.compile(pattern + '$'), handler) for method, pattern, handler in self.routes]
+
+    def route(self, request):
+        allowed = False
+        for method, pattern, handler in self.routes:
+            match = pattern.match(request.path)
+            if match:
+                if method == request.method:
+                    return handler, [unquote(group) for group in match.groups()]
+                allowed = True
+        if allowed:
+            raise HTTPError(405, "method not allowed")
+        raise HTTPError(404, "no such endpoint")
+
+    async def handle(self, request):
+        """
+        runs the handler of a request and converts errors to responses
+        """
+        start = time.perf_counter()
+        name = 'http %s' % request.method
+        try:
+            handler, args = self.route(request)
+            # e.g. "http get students", so that all requests for one endpoint share a histogram
+            name = " ".join(['http', handler.__name__] + [arg for arg in args[:1] if arg in RESOURCES])
+            return await handler(request, *args)
+        except HTTPError as e:
+            return Response(e.status, {'error': str(e)})
+        except (AssertionError, ValueError, KeyError, TypeError) as e:
+            return Response(400, {'error': "invalid record: %s" % (str(e) or type(e).__name__)})
+        except sqlite3.IntegrityError as e:
+            return Response(409, {'error': str(e)})
+        except Exception as e:
+            return Response(500, {'error': "%s: %s" % (type(e).__name__, e)})
+        finally:
+            metrics.record(name, time.perf_counter() - start)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    await send(writer, Response(e.status, {'error': str(e)}), False)
+                    break
+                if request is None:
+                    break
+                response = await self.handle(request)
+                await send(writer, response, request.keep_alive)
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    #### streaming
+
+    async def pages(self, resource, filters=()):
+        """
+        yields the rows of a resource a page at a time, using the key of the last row of a page to fetch the next
+        """
+        after = None
+        while True:
+            rows = await self.db.read(fetch_page, resource, list(filters), after, self.page_size)
+            if rows:
+                yield rows
+            if len(rows) < self.page_size:
+                return
+            after = page_key(RESOURCES[resource]['table'], rows[-1], RESOURCES[resource]['columns'])
+
+    async def json_array(self, pages, to_json):
+        yield b'['
+        first = True
+        async for rows in pages:
+            chunk = ",".join(json.dumps(to_json(row)) for row in rows)
+            yield (chunk if first else "," + chunk).encode()
+            first = False
+        yield b']'
+
+    #### handlers
+
+    async def get_metrics(self, request):
+        return Response(200, metrics.snapshot())
+
+    async def get_cache(self, request):
+        return Response(200, self.db.cache.stats())
+
+    async def lookup(self, request, resource, key):
+        name = {'students': 'student_schedule', 'courses': 'course_roster', 'instructors': 'instructor_courses'}[resource]
+        rows = await self.db.lookup(name, key)
+        return Response(200, [dict(zip(LOOKUP_FIELDS[name], row)) for row in rows])
+
+    async def list(self, request, resource):
+        filters = [(column, request.query[param]) for param, column in FILTERS[resource].items()
+                   if request.query.get(param)]
+        fields = RESOURCES[resource]['fields']
+        if request.query.get('limit') or request.query.get('after'):
+            return await self.page(request, resource, filters)
+        return StreamResponse(self.json_array(self.pages(resource, filters), lambda row: dict(zip(fields, row))))
+
+    async def page(self, request, resource, filters):
+        """
+        returns one page of a list, and the cursor of the next page, which stays valid whatever is inserted meanwhile
+        """
+        spec = RESOURCES[resource]
+        try:
+            limit = int(request.query.get('limit') or self.page_size)
+            after = decode_cursor(request.query.get('after'))
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        if not 0 < limit <= self.page_size or (after is not None and len(after) != len(spec['key'])):
+            raise HTTPError(400, "limit must be between 1 and %d, and after a cursor of this list" % self.page_size)
+        rows = await self.db.read(fetch_page, resource, filters, after, limit)
+        cursor = encode_cursor(page_key(spec['table'], rows[-1], spec['columns'])) if len(rows) == limit else None
+        return Response(200, {'rows': [dict(zip(spec['fields'], row)) for row in rows], 'next': cursor})
+
+    async def get(self, request, resource, key):
+        row = await self.db.read(fetch_one, resource, [key])
+        if row is None:
+            raise HTTPError(404, "no %s with ID %s" % (resource[:-1], key))
+        return Response(200, dict(zip(RESOURCES[resource]['fields'], row)))
+
+    async def create(self, request, resource):
+        spec = RESOURCES[resource]
+        data = request.json()
+        missing = [field for field in spec['required'] if data.get(field) in (None, "")]
+        if missing:
+            raise HTTPError(400, "missing fields: " + ", ".join(missing))
+        if spec['validate']:
+            spec['validate'](data)
+        values = [data.get(field) for field in spec['fields']]
+        await self.db.write(insert, resource, values)
+        return Response(201, dict(zip(spec['fields'], values)))
+
+    async def update(self, request, resource, key):
+        spec = RESOURCES[resource]
+        data = request.json()
+        row = await self.db.read(fetch_one, resource, [key])
+        if row is None:
+            raise HTTPError(404, "no %s with ID %s" % (resource[:-1], key))
+        record = dict(zip(spec['fields'], row))
+        changes = {column: data[field] for field, column in zip(spec['fields'], spec['columns'])
+                   if field != 'id' and data.get(field) not in (None, "")}
+        if not changes:
+            return Response(200, record)
+        record.update({field: data[field] for field in spec['fields']
+                       if field != 'id' and data.get(field) not in (None, "")})
+        spec['validate'](record)
+        if not await self.db.write(update, resource, [key], changes):
+            raise HTTPError(404, "no %s with ID %s" % (resource[:-1], key))
+        return Response(200, record)
+
+    async def delete(self, request, resource, *key):
+        if not await self.db.write(delete, resource, list(key)):
+            raise HTTPError(404, "no such %s" % resource[:-1])
+        return Response(204)
+
+    async def assign_instructor(self, request, course_id):
+        instructor_id = request.json().get('instructor_id')
+        if not instructor_id:
+            raise HTTPError(400, "missing fields: instructor_id")
+        if not await self.db.write(update, 'courses', [course_id], {'InstructorID': instructor_id}):
+            raise HTTPError(404, "no course with ID %s" % course_id)
+        return Response(200, {'id': course_id, 'instructor_id': instructor_id})
+
+    async def export(self, request, table):
+        to_dict = EXPORTS[table][1]
+        return StreamResponse(self.json_array(self.pages(table), to_dict))
+
+    async def export_csv(self, request):
+        async def rows():
+            for resource, to_row in CSV_ROWS.items():
+                async for page in self.pages(resource):
+                    yield [to_row(t) for t in page]
+
+        async def chunks():
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(CSV_HEADER)
+            yield buffer.getvalue().encode()
+            async for page in rows():
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(page)
+                yield buffer.getvalue().encode()
+
+        return StreamResponse(chunks(), 'text/csv')
+
+    async def serve(self, host='127.0.0.1', port=8080, ready=None):
+        """
+        serves requests until cancelled
+
+        :param ready: called with the (host, port) the server listens on, useful with port 0
+        :type ready: function or None
+        """
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_BODY)
+        if ready:
+            ready(server.sockets[0].getsockname()[:2])
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.db.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON/HTTP API over the school database")
+    parser.add_argument('--db', default=DB_FILE, help='database file (default: university.db)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080, help='port to listen on, 0 for any free port')
+    parser.add_argument('--readers', type=int, default=4, help='number of reader threads')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help='rows fetched per page of a list')
+    args = parser.parse_args(argv)
+
+    server = SchoolServer(args.db, args.readers, args.page_size)
+    ready = lambda address: print("listening on http://%s:%d" % address, flush=True)
+    try:
+        asyncio.run(server.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""
+An identity map of the students, instructors and courses of the database, as the objects of objects.py,
+whose relationships are loaded lazily and in batches.
+
+A Session builds each object at most once per ID: asking it again for the same student, or reaching that
+student again from a course, gives the same object, so code can walk from a student to their courses, from
+a course to its instructor and back again without copies of the same row. The relationships
+(Student.registered_courses, Course.enrolled_students, Course.instructor and Instructor.assigned_courses)
+are not read with the objects but on their first access (see objects.Related), and then not only for the
+object accessed but for up to BATCH_SIZE objects of the session still waiting for them: one query reads
+the keys of the related rows of the whole batch, and another the related objects not in the session yet.
+Walking the courses of 10,000 students thus runs about 40 queries instead of one per student::
+
+    session = Session(conn)
+    for student in session.all(Student):
+        for course in student.registered_courses:
+            print(student.name, course.course_name, course.instructor and course.instructor.name)
+
+The objects are built from the rows without validating them again (see from_row in objects.py). A session
+holds its objects weakly, so the objects the code no longer uses are freed, and read again if asked for
+again. It doesn't see the rows written after it read them: it is meant for one unit of work, like one
+export or one report, and clear() or a new session reads them again. Like its connection, a session is
+used by one thread at a time.
+"""
+import weakref
+from collections import OrderedDict
+
+from database import COLUMNS
+from objects import Student, Instructor, Course
+from pagination import PAGE_SIZE, iter_pages
+
+# the objects whose relationship is loaded at once, and the keys looked up per query,
+# below the limit of 999 parameters of older SQLite versions
+BATCH_SIZE = 500
+
+# class -> its table, and the attribute holding the ID of its objects
+TABLES = {
+    Student: ('Students', 'student_id'),
+    Instructor: ('Instructors', 'instructor_id'),
+    Course: ('Courses', 'course_id'),
+}
+
+# (class, relationship) -> the class of the related objects, and the query of the (key of an object, key of a
+# related object) pairs of a list of objects, or None if the key of the related object is an attribute
+RELATIONS = {
+    (Student, 'registered_courses'): (
+        Course, "select StudentID, CourseID from Registrations where StudentID in (%s) order by StudentID, CourseID"),
+    (Course, 'enrolled_students'): (
+        Student, "select CourseID, StudentID from Registrations where CourseID in (%s) order by CourseID, StudentID"),
+    (Instructor, 'assigned_courses'): (
+        Course, "select InstructorID, ID from Courses where InstructorID in (%s) order by InstructorID, ID"),
+    (Course, 'instructor'): (Instructor, None),
+}
+
+# the attribute of a course holding the key of its instructor
+FOREIGN_KEYS = {(Course, 'instructor'): 'instructor_id'}
+
+
+class Session:
+    """
+    The objects read from one connection, each built once per ID, with their relationships loaded on first access.
+
+    Attributes
+    ----------
+    conn : sqlite3.Connection
+        The database connection.
+    batch_size : int
+        The objects whose relationship is loaded at once, and the keys looked up per query.
+    queries : int
+        The queries run so far.
+    objects : dict
+        Class -> ID -> the object of the session, held weakly.
+    pending : dict
+        (Class, relationship) -> the IDs of the objects that haven't loaded it yet, in the order they were read.
+
+    Methods
+    -------
+    get(cls, key)
+        Returns the object of a class with the given ID, or None if there is none.
+    get_many(cls, keys)
+        Returns the objects of a class with the given IDs, by ID.
+    all(cls, filters=(), page_size=PAGE_SIZE)
+        Yields the objects of a class in the order of their IDs, reading a page at a time.
+    load(obj, name)
+        Loads a relationship of an object, and of a batch of other objects waiting for it.
+    clear()
+        Forgets every object, so they are read again.
+    """
+
+    def __init__(self, conn, batch_size=BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.queries = 0
+        self.clear()
+
+    def clear(self):
+        """
+        forgets every object, so that they are read again from the database. The objects already handed out
+        keep their attributes, and load their relationships with the session as before
+
+        :return: Nothing.
+        :rtype: None
+        """
+        self.objects = {cls: weakref.WeakValueDictionary() for cls in TABLES}
+        self.pending = {relation: OrderedDict() for relation in RELATIONS}
+
+    def execute(self, sql, parameters=()):
+        self.queries += 1
+        return self.conn.execute(sql, parameters).fetchall()
+
+    def materialize(self, cls, rows):
+        """
+        returns the objects of rows of the table of a class, building those not in the session yet
+
+        :param cls: Student, Instructor or Course
+        :type cls: type
+
+        :param rows: rows with all the columns of the table, the ID first
+        :type rows: list of tuple
+
+        :return: the objects, in the order of the rows
+        :rtype: list
+        """
+        objects = self.objects[cls]
+        relations = [(name, pending) for (owner, name), pending in self.pending.items() if owner is cls]
+        found = []
+        for row in rows:
+            obj = objects.get(row[0])
+            if obj is None:
+                obj = cls.from_row(row)
+                attributes = obj.__dict__
+                attributes['_session'] = self
+                for name, pending in relations:
+                    # left unset, so that the first access loads it (see objects.Related)
+                    attributes.pop(name, None)
+                    pending[row[0]] = None
+                objects[row[0]] = obj
+            found.append(obj)
+        return found
+
+    def get_many(self, cls, keys):
+        """
+        returns the objects of a class with the given IDs, reading those not in the session yet,
+        batch_size IDs per query
+
+        :param cls: Student, Instructor or Course
+        :type cls: type
+
+        :param keys: the IDs
+        :type keys: iterable of str
+
+        :return: ID -> object, without the IDs that aren't in the table
+        :rtype: dict
+        """
+        objects = self.objects[cls]
+        found = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            obj = objects.get(key)
+            if obj is None:
+                missing.append(key)
+            else:
+                found[key] = obj
+        table = TABLES[cls][0]
+        columns = ", ".join(COLUMNS[table][0])
+        for start in range(0, len(missing), self.batch_size):
+            chunk = missing[start:start + self.batch_size]
+            rows = self.execute("select %s from %s where ID in (%s)" % (columns, table, ", ".join("?" * len(chunk))),
+                                chunk)
+            for row, obj in zip(rows, self.materialize(cls, rows)):
+                found[row[0]] = obj
+        return found
+
+    def get(self, cls, key):
+        """
+        returns the object of a class with the given ID, reading it only if it isn't in the session yet
+
+        :param cls: Student, Instructor or Course
+        :type cls: type
+
+        :param key: the ID
+        :type key: str
+
+        :return: the object, or None if the table has no row with this ID
+        :rtype: Student, Instructor, Course or None
+        """
+        return self.get_many(cls, [key]).get(key)
+
+    def all(self, cls, filters=(), page_size=PAGE_SIZE):
+        """
+        yields the objects of a class in the order of their IDs, reading the table a page at a time
+        (see pagination.iter_pages), so only the objects the caller keeps stay in memory
+
+        :param cls: Student, Instructor or Course
+        :type cls: type
+
+        :param filters: (column, value) pairs the rows must match
+        :type filters: iterable of tuple
+
+        :rtype: generator
+        """
+        for rows in iter_pages(self.conn, TABLES[cls][0], filters, page_size):
+            self.queries += 1
+            yield from self.materialize(cls, rows)
+
+    def load(self, obj, name):
+        """
+        loads a relationship of an object of the session, and the same relationship of up to batch_size - 1
+        other objects of its class that haven't loaded it yet, in the order they were read
+
+        :param obj: an object of the session
+        :type obj: Student, Instructor or Course
+
+        :param name: the relationship, e.g. registered_courses
+        :type name: str
+
+        :return: Nothing.
+        :rtype: None
+        """
+        cls = type(obj)
+        key_attribute = TABLES[cls][1]
+        objects = self.objects[cls]
+        pending = self.pending[(cls, name)]
+        pending.pop(getattr(obj, key_attribute), None)
+        batch = [obj]
+        while pending and len(batch) < self.batch_size:
+            other = objects.get(pending.popitem(last=False)[0])
+            if other is not None and name not in other.__dict__:
+                batch.append(other)
+
+        related_cls, sql = RELATIONS[(cls, name)]
+        if sql is None:
+            foreign_key = FOREIGN_KEYS[(cls, name)]
+            related = self.get_many(related_cls, [getattr(o, foreign_key) for o in batch
+                                                  if getattr(o, foreign_key) is not None])
+            for o in batch:
+                o.__dict__[name] = related.get(getattr(o, foreign_key))
+            return
+
+        keys = [getattr(o, key_attribute) for o in batch]
+        pairs = self.execute(sql % ", ".join("?" * len(keys)), keys)
+        related = self.get_many(related_cls, [pair[1] for pair in pairs])
+        values = {key: [] for key in keys}
+        for key, related_key in pairs:
+            if related_key in related:
+                values[key].append(related[related_key])
+        for o, key in zip(batch, keys):
+            o.__dict__[name] = values[key]
@@ -0,0 +1,802 @@
+"""
+The students, instructors, courses and registrations behind one interface, so that main.py and
+app_PyQt5.py can run on any of these stores:
+
+- JsonStorage keeps the records in memory, indexed by ID, and rewrites the json file of a table
+  after every change.
+- JsonLinesStorage does the same with .jsonl files, but appends new records and registrations
+  to them without rewriting them.
+- SqliteStorage runs every operation on the database of app_PyQt5.py (university.db).
+
+The json stores can also write their files behind (WriteBehindJsonStorage, WriteBehindJsonLinesStorage):
+changes are applied in memory and journaled at once, and written to the files in batches by a
+background thread.
+
+Records are dictionaries with the fields listed in KINDS. The files of the json stores hold the
+records of the Export Data tab of app_PyQt5.py, so an export can be opened as a store, and a store
+loaded into the database::
+
+    storage = open_storage('sqlite', 'university.db')
+    storage.add('students', {'id': 'S1', 'name': 'Ali', 'age': 20, 'email': 'ali@mail.com'})
+    storage.register('S1', 'C1')
+    for student in storage.iterate('students', name='Ali'):
+        ...
+
+Deleting a student, course or instructor deletes their registrations and, for an instructor, their
+courses, in every store.
+"""
+import glob
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+from database import COLUMNS, DB_FILE, connect, write_transaction
+from jsonstream import iter_json_lines, iter_records, write_json_array, write_json_lines, append_json_lines
+from pagination import PAGE_SIZE, fetch_page, key_columns
+from prerequisites import check_eligibility
+from timetable import check_assignment, check_registration
+from transfer import EXPORTS
+
+# a store written behind flushes its changes every FLUSH_INTERVAL seconds, or once FLUSH_THRESHOLD are pending
+FLUSH_INTERVAL = 1.0
+FLUSH_THRESHOLD = 100
+
+# kind of record -> its table, the fields of its records in the order of the columns of the table,
+# and the keys of the records of its json export
+KINDS = {
+    'students': ('Students', ('id', 'name', 'age', 'email'), ('student_id', 'name', 'age', 'email')),
+    'instructors': ('Instructors', ('id', 'name', 'age', 'email'), ('instructor_id', 'name', 'age', 'email')),
+    'courses': ('Courses', ('id', 'name', 'instructor_id'), ('course_id', 'course_name', 'instructor_id')),
+    'registrations': ('Registrations', ('student_id', 'course_id'), ('StudentID', 'CourseID')),
+}
+
+# the files written by main.py before it used a store, converted once by JsonStorage: the students and
+# instructors with the names of their courses, the courses, and the registrations and assignments by course name
+LEGACY_FILES = ('students.json', 'instructors.json', 'Courses.json', 'RegCourses.json', 'AssignedCourses.json')
+
+
+class StorageError(Exception):
+    """
+    Raised when a change would break the integrity of a store: an ID that is already taken, a student
+    registered twice in a course, or a reference to a student, instructor or course that doesn't exist.
+    """
+
+
+def from_export(kind, record):
+    """
+    converts a record of a json export, e.g. {"student_id", "name", "age", "email"}, into a record of a store
+
+    :param kind: students, instructors, courses or registrations
+    :type kind: str
+
+    :param record: the record of the export
+    :type record: dict
+
+    :return: the record of the store, e.g. {"id", "name", "age", "email"}
+    :rtype: dict
+    """
+    table, fields, keys = KINDS[kind]
+    return {field: record[key] for field, key in zip(fields, keys)}
+
+
+def record_key(kind, record):
+    """
+    returns the key of a record, e.g. (id,) for a student and (student_id, course_id) for a registration
+
+    :rtype: tuple
+    """
+    table, fields, keys = KINDS[kind]
+    columns = COLUMNS[table][0]
+    return tuple(record[fields[columns.index(column)]] for column in key_columns(table))
+
+
+class Storage(ABC):
+    """
+    The operations of both front-ends on the records, whatever they are stored in.
+
+    Methods
+    -------
+    add(kind, record)
+        Adds a student, instructor or course.
+    get(kind, id)
+        Returns the student, instructor or course with the given ID, or None.
+    update(kind, id, changes)
+        Changes some fields of a student, instructor or course, other than its ID.
+    delete(kind, id)
+        Deletes a student, instructor or course, along with what refers to it.
+    register(student_id, course_id)
+        Registers a student in a course.
+    drop(student_id, course_id)
+        Drops a student from a course.
+    assign(course_id, instructor_id)
+        Assigns an instructor to a course.
+    iterate(kind, **filters)
+        Yields the records of a kind whose fields equal the given values.
+    page(kind, after=None, limit=PAGE_SIZE, before=None, **filters)
+        Returns a page of the records of a kind whose fields equal the given values, in the order of their keys.
+    close()
+        Releases the store.
+    """
+
+    @abstractmethod
+    def add(self, kind, record):
+        pass
+
+    @abstractmethod
+    def get(self, kind, id):
+        pass
+
+    @abstractmethod
+    def update(self, kind, id, changes):
+        pass
+
+    @abstractmethod
+    def delete(self, kind, id):
+        pass
+
+    @abstractmethod
+    def register(self, student_id, course_id):
+        pass
+
+    @abstractmethod
+    def drop(self, student_id, course_id):
+        pass
+
+    @abstractmethod
+    def iterate(self, kind, **filters):
+        pass
+
+    def assign(self, course_id, instructor_id):
+        return self.update('courses', course_id, {'instructor_id': instructor_id})
+
+    def page(self, kind, after=None, limit=PAGE_SIZE, before=None, **filters):
+        """
+        returns up to limit records of a kind whose fields equal the given values, in the order of their keys
+        (see record_key), starting after the key of the last record of the previous page. With before, returns
+        the records of the page that ends right before the key of the first record of the next page instead.
+        """
+        records = sorted(self.iterate(kind, **filters), key=lambda record: record_key(kind, record))
+        if after is not None:
+            records = [record for record in records if record_key(kind, record) > tuple(after)]
+        if before is not None:
+            records = [record for record in records if record_key(kind, record) < tuple(before)][-limit:]
+        return records[:limit]
+
+    def close(self):
+        pass
+
+
+class JsonStorage(Storage):
+    """
+    A store kept in memory and in the json files of a directory, one per kind of record, which are
+    rewritten after every change. Students, instructors and courses are indexed by ID, and registrations
+    by student and by course, so lookups don't scan the files.
+
+    Attributes
+    ----------
+    directory : str
+        The directory of the files, students.json, instructors.json, courses.json and registrations.json
+    rows : dict
+        The rows of the students, instructors and courses by ID, for each kind.
+    courses_of : dict
+        The IDs of the courses of each instructor.
+    registrations : dict
+        The IDs of the courses of each student.
+    students_of : dict
+        The IDs of the students of each course.
+    """
+
+    extension = '.json'
+    write = staticmethod(write_json_array)
+    # whether the files are synced to the disk before they replace the previous ones
+    sync = False
+
+    def __init__(self, directory='.'):
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.rows = {'students': {}, 'instructors': {}, 'courses': {}}
+        # the values of these dictionaries are dictionaries used as ordered sets
+        self.courses_of = {}
+        self.registrations = {}
+        self.students_of = {}
+        self.migrate_legacy()
+        for kind in KINDS:
+            self.load(kind)
+
+    def filename(self, kind):
+        return os.path.join(self.directory, kind + self.extension)
+
+    def migrate_legacy(self):
+        """
+        converts the files of the directory written by main.py before it used a store (see LEGACY_FILES) into
+        the files of the store, and keeps them as <name>.bak. They are first renamed <name>.legacy, so that a
+        conversion interrupted on the way is done again from them. A record whose ID is taken by an earlier one
+        is left out, and so are the registrations and assignments of unknown students, instructors or course
+        names. A course assigned to several instructors keeps the last one.
+
+        :return: whether there were files to convert
+        :rtype: bool
+        """
+        def path(name):
+            return os.path.join(self.directory, name)
+
+        def is_legacy(name):
+            if name[0].isupper():
+                # compared as listed, as Courses.json is courses.json on case-insensitive file systems
+                return name in os.listdir(self.directory)
+            with open(path(name), 'r') as file:
+                return any('_email' in record for record in iter_records(file, path(name)))
+
+        def by_id(records, key, row):
+            rows = {}
+            for record in records:
+                rows.setdefault(record[key], row(record))
+            return rows
+
+        for name in LEGACY_FILES:
+            if os.path.exists(path(name)) and is_legacy(name):
+                os.replace(path(name), path(name + '.legacy'))
+        legacy = {}
+        for name in LEGACY_FILES:
+            if os.path.exists(path(name + '.legacy')):
+                with open(path(name + '.legacy'), 'r') as file:
+                    legacy[name] = list(iter_records(file, path(name + '.legacy')))
+        if not legacy:
+            return False
+        students = by_id(legacy.get('students.json', []), 'student_id',
+                         lambda record: (record['student_id'], record['name'], record['age'], record['_email']))
+        instructors = by_id(legacy.get('instructors.json', []), 'instructor_id',
+                            lambda record: (record['instructor_id'], record['name'], record['age'], record['_email']))
+        courses = by_id(legacy.get('Courses.json', []), 'course_id',
+                        lambda record: [record['course_id'], record['course_name'], None])
+        ids = {}
+        for course in courses.values():
+            ids.setdefault(course[1], course[0])
+        assignments = [(record['instructor_id'], name) for record in legacy.get('instructors.json', [])
+                       for name in record.get('assigned_courses', [])]
+        assignments += [(record['instructor_id'], record['course_name'])
+                        for record in legacy.get('AssignedCourses.json', [])]
+        for instructor_id, course_name in assignments:
+            if instructor_id in instructors and course_name in ids:
+                courses[ids[course_name]][2] = instructor_id
+        registrations = [(record['student_id'], name) for record in legacy.get('students.json', [])
+                         for name in record.get('registered_courses', [])]
+        registrations += [(record['student_id'], record['course_name'])
+                          for record in legacy.get('RegCourses.json', [])]
+        registrations = {(student_id, ids[course_name]): None for student_id, course_name in registrations
+                         if student_id in students and course_name in ids}
+        for kind, rows, name in (('students', list(students.values()), 'students.json'),
+                                 ('instructors', list(instructors.values()), 'instructors.json'),
+                                 ('courses', [tuple(course) for course in courses.values()], 'Courses.json'),
+                                 ('registrations', list(registrations), 'RegCourses.json')):
+            if name in legacy or rows:
+                self.write_table(kind, rows)
+        for name in legacy:
+            os.replace(path(name + '.legacy'), path(name + '.bak'))
+        return True
+
+    def load(self, kind):
+        table, fields, keys = KINDS[kind]
+        if not os.path.exists(self.filename(kind)):
+            return
+        with open(self.filename(kind), 'r') as file:
+            for record in iter_records(file, self.filename(kind)):
+                row = tuple(record[key] for key in keys)
+                if kind == 'registrations':
+                    self.link(*row)
+                else:
+                    self.rows[kind][row[0]] = row
+                    if kind == 'courses' and row[2] is not None:
+                        self.courses_of.setdefault(row[2], {})[row[0]] = None
+
+    def table(self, kind):
+        if kind == 'registrations':
+            return [(student_id, course_id) for student_id, courses in self.registrations.items() for course_id in courses]
+        return list(self.rows[kind].values())
+
+    def save(self, kind):
+        """
+        stores the records of a kind after they were changed
+        """
+        self.write_table(kind, self.table(kind))
+
+    def write_table(self, kind, rows, filename=None):
+        """
+        rewrites the file of a kind of record, or the given file, with the given rows, replacing it once the new one is complete
+        """
+        to_dict = EXPORTS[kind][1]
+        filename = filename or self.filename(kind)
+        with open(filename + '.tmp', 'w') as file:
+            self.write(file, (to_dict(row) for row in rows))
+            if self.sync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(filename + '.tmp', filename)
+
+    def added(self, kind, row):
+        """
+        stores a row that was added to the records of a kind
+        """
+        self.save(kind)
+
+    def check(self, kind, id):
+        if id is not None and id not in self.rows[kind]:
+            raise StorageError("no %s with ID %s" % (kind[:-1], id))
+
+    def link(self, student_id, course_id):
+        self.registrations.setdefault(student_id, {})[course_id] = None
+        self.students_of.setdefault(course_id, {})[student_id] = None
+
+    def unlink(self, student_id, course_id):
+        del self.registrations[student_id][course_id]
+        del self.students_of[course_id][student_id]
+
+    def add(self, kind, record):
+        table, fields, keys = KINDS[kind]
+        row = tuple(record.get(field) for field in fields)
+        if row[0] in self.rows[kind]:
+            raise StorageError("a %s with ID %s already exists" % (kind[:-1], row[0]))
+        if kind == 'courses':
+            self.check('instructors', row[2])
+            if row[2] is not None:
+                self.courses_of.setdefault(row[2], {})[row[0]] = None
+        self.rows[kind][row[0]] = row
+        self.added(kind, row)
+
+    def get(self, kind, id):
+        row = self.rows[kind].get(id)
+        return None if row is None else dict(zip(KINDS[kind][1], row))
+
+    def update(self, kind, id, changes):
+        table, fields, keys = KINDS[kind]
+        record = self.get(kind, id)
+        if record is None:
+            return False
+        if changes.get('id', id) != id:
+            raise StorageError("the ID of a %s can't be changed" % kind[:-1])
+        record.update(changes)
+        if kind == 'courses' and record['instructor_id'] != self.rows[kind][id][2]:
+            self.check('instructors', record['instructor_id'])
+            self.courses_of.get(self.rows[kind][id][2], {}).pop(id, None)
+            if record['instructor_id'] is not None:
+                self.courses_of.setdefault(record['instructor_id'], {})[id] = None
+        self.rows[kind][id] = tuple(record[field] for field in fields)
+        self.save(kind)
+        return True
+
+    def delete(self, kind, id):
+        row = self.rows[kind].pop(id, None)
+        if row is None:
+            return False
+        changed = [kind]
+        if kind == 'students':
+            for course_id in self.registrations.pop(id, {}):
+                del self.students_of[course_id][id]
+                changed.append('registrations')
+        else:
+            if kind == 'courses':
+                self.courses_of.get(row[2], {}).pop(id, None)
+                courses = [id]
+            else:
+                courses = self.courses_of.pop(id, {})
+            for course_id in courses:
+                if kind == 'instructors':
+                    del self.rows['courses'][course_id]
+                    changed.append('courses')
+                for student_id in self.students_of.pop(course_id, {}):
+                    del self.registrations[student_id][course_id]
+                    changed.append('registrations')
+        for kind in dict.fromkeys(changed):
+            self.save(kind)
+        return True
+
+    def register(self, student_id, course_id):
+        self.check('students', student_id)
+        self.check('courses', course_id)
+        if course_id in self.registrations.get(student_id, {}):
+            raise StorageError("%s is already registered in %s" % (student_id, course_id))
+        self.link(student_id, course_id)
+        self.added('registrations', (student_id, course_id))
+
+    def drop(self, student_id, course_id):
+        if course_id not in self.registrations.get(student_id, {}):
+            return False
+        self.unlink(student_id, course_id)
+        self.save('registrations')
+        return True
+
+    def iterate(self, kind, **filters):
+        table, fields, keys = KINDS[kind]
+        # the rows are copied, so that the records can be changed while they are iterated
+        if kind == 'registrations' and 'student_id' in filters:
+            rows = [(filters['student_id'], course_id) for course_id in self.registrations.get(filters['student_id'], {})]
+        elif kind == 'registrations' and 'course_id' in filters:
+            rows = [(student_id, filters['course_id']) for student_id in self.students_of.get(filters['course_id'], {})]
+        elif kind == 'courses' and 'instructor_id' in filters:
+            rows = [self.rows[kind][course_id] for course_id in self.courses_of.get(filters['instructor_id'], {})]
+        elif 'id' in filters:
+            rows = [self.rows[kind][filters['id']]] if filters['id'] in self.rows[kind] else []
+        else:
+            rows = self.table(kind)
+        for row in rows:
+            record = dict(zip(fields, row))
+            if all(record[field] == value for field, value in filters.items()):
+                yield record
+
+
+class JsonLinesStorage(JsonStorage):
+    """
+    A JsonStorage whose files hold json lines (students.jsonl, ...). Students, instructors, courses and
+    registrations are appended to them when they are added, only changes and deletions rewrite a file.
+    """
+
+    extension = '.jsonl'
+    write = staticmethod(write_json_lines)
+
+    def added(self, kind, row):
+        append_json_lines(self.filename(kind), [EXPORTS[kind][1](row)])
+
+
+class WriteBehind:
+    """
+    Makes a JsonStorage or JsonLinesStorage write its files behind: changes are applied to the records in
+    memory at once, and the files are written in batches by a background thread, every interval seconds or
+    as soon as threshold changes are pending, so that a change doesn't wait for its file to be rewritten.
+
+    Every change is first appended to a journal in the directory of the store (journal-<n>.jsonl), which
+    is replayed when the store is opened again, so changes that were not written yet survive a crash.
+    A flush starts a new journal, writes the new files next to the old ones, and then records what is left
+    to do in flush.json: replacing the old files and appending the new json lines. Only then are the files
+    changed and the previous journals deleted, and a flush interrupted on the way is completed when the store
+    is opened again, so the journal is always replayed on files of the same point in time.
+    close() writes the pending changes and stops the thread.
+
+    Attributes
+    ----------
+    interval : float
+        The seconds between two flushes of the background thread.
+    threshold : int
+        The number of pending changes that makes the background thread flush at once.
+    sync : bool
+        Whether the journal and the files are synced to the disk, so that they also survive a power loss.
+    flushes : int
+        The number of flushes that wrote something.
+    error : Exception or None
+        The exception of the last flush that failed, whose changes are still pending.
+
+    Methods
+    -------
+    flush()
+        Writes the pending changes to the files.
+    pending()
+        Returns the number of changes not written to the files yet.
+    """
+
+    def __init__(self, directory='.', interval=FLUSH_INTERVAL, threshold=FLUSH_THRESHOLD, sync=False):
+        self.interval = interval
+        self.threshold = threshold
+        self.sync = sync
+        self.flushes = 0
+        self.error = None
+        # lock guards the records, the pending changes and the journal, flushing lets one flush run at a time
+        self.lock = threading.RLock()
+        self.flushing = threading.Lock()
+        self.dirty = {}
+        self.appended = {}
+        self.changes = 0
+        self.wake = threading.Event()
+        self.closed = False
+        self.directory = os.path.abspath(directory)
+        self.complete_flush()
+        super().__init__(directory)
+        segments = self.segments()
+        for filename in segments:
+            with open(filename, 'r') as file:
+                for entry in iter_json_lines(file):
+                    try:
+                        getattr(JsonStorage, entry['op'])(self, *entry['args'])
+                    except StorageError:
+                        pass
+        self.segment = int(segments[-1][-len('000000.jsonl'):-len('.jsonl')]) + 1 if segments else 1
+        self.journal = open(self.journal_name(self.segment), 'a')
+        self.flush()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def journal_name(self, segment):
+        return os.path.join(self.directory, 'journal-%06d.jsonl' % segment)
+
+    def segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, 'journal-[0-9]*.jsonl')))
+
+    def change(self, op, *args):
+        """
+        applies a change to the records in memory and appends it to the journal
+        """
+        with self.lock:
+            result = getattr(super(), op)(*args)
+            self.journal.write(json.dumps({'op': op, 'args': args}) + '\n')
+            self.journal.flush()
+            if self.sync:
+                os.fsync(self.journal.fileno())
+            self.changes += 1
+            if self.changes >= self.threshold:
+                self.wake.set()
+            return result
+
+    def add(self, kind, record):
+        return self.change('add', kind, record)
+
+    def update(self, kind, id, changes):
+        return self.change('update', kind, id, changes)
+
+    def delete(self, kind, id):
+        return self.change('delete', kind, id)
+
+    def register(self, student_id, course_id):
+        return self.change('register', student_id, course_id)
+
+    def drop(self, student_id, course_id):
+        return self.change('drop', student_id, course_id)
+
+    def save(self, kind):
+        self.dirty[kind] = None
+
+    def added(self, kind, row):
+        if isinstance(self, JsonLinesStorage):
+            self.appended.setdefault(kind, []).append(row)
+        else:
+            self.dirty[kind] = None
+
+    def pending(self):
+        return self.changes
+
+    def flush(self):
+        """
+        writes the files changed since the last flush. The records are copied under the lock, and written
+        without holding it, so that changes can go on meanwhile.
+
+        :return: the number of changes written
+        :rtype: int
+        """
+        with self.flushing:
+            self.complete_flush()
+            with self.lock:
+                if not self.dirty and not self.appended:
+                    return 0
+                dirty, appended, changes = self.dirty, self.appended, self.changes
+                tables = {kind: self.table(kind) for kind in dirty}
+                self.dirty, self.appended, self.changes = {}, {}, 0
+                # the changes from now on go to a new journal, the previous ones are deleted once the files are written
+                self.journal.close()
+                self.segment += 1
+                self.journal = open(self.journal_name(self.segment), 'a')
+            try:
+                for kind, rows in tables.items():
+                    self.write_table(kind, rows, self.filename(kind) + '.new')
+                self.write_flush({
+                    'segment': self.segment,
+                    'replace': list(tables),
+                    'append': {kind: [EXPORTS[kind][1](row) for row in rows] for kind, rows in appended.items()
+                               if kind not in tables},
+                    'sizes': {kind: os.path.getsize(self.filename(kind)) if os.path.exists(self.filename(kind)) else 0
+                              for kind in appended if kind not in tables},
+                })
+            except Exception as e:
+                with self.lock:
+                    for kind in dirty:
+                        self.dirty[kind] = None
+                    for kind, rows in appended.items():
+                        if kind not in dirty:
+                            self.appended[kind] = rows + self.appended.get(kind, [])
+                    self.changes += changes
+                self.error = e
+                raise
+            self.complete_flush()
+            self.flushes += 1
+            self.error = None
+            return changes
+
+    def write_flush(self, flush):
+        filename = os.path.join(self.directory, 'flush.json')
+        with open(filename + '.tmp', 'w') as file:
+            json.dump(flush, file)
+            if self.sync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(filename + '.tmp', filename)
+
+    def complete_flush(self):
+        """
+        completes the flush recorded in flush.json, if any: replaces the files by their new version, appends
+        the new json lines to the others (after cutting what an interrupted flush may have appended already),
+        and deletes the journals of the changes the flush wrote
+        """
+        filename = os.path.join(self.directory, 'flush.json')
+        if not os.path.exists(filename):
+            # the new files of a flush interrupted before flush.json was written are not used
+            for kind in KINDS:
+                if os.path.exists(self.filename(kind) + '.new'):
+                    os.remove(self.filename(kind) + '.new')
+            return
+        with open(filename, 'r') as file:
+            flush = json.load(file)
+        for kind in flush['replace']:
+            if os.path.exists(self.filename(kind) + '.new'):
+                os.replace(self.filename(kind) + '.new', self.filename(kind))
+        for kind, records in flush['append'].items():
+            with open(self.filename(kind), 'a') as file:
+                file.truncate(flush['sizes'][kind])
+                write_json_lines(file, records)
+        for segment in self.segments():
+            if segment < self.journal_name(flush['segment']):
+                os.remove(segment)
+        os.remove(filename)
+
+    def run(self):
+        while not self.closed:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(e)
+
+    def close(self):
+        """
+        stops the background thread, then writes the pending changes and deletes the journal
+        """
+        self.closed = True
+        self.wake.set()
+        self.thread.join()
+        self.flush()
+        self.journal.close()
+        for filename in self.segments():
+            os.remove(filename)
+
+
+class WriteBehindJsonStorage(WriteBehind, JsonStorage):
+    """
+    A JsonStorage whose files are written behind (see WriteBehind).
+    """
+
+
+class WriteBehindJsonLinesStorage(WriteBehind, JsonLinesStorage):
+    """
+    A JsonLinesStorage whose files are written behind (see WriteBehind).
+    """
+
+
+class SqliteStorage(Storage):
+    """
+    A store in a database in the schema of database.py. Every change is committed at once, in a write
+    transaction retried while another process is writing (see database.write_transaction). Registering a
+    student in a course, or assigning an instructor to it, fails if it meets at the same time as another
+    course of theirs (see timetable.py), and registering a student fails if they haven't completed the
+    prerequisites of the course (see prerequisites.py).
+
+    Attributes
+    ----------
+    conn : sqlite3.Connection
+        The connection to the database.
+    """
+
+    def __init__(self, database=DB_FILE):
+        self.owned = not isinstance(database, sqlite3.Connection)
+        self.conn = connect(database) if self.owned else database
+
+    def write(self, work):
+        """
+        runs work(conn) in a transaction of its own and returns its result, raising a StorageError if it breaks
+        a constraint of the database, makes a clash in a timetable (see timetable.py) or registers a student
+        without the prerequisites of a course (see prerequisites.py)
+        """
+        try:
+            return write_transaction(self.conn, work)
+        except sqlite3.IntegrityError as e:
+            raise StorageError(str(e)) from e
+
+    def execute(self, sql, parameters=()):
+        """
+        runs a statement in a transaction of its own, and returns the number of rows it changed
+        """
+        return self.write(lambda conn: conn.execute(sql, parameters).rowcount)
+
+    def add(self, kind, record):
+        table, fields, keys = KINDS[kind]
+        columns = COLUMNS[table][0]
+
+        def add(conn):
+            if kind == 'courses' and record.get('instructor_id') is not None:
+                check_assignment(conn, record['instructor_id'], record.get('id'))
+            conn.execute("insert into %s (%s) values (%s)" % (table, ", ".join(columns), ", ".join("?" * len(columns))),
+                         [record.get(field) for field in fields])
+        self.write(add)
+
+    def get(self, kind, id):
+        for record in self.iterate(kind, id=id):
+            return record
+        return None
+
+    def update(self, kind, id, changes):
+        table, fields, keys = KINDS[kind]
+        if changes.get('id', id) != id:
+            raise StorageError("the ID of a %s can't be changed" % kind[:-1])
+        columns = dict(zip(fields, COLUMNS[table][0]))
+        changes = {columns[field]: value for field, value in changes.items() if field != 'id'}
+        if not changes:
+            return self.get(kind, id) is not None
+
+        def update(conn):
+            if kind == 'courses' and changes.get('InstructorID') is not None:
+                check_assignment(conn, changes['InstructorID'], id)
+            return conn.execute("update %s set %s where ID = ?" % (table, ", ".join("%s = ?" % c for c in changes)),
+                                list(changes.values()) + [id]).rowcount > 0
+        return self.write(update)
+
+    def delete(self, kind, id):
+        return self.execute("delete from %s where ID = ?" % KINDS[kind][0], (id,)) > 0
+
+    def register(self, student_id, course_id):
+        def register(conn):
+            check_eligibility(conn, student_id, course_id)
+            check_registration(conn, student_id, course_id)
+            conn.execute("insert into Registrations (StudentID, CourseID) values (?, ?)", (student_id, course_id))
+        self.write(register)
+
+    def drop(self, student_id, course_id):
+        return self.execute("delete from Registrations where StudentID = ? and CourseID = ?", (student_id, course_id)) > 0
+
+    def iterate(self, kind, **filters):
+        table, fields, keys = KINDS[kind]
+        columns = dict(zip(fields, COLUMNS[table][0]))
+        sql = "select %s from %s" % (", ".join(columns.values()), table)
+        if filters:
+            sql += " where " + " and ".join("%s = ?" % columns[field] for field in filters)
+        for row in self.conn.execute(sql, list(filters.values())):
+            yield dict(zip(fields, row))
+
+    def page(self, kind, after=None, limit=PAGE_SIZE, before=None, **filters):
+        table, fields, keys = KINDS[kind]
+        columns = dict(zip(fields, COLUMNS[table][0]))
+        rows = fetch_page(self.conn, table, [(columns[field], value) for field, value in filters.items()],
+                          after, limit, before=before)
+        return [dict(zip(fields, row)) for row in rows]
+
+    def close(self):
+        if self.owned:
+            self.conn.close()
+
+
+STORAGES = {
+    'json': JsonStorage,
+    'jsonl': JsonLinesStorage,
+    'sqlite': SqliteStorage,
+}
+
+WRITE_BEHIND = {
+    'json': WriteBehindJsonStorage,
+    'jsonl': WriteBehindJsonLinesStorage,
+}
+
+
+def open_storage(kind, location=None, write_behind=False):
+    """
+    opens a store
+
+    :param kind: json, jsonl or sqlite
+    :type kind: str
+
+    :param location: the directory of a json store, or the database file, defaults to the current directory or university.db
+    :type location: str or None
+
+    :param write_behind: whether a json store writes its files behind. A database commits every change at once anyway
+    :type write_behind: bool
+
+    :return: the store
+    :rtype: Storage
+    """
+    storage = WRITE_BEHIND[kind] if write_behind and kind in WRITE_BEHIND else STORAGES[kind]
+    return storage() if location is None else storage(location)
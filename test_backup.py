@@ -0,0 +1,57 @@
+"""
+Tests of backup.py: backups and consistent exports run on a background thread.
+"""
+import json
+import os
+
+import pytest
+
+from backup import BackgroundJob, BackupJob, SnapshotJob
+from database import connect
+from jsonstream import load_json_array
+
+
+@pytest.fixture
+def db(tmp_path):
+    filename = str(tmp_path / 'university.db')
+    conn = connect(filename)
+    with conn:
+        conn.executemany("insert into Students values (?, 's', 20, 's@x.com')", [('S%d' % i,) for i in range(500)])
+    conn.close()
+    return filename
+
+
+def test_backup(tmp_path, db):
+    target = str(tmp_path / 'backups' / 'copy.db')
+    job = BackupJob(db, target, pages=1).start()
+    job.join()
+    assert job.progress()['done'] == job.progress()['total'] > 1
+    copy = connect(target)
+    assert copy.execute("select count(*) from Students").fetchone()[0] == 500
+    copy.close()
+
+
+def test_snapshot(tmp_path, db):
+    directory = str(tmp_path / 'snapshot')
+    job = SnapshotJob(db, directory).start()
+    job.join()
+    with open(os.path.join(directory, 'snapshot.json')) as file:
+        snapshot = json.load(file)
+    assert snapshot['counts']['students'] == 500
+    assert snapshot['sequence'] == job.sequence > 0
+    assert len(list(load_json_array(os.path.join(directory, 'students.json')))) == 500
+
+
+def test_failed_job(tmp_path):
+    job = SnapshotJob(str(tmp_path / 'missing' / 'university.db'), str(tmp_path / 'snapshot')).start()
+    with pytest.raises(Exception):
+        job.join()
+    assert job.progress()['error'] is not None
+
+
+def test_job_without_run():
+    class Job(BackgroundJob):
+        pass
+
+    with pytest.raises(TypeError):
+        Job()
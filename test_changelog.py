@@ -0,0 +1,66 @@
+"""
+Tests of changelog.py: a copy kept in sync with the deltas of its source ends up with the same rows.
+"""
+import pytest
+
+from changelog import apply_changes, export_changes, start_from
+from database import connect
+
+TABLES = ['Students', 'Instructors', 'Courses', 'Registrations']
+
+
+def rows(conn):
+    return {table: sorted(conn.execute("select * from " + table).fetchall()) for table in TABLES}
+
+
+@pytest.fixture
+def source(tmp_path):
+    conn = connect(str(tmp_path / 'source.db'))
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def copy(tmp_path):
+    conn = connect(str(tmp_path / 'copy.db'))
+    start_from(conn, 0)
+    yield conn
+    conn.close()
+
+
+def test_round_trip(tmp_path, source, copy):
+    with source:
+        source.execute("insert into Instructors values ('I1', 'Ina', 40, 'i@x.com')")
+        source.executemany("insert into Students values (?, 's', 20, 's@x.com')", [('S%d' % i,) for i in range(5)])
+        source.execute("insert into Courses values ('C1', 'Math', 'I1')")
+        source.executemany("insert into Registrations values (?, 'C1')", [('S%d' % i,) for i in range(5)])
+    delta = str(tmp_path / 'first.jsonl.gz')
+    assert export_changes(source, delta)[2] > 0
+    assert apply_changes(copy, delta)[0] > 0
+    assert rows(copy) == rows(source)
+    # updates, cascaded renames and deletes
+    with source:
+        source.execute("update Students set Age = 21 where ID = 'S1'")
+        source.execute("update Courses set ID = 'C2' where ID = 'C1'")
+        source.execute("delete from Students where ID = 'S2'")
+    delta = str(tmp_path / 'second.json')
+    export_changes(source, delta)
+    applied, last = apply_changes(copy, delta)
+    assert rows(copy) == rows(source)
+    # applying the same file again changes nothing
+    assert apply_changes(copy, delta) == (0, last)
+
+
+def test_out_of_order(tmp_path, source, copy):
+    with source:
+        source.execute("insert into Students values ('S1', 's', 20, 's@x.com')")
+    export_changes(source, str(tmp_path / 'first.jsonl'))
+    with source:
+        source.execute("insert into Students values ('S2', 's', 20, 's@x.com')")
+    export_changes(source, str(tmp_path / 'second.jsonl'))
+    with pytest.raises(ValueError):
+        apply_changes(copy, str(tmp_path / 'second.jsonl'))
+    assert rows(copy)['Students'] == []
+    apply_changes(copy, str(tmp_path / 'first.jsonl'))
+    apply_changes(copy, str(tmp_path / 'second.jsonl'))
+    assert rows(copy) == rows(source)
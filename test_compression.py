@@ -0,0 +1,29 @@
+"""
+Tests of compression.py: the format is chosen from the extension, and files round-trip at every level.
+"""
+import gzip
+
+import pytest
+
+from compression import compressor_for, open_file, strip_compression_suffix
+
+
+@pytest.mark.parametrize('suffix', ['', '.gz', '.bz2', '.xz', '.lzma'])
+@pytest.mark.parametrize('level', [None, 0, 9])
+def test_round_trip(tmp_path, suffix, level):
+    filename = str(tmp_path / ('students.json' + suffix))
+    with open_file(filename, 'w', level=level) as file:
+        file.write('[{"student_id": "S1"}]\n' * 100)
+    with open_file(filename, 'r') as file:
+        assert file.read() == '[{"student_id": "S1"}]\n' * 100
+
+
+def test_compressed_by_extension(tmp_path):
+    filename = str(tmp_path / 'students.JSON.GZ')
+    with open_file(filename, 'w') as file:
+        file.write('data')
+    with gzip.open(filename, 'rt') as file:
+        assert file.read() == 'data'
+    assert compressor_for('students.json') is None
+    assert strip_compression_suffix('students.json.bz2') == 'students.json'
+    assert strip_compression_suffix('students.json') == 'students.json'
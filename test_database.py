@@ -0,0 +1,78 @@
+"""
+Tests of database.py: bulk loads skip the summary triggers of their own transactions only, and the database
+stays writable by any SQLite client.
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from database import bulk_load, connect, write_transaction
+from test_reports import expected, summaries
+
+
+@pytest.fixture
+def filename(tmp_path):
+    filename = str(tmp_path / 'university.db')
+    conn = connect(filename)
+    with conn:
+        conn.execute("INSERT INTO Instructors VALUES ('I1', 'i', 40, 'i@x.com')")
+        conn.executemany("INSERT INTO Students VALUES (?, 's', 20, 's@x.com')", [('S%d' % i,) for i in range(100)])
+        conn.executemany("INSERT INTO Courses VALUES (?, 'c', 'I1')", [('C%d' % i,) for i in range(5)])
+    conn.close()
+    return filename
+
+
+def generations(conn):
+    return dict(conn.execute("SELECT TableName, Generation FROM Generations").fetchall())
+
+
+def test_plain_sqlite3_connection(filename):
+    conn = sqlite3.connect(filename)
+    conn.execute("PRAGMA foreign_keys = ON")
+    with conn:
+        conn.execute("INSERT INTO Students VALUES ('S100', 's', 20, 's@x.com')")
+        conn.execute("INSERT INTO Registrations VALUES ('S100', 'C1')")
+        conn.execute("UPDATE Courses SET InstructorID = NULL WHERE ID = 'C2'")
+        conn.execute("DELETE FROM Students WHERE ID = 'S1'")
+    assert summaries(conn) == expected(conn)
+    conn.close()
+
+
+def test_bulk_load(filename):
+    conn, other = connect(filename), connect(filename)
+    before = generations(conn)
+    with bulk_load(conn):
+        for i in range(0, 100, 10):
+            write_transaction(conn, lambda conn: conn.executemany(
+                "INSERT INTO Registrations VALUES (?, 'C0')", [('S%d' % j,) for j in range(i, i + 10)]))
+        # the rows of the load aren't counted yet, those of the other connection are
+        assert summaries(other)['CourseEnrollment'] == []
+        assert other.execute("SELECT count(*) FROM TransactionFlags").fetchone()[0] == 0
+        with other:
+            other.execute("INSERT INTO Registrations VALUES ('S0', 'C1')")
+        assert summaries(other)['CourseEnrollment'] == [('C1', 1)]
+    assert summaries(conn) == expected(conn)
+    assert all(generations(conn)[table] > before[table] for table in before)
+    conn.close()
+    other.close()
+
+
+def test_bulk_load_of_a_process_that_died(filename):
+    subprocess.run([sys.executable, '-c', '''
+import os
+from database import bulk_load, connect, write_transaction
+conn = connect(%r)
+with bulk_load(conn):
+    write_transaction(conn, lambda conn: conn.execute("INSERT INTO Registrations VALUES ('S0', 'C0')"))
+    os._exit(1)
+''' % filename], cwd=os.path.dirname(os.path.abspath(__file__)))
+    conn = sqlite3.connect(filename)
+    assert summaries(conn) != expected(conn)
+    conn.close()
+    conn = connect(filename)
+    assert summaries(conn) == expected(conn)
+    assert conn.execute("SELECT count(*) FROM BulkLoads").fetchone()[0] == 0
+    conn.close()
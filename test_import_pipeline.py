@@ -0,0 +1,54 @@
+"""
+Tests of import_pipeline.py: the shards of a file hold each of its records once, and an import split across
+processes inserts the valid records and reports the others.
+"""
+import json
+
+import pytest
+
+from compression import open_file
+from database import connect
+from import_pipeline import TABLES, import_file, read_shard, shards
+
+RECORDS = [{'student_id': 'S%03d' % i, 'name': ['Ali', 'a [{b', 'c, {"d": 1}', 'ünï'][i % 4], 'age': 20 + i % 5,
+            'email': 's%d@x.com' % i} for i in range(200)]
+
+
+def write(filename, records, indent=None):
+    with open_file(filename, 'w') as file:
+        if '.jsonl' in filename:
+            file.write("".join(json.dumps(record) + '\n' for record in records))
+        else:
+            json.dump(records, file, indent=indent, ensure_ascii=False)
+
+
+@pytest.mark.parametrize('indent', [None, 4])
+@pytest.mark.parametrize('shard_size', [50, 333, 100000])
+def test_shards_hold_every_record_once(tmp_path, indent, shard_size):
+    filename = str(tmp_path / 'students.json')
+    write(filename, RECORDS, indent)
+    records = [record for start, end in shards(filename, shard_size)
+               for record in read_shard(filename, start, end, TABLES['students'][0])]
+    assert records == RECORDS
+
+
+def test_empty_file(tmp_path):
+    filename = str(tmp_path / 'students.json')
+    write(filename, [])
+    assert [read_shard(filename, start, end, TABLES['students'][0]) for start, end in shards(filename)] == [[]]
+
+
+@pytest.mark.parametrize('name', ['students.json', 'students.jsonl', 'students.json.gz'])
+def test_import(tmp_path, name):
+    filename = str(tmp_path / name)
+    db = str(tmp_path / 'university.db')
+    conn = connect(db)
+    with conn:
+        conn.execute("insert into Students values ('S000', 'Ali', 20, 's0@x.com')")
+    write(filename, RECORDS + [dict(RECORDS[1], student_id='S900', age=-1), dict(RECORDS[1], name='Again')], 4)
+    result = import_file('students', filename, db, workers=2, batch_size=30, shard_size=1000)
+    assert (result['records'], result['inserted'], result['invalid'], result['failed']) == (202, 199, 1, 2)
+    assert conn.execute("select * from Students order by ID").fetchall() == [
+        (record['student_id'], record['name'], record['age'], record['email']) for record in RECORDS]
+    assert len(result['errors']) == 3
+    conn.close()
@@ -0,0 +1,123 @@
+"""
+Tests of jobs.py: exports and imports interrupted on the way go on from their last checkpoint, and end as if
+they had run at once.
+"""
+import json
+
+import pytest
+
+from database import connect
+from jobs import CheckpointedJob, ExportJob, ImportJob, get_job, import_summary, open_job, partial_filename
+
+
+def students(conn):
+    return conn.execute("select * from Students order by ID").fetchall()
+
+
+def database(filename, count):
+    conn = connect(filename)
+    with conn:
+        conn.executemany("insert into Students values (?, 'Student', 20, ?)",
+                         [('S%04d' % i, 's%d@x.com' % i) for i in range(count)])
+    return conn
+
+
+@pytest.fixture
+def source(tmp_path):
+    filename = str(tmp_path / 'source.db')
+    database(filename, 1000).close()
+    return filename
+
+
+@pytest.fixture
+def target(tmp_path):
+    filename = str(tmp_path / 'target.db')
+    database(filename, 0).close()
+    return filename
+
+
+def fail_at(monkeypatch, job_class, batch):
+    # the process stops while checkpointing the given batch, which is rolled back or written again
+    calls = []
+    save_checkpoint = job_class.save_checkpoint
+
+    def failing(self, conn, *args, **kwargs):
+        calls.append(None)
+        if len(calls) == batch:
+            raise RuntimeError("stopped")
+        save_checkpoint(self, conn, *args, **kwargs)
+    monkeypatch.setattr(job_class, 'save_checkpoint', failing)
+
+
+def run(source, kind, table, filename, **options):
+    conn = connect(source)
+    job = open_job(conn, source, kind, table, filename, batch_rows=150, **options).start()
+    try:
+        job.join()
+    finally:
+        conn.close()
+    return job
+
+
+@pytest.mark.parametrize('name', ['students.json', 'students.jsonl', 'students.json.gz', 'students.jsonl.xz'])
+def test_round_trip(tmp_path, monkeypatch, source, target, name):
+    filename = str(tmp_path / name)
+    with monkeypatch.context() as patch:
+        fail_at(patch, ExportJob, 3)
+        with pytest.raises(RuntimeError):
+            run(source, 'export', 'students', filename)
+    conn = connect(source)
+    assert get_job(conn, 1)['status'] == 'failed'
+    conn.close()
+    job = run(source, 'export', 'students', filename)
+    assert job.job_id == 1 and job.progress()['done'] == 1000
+    with monkeypatch.context() as patch:
+        fail_at(patch, ImportJob, 4)
+        with pytest.raises(RuntimeError):
+            run(target, 'import', 'students', filename)
+    copy = connect(target)
+    assert len(students(copy)) == 450
+    job = run(target, 'import', 'students', filename)
+    assert job.job['checkpoint']['inserted'] == 1000 and job.job['checkpoint']['records'] == 1000
+    conn = connect(source)
+    assert students(copy) == students(conn)
+    copy.close()
+    conn.close()
+
+
+def test_partial_export_not_left(tmp_path, source):
+    filename = str(tmp_path / 'students.json.gz')
+    run(source, 'export', 'students', filename)
+    assert (tmp_path / 'students.json.gz').exists() and not (tmp_path / partial_filename('students.json.gz')).exists()
+
+
+def test_existing_records_rejected(tmp_path, source):
+    with open(str(tmp_path / 'students.jsonl'), 'w') as file:
+        file.write('{"student_id": "S0001", "name": "Again", "age": 30, "email": "a@x.com"}\n'
+                   '{"student_id": "S2000", "name": "", "age": 30, "email": "a@x.com"}\n'
+                   '{"student_id": "S2001", "name": "New", "age": 30, "email": "n@x.com"}\n')
+    checkpoint = run(source, 'import', 'students', str(tmp_path / 'students.jsonl')).job['checkpoint']
+    # the records already in the table are rejected, not skipped
+    assert import_summary(checkpoint) == "1 inserted, 2 rejected"
+    assert "record 0: UNIQUE constraint failed: Students.ID" in checkpoint['errors']
+
+
+def test_sync_import(tmp_path, source):
+    with open(str(tmp_path / 'students.jsonl'), 'w') as file:
+        for i in range(0, 1200, 2):
+            file.write(json.dumps({'student_id': 'S%04d' % i, 'name': 'Student', 'age': 21 if i < 100 else 20,
+                                   'email': 's%d@x.com' % i}) + '\n')
+    checkpoint = run(source, 'import', 'students', str(tmp_path / 'students.jsonl'), sync=True,
+                     delete_missing=True).job['checkpoint']
+    assert import_summary(checkpoint) == "100 inserted, 50 updated, 450 unchanged, 500 deleted, 0 rejected"
+    conn = connect(source)
+    assert len(students(conn)) == 600
+    conn.close()
+
+
+def test_job_without_resume():
+    class Job(CheckpointedJob):
+        pass
+
+    with pytest.raises(TypeError):
+        Job('university.db', 1)
@@ -0,0 +1,75 @@
+"""
+Tests of jsonstream.py: json arrays read one element at a time, whatever the chunks they are split into,
+and json lines files, read whole or in byte ranges.
+"""
+import io
+import json
+
+import pytest
+
+from jsonstream import (append_json_lines, is_json_lines, iter_json_array, iter_records, read_json_lines_range,
+                        rewrite_json_array, write_json_array, write_json_lines)
+
+RECORDS = [{"student_id": "S%d" % i, "name": "a, [b] \"c\" \\ {d}", "age": i, "email": None} for i in range(50)]
+
+
+def read(text, chunk_size):
+    return list(iter_json_array(io.StringIO(text), chunk_size=chunk_size))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 64, 1 << 16])
+def test_reads_what_write_json_array_writes(chunk_size):
+    file = io.StringIO()
+    write_json_array(file, RECORDS)
+    assert json.loads(file.getvalue()) == RECORDS
+    assert read(file.getvalue(), chunk_size) == RECORDS
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1 << 16])
+@pytest.mark.parametrize('text, elements', [
+    ('[]', []),
+    (' \n[ ] \n', []),
+    ('[1,2 , 3]', [1, 2, 3]),
+    ('[[1, [2]], {"a": [3, {"b": 4}]}, "x]y", null, true, -1.5e3]',
+     [[1, [2]], {"a": [3, {"b": 4}]}, "x]y", None, True, -1500.0]),
+])
+def test_elements(text, elements, chunk_size):
+    assert read(text, chunk_size) == elements
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1 << 16])
+@pytest.mark.parametrize('text', ['', '{}', '[1, 2', '[1,, 2]', '[1 2]', '[,1]', '[1,]', '[1] 2', '[1]]', '[] []'])
+def test_invalid(text, chunk_size):
+    with pytest.raises(json.JSONDecodeError):
+        read(text, chunk_size)
+
+
+def test_rewrite(tmp_path):
+    filename = str(tmp_path / 'students.json')
+    with open(filename, 'w') as file:
+        write_json_array(file, RECORDS)
+    rewrite_json_array(filename, lambda record: dict(record, age=record['age'] + 1))
+    with open(filename) as file:
+        assert [record['age'] for record in json.load(file)] == list(range(1, 51))
+
+
+def test_json_lines(tmp_path):
+    filename = str(tmp_path / 'students.jsonl')
+    with open(filename, 'w') as file:
+        write_json_lines(file, RECORDS[:30])
+    append_json_lines(filename, RECORDS[30:])
+    with open(filename) as file:
+        assert list(iter_records(file, filename)) == RECORDS
+    assert is_json_lines('students.jsonl.gz') and not is_json_lines('students.json.gz')
+
+
+@pytest.mark.parametrize('parts', [1, 2, 7, 100])
+def test_json_lines_ranges(tmp_path, parts):
+    filename = str(tmp_path / 'students.jsonl')
+    with open(filename, 'w') as file:
+        write_json_lines(file, RECORDS)
+    size = (tmp_path / 'students.jsonl').stat().st_size
+    bounds = [size * i // parts for i in range(parts + 1)]
+    records = [record for start, end in zip(bounds, bounds[1:])
+               for record in read_json_lines_range(filename, start, end)]
+    assert records == RECORDS
@@ -0,0 +1,60 @@
+"""
+Tests of pagination.py: pages read from the key of the previous one cover a table once, in key order.
+"""
+import pytest
+
+from database import connect
+from pagination import decode_cursor, encode_cursor, fetch_page, iter_pages, iter_rows, page_key
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / 'university.db'))
+    with conn:
+        conn.executemany("insert into Students values (?, 's', 20, 's@x.com')", [('S%03d' % i,) for i in range(250)])
+        conn.executemany("insert into Courses values (?, 'c', null)", [('C%d' % i,) for i in range(3)])
+        conn.executemany("insert into Registrations values (?, ?)",
+                         [('S%03d' % i, 'C%d' % (i % 3)) for i in range(250)] + [('S000', 'C1'), ('S000', 'C2')])
+    yield conn
+    conn.close()
+
+
+def test_pages_cover_the_table(conn):
+    pages = list(iter_pages(conn, 'Students', page_size=100))
+    assert [len(page) for page in pages] == [100, 100, 50]
+    assert [row[0] for page in pages for row in page] == ['S%03d' % i for i in range(250)]
+    # a composite key
+    rows = list(iter_rows(conn, 'Registrations', page_size=7))
+    assert rows == sorted(conn.execute("select * from Registrations").fetchall())
+
+
+def test_filters_and_columns(conn):
+    rows = list(iter_rows(conn, 'Registrations', [('CourseID', 'C1')], page_size=10, columns=['StudentID', 'CourseID']))
+    assert rows == conn.execute("select StudentID, CourseID from Registrations where CourseID = 'C1' "
+                                "order by StudentID").fetchall()
+    rows = list(iter_rows(conn, 'Students', page_size=10, columns=['Name', 'ID'], after=('S240',), upto=('S244',)))
+    assert rows == [('s', 'S%03d' % i) for i in range(241, 245)]
+
+
+def test_previous_page(conn):
+    page = fetch_page(conn, 'Students', after=('S049',), limit=10)
+    previous = fetch_page(conn, 'Students', before=page_key('Students', page[0]), limit=10)
+    assert [row[0] for row in previous] == ['S%03d' % i for i in range(40, 50)]
+
+
+def test_rows_changed_between_pages(conn):
+    first = fetch_page(conn, 'Students', limit=100)
+    with conn:
+        conn.execute("delete from Students where ID in ('S010', 'S100')")
+        conn.execute("insert into Students values ('S0005', 's', 20, 's@x.com')")
+    rest = list(iter_rows(conn, 'Students', after=page_key('Students', first[-1])))
+    assert rest[0][0] == 'S101' and len(first) + len(rest) == 249
+
+
+def test_cursor():
+    for key in [('S1',), ('S1', 'C1'), ('ünï', 3)]:
+        assert decode_cursor(encode_cursor(key)) == key
+    assert encode_cursor(None) is None and decode_cursor('') is None
+    for cursor in ['not a cursor', encode_cursor(('S1',))[:-2] + '!', 'e30']:
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
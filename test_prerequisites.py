@@ -0,0 +1,152 @@
+"""
+Tests of prerequisites.py: the triggers keep PrerequisiteClosure as a rebuild from the prerequisites would,
+through any sequence of changes, and registrations need the courses required.
+"""
+import random
+import sqlite3
+
+import pytest
+
+from changelog import apply_changes, export_changes, start_from
+from database import connect
+from prerequisites import (CLOSURE, PrerequisiteError, add_prerequisite, check_eligibility, complete_courses,
+                           rebuild_closure, required_courses, set_prerequisites)
+
+
+def closure(conn):
+    return sorted(conn.execute("select CourseID, RequiredID, Paths from PrerequisiteClosure").fetchall())
+
+
+def expected(conn):
+    return sorted(conn.execute(CLOSURE).fetchall())
+
+
+def requires(conn, course_id, other_id):
+    # whether a course requires another, walking the prerequisites
+    edges = {}
+    for course, prerequisite in conn.execute("select CourseID, PrerequisiteID from Prerequisites"):
+        edges.setdefault(course, []).append(prerequisite)
+    seen, todo = set(), [course_id]
+    while todo:
+        for prerequisite in edges.get(todo.pop(), []):
+            if prerequisite not in seen:
+                seen.add(prerequisite)
+                todo.append(prerequisite)
+    return other_id in seen
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / 'university.db'))
+    with conn:
+        conn.executemany("insert into Courses values (?, 'c', null)", [('C%d' % i,) for i in range(1, 5)])
+        conn.executemany("insert into Students values (?, 's', 20, 's@x.com')", [('S1',), ('S2',)])
+    yield conn
+    conn.close()
+
+
+def random_step(conn, rng, step):
+    courses = [row[0] for row in conn.execute("select ID from Courses")]
+    edges = conn.execute("select CourseID, PrerequisiteID from Prerequisites").fetchall()
+    action = rng.randrange(12)
+    if action == 0 and len(courses) < 15 or len(courses) < 8:
+        conn.execute("insert into Courses values (?, 'c', null)", ('C%d' % (step + 10),))
+    elif action < 7 or not edges:
+        course_id, prerequisite_id = rng.choice(courses), rng.choice(courses)
+        refused = course_id == prerequisite_id or requires(conn, prerequisite_id, course_id)
+        try:
+            conn.execute("insert or ignore into Prerequisites values (?, ?)", (course_id, prerequisite_id))
+        except sqlite3.IntegrityError:
+            assert refused, (course_id, prerequisite_id)
+        else:
+            assert not refused, (course_id, prerequisite_id)
+    elif action == 7:
+        conn.execute("delete from Prerequisites where CourseID = ? and PrerequisiteID = ?", rng.choice(edges))
+    elif action == 8:
+        try:
+            conn.execute("update Prerequisites set PrerequisiteID = ? where CourseID = ? and PrerequisiteID = ?",
+                         (rng.choice(courses),) + rng.choice(edges))
+        except sqlite3.IntegrityError:
+            pass  # a cycle, or a prerequisite the course has already
+    elif action in (9, 10):
+        conn.execute("update Courses set ID = ? where ID = ?", ('R%d' % step, rng.choice(courses)))
+    else:
+        conn.execute("delete from Courses where ID = ?", (rng.choice(courses),))
+
+
+def test_triggers_keep_the_closure(conn):
+    rng = random.Random(50)
+    sizes = []
+    for step in range(1500):
+        with conn:
+            random_step(conn, rng, step)
+        assert closure(conn) == expected(conn), step
+        sizes.append(len(closure(conn)))
+    assert max(sizes) > 50
+    rebuild_closure(conn)
+    assert closure(conn) == expected(conn)
+
+
+def test_cycles_refused(conn):
+    set_prerequisites(conn, 'C3', ['C2', 'C2'])
+    add_prerequisite(conn, 'C2', 'C1')
+    assert required_courses(conn, 'C3') == ['C1', 'C2']
+    for course_id, prerequisite_id in [('C1', 'C3'), ('C1', 'C1'), ('C2', 'C3')]:
+        with pytest.raises(PrerequisiteError):
+            add_prerequisite(conn, course_id, prerequisite_id)
+    with pytest.raises(sqlite3.IntegrityError):
+        with conn:
+            conn.execute("insert into Prerequisites values ('C1', 'C3')")
+    with pytest.raises(PrerequisiteError):
+        set_prerequisites(conn, 'C1', ['C4', 'C3'])
+    assert required_courses(conn, 'C1') == []
+
+
+def test_eligibility(tmp_path, conn):
+    set_prerequisites(conn, 'C3', ['C2'])
+    set_prerequisites(conn, 'C2', ['C1'])
+    with pytest.raises(PrerequisiteError, match="student S1 has to complete C1, C2 before C3"):
+        check_eligibility(conn, 'S1', 'C3')
+    complete_courses(conn, 'S1', ['C1'])
+    with pytest.raises(sqlite3.IntegrityError):
+        with conn:
+            conn.execute("insert into Registrations values ('S1', 'C3')")
+    # the trigger is the same for any connection to the database
+    other = sqlite3.connect(str(tmp_path / 'university.db'))
+    with pytest.raises(sqlite3.IntegrityError):
+        with other:
+            other.execute("insert into Registrations values ('S1', 'C3')")
+    complete_courses(conn, 'S1', ['C1', 'C2'])
+    check_eligibility(conn, 'S1', 'C3')
+    with other:
+        other.execute("insert into Registrations values ('S1', 'C3')")
+        other.execute("insert or ignore into Registrations values ('S1', 'C3')")
+    other.close()
+    # a registration made before the prerequisite is kept
+    with conn:
+        conn.execute("insert into Registrations values ('S2', 'C4')")
+    set_prerequisites(conn, 'C4', ['C1'])
+    assert conn.execute("select count(*) from Registrations").fetchone()[0] == 2
+
+
+def test_replicated(tmp_path, conn):
+    copy = connect(str(tmp_path / 'copy.db'))
+    start_from(copy, 0)
+    set_prerequisites(conn, 'C3', ['C1', 'C2'])
+    complete_courses(conn, 'S1', ['C1', 'C2'])
+    with conn:
+        conn.execute("insert into Registrations values ('S1', 'C3')")
+        conn.execute("update Courses set ID = 'C5' where ID = 'C2'")
+        conn.execute("delete from CompletedCourses where CourseID = 'C1'")
+    export_changes(conn, str(tmp_path / 'changes.jsonl'))
+    apply_changes(copy, str(tmp_path / 'changes.jsonl'))
+    for table in ['Prerequisites', 'CompletedCourses', 'Registrations']:
+        assert sorted(copy.execute("select * from " + table).fetchall()) == sorted(
+            conn.execute("select * from " + table).fetchall())
+    assert closure(copy) == closure(conn) == expected(copy)
+    # the registrations made in the copy itself are checked
+    assert copy.execute("select count(*) from TransactionFlags").fetchone()[0] == 0
+    with pytest.raises(sqlite3.IntegrityError):
+        with copy:
+            copy.execute("insert into Registrations values ('S2', 'C3')")
+    copy.close()
@@ -0,0 +1,90 @@
+"""
+Tests of the summary tables behind reports.py: after any sequence of writes, the triggers leave them as a
+rebuild from the other tables would.
+"""
+import random
+
+import pytest
+
+from database import connect
+from reports import refresh_summaries, report
+
+SUMMARIES = {
+    'CourseEnrollment': "SELECT CourseID, count(*) FROM Registrations GROUP BY CourseID",
+    'CourseAges': '''
+        SELECT r.CourseID, s.Age, count(*) FROM Registrations r JOIN Students s ON s.ID = r.StudentID
+        WHERE s.Age IS NOT NULL GROUP BY r.CourseID, s.Age''',
+    'InstructorLoad': '''
+        SELECT c.InstructorID, count(*), (SELECT count(*) FROM Registrations r JOIN Courses d ON d.ID = r.CourseID
+                                          WHERE d.InstructorID = c.InstructorID)
+        FROM Courses c WHERE c.InstructorID IS NOT NULL GROUP BY c.InstructorID''',
+}
+
+
+def summaries(conn):
+    # the rows of the courses and instructors left with nothing are kept at 0 by the triggers
+    return {table: sorted(conn.execute("SELECT * FROM %s WHERE %s" % (table, where)).fetchall())
+            for table, where in (('CourseEnrollment', "Students > 0"), ('CourseAges', "1"),
+                                 ('InstructorLoad', "Courses > 0 OR Students > 0"))}
+
+
+def expected(conn):
+    return {table: sorted(row for row in conn.execute(query).fetchall()) for table, query in SUMMARIES.items()}
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / 'university.db'))
+    yield conn
+    conn.close()
+
+
+def random_step(conn, rng, step):
+    students = [row[0] for row in conn.execute("SELECT ID FROM Students")]
+    instructors = [row[0] for row in conn.execute("SELECT ID FROM Instructors")]
+    courses = [row[0] for row in conn.execute("SELECT ID FROM Courses")]
+    action = rng.randrange(9)
+    if action == 0 or not students:
+        conn.execute("INSERT INTO Students VALUES (?, 's', ?, 's@x.com')",
+                     ('S%d' % step, rng.choice([None, 20, 21, 22])))
+    elif action == 1 or not instructors:
+        conn.execute("INSERT INTO Instructors VALUES (?, 'i', 40, 'i@x.com')", ('I%d' % step,))
+    elif action == 2 or not courses:
+        conn.execute("INSERT INTO Courses VALUES (?, 'c', ?)", ('C%d' % step, rng.choice(instructors + [None])))
+    elif action in (3, 4):
+        conn.execute("INSERT OR IGNORE INTO Registrations VALUES (?, ?)", (rng.choice(students), rng.choice(courses)))
+    elif action == 5:
+        conn.execute("UPDATE Students SET Age = ? WHERE ID = ?", (rng.choice([None, 20, 23]), rng.choice(students)))
+    elif action == 6:
+        conn.execute("UPDATE Courses SET InstructorID = ? WHERE ID = ?",
+                     (rng.choice(instructors + [None]), rng.choice(courses)))
+    elif action == 7:
+        table, ids = rng.choice([('Students', students), ('Courses', courses), ('Instructors', instructors)])
+        conn.execute("UPDATE %s SET ID = ? WHERE ID = ?" % table, ('R%d' % step, rng.choice(ids)))
+    else:
+        table, ids = rng.choice([('Students', students), ('Courses', courses), ('Instructors', instructors),
+                                 ('Registrations', None)])
+        if ids is None:
+            conn.execute("DELETE FROM Registrations WHERE rowid = (SELECT rowid FROM Registrations ORDER BY random())")
+        else:
+            conn.execute("DELETE FROM %s WHERE ID = ?" % table, (rng.choice(ids),))
+
+
+def test_triggers_keep_the_summaries(conn):
+    rng = random.Random(36)
+    for step in range(600):
+        with conn:
+            random_step(conn, rng, step)
+        assert summaries(conn) == expected(conn), step
+    refresh_summaries(conn)
+    assert summaries(conn) == expected(conn)
+
+
+def test_report(conn):
+    with conn:
+        conn.execute("INSERT INTO Instructors VALUES ('I1', 'Ina', 40, 'i@x.com')")
+        conn.execute("INSERT INTO Courses VALUES ('C1', 'Math', 'I1')")
+        conn.executemany("INSERT INTO Students VALUES (?, 's', ?, 's@x.com')", [('S1', 20), ('S2', 23)])
+        conn.executemany("INSERT INTO Registrations VALUES (?, 'C1')", [('S1',), ('S2',)])
+    assert report(conn, 'enrollment')[1] == [('C1', 'Math', 'Ina', 2, 21.5)]
+    assert report(conn, 'load')[1] == [('I1', 'Ina', 1, 2)]
@@ -0,0 +1,185 @@
+"""
+Tests of storage.py: every backend behaves the same, the files of the old Tkinter app are converted, and
+the changes of a store written behind survive a crash.
+"""
+import json
+import os
+import time
+
+import pytest
+
+from storage import STORAGES, StorageError, WriteBehindJsonLinesStorage, WriteBehindJsonStorage, open_storage
+
+STUDENT = {'id': 'S1', 'name': 'Ali', 'age': 20, 'email': 'ali@x.com'}
+
+
+def location(tmp_path, kind):
+    return str(tmp_path / 'university.db') if kind == 'sqlite' else str(tmp_path / 'data')
+
+
+@pytest.fixture(params=list(STORAGES))
+def storage(request, tmp_path):
+    storage = open_storage(request.param, location(tmp_path, request.param))
+    yield storage
+    storage.close()
+
+
+def fill(storage):
+    storage.add('instructors', {'id': 'I1', 'name': 'Ina', 'age': 40, 'email': 'ina@x.com'})
+    storage.add('students', STUDENT)
+    storage.add('students', {'id': 'S2', 'name': 'Bo', 'age': 21, 'email': 'bo@x.com'})
+    storage.add('courses', {'id': 'C1', 'name': 'Math', 'instructor_id': 'I1'})
+    storage.add('courses', {'id': 'C2', 'name': 'Physics', 'instructor_id': None})
+    storage.register('S1', 'C1')
+    storage.register('S2', 'C1')
+    storage.register('S1', 'C2')
+
+
+def test_operations(storage):
+    fill(storage)
+    assert storage.get('students', 'S1') == STUDENT
+    assert storage.get('students', 'S9') is None
+    assert [r['course_id'] for r in storage.iterate('registrations', student_id='S1')] == ['C1', 'C2']
+    assert [c['id'] for c in storage.iterate('courses', instructor_id='I1')] == ['C1']
+    assert storage.update('students', 'S1', {'age': 22})
+    assert storage.get('students', 'S1')['age'] == 22
+    storage.assign('C2', 'I1')
+    assert [c['id'] for c in storage.iterate('courses', instructor_id='I1')] == ['C1', 'C2']
+    assert storage.drop('S1', 'C2') and not storage.drop('S1', 'C2')
+    assert [s['id'] for s in storage.page('students', limit=1)] == ['S1']
+    assert [s['id'] for s in storage.page('students', after=('S1',))] == ['S2']
+
+
+@pytest.mark.parametrize('change', [
+    lambda storage: storage.add('students', STUDENT),
+    lambda storage: storage.register('S1', 'C1'),
+    lambda storage: storage.register('S9', 'C1'),
+    lambda storage: storage.add('courses', {'id': 'C9', 'name': 'x', 'instructor_id': 'I9'}),
+])
+def test_integrity(storage, change):
+    fill(storage)
+    with pytest.raises(StorageError):
+        change(storage)
+
+
+def test_cascades(storage):
+    fill(storage)
+    storage.delete('instructors', 'I1')
+    assert [c['id'] for c in storage.iterate('courses')] == ['C2']
+    assert list(storage.iterate('registrations')) == [{'student_id': 'S1', 'course_id': 'C2'}]
+    storage.delete('students', 'S1')
+    assert list(storage.iterate('registrations')) == []
+
+
+@pytest.mark.parametrize('kind', list(STORAGES))
+def test_reopened(tmp_path, kind):
+    storage = open_storage(kind, location(tmp_path, kind))
+    fill(storage)
+    storage.delete('students', 'S2')
+    storage.close()
+    storage = open_storage(kind, location(tmp_path, kind))
+    assert [s['id'] for s in storage.iterate('students')] == ['S1']
+    assert len(list(storage.iterate('registrations'))) == 2
+    storage.close()
+
+
+def test_legacy_files(tmp_path):
+    directory = tmp_path / 'data'
+    directory.mkdir()
+    legacy = {
+        'students.json': [
+            {'name': 'Ali', 'age': 20, '_email': 'ali@x.com', 'student_id': 'S1',
+             'registered_courses': ['Math', 'Art']},
+            {'name': 'Bo', 'age': 21, '_email': 'bo@x.com', 'student_id': 'S2', 'registered_courses': []},
+            {'name': 'Again', 'age': 22, '_email': 'a@x.com', 'student_id': 'S1', 'registered_courses': []},
+        ],
+        'instructors.json': [
+            {'name': 'Ina', 'age': 40, '_email': 'ina@x.com', 'instructor_id': 'I1', 'assigned_courses': ['Math']},
+        ],
+        'Courses.json': [
+            {'course_id': 'C1', 'course_name': 'Math', 'instructor': None, 'enrolled_students': []},
+            {'course_id': 'C2', 'course_name': 'Physics', 'instructor': None, 'enrolled_students': []},
+        ],
+        'RegCourses.json': [{'student_id': 'S1', 'course_name': 'Math'},
+                            {'student_id': 'S2', 'course_name': 'Physics'}],
+        'AssignedCourses.json': [{'instructor_id': 'I1', 'course_name': 'Physics'}],
+    }
+    for name, records in legacy.items():
+        with open(str(directory / name), 'w') as file:
+            json.dump(records, file, indent=4)
+    storage = open_storage('json', str(directory))
+    assert list(storage.iterate('students')) == [STUDENT, {'id': 'S2', 'name': 'Bo', 'age': 21, 'email': 'bo@x.com'}]
+    assert list(storage.iterate('courses')) == [{'id': 'C1', 'name': 'Math', 'instructor_id': 'I1'},
+                                                {'id': 'C2', 'name': 'Physics', 'instructor_id': 'I1'}]
+    assert list(storage.iterate('registrations')) == [{'student_id': 'S1', 'course_id': 'C1'},
+                                                      {'student_id': 'S2', 'course_id': 'C2'}]
+    storage.close()
+    assert sorted(name for name in os.listdir(str(directory)) if name.endswith('.bak')) == sorted(
+        name + '.bak' for name in legacy)
+    # converted once
+    storage = open_storage('json', str(directory))
+    storage.update('students', 'S2', {'age': 30})
+    storage.close()
+    storage = open_storage('json', str(directory))
+    assert storage.get('students', 'S2')['age'] == 30
+    storage.close()
+
+
+def crash(storage):
+    # stops the background thread without writing what is pending, as a process that dies would
+    storage.flush = lambda: 0
+    storage.closed = True
+    storage.wake.set()
+    storage.thread.join()
+    storage.journal.close()
+
+
+@pytest.mark.parametrize('storage_class', [WriteBehindJsonStorage, WriteBehindJsonLinesStorage])
+def test_journal_replayed(tmp_path, storage_class):
+    directory = str(tmp_path / 'data')
+    storage = storage_class(directory, interval=3600, threshold=10 ** 6)
+    fill(storage)
+    storage.flush()
+    storage.update('students', 'S1', {'age': 22})
+    storage.delete('students', 'S2')
+    storage.add('students', {'id': 'S3', 'name': 'Cy', 'age': 19, 'email': 'cy@x.com'})
+    assert storage.pending() == 3
+    crash(storage)
+    with open(storage.filename('students')) as file:
+        assert 'S3' not in file.read()
+    storage = storage_class(directory)
+    assert [(s['id'], s['age']) for s in storage.iterate('students')] == [('S1', 22), ('S3', 19)]
+    assert len(list(storage.iterate('registrations'))) == 2
+    storage.close()
+    assert not [name for name in os.listdir(directory) if name.startswith('journal-')]
+
+
+@pytest.mark.parametrize('storage_class', [WriteBehindJsonStorage, WriteBehindJsonLinesStorage])
+def test_interrupted_flush_completed(tmp_path, monkeypatch, storage_class):
+    directory = str(tmp_path / 'data')
+    storage = storage_class(directory, interval=3600, threshold=10 ** 6)
+    fill(storage)
+    storage.add('students', {'id': 'S3', 'name': 'Cy', 'age': 19, 'email': 'cy@x.com'})
+    # the process dies once flush.json is written, before the files are replaced
+    monkeypatch.setattr(storage, 'complete_flush', lambda: None)
+    storage.flush()
+    storage.register('S3', 'C2')
+    crash(storage)
+    assert os.path.exists(os.path.join(directory, 'flush.json'))
+    storage = storage_class(directory)
+    assert [s['id'] for s in storage.iterate('students')] == ['S1', 'S2', 'S3']
+    assert len(list(storage.iterate('registrations'))) == 4
+    assert not os.path.exists(os.path.join(directory, 'flush.json'))
+    storage.close()
+
+
+def test_background_flush(tmp_path):
+    storage = WriteBehindJsonStorage(str(tmp_path / 'data'), interval=3600, threshold=3)
+    fill(storage)
+    storage.wake.set()
+    for _ in range(100):
+        if storage.flushes:
+            break
+        time.sleep(0.05)
+    assert storage.flushes
+    storage.close()
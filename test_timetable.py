@@ -0,0 +1,112 @@
+"""
+Tests of timetable.py: the interval index finds the same overlaps as comparing every pair of slots, and a
+change that would give someone two courses at the same time is refused.
+"""
+import itertools
+import random
+
+import pytest
+
+from database import connect
+from storage import SqliteStorage, StorageError
+from timetable import (ClashError, SlotIndex, check_assignment, check_registration, course_slots, format_slot,
+                       parse_slot, parse_slots, set_slots, validate_term)
+
+
+def overlap(a, b):
+    return a[0] == b[0] and a[1] < b[2] and b[1] < a[2]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / 'university.db'))
+    with conn:
+        conn.execute("insert into Instructors values ('I1', 'i', 40, 'i@x.com')")
+        conn.executemany("insert into Students values (?, 's', 20, 's@x.com')", [('S1',), ('S2',)])
+        conn.executemany("insert into Courses values (?, 'c', ?)", [('C1', 'I1'), ('C2', None), ('C3', 'I1')])
+        conn.executemany("insert into Registrations values (?, ?)", [('S1', 'C1'), ('S2', 'C2')])
+    set_slots(conn, 'C1', parse_slots("Mon 09:00-10:15, Wed 09:00-10:15"))
+    set_slots(conn, 'C2', parse_slots("Mon 10:00-11:00"))
+    set_slots(conn, 'C3', parse_slots("Mon 10:15-11:00"))
+    yield conn
+    conn.close()
+
+
+def test_parse_slot():
+    assert parse_slot("Mon 09:00-10:15") == (0, 540, 615)
+    assert parse_slot(" sunday 9:05 - 23:59 ") == (6, 545, 1439)
+    assert parse_slots("Mon 09:00-10:15; Wed 09:00-10:15,") == [(0, 540, 615), (2, 540, 615)]
+    assert format_slot(*parse_slot("Fri 08:30-24:00")) == "Fri 08:30-24:00"
+    for text in ["Mon 10:00-09:00", "Mon 10:00-10:00", "Xyz 09:00-10:00", "Mon 9-10", "Mon 23:00-24:30"]:
+        with pytest.raises(ValueError):
+            parse_slot(text)
+
+
+def test_index_finds_every_overlap():
+    rng = random.Random(49)
+    slots = []
+    for i in range(300):
+        start = rng.randrange(0, 1400)
+        slots.append(('C%d' % i, rng.randrange(3), start, start + rng.randrange(1, 200)))
+    index = SlotIndex()
+    for slot in slots:
+        index.add(*slot)
+    for _ in range(300):
+        start = rng.randrange(0, 1400)
+        slot = (rng.randrange(3), start, start + rng.randrange(1, 200))
+        assert index.overlapping(*slot) == sorted((s for s in slots if overlap(s[1:], slot)), key=lambda s: s[2])
+
+
+def test_clashes_refused(conn):
+    # C1 ends at 10:15, when C3 starts
+    check_assignment(conn, 'I1', 'C3')
+    check_registration(conn, 'S1', 'C3')
+    with pytest.raises(ClashError, match="C2 \\(Mon 10:00-11:00\\) clashes with C1 \\(Mon 09:00-10:15\\)"):
+        check_registration(conn, 'S1', 'C2')
+    with pytest.raises(ClashError):
+        check_assignment(conn, 'I1', 'C2')
+    # C1 moved to the time of C3, which has the same instructor
+    with pytest.raises(ClashError):
+        set_slots(conn, 'C1', parse_slots("Mon 10:30-11:30"))
+    assert course_slots(conn, 'C1') == [(0, 540, 615), (2, 540, 615)]
+    set_slots(conn, 'C2', parse_slots("Tue 10:00-11:00"))
+    check_registration(conn, 'S1', 'C2')
+
+
+def test_storage_refuses_clashes(tmp_path, conn):
+    storage = SqliteStorage(str(tmp_path / 'university.db'))
+    with pytest.raises(StorageError):
+        storage.register('S2', 'C1')
+    with pytest.raises(StorageError):
+        storage.update('courses', 'C2', {'instructor_id': 'I1'})
+    storage.register('S1', 'C3')
+    assert [r['course_id'] for r in storage.iterate('registrations', student_id='S1')] == ['C1', 'C3']
+    storage.close()
+
+
+def test_validate_term(conn):
+    rng = random.Random(50)
+    with conn:
+        conn.execute("delete from CourseSlots")
+        conn.executemany("insert into Courses values (?, 'c', ?)",
+                         [('D%d' % i, rng.choice(['I1', None])) for i in range(30)])
+        conn.executemany("insert or ignore into CourseSlots (CourseID, Day, StartTime, EndTime) values (?, ?, ?, ?)",
+                         [('D%d' % i, rng.randrange(2), start, start + 60)
+                          for i in range(30) for start in rng.sample(range(480, 1080, 30), 2)])
+        conn.executemany("insert or ignore into Registrations values (?, ?)",
+                         [(rng.choice(['S1', 'S2']), 'D%d' % rng.randrange(30)) for _ in range(30)])
+    slots = {}
+    for course_id, day, start, end in conn.execute("select CourseID, Day, StartTime, EndTime from CourseSlots"):
+        slots.setdefault(course_id, []).append((day, start, end))
+    result = validate_term(conn)
+    for kind, query in [('students', "select StudentID, CourseID from Registrations"),
+                        ('instructors', "select InstructorID, ID from Courses where InstructorID is not null")]:
+        courses = {}
+        for person_id, course_id in conn.execute(query):
+            courses.setdefault(person_id, []).append(course_id)
+        expected = {(person_id,) + tuple(sorted(pair)) for person_id, ids in courses.items()
+                    for pair in itertools.combinations(ids, 2)
+                    if any(overlap(a, b) for a in slots.get(pair[0], []) for b in slots.get(pair[1], []))}
+        assert {(person_id,) + tuple(sorted((course_id, other)))
+                for person_id, course_id, slot, other, other_slot in result[kind]} == expected
+        assert expected
@@ -0,0 +1,395 @@
+"""
+Meeting times of the courses, and the clashes between them in the timetable of a student or an instructor.
+
+A course meets in any number of slots, e.g. Mon 09:00-10:15, kept in the CourseSlots table (see database.py)
+as a day from 0 (Monday) to 6 and a start and an end time in minutes since midnight. A slot lasts from its
+start up to its end, so a course ending at 10:15 doesn't clash with one starting at 10:15.
+
+A student can't be registered in a course, nor an instructor assigned to it, if one of its slots overlaps a
+slot of another course of theirs: check_registration and check_assignment raise a ClashError, in the
+transaction of the change (see storage.SqliteStorage and server.py). Likewise, set_slots refuses meeting
+times that overlap another course of the instructor or of a student of the course. The slots of the other courses of the
+person are read in the order of their days and start times into a SlotIndex, an interval index that keeps
+the latest end time of the slots up to each of them, so each slot of the course is checked with a binary
+search, in O(log n) for the n slots of the person, rather than against each of them.
+
+validate_term finds all the clashes of the term at once, e.g. after the times of courses have changed: it
+reads the slots of every course once, then the registrations in the order of their students (and the
+courses in the order of their instructors), and checks each course of a person against a SlotIndex of
+their previous courses, in one pass over the registrations. Usage::
+
+    python timetable.py set C1 "Mon 09:00-10:15" "Wed 09:00-10:15" --db university.db
+    python timetable.py show C1
+    python timetable.py validate --csv clashes.csv
+"""
+import argparse
+import bisect
+import csv
+import itertools
+import re
+import sqlite3
+import time
+
+from compression import open_file
+from database import DB_FILE, connect, write_transaction
+
+DAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+# a slot as written by format_slot, e.g. Mon 09:00-10:15, the day possibly in full (Monday)
+SLOT_PATTERN = re.compile(r'^\s*([A-Za-z]{3})[A-Za-z]*\s+(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*$')
+
+# kind of person -> the query of the slots of their courses other than a given one, in the order of days and times
+PERSON_SLOTS = {
+    'students': '''
+        SELECT s.CourseID, s.Day, s.StartTime, s.EndTime
+        FROM Registrations r
+        JOIN CourseSlots s ON s.CourseID = r.CourseID
+        WHERE r.StudentID = ? AND r.CourseID <> ?
+        ORDER BY s.Day, s.StartTime
+        ''',
+    'instructors': '''
+        SELECT s.CourseID, s.Day, s.StartTime, s.EndTime
+        FROM Courses c
+        JOIN CourseSlots s ON s.CourseID = c.ID
+        WHERE c.InstructorID = ? AND c.ID <> ?
+        ORDER BY s.Day, s.StartTime
+        ''',
+}
+
+# kind of person -> the query of the (person, course) pairs of all people, in the order of the people
+TERM = {
+    'students': "SELECT StudentID, CourseID FROM Registrations ORDER BY StudentID",
+    'instructors': "SELECT InstructorID, ID FROM Courses WHERE InstructorID IS NOT NULL ORDER BY InstructorID",
+}
+
+CSV_HEADER = ['Kind', 'ID', 'Course', 'Slot', 'Other course', 'Other slot']
+
+
+class ClashError(sqlite3.IntegrityError):
+    """
+    Raised when a registration or an assignment would give a student or an instructor two courses at the same
+    time. It is an IntegrityError, so it is reported like the constraints of the database: as a StorageError by
+    storage.py, and with a 409 status by server.py.
+    """
+
+
+def parse_slot(text):
+    """
+    reads a slot written like Mon 09:00-10:15
+
+    :param text: the slot
+    :type text: str
+
+    :return: the day, from 0 for Monday, and the start and end times in minutes since midnight
+    :rtype: tuple
+    :raises ValueError: if the text isn't a slot, or the slot ends before it starts
+    """
+    match = SLOT_PATTERN.match(text)
+    if match is None or match.group(1).capitalize() not in DAYS:
+        raise ValueError("%r is not a meeting time like Mon 09:00-10:15" % text)
+    day = DAYS.index(match.group(1).capitalize())
+    start = int(match.group(2)) * 60 + int(match.group(3))
+    end = int(match.group(4)) * 60 + int(match.group(5))
+    if not 0 <= start < end <= 24 * 60:
+        raise ValueError("%r doesn't end after it starts on the same day" % text)
+    return day, start, end
+
+
+def parse_slots(text):
+    """
+    reads the slots of a course separated by commas or semicolons, e.g. "Mon 09:00-10:15, Wed 09:00-10:15"
+
+    :rtype: list of tuple
+    :raises ValueError: if one of them isn't a slot
+    """
+    return [parse_slot(part) for part in re.split(r'[,;]', text) if part.strip()]
+
+
+def format_slot(day, start, end):
+    """
+    writes a slot like Mon 09:00-10:15
+    """
+    return "%s %02d:%02d-%02d:%02d" % (DAYS[day], start // 60, start % 60, end // 60, end % 60)
+
+
+class SlotIndex:
+    """
+    An interval index of meeting slots: the slots of each day in the order of their start times, along with
+    the latest end time of the slots up to each of them, so that the slots overlapping a given one are found
+    with a binary search instead of a comparison with every slot.
+
+    Attributes
+    ----------
+    days : dict
+        Day -> the start times, end times and courses of its slots in the order of the start times, and the
+        latest end time of the slots up to each position.
+
+    Methods
+    -------
+    add(course_id, day, start, end)
+        Adds a slot of a course.
+    overlapping(day, start, end)
+        Returns the slots that overlap the given one.
+    """
+
+    def __init__(self, slots=()):
+        self.days = {}
+        for course_id, day, start, end in slots:
+            self.add(course_id, day, start, end)
+
+    def add(self, course_id, day, start, end):
+        """
+        adds a slot of a course. Slots added in the order of their start times are appended in constant time
+
+        :return: Nothing.
+        :rtype: None
+        """
+        if day not in self.days:
+            self.days[day] = ([], [], [], [])
+        starts, ends, courses, reach = self.days[day]
+        i = bisect.bisect_right(starts, start)
+        starts.insert(i, start)
+        ends.insert(i, end)
+        courses.insert(i, course_id)
+        reach.insert(i, end)
+        latest = reach[i - 1] if i else 0
+        for j in range(i, len(starts)):
+            latest = max(latest, ends[j])
+            reach[j] = latest
+
+    def overlapping(self, day, start, end):
+        """
+        returns the slots that overlap the given one: those starting before it ends and ending after it starts.
+        The last slot starting before its end is found by a binary search, and the slots before it are only
+        looked at as long as one of them still ends after its start
+
+        :return: the (course ID, day, start, end) of the slots, in the order of their start times
+        :rtype: list of tuple
+        """
+        if day not in self.days:
+            return []
+        starts, ends, courses, reach = self.days[day]
+        found = []
+        j = bisect.bisect_left(starts, end) - 1
+        while j >= 0 and reach[j] > start:
+            if ends[j] > start:
+                found.append((courses[j], day, starts[j], ends[j]))
+            j -= 1
+        found.reverse()
+        return found
+
+
+def course_slots(conn, course_id):
+    """
+    returns the slots of a course, in the order of their days and start times
+
+    :rtype: list of tuple
+    """
+    return conn.execute("select Day, StartTime, EndTime from CourseSlots where CourseID = ? order by Day, StartTime",
+                        (course_id,)).fetchall()
+
+
+def set_slots(conn, course_id, slots):
+    """
+    replaces the slots of a course, checking them against the other courses of its instructor and of each of
+    its students in the same transaction (see check_course)
+
+    :param course_id: the ID of the course
+    :type course_id: str
+
+    :param slots: the (day, start, end) of its slots, see parse_slot
+    :type slots: list of tuple
+
+    :return: Nothing.
+    :rtype: None
+    :raises ClashError: if a slot overlaps another course of the instructor or of a student of the course,
+        in which case the slots are left unchanged
+    :raises sqlite3.IntegrityError: if there is no such course, or two slots start at the same time on the same day
+    """
+    def replace(conn):
+        conn.execute("delete from CourseSlots where CourseID = ?", (course_id,))
+        conn.executemany("insert into CourseSlots (CourseID, Day, StartTime, EndTime) values (?, ?, ?, ?)",
+                         [(course_id,) + tuple(slot) for slot in slots])
+        check_course(conn, course_id)
+    write_transaction(conn, replace)
+
+
+def clashes(conn, kind, person_id, course_id):
+    """
+    returns the clashes that registering a student in a course, or assigning an instructor to it, would make
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param kind: students or instructors
+    :type kind: str
+
+    :param person_id: the ID of the student or instructor
+    :type person_id: str
+
+    :param course_id: the ID of the course
+    :type course_id: str
+
+    :return: the (slot of the course, other course of the person, slot of the other course) that overlap
+    :rtype: list of tuple
+    """
+    slots = course_slots(conn, course_id)
+    if not slots:
+        return []
+    index = SlotIndex(conn.execute(PERSON_SLOTS[kind], (person_id, course_id)))
+    return [((day, start, end), other[0], other[1:]) for day, start, end in slots
+            for other in index.overlapping(day, start, end)]
+
+
+def check(conn, kind, person_id, course_id):
+    """
+    raises a ClashError if registering a student in a course, or assigning an instructor to it, makes a clash
+
+    :return: Nothing.
+    :rtype: None
+    :raises ClashError: naming the first clash
+    """
+    found = clashes(conn, kind, person_id, course_id)
+    if found:
+        slot, other, other_slot = found[0]
+        raise ClashError("%s (%s) clashes with %s (%s) in the timetable of %s %s" % (
+            course_id, format_slot(*slot), other, format_slot(*other_slot), kind[:-1], person_id))
+
+
+def check_registration(conn, student_id, course_id):
+    """
+    raises a ClashError if a course meets at the same time as another course of a student (see check)
+    """
+    check(conn, 'students', student_id, course_id)
+
+
+def check_assignment(conn, instructor_id, course_id):
+    """
+    raises a ClashError if a course meets at the same time as another course of an instructor (see check)
+    """
+    check(conn, 'instructors', instructor_id, course_id)
+
+
+def check_course(conn, course_id):
+    """
+    raises a ClashError if a course meets at the same time as another course of its instructor, or of one of
+    its students (see check)
+
+    :return: Nothing.
+    :rtype: None
+    :raises ClashError: naming the first clash
+    """
+    if not course_slots(conn, course_id):
+        return
+    for instructor_id, in conn.execute("select InstructorID from Courses where ID = ? and InstructorID is not null",
+                                       (course_id,)).fetchall():
+        check_assignment(conn, instructor_id, course_id)
+    for student_id, in conn.execute("select StudentID from Registrations where CourseID = ? order by StudentID",
+                                    (course_id,)).fetchall():
+        check_registration(conn, student_id, course_id)
+
+
+def all_slots(conn):
+    """
+    returns the slots of every course that has some
+
+    :return: course ID -> its (day, start, end) slots
+    :rtype: dict
+    """
+    slots = {}
+    for course_id, day, start, end in conn.execute("select CourseID, Day, StartTime, EndTime from CourseSlots"):
+        slots.setdefault(course_id, []).append((day, start, end))
+    return slots
+
+
+def term_clashes(conn, kind, slots=None):
+    """
+    yields the clashes in the timetables of all students or all instructors, each pair of courses of a person
+    once. The courses of each person are read in one pass, and each checked against a SlotIndex of the
+    person's previous courses
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param kind: students or instructors
+    :type kind: str
+
+    :param slots: the slots of every course, as returned by all_slots, read if not given
+    :type slots: dict or None
+
+    :return: (person ID, course ID, its slot, other course ID, its slot), in the order of the people
+    :rtype: generator of tuple
+    """
+    slots = all_slots(conn) if slots is None else slots
+    for person_id, rows in itertools.groupby(conn.execute(TERM[kind]), key=lambda t: t[0]):
+        index = SlotIndex()
+        reported = set()
+        for _, course_id in rows:
+            for day, start, end in slots.get(course_id, ()):
+                for other, *other_slot in index.overlapping(day, start, end):
+                    if other != course_id and (other, course_id) not in reported:
+                        reported.add((other, course_id))
+                        yield person_id, other, tuple(other_slot), course_id, (day, start, end)
+            for day, start, end in slots.get(course_id, ()):
+                index.add(course_id, day, start, end)
+
+
+def validate_term(conn):
+    """
+    finds the clashes in the timetables of all students and instructors
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :return: the clashes of the students and of the instructors (see term_clashes), and the time taken
+    :rtype: dict
+    """
+    start = time.perf_counter()
+    slots = all_slots(conn)
+    result = {kind: list(term_clashes(conn, kind, slots)) for kind in TERM}
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def clash_rows(result):
+    """
+    yields the rows of the clashes found by validate_term, in the columns of CSV_HEADER
+    """
+    for kind in TERM:
+        for person_id, course_id, slot, other, other_slot in result[kind]:
+            yield [kind[:-1], person_id, course_id, format_slot(*slot), other, format_slot(*other_slot)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="meeting times of the courses, and the clashes of the timetables")
+    parser.add_argument('command', choices=['set', 'show', 'validate'])
+    parser.add_argument('course', nargs='?', help='the course to set or show the meeting times of')
+    parser.add_argument('slots', nargs='*', help='the meeting times to set, e.g. "Mon 09:00-10:15"')
+    parser.add_argument('--db', default=DB_FILE)
+    parser.add_argument('--csv', help='csv file to write the clashes to instead of printing them')
+    args = parser.parse_args(argv)
+    if args.command != 'validate' and not args.course:
+        parser.error("%s needs a course" % args.command)
+
+    conn = connect(args.db)
+    if args.command == 'set':
+        set_slots(conn, args.course, parse_slots(", ".join(args.slots)))
+    if args.command in ('set', 'show'):
+        print("%s: %s" % (args.course, ", ".join(format_slot(*slot) for slot in course_slots(conn, args.course))))
+    else:
+        result = validate_term(conn)
+        if args.csv:
+            with open_file(args.csv, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(CSV_HEADER)
+                writer.writerows(clash_rows(result))
+        else:
+            for row in clash_rows(result):
+                print("\t".join(row))
+        print("%d clashes of students, %d of instructors, in %.2fs" % (
+            len(result['students']), len(result['instructors']), result['seconds']))
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""
+Reading the tables of the database as the records of the json and csv exports, and writing
+them to (possibly compressed) files one record at a time.
+
+The records have the same shape as the ones written by the Export Data tab of app_PyQt5.py:
+students.json holds Student.to_dict() records, instructors.json Instructor.to_dict() records,
+courses.json Course.to_dict() records and registrations.json {"StudentID", "CourseID"} records.
+Each file is either a json array (.json) or json lines (.jsonl), one record per line.
+
+The nested exports write one document per student, with the courses they are registered in, and one per
+instructor, with the courses they teach (see NESTED), so that their readers don't have to join the files of
+the tables. Each is read with a single query joining the tables in the order of the students (or instructors)
+and of their courses, whose rows are grouped into documents as they are read: the export takes one pass over
+the tables, and only the rows of one document are in memory at a time.
+
+The tables are read a page at a time in the order of their keys (see pagination.py), and the objects of
+the records are built from the rows without validating them again, since they come from the database.
+"""
+import csv
+import itertools
+
+from compression import open_file
+from jsonstream import is_json_lines, iter_records, write_json_array, write_json_lines
+from objects import Student, Instructor, Course
+from pagination import iter_pages, iter_rows
+
+
+def student_to_dict(t):
+    """
+    converts a row (ID, Name, Age, Email) of the Students table into the dictionary written to students.json
+    """
+    return Student.from_row(t).to_dict()
+
+
+def instructor_to_dict(t):
+    """
+    converts a row (ID, Name, Age, Email) of the Instructors table into the dictionary written to instructors.json
+    """
+    return Instructor.from_row(t).to_dict()
+
+
+def course_to_dict(t):
+    """
+    converts a row (ID, Name, InstructorID) of the Courses table into the dictionary written to courses.json
+    """
+    return Course.from_row(t).to_dict()
+
+
+def registration_to_dict(t):
+    """
+    converts a row (StudentID, CourseID) of the Registrations table into the dictionary written to registrations.json
+    """
+    return {"StudentID" : t[0], "CourseID" : t[1]}
+
+
+# table name -> (table of the database, row converter, default file name)
+EXPORTS = {
+    'students': ("Students", student_to_dict, 'students.json'),
+    'instructors': ("Instructors", instructor_to_dict, 'instructors.json'),
+    'courses': ("Courses", course_to_dict, 'courses.json'),
+    'registrations': ("Registrations", registration_to_dict, 'registrations.json'),
+}
+
+# table name -> class of its records, which converts a page of rows at once (see rows_to_dicts)
+CLASSES = {'students': Student, 'instructors': Instructor, 'courses': Course}
+
+# kind of nested export -> the key of the list of courses in its documents, the query of the rows of its documents,
+# one per course (with null courses for a student or instructor without any) in the order of the documents, and
+# the file it is written to by default
+NESTED = {
+    'students': ('registered_courses', '''
+        SELECT s.ID, s.Name, s.Age, s.Email, c.ID, c.Name, c.InstructorID
+        FROM Students s
+        LEFT JOIN Registrations r ON r.StudentID = s.ID
+        LEFT JOIN Courses c ON c.ID = r.CourseID
+        ORDER BY s.ID, c.ID
+        ''', 'students_nested.json'),
+    'instructors': ('assigned_courses', '''
+        SELECT i.ID, i.Name, i.Age, i.Email, c.ID, c.Name, c.InstructorID
+        FROM Instructors i
+        LEFT JOIN Courses c ON c.InstructorID = i.ID
+        ORDER BY i.ID, c.ID
+        ''', 'instructors_nested.json'),
+}
+
+CSV_HEADER = ['ID / Student ID', 'Name / Course ID', 'Type', 'Age/Instructor ID', 'Email']
+
+# table name -> converter of its rows into the rows of merged_data.csv, in the order of the file
+CSV_ROWS = {
+    'students': lambda t: [t[0], t[1], 'Student', t[2], t[3]],
+    'instructors': lambda t: [t[0], t[1], 'Instructor', t[2], t[3]],
+    'courses': lambda t: [t[0], t[1], 'Course', t[2], 'N/A'],  # 'N/A' for email
+    'registrations': lambda t: [t[0], t[1], 'Registration', "N/A", 'N/A'],  # 'N/A' for email
+}
+
+
+def rows_to_dicts(table, rows):
+    """
+    converts rows of a table into the records of its json export, like the row converter of EXPORTS does one row
+    at a time. The rows come from the database, so the objects are built without validating them again
+    (see from_rows in objects.py)
+
+    :param table: students, instructors, courses or registrations
+    :type table: str
+
+    :param rows: rows of the table, with all its columns
+    :type rows: list of tuple
+
+    :rtype: list of dict
+    """
+    if table not in CLASSES:
+        return [registration_to_dict(t) for t in rows]
+    cls = CLASSES[table]
+    return cls.to_dicts(cls.from_rows(rows))
+
+
+def records(conn, table):
+    """
+    yields the records of a table, in the format of its json export
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param table: students, instructors, courses or registrations
+    :type table: str
+
+    :return: the records
+    :rtype: generator of dict
+    """
+    for rows in iter_pages(conn, EXPORTS[table][0]):
+        yield from rows_to_dicts(table, rows)
+
+
+def export_json(conn, table, filename=None, level=None):
+    """
+    exports a table into a json file, overwriting it if it exists.
+    The records are written as json lines if the file name ends with .jsonl, and as a json array otherwise.
+    The file is compressed if its name ends with .gz, .bz2 or .xz
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param table: students, instructors, courses or registrations
+    :type table: str
+
+    :param filename: the file to write, defaults to <table>.json
+    :type filename: str or None
+
+    :param level: the compression level
+    :type level: int or None
+
+    :return: Nothing.
+    :rtype: None
+    """
+    filename = filename or EXPORTS[table][2]
+    write = write_json_lines if is_json_lines(filename) else write_json_array
+    with open_file(filename, 'w', level) as file:
+        write(file, records(conn, table))
+
+
+def nested_records(conn, kind):
+    """
+    yields the documents of a nested export: the record of a student in students.json with the list of the courses
+    they are registered in as registered_courses, or the record of an instructor in instructors.json with the courses
+    they teach as assigned_courses, as read back by Student.load_from_json and Instructor.load_from_json.
+    The rows of the query of the export are grouped into documents as they are read, so only one document is in memory
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param kind: students or instructors
+    :type kind: str
+
+    :return: the documents, in the order of their IDs
+    :rtype: generator of dict
+    """
+    courses, query, filename = NESTED[kind]
+    cls = CLASSES[kind]
+    for key, rows in itertools.groupby(conn.execute(query), key=lambda t: t[0]):
+        first = next(rows)
+        document = cls.from_row(first[:4]).to_dict()
+        document[courses] = Course.to_dicts(Course.from_rows(t[4:] for t in itertools.chain([first], rows)
+                                                              if t[4] is not None))
+        yield document
+
+
+def export_nested(conn, kind, filename=None, level=None):
+    """
+    writes the documents of a nested export (see nested_records) into a json file, overwriting it if it exists.
+    The documents are written as json lines if the file name ends with .jsonl, and as a json array otherwise.
+    The file is compressed if its name ends with .gz, .bz2 or .xz
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param kind: students or instructors
+    :type kind: str
+
+    :param filename: the file to write, defaults to students_nested.json or instructors_nested.json
+    :type filename: str or None
+
+    :param level: the compression level
+    :type level: int or None
+
+    :return: Nothing.
+    :rtype: None
+    """
+    filename = filename or NESTED[kind][2]
+    write = write_json_lines if is_json_lines(filename) else write_json_array
+    with open_file(filename, 'w', level) as file:
+        write(file, nested_records(conn, kind))
+
+
+def read_records(filename):
+    """
+    yields the records of a json array or json lines export, one at a time.
+    The file is decompressed on the fly if its name ends with .gz, .bz2 or .xz
+
+    :param filename: the file to read
+    :type filename: str
+
+    :return: the records
+    :rtype: generator
+    """
+    with open_file(filename, 'r') as file:
+        yield from iter_records(file, filename)
+
+
+def csv_rows(conn):
+    """
+    yields the rows of merged_data.csv: the header, then every student, instructor, course and registration,
+    tagged with its type in the third column
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :return: the rows
+    :rtype: generator of list
+    """
+    yield CSV_HEADER
+    for table, to_row in CSV_ROWS.items():
+        for t in iter_rows(conn, EXPORTS[table][0]):
+            yield to_row(t)
+
+
+def export_csv(conn, filename='merged_data.csv', level=None):
+    """
+    writes all records in the tables of the database into a csv file, overwriting it if it exists.
+    The file is compressed if its name ends with .gz, .bz2 or .xz
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param filename: the file to write
+    :type filename: str
+
+    :param level: the compression level
+    :type level: int or None
+
+    :return: Nothing.
+    :rtype: None
+    """
+    with open_file(filename, 'w', level, newline='') as f:
+        csv.writer(f).writerows(csv_rows(conn))
@@ -0,0 +1,160 @@
+"""
+Synchronizing a table with a full dump of it, e.g. the nightly export of another copy of the database.
+
+The rows of the dump are upserted: inserted, or updated in place when the table has a row with the same
+key, but only if one of its columns differs::
+
+    INSERT INTO Students (ID, Name, Age, Email) VALUES (?, ?, ?, ?)
+    ON CONFLICT (ID) DO UPDATE SET Name = excluded.Name, Age = excluded.Age, Email = excluded.Email
+    WHERE Name IS NOT excluded.Name OR Age IS NOT excluded.Age OR Email IS NOT excluded.Email
+
+A row that is the same in the dump is left alone: no page is written and no trigger fires (nothing is
+added to the ChangeLog, no summary is updated), so importing a dump in which few rows changed writes
+little, which keeps the WAL and the next backup small. Unlike INSERT OR REPLACE, which deletes a row
+before inserting it again, an update keeps the registrations of a student, which the foreign keys would
+delete with it.
+
+The rows of a batch that are already in the table are read first, KEYS_PER_QUERY keys per query, to tell
+the rows inserted from the ones updated, and to skip the unchanged ones without executing anything.
+
+The rows missing from the dump can then be deleted: the keys of the dump are collected in a temporary
+table, which is never written to the database file, and the rows whose key isn't in it are deleted with
+one statement. Deleting a student or a course deletes its registrations, and deleting an instructor
+deletes their courses (see the foreign keys in database.py).
+"""
+from database import COLUMNS
+from pagination import page_key
+
+# the keys looked up per query by existing_rows, below the limit of 999 parameters of older SQLite versions
+KEYS_PER_QUERY = 400
+
+
+def upsert_statement(table):
+    """
+    returns the statement inserting a row into a table, or updating the row with the same key if one of its
+    other columns differs. A table with only key columns (Registrations) has nothing to update
+
+    :param table: Students, Instructors, Courses or Registrations
+    :type table: str
+
+    :rtype: str
+    """
+    columns, keys = COLUMNS[table]
+    others = [column for column in columns if column not in keys]
+    statement = "insert into %s (%s) values (%s) on conflict (%s) do " % (
+        table, ", ".join(columns), ", ".join("?" * len(columns)), ", ".join(keys))
+    if not others:
+        return statement + "nothing"
+    return statement + "update set %s where %s" % (
+        ", ".join("%s = excluded.%s" % (column, column) for column in others),
+        " or ".join("%s is not excluded.%s" % (column, column) for column in others))
+
+
+# table -> its upsert statement
+STATEMENTS = {table: upsert_statement(table) for table in COLUMNS}
+
+
+def existing_rows(conn, table, keys):
+    """
+    returns the rows of a table with the given keys
+
+    :param conn: the database connection
+    :type conn: sqlite3.Connection
+
+    :param table: Students, Instructors, Courses or Registrations
+    :type table: str
+
+    :param keys: the primary keys to look up
+    :type keys: list of tuple
+
+    :return: the rows found, by key
+    :rtype: dict
+    """
+    columns, key_columns = COLUMNS[table]
+    placeholder = "(%s)" % ", ".join("?" * len(key_columns))
+    found = {}
+    for start in range(0, len(keys), KEYS_PER_QUERY):
+        chunk = keys[start:start + KEYS_PER_QUERY]
+        sql = "select %s from %s where (%s) in (values %s)" % (
+            ", ".join(columns), table, ", ".join(key_columns), ", ".join([placeholder] * len(chunk)))
+        for row in conn.execute(sql, [value for key in chunk for value in key]):
+            found[page_key(table, row)] = row
+    return found
+
+
+def upsert_row(conn, table, row, existing, counts):
+    """
+    inserts a row, or updates the row with the same key if it differs, and counts it as inserted, updated
+    or unchanged. An unchanged row isn't written at all
+
+    :param conn: the database connection, in the transaction of the batch
+    :type conn: sqlite3.Connection
+
+    :param table: Students, Instructors, Courses or Registrations
+    :type table: str
+
+    :param row: the row, with all the columns of the table in their order
+    :type row: tuple
+
+    :param existing: the rows of the batch already in the table, by key (see existing_rows), updated with the row
+    :type existing: dict
+
+    :param counts: the counts of the rows inserted, updated and unchanged, incremented
+    :type counts: dict
+
+    :return: Nothing.
+    :rtype: None
+    :raises sqlite3.IntegrityError: if the row breaks a constraint, e.g. a registration of an unknown student
+    """
+    key = page_key(table, row)
+    old = existing.get(key)
+    if old == tuple(row):
+        counts['unchanged'] += 1
+        return
+    if conn.execute(STATEMENTS[table], row).rowcount == 0:
+        # the same values with other types, e.g. an age of "20" for 20
+        counts['unchanged'] += 1
+    else:
+        counts['inserted' if old is None else 'updated'] += 1
+    existing[key] = tuple(row)
+
+
+def create_seen_keys(conn, table):
+    """
+    creates, empty, the temporary table collecting the keys of a dump of a table (see remember_keys)
+
+    :return: Nothing.
+    :rtype: None
+    """
+    keys = COLUMNS[table][1]
+    conn.execute("drop table if exists temp.SeenKeys")
+    conn.execute("create temp table SeenKeys (%s, primary key (%s)) without rowid" % (
+        ", ".join(keys), ", ".join(keys)))
+
+
+def remember_keys(conn, table, rows):
+    """
+    adds the keys of rows of the dump to the temporary table of create_seen_keys
+
+    :param rows: rows with all the columns of the table, in their order
+    :type rows: list of tuple
+
+    :return: Nothing.
+    :rtype: None
+    """
+    keys = COLUMNS[table][1]
+    conn.executemany("insert or ignore into temp.SeenKeys values (%s)" % ", ".join("?" * len(keys)),
+                     [page_key(table, row) for row in rows])
+
+
+def delete_missing(conn, table):
+    """
+    deletes the rows of a table whose key isn't in the temporary table of create_seen_keys,
+    i.e. the rows missing from the dump
+
+    :return: the number of rows deleted, without the rows of other tables deleted with them
+    :rtype: int
+    """
+    keys = COLUMNS[table][1]
+    return conn.execute("delete from %s where not exists (select 1 from temp.SeenKeys where %s)" % (
+        table, " and ".join("SeenKeys.%s = %s.%s" % (key, table, key) for key in keys))).rowcount